@@ -0,0 +1,22 @@
+"""
+Настройка pytest: модули бота импортируются от каталога src, как при запуске main.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.sheets_cache import sheets_cache
+
+
+@pytest.fixture
+def direct_sheets_calls(monkeypatch):
+    """Вызовы через пул Sheets выполняются сразу в цикле событий: без квоты, потоков и повторов"""
+    async def call(func, *args, priority=None, operation=None, cost=1, **kwargs):
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(sheets_cache, "execute_with_rate_limit", call)
+    monkeypatch.setattr(sheets_cache, "run_in_executor", call)
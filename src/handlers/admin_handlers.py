@@ -3,7 +3,7 @@
 """
 
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
-from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters, CommandHandler
+from telegram.ext import ContextTypes, ConversationHandler
 
 from models.states import *
 from utils.sheets import GoogleSheets
@@ -20,17 +20,16 @@ class AdminHandler(BaseHandler):
     
     def __init__(self, sheets: GoogleSheets, application=None):
         super().__init__(sheets)
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
         self.application = application  # Сохраняем application при инициализации
 
     async def list_questions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Вывод списка вопросов"""
+        schema = self.survey_store.current
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Запрос списка вопросов")
         
         # Проверяем, есть ли вопросы
-        if not self.questions:
+        if not schema.texts:
             await update.message.reply_text(
                 "❌ В данный момент нет доступных вопросов.",
                 reply_markup=ReplyKeyboardRemove()
@@ -39,8 +38,8 @@ class AdminHandler(BaseHandler):
         
         # Формируем текст со списком вопросов
         questions_text = "📋 Список вопросов:\n\n"
-        for i, question in enumerate(self.questions):
-            options = self.questions_with_options[question]
+        for i, question in enumerate(schema.texts):
+            options = schema.source[question]
             
             # Добавляем номер и текст вопроса
             questions_text += f"{i+1}. {question}\n"
@@ -134,15 +133,13 @@ class AdminHandler(BaseHandler):
         if choice == "✨ Свободный ответ":
             # Добавляем вопрос без вариантов ответов
             question = context.user_data['new_question']
-            success = self.sheets.add_question(question, [])
+            success = await self.sheets.async_add_question(question, [])
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем списки вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
-                
-                # Обновляем списки вопросов в других обработчиках через application
-                await self._update_handlers_questions(update)
+                await self.refresh_questions()
                 
                 await update.message.reply_text(
                     f"✅ Вопрос успешно добавлен:\n{question}\n\nТип: Свободный ответ",
@@ -219,15 +216,13 @@ class AdminHandler(BaseHandler):
                 return ADDING_OPTIONS
             
             # Добавляем вопрос с вариантами ответов
-            success = self.sheets.add_question(question, options)
+            success = await self.sheets.async_add_question(question, options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем списки вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
-                
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
+                await self.refresh_questions()
                 
                 # Спрашиваем, нужно ли добавить вложенные варианты
                 keyboard = [
@@ -256,15 +251,13 @@ class AdminHandler(BaseHandler):
         # Если был выбран свободный ответ
         if context.user_data.get('free_form'):
             # Добавляем вопрос без вариантов ответов
-            success = self.sheets.add_question(question)
+            success = await self.sheets.async_add_question(question)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем списки вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
-                
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
+                await self.refresh_questions()
                 
                 await update.message.reply_text(
                     f"✅ Вопрос со свободным ответом успешно добавлен:\n{question}",
@@ -307,6 +300,7 @@ class AdminHandler(BaseHandler):
     
     async def handle_nested_options(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Обработка запроса на добавление вложенных вариантов ответа"""
+        schema = self.survey_store.current
         user_id = update.effective_user.id
         text = update.message.text
         
@@ -342,8 +336,8 @@ class AdminHandler(BaseHandler):
                 # Получаем текущий вопрос и его варианты
                 if 'current_question' in context.user_data:
                     question = context.user_data['current_question']
-                    if question in self.questions_with_options:
-                        options = self.questions_with_options[question]
+                    if question in schema.source:
+                        options = schema.source[question]
                         
                         # Формируем клавиатуру из вариантов
                         keyboard = []
@@ -463,7 +457,7 @@ class AdminHandler(BaseHandler):
                                        details={"вопрос": question, "вариант": parent_option_text})
                 
                 # Находим номер вопроса
-                for i, q in enumerate(self.questions):
+                for i, q in enumerate(schema.texts):
                     if q == question:
                         question_num = i
                         context.user_data['editing_question_num'] = i
@@ -471,8 +465,8 @@ class AdminHandler(BaseHandler):
             
             # Получаем текущие варианты ответов для вопроса
             current_options = []
-            if question in self.questions_with_options:
-                current_options = self.questions_with_options[question]
+            if question in schema.source:
+                current_options = self.editable_options(schema, question)
                 logger.data_processing("варианты", "Текущие варианты ответа",
                                        details={"вопрос": question, "варианты": current_options})
                 
@@ -492,16 +486,17 @@ class AdminHandler(BaseHandler):
                                    details={"вопрос_индекс": question_num, 
                                            "вариант": parent_option_text, 
                                            "тип": "свободный ответ"})
-            success = self.sheets.edit_question_options(question_index=question_num, options=current_options)
+            success = await self.sheets.async_edit_question_options(question_index=question_num, options=current_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем локальные списки вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 # Проверка после обновления
-                if question in self.questions_with_options:
-                    updated_options = self.questions_with_options[question]
+                if question in schema.source:
+                    updated_options = schema.source[question]
                     found_option = None
                     for opt in updated_options:
                         if isinstance(opt, dict) and "text" in opt and opt["text"] == parent_option_text:
@@ -517,9 +512,6 @@ class AdminHandler(BaseHandler):
                     # Детализируем структуру вопроса после обновления
                     logger.data_processing("структура", "Структура вопроса после обновления", details={"вопрос": question})
                 
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
-                
                 # Запрос подсказки для свободного ввода
                 await update.message.reply_text(
                     f"Введите текст вопроса для свободного ответа для варианта '{parent_option_text}':",
@@ -585,7 +577,7 @@ class AdminHandler(BaseHandler):
                 question = context.user_data['current_question']
                 
                 # Находим номер вопроса
-                for i, q in enumerate(self.questions):
+                for i, q in enumerate(schema.texts):
                     if q == question:
                         question_num = i
                         context.user_data['editing_question_num'] = i
@@ -605,8 +597,8 @@ class AdminHandler(BaseHandler):
             
             # Получаем текущие варианты ответов для вопроса
             current_options = []
-            if question in self.questions_with_options:
-                current_options = self.questions_with_options[question]
+            if question in schema.source:
+                current_options = self.editable_options(schema, question)
                 
                 # Находим вариант, который нужно изменить
                 for i, opt in enumerate(current_options):
@@ -616,15 +608,13 @@ class AdminHandler(BaseHandler):
                         break
             
             # Сохраняем изменения в таблицу
-            success = self.sheets.edit_question_options(question_index=question_num, options=current_options)
+            success = await self.sheets.async_edit_question_options(question_index=question_num, options=current_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем локальные списки вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
-                
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
+                schema = await self.refresh_questions()
                 
                 # Формируем сообщение с добавленными подвариантами
                 sub_options_text = "\n".join([f"- {sub_opt}" for sub_opt in sub_options])
@@ -708,7 +698,9 @@ class AdminHandler(BaseHandler):
             logger.admin_action(user_id, "Подтверждена очистка данных")
             
             # Выполняем очистку
-            success = self.sheets.clear_answers_and_stats()
+            success = await self.sheets.async_clear_answers_and_stats()
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 await update.message.reply_text(
@@ -838,12 +830,14 @@ class AdminHandler(BaseHandler):
                               details={"admin_id": new_admin_id, "name": admin_name})
 
             # Добавляем администратора со всеми данными
-            success = self.sheets.add_admin(new_admin_id, admin_name, admin_description)
+            success = await self.sheets.async_add_admin(new_admin_id, admin_name, admin_description)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
 
             if success:
                 try:
                     # Обновляем список админов в памяти
-                    admin_ids = self.sheets.get_admins()
+                    admin_ids = await self.sheets.async_get_admins()
                     # Обновляем команды для нового админа
                     await setup_commands(self.application, admin_ids)
                     
@@ -943,11 +937,13 @@ class AdminHandler(BaseHandler):
             admin_id = int(choice.split(" - ")[0])
             logger.admin_action(user_id, "Удаление администратора", details={"admin_id": admin_id})
             
-            success = self.sheets.remove_admin(admin_id)
+            success = await self.sheets.async_remove_admin(admin_id)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список админов в памяти
-                admin_ids = self.sheets.get_admins()
+                admin_ids = await self.sheets.async_get_admins()
                 # Обновляем команды после удаления админа
                 await setup_commands(self.application, admin_ids)
                 
@@ -1003,6 +999,45 @@ class AdminHandler(BaseHandler):
                 reply_markup=ReplyKeyboardRemove()
             )
 
+    async def show_health(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показывает состояние подключения к таблице, выключателя и локальных очередей"""
+        user_id = update.effective_user.id
+        logger.admin_action(user_id, "Просмотр состояния подключения к таблице")
+        
+        health = self.sheets.get_health()
+        retry = health["retry"]
+        circuit = retry["circuit"]
+        circuit_names = {"closed": "замкнут", "open": "разомкнут", "half_open": "пробный запрос"}
+        questions_cache = health["questions_cache"]
+        answers_buffer = health["answers_buffer"]
+        write_queue = health["write_queue"]
+        
+        lines = [
+            "⚠️ Таблица недоступна: бот работает в деградированном режиме" if health["degraded"]
+            else "✅ Таблица доступна",
+            "",
+            f"🔌 Выключатель: {circuit_names.get(circuit['state'], circuit['state'])}"
+            + (f" ({circuit['open_for']:.0f} сек)" if circuit["state"] != "closed" else ""),
+            f"❗ Ошибок подряд: {circuit['consecutive_failures']}, размыканий: {circuit['opened']}",
+            f"🔁 Запросов: {retry['requests']}, повторов: {retry['retries']}, без успеха: {retry['gave_up']}",
+            f"🪙 Бюджет повторов: {retry['budget']['tokens']}",
+            "",
+            f"📝 Ответов в буфере: {answers_buffer['pending']}",
+            f"📥 Отложенных записей: {write_queue['pending']}"
+            + (" (" + ", ".join(f"{kind}: {count}" for kind, count in write_queue["pending_by_kind"].items()) + ")"
+               if write_queue["pending_by_kind"] else ""),
+            f"❓ Вопросы в кэше: возраст {questions_cache['served_age_last'] or 0:.0f} сек, "
+            f"выдано после TTL: {questions_cache['expired_hits']}",
+        ]
+        replication = health["replication"]
+        if replication is not None:
+            lines.append(
+                f"🗄 Изменений не отправлено в таблицу: {replication['pending']}"
+                + (f" (самое старое - {replication['oldest_pending_age']:.0f} сек)"
+                   if replication["oldest_pending_age"] else "")
+            )
+        await update.message.reply_text("\n".join(lines))
+    
     async def handle_add_free_text_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка добавления вопроса для свободного ответа"""
         user_id = update.effective_user.id
@@ -1030,7 +1065,7 @@ class AdminHandler(BaseHandler):
             return ConversationHandler.END
         
         # Загружаем текущие варианты ответов для данного вопроса
-        questions_with_options = self.sheets.get_questions_with_options()
+        questions_with_options = await self.sheets.async_get_questions_with_options()
         questions = list(questions_with_options.keys())
         question = questions[question_index]
         current_options = questions_with_options[question]
@@ -1050,22 +1085,20 @@ class AdminHandler(BaseHandler):
         logger.data_processing("изменения", "Сохранение изменений",
                        details={"вопрос": question, "номер_варианта": option_index})
         
-        success = self.sheets.edit_question_options(question_index=question_index, options=current_options)
+        success = await self.sheets.async_edit_question_options(question_index=question_index, options=current_options)
+        if await self.reply_if_write_unknown(update.message, success):
+            return ConversationHandler.END
         
         if success:
             # Обновляем локальные данные после успешного сохранения
             # Инвалидируем кэш в sheets и обновляем локальные данные
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            await self.refresh_questions()
             
             await update.message.reply_text(
                 f"✅ Вопрос для свободного ответа добавлен: '{prompt}'",
                 reply_markup=ReplyKeyboardRemove()
             )
             
-            # Обновляем списки вопросов в других обработчиках
-            await self._update_handlers_questions(update)
-            
             # Спрашиваем, нужно ли добавить вложенные варианты к другому варианту
             keyboard = [
                 [KeyboardButton("✅ Да, к другому варианту")],
@@ -1104,114 +1137,6 @@ class AdminHandler(BaseHandler):
         context.user_data.pop('editing_option_index', None)
         return ConversationHandler.END
 
-    async def _update_handlers_questions(self, update: Update):
-        """Обновляет списки вопросов во всех обработчиках"""
-        try:
-            if not self.application:
-                logger.error("отсутствие_приложения", "Application не найден")
-                return
-
-            # Обновляем собственные списки вопросов перед обновлением других обработчиков
-            old_questions_count = len(self.questions)
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
-            logger.data_processing("обновление", "Обновление списков вопросов", 
-                              details={"обработчик": "AdminHandler", 
-                                       "старое_количество": old_questions_count, 
-                                       "новое_количество": len(self.questions)})
-            
-            # Упрощенное логирование для снижения нагрузки
-            logger.data_processing("обновление", "Начало обновления вопросов в обработчиках", 
-                              details={"количество_вопросов": len(self.questions)})
-            
-            # Обновляем списки вопросов в других обработчиках
-            for handler in self.application.handlers[0]:
-                # Обновление для SurveyHandler
-                if isinstance(handler, ConversationHandler) and hasattr(handler, 'name') and handler.name == "survey_conversation":
-                    # Находим SurveyHandler в entry_points
-                    for entry_point in handler.entry_points:
-                        if hasattr(entry_point.callback, '__self__'):
-                            survey_handler = entry_point.callback.__self__
-                            old_count = len(survey_handler.questions)
-                            # Важно: передаем копию словаря questions_with_options, чтобы избежать изменений общих данных
-                            survey_handler.questions_with_options = self.questions_with_options.copy()
-                            survey_handler.questions = self.questions.copy()
-                            
-                            # Полностью перестраиваем состояния для вопросов
-                            new_states = {}
-                            
-                            # Сначала копируем стандартные состояния, не связанные с конкретными вопросами
-                            for state, handlers_list in handler.states.items():
-                                # Пропускаем не вопросы и вложенные состояния
-                                if not state.startswith("QUESTION_") or state in ["WAITING_START", "CONFIRMING", "SUB_OPTIONS"]:
-                                    continue
-                                new_states[state] = handlers_list
-                            
-                            # Затем добавляем состояния для текущих вопросов
-                            for i in range(len(self.questions)):
-                                question_state = f"QUESTION_{i}"
-                                new_states[question_state] = [MessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)]
-                                # Добавляем состояние для вложенных вариантов
-                                sub_question_state = f"QUESTION_{i}_SUB"
-                                new_states[sub_question_state] = [MessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)]
-                            
-                            # Заменяем старые состояния новыми
-                            handler.states.clear()
-                            handler.states.update(new_states)
-                            
-                            logger.data_processing("обновление", "Обновление состояний SurveyHandler", 
-                                              details={"старое_количество": old_count, 
-                                                       "новое_количество": len(self.questions)})
-                            break
-                
-                # Обновление для EditHandler
-                if isinstance(handler, ConversationHandler) and hasattr(handler, 'name') and handler.name == "edit_question_conversation":
-                    # Находим EditHandler в entry_points
-                    for entry_point in handler.entry_points:
-                        if hasattr(entry_point.callback, '__self__'):
-                            edit_handler = entry_point.callback.__self__
-                            old_count = len(edit_handler.questions)
-                            edit_handler.questions_with_options = self.questions_with_options.copy()
-                            edit_handler.questions = self.questions.copy()
-                            
-                            logger.data_processing("обновление", "Обновление вопросов в EditHandler", 
-                                              details={"старое_количество": old_count, 
-                                                       "новое_количество": len(self.questions)})
-                            break
-                
-                # Обновление для DeleteQuestionHandler
-                if isinstance(handler, ConversationHandler) and hasattr(handler, 'name') and handler.name == "delete_question_conversation":
-                    # Находим DeleteQuestionHandler в entry_points
-                    for entry_point in handler.entry_points:
-                        if hasattr(entry_point.callback, '__self__'):
-                            delete_handler = entry_point.callback.__self__
-                            old_count = len(delete_handler.questions)
-                            delete_handler.questions_with_options = self.questions_with_options.copy()
-                            delete_handler.questions = self.questions.copy()
-                            
-                            logger.data_processing("обновление", "Обновление вопросов в DeleteQuestionHandler", 
-                                              details={"старое_количество": old_count, 
-                                                       "новое_количество": len(self.questions)})
-                            break
-                
-                # Обновление для ListQuestionsHandler
-                if isinstance(handler, CommandHandler) and handler.callback.__name__ == "list_questions":
-                    if hasattr(handler.callback, '__self__'):
-                        list_questions_handler = handler.callback.__self__
-                        if hasattr(list_questions_handler, 'questions'):
-                            old_count = len(list_questions_handler.questions)
-                            list_questions_handler.questions_with_options = self.questions_with_options.copy()
-                            list_questions_handler.questions = self.questions.copy()
-                            logger.data_processing("обновление", "Обновление вопросов в ListQuestionsHandler", 
-                                              details={"старое_количество": old_count, 
-                                                       "новое_количество": len(self.questions)})
-
-            logger.data_processing("обновление", "Завершение обновления вопросов", 
-                              details={"итоговое_количество": len(self.questions)})
-
-        except Exception as e:
-            logger.error("обновление_вопросов", str(e))
-
     async def reset_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Сброс прохождения опроса для пользователя"""
         user_id = update.effective_user.id
@@ -1232,7 +1157,9 @@ class AdminHandler(BaseHandler):
             user_id = int(update.message.text)
             logger.admin_action(admin_id, "Сброс опроса пользователя", details={"target_user_id": user_id})
             
-            success = self.sheets.reset_user_survey(user_id)
+            success = await self.sheets.async_reset_user_survey(user_id)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 await update.message.reply_text(
@@ -1308,7 +1235,7 @@ class AdminHandler(BaseHandler):
         page_size = context.user_data.get('users_page_size', 10)
         
         # Получаем список пользователей для текущей страницы
-        users, total_users, total_pages = self.sheets.get_users_list(page, page_size)
+        users, total_users, total_pages = await self.sheets.async_get_users_list(page, page_size)
         
         # Сохраняем общее количество страниц
         context.user_data['users_total_pages'] = total_pages
@@ -1361,7 +1288,7 @@ class AdminHandler(BaseHandler):
         logger.data_processing("пользователи", "Получение списка пользователей", details={"запросил": user_id})
         
         # Получаем список пользователей из таблицы
-        users = self.sheets.get_users_list()
+        users = await self.sheets.async_get_users_list()
         
         if not users:
             await update.message.reply_text(
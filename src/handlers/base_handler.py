@@ -2,33 +2,83 @@
 Базовый класс для обработчиков сообщений
 """
 
+import copy
+
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler, Application
 
 from utils.sheets import GoogleSheets
+from utils.survey_store import survey_store
+from utils.survey_schema import SurveySchema
+from utils.sheets_retry import sheets_retry
 from utils.logger import get_logger
 
 # Настройка логирования
 logger = get_logger()
 
+# Ответ, когда запись в таблицу не завершилась за SHEETS_CALL_TIMEOUT: она продолжается в фоне
+WRITE_RESULT_UNKNOWN_TEXT = (
+    "⏳ Таблица отвечает слишком долго. Изменение может примениться позже - "
+    "проверьте результат через минуту, прежде чем повторять действие."
+)
+
 class BaseHandler:
     """Базовый класс для обработчиков сообщений"""
     
     def __init__(self, sheets: GoogleSheets, application: Application = None):
         """Инициализация обработчика"""
         self.sheets = sheets
-        # Загружаем вопросы только один раз при инициализации
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
         self.application = application
-        logger.init("base_handler", f"Инициализация обработчика", details={"вопросов": len(self.questions)})
+        # Вопросы общие для всех обработчиков: первый обработчик публикует их, остальные читают
+        self.survey_store = survey_store
+        if not self.survey_store.current.version:
+            # Обработчики создаются при запуске бота, до начала обработки обновлений
+            self._publish_questions(self.sheets.get_questions_with_options())
+        logger.init("base_handler", f"Инициализация обработчика", details={"вопросов": len(self.survey_store.current)})
+    
+    @staticmethod
+    def editable_options(schema: SurveySchema, question: str) -> list:
+        """
+        Копия вариантов ответа одного вопроса для редактирования
+        
+        Обработчик берет схему один раз (schema = self.survey_store.current) и
+        читает schema.source без копирования; копируются только варианты
+        вопроса, которые он изменяет, - опубликованная схема не меняется.
+        """
+        return copy.deepcopy(schema.source.get(question) or [])
+    
+    async def refresh_questions(self) -> SurveySchema:
+        """Обновляет вопросы из источника данных и публикует их новой версией для всех обработчиков"""
+        return self._publish_questions(await self.sheets.async_get_questions_with_options())
+    
+    async def reply_if_write_unknown(self, message, result) -> bool:
+        """
+        Сообщает администратору, что результат записи в таблицу неизвестен
+        
+        Args:
+            message: Сообщение Telegram, на которое отвечаем
+            result: Результат async-записи GoogleSheets (None - запись не дождались)
+        
+        Returns:
+            bool: True, если результат неизвестен и ответ уже отправлен
+        """
+        if result is not None:
+            return False
+        await message.reply_text(WRITE_RESULT_UNKNOWN_TEXT, reply_markup=ReplyKeyboardRemove())
+        return True
     
-    def refresh_questions(self):
-        """Обновляет вопросы из источника данных"""
-        # Перезагружаем вопросы
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
-        logger.data_processing("вопросы", "Обновление списка вопросов", details={"количество": len(self.questions)})
+    def _publish_questions(self, questions: dict) -> SurveySchema:
+        """Публикует загруженные вопросы новой версией схемы и возвращает текущую версию"""
+        current = self.survey_store.current
+        if not questions and len(current) and (sheets_retry.is_degraded or sheets_retry.has_recent_failures):
+            # Пустой ответ при недоступной таблице - не изменение вопросов; оставляем текущую версию
+            logger.warning("Вопросы не загружены: таблица недоступна, используется текущая версия схемы",
+                           details={"версия": current.version, "вопросов": len(current)})
+            return current
+        schema = self.survey_store.publish(questions)
+        logger.data_processing("вопросы", "Обновление списка вопросов",
+                               details={"количество": len(schema), "версия": schema.version})
+        return schema
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка команды /start"""
@@ -92,7 +142,7 @@ class BaseHandler:
         
         # Обновляем список вопросов принудительно сбрасывая кэш
         self.sheets.invalidate_questions_cache()
-        self.refresh_questions()
+        await self.refresh_questions()
         
         # Перезапускаем бота
         return await self.start(update, context)
@@ -114,7 +164,7 @@ class BaseHandler:
         logger.user_action(user.id, "Завершение опроса", details={"тип": "Регистрация завершена"})
         
         # Получаем сообщение о завершении из таблицы
-        message_data = self.sheets.get_message("finish")
+        message_data = await self.sheets.async_get_message("finish")
         
         # Форматируем сообщение (замена плейсхолдеров и обработка Markdown)
         message_text = message_data.get("text", "Спасибо за регистрацию!")
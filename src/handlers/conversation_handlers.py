@@ -35,22 +35,14 @@ def create_survey_handler(survey_handler: SurveyHandler) -> ConversationHandler:
         TelegramMessageHandler(filters.Regex(r"^🔄 Начать заново$"), survey_handler.begin_survey)
     ]
     
-    # Добавляем динамические состояния для каждого вопроса
-    questions_count = len(survey_handler.questions)
-    logger.data_processing("состояния_опроса", "Добавление состояний для вопросов", details={"количество": questions_count})
-    
-    for i in range(questions_count):
-        # Основное состояние для выбора варианта ответа
-        question_state = f"QUESTION_{i}"
-        survey_states[question_state] = [
-            TelegramMessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)
-        ]
-        
-        # Состояние для выбора вложенного варианта ответа
-        sub_question_state = f"QUESTION_{i}_SUB"
-        survey_states[sub_question_state] = [
-            TelegramMessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)
-        ]
+    # Состояния ответа на вопрос не зависят от количества вопросов:
+    # вопросы, добавленные после запуска, не требуют пересоздания обработчика
+    survey_states[ANSWERING_QUESTION] = [
+        TelegramMessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)
+    ]
+    survey_states[QUESTION_SUB] = [
+        TelegramMessageHandler(filters.TEXT & ~filters.COMMAND, survey_handler.handle_answer)
+    ]
     
     # Добавляем состояние для вложенных вариантов ответов
     survey_states[SUB_OPTIONS] = [
@@ -201,6 +193,10 @@ def create_admin_handlers(admin_handler: AdminHandler, admin_ids: list) -> list:
     )
     handlers.append(list_users_handler)
     
+    # Состояние подключения к таблице и очередей записи
+    handlers.append(CommandHandler("health", admin_handler.show_health,
+                                   filters=filters.User(user_id=admin_ids)))
+    
     # Добавляем остальные обработчики
     handlers.extend([
         CommandHandler("list_questions", admin_handler.list_questions, 
@@ -436,4 +432,7 @@ def create_post_handlers(post_handler: PostHandler, admin_ids: list) -> list:
                       filters=filters.User(user_id=admin_ids)),
         CommandHandler('edit_caption', post_handler.edit_sent_post_with_caption,
                       filters=filters.User(user_id=admin_ids)),
+        # Обработчик для просмотра и управления рассылками
+        CommandHandler('broadcasts', post_handler.list_broadcasts,
+                      filters=filters.User(user_id=admin_ids)),
     ] 
\ No newline at end of file
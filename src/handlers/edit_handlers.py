@@ -3,7 +3,7 @@
 """
 
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
-from telegram.ext import ContextTypes, ConversationHandler, CommandHandler
+from telegram.ext import ContextTypes, ConversationHandler
 
 from models.states import *
 from handlers.base_handler import BaseHandler
@@ -18,12 +18,11 @@ class EditHandler(BaseHandler):
     
     def __init__(self, sheets: GoogleSheets, application=None):
         super().__init__(sheets)
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
         self.application = application
     
     async def edit_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начало редактирования вопроса"""
+        schema = self.survey_store.current
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Редактирование вопроса", "Начало процесса")
         
@@ -31,7 +30,7 @@ class EditHandler(BaseHandler):
         context.user_data.clear()
         
         # Проверяем, есть ли вопросы
-        if not self.questions:
+        if not schema.texts:
             await update.message.reply_text(
                 "❌ В данный момент нет доступных вопросов для редактирования.",
                 reply_markup=ReplyKeyboardRemove()
@@ -40,7 +39,7 @@ class EditHandler(BaseHandler):
         
         # Создаем клавиатуру с вопросами
         keyboard = []
-        for i, question in enumerate(self.questions):
+        for i, question in enumerate(schema.texts):
             # Ограничиваем длину вопроса для кнопки
             short_question = question[:30] + "..." if len(question) > 30 else question
             keyboard.append([KeyboardButton(f"{i+1}. {short_question}")])
@@ -58,6 +57,7 @@ class EditHandler(BaseHandler):
     
     async def handle_question_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка выбора вопроса для редактирования"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Редактирование вопроса", "Выбор вопроса", details={"выбор": choice})
@@ -74,11 +74,11 @@ class EditHandler(BaseHandler):
             question_num = int(choice.split('.')[0]) - 1
             
             # Проверяем, что номер вопроса в допустимом диапазоне
-            if 0 <= question_num < len(self.questions):
+            if 0 <= question_num < len(schema.texts):
                 logger.data_processing("вопросы", "Обработка выбора вопроса", details={"user_id": user_id})
                 
                 # Сохраняем выбранный вопрос
-                selected_question = self.questions[question_num]
+                selected_question = schema.texts[question_num]
                 context.user_data['editing_question'] = selected_question
                 context.user_data['editing_question_num'] = question_num
                 
@@ -101,7 +101,7 @@ class EditHandler(BaseHandler):
                 return EDITING_QUESTION
             else:
                 logger.error("invalid_question_number", "Некорректный номер вопроса", 
-                           details={"номер": question_num, "максимум": len(self.questions)-1}, 
+                           details={"номер": question_num, "максимум": len(schema.texts)-1}, 
                            user_id=user_id)
                 await update.message.reply_text(
                     "❌ Некорректный номер вопроса. Пожалуйста, выберите из списка.",
@@ -119,6 +119,7 @@ class EditHandler(BaseHandler):
     
     async def handle_edit_menu_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка выбора действия в меню редактирования"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         
@@ -149,7 +150,7 @@ class EditHandler(BaseHandler):
         if question_num is None:
             # Если номера нет, находим его
             try:
-                question_num = self.questions.index(question)
+                question_num = schema.texts.index(question)
                 context.user_data['editing_question_num'] = question_num
                 logger.data_processing("вопросы", "Определение номера вопроса", details={"номер": question_num, "вопрос": question})
             except ValueError:
@@ -158,7 +159,7 @@ class EditHandler(BaseHandler):
                 question_num = -1
         
         # Проверяем наличие вариантов ответов
-        has_options = bool(self.questions_with_options[question])
+        has_options = bool(schema.source[question])
         logger.data_processing("вопросы", "Проверка вариантов ответов", details={"наличие_вариантов": has_options, "вопрос": question})
         
         if choice == "✏️ Изменить текст вопроса":
@@ -185,7 +186,7 @@ class EditHandler(BaseHandler):
             reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
             
             # Получаем текущие варианты ответов
-            current_options = self.questions_with_options[question]
+            current_options = schema.source[question]
             
             # Показываем текущие варианты ответов с вложенными вариантами
             options_text = ""
@@ -233,6 +234,7 @@ class EditHandler(BaseHandler):
 
     async def handle_question_text_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка редактирования текста вопроса"""
+        schema = self.survey_store.current
         new_text = update.message.text.strip()
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Редактирование текста вопроса", details={"новый_текст": new_text})
@@ -253,7 +255,7 @@ class EditHandler(BaseHandler):
         # Если номер вопроса не сохранен, находим его
         if question_num == -1:
             try:
-                question_num = self.questions.index(old_question)
+                question_num = schema.texts.index(old_question)
                 context.user_data['editing_question_num'] = question_num
             except ValueError:
                 logger.error("question_not_found", "Вопрос не найден в списке", 
@@ -268,16 +270,16 @@ class EditHandler(BaseHandler):
                           details={"старый_текст": old_question, "новый_текст": new_text, "user_id": user_id})
                 
         # Редактируем текст вопроса
-        success = self.sheets.edit_question_text(question_num, new_text)
+        success = await self.sheets.async_edit_question_text(question_num, new_text)
+        if await self.reply_if_write_unknown(update.message, success):
+            return ConversationHandler.END
         
         if success:
             # Обновляем список вопросов
-            old_options = self.questions_with_options[old_question]
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             # Проверяем, что вопрос был обновлен
-            if new_text in self.questions:
+            if new_text in schema.texts:
                 logger.admin_action(user_id, "Обновление текста вопроса", 
                                details={"статус": "успешно", "старый": old_question, "новый": new_text})
                 await update.message.reply_text(
@@ -305,12 +307,11 @@ class EditHandler(BaseHandler):
         context.user_data.pop('editing_question', None)
         context.user_data.pop('editing_question_num', None)
         
-        await self._update_handlers_questions(update)
-        
         return ConversationHandler.END
 
     async def handle_options_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка редактирования вариантов ответов"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Выбор действия с вариантами ответов", details={"действие": choice})
@@ -329,7 +330,7 @@ class EditHandler(BaseHandler):
         # Если номер вопроса не сохранен, находим его
         if question_num == -1:
             try:
-                question_num = self.questions.index(question)
+                question_num = schema.texts.index(question)
                 context.user_data['editing_question_num'] = question_num
             except ValueError:
                 await update.message.reply_text(
@@ -339,7 +340,7 @@ class EditHandler(BaseHandler):
                 return ConversationHandler.END
         
         # Получаем текущие варианты ответов
-        current_options = self.questions_with_options[question]
+        current_options = schema.source[question]
         
         # Проверяем, редактируем ли мы подварианты
         if 'editing_option_index' in context.user_data:
@@ -438,11 +439,10 @@ class EditHandler(BaseHandler):
         
         elif choice == "✨ Сделать свободным":
             # Получаем актуальные данные перед изменением
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             # Проверяем, что вопрос существует в актуальном списке
-            if question not in self.questions_with_options:
+            if question not in schema.source:
                 logger.warning("question_not_found", "Вопрос не найден в актуальном списке вопросов", 
                             details={"вопрос": question, "user_id": update.effective_user.id})
                 await update.message.reply_text(
@@ -452,12 +452,13 @@ class EditHandler(BaseHandler):
                 return ConversationHandler.END
             
             # Удаляем все варианты ответов
-            success = self.sheets.edit_question_options(question_num, [])
+            success = await self.sheets.async_edit_question_options(question_num, [])
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 await update.message.reply_text(
                     "✅ Вопрос теперь свободный (без вариантов ответов)",
@@ -482,12 +483,11 @@ class EditHandler(BaseHandler):
             new_option = {"text": choice}
             
             # Получаем актуальные данные перед изменением
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             # Проверяем, что вопрос существует
-            if question in self.questions_with_options:
-                current_options = self.questions_with_options[question]
+            if question in schema.source:
+                current_options = schema.source[question]
             else:
                 logger.warning("question_not_found", "Вопрос не найден в списке", 
                             details={"вопрос": question, "user_id": update.effective_user.id})
@@ -505,21 +505,19 @@ class EditHandler(BaseHandler):
             logger.admin_action(update.effective_user.id, "Добавление варианта ответа", 
                              details={"вариант": choice, "текущие_варианты": str(current_options)})
             
-            success = self.sheets.edit_question_options(question_num, new_options)
+            success = await self.sheets.async_edit_question_options(question_num, new_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 await update.message.reply_text(
                     f"✅ Вариант ответа добавлен: {choice}",
                     reply_markup=ReplyKeyboardRemove()
                 )
                 
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
-                
                 # Очищаем состояние добавления обычного варианта
                 context.user_data.pop('adding_option', None)
                 return ConversationHandler.END
@@ -544,12 +542,11 @@ class EditHandler(BaseHandler):
                 return ConversationHandler.END
             
             # Получаем актуальные данные перед изменением
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             # Проверяем, что вопрос существует
-            if question in self.questions_with_options:
-                current_options = self.questions_with_options[question]
+            if question in schema.source:
+                current_options = schema.source[question]
             else:
                 logger.warning("question_not_found", "Вопрос не найден в списке", 
                             details={"вопрос": question, "user_id": update.effective_user.id})
@@ -572,12 +569,13 @@ class EditHandler(BaseHandler):
                     new_options.append(opt)
             
             if option_to_remove:
-                success = self.sheets.edit_question_options(question_num, new_options)
+                success = await self.sheets.async_edit_question_options(question_num, new_options)
+                if await self.reply_if_write_unknown(update.message, success):
+                    return ConversationHandler.END
                 
                 if success:
                     # Обновляем список вопросов
-                    self.questions_with_options = self.sheets.get_questions_with_options()
-                    self.questions = list(self.questions_with_options.keys())
+                    schema = await self.refresh_questions()
                     
                     # Если у варианта были вложенные варианты, сообщаем об этом
                     sub_options_message = ""
@@ -589,8 +587,6 @@ class EditHandler(BaseHandler):
                         reply_markup=ReplyKeyboardRemove()
                     )
                     
-                    # Обновляем списки вопросов в других обработчиках
-                    await self._update_handlers_questions(update)
                 else:
                     await update.message.reply_text(
                         "❌ Не удалось удалить вариант ответа",
@@ -649,6 +645,7 @@ class EditHandler(BaseHandler):
     
     async def handle_sub_options_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка редактирования вложенных вариантов ответов"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Выбор действия для вложенных вариантов", details={"выбор": choice})
@@ -672,11 +669,10 @@ class EditHandler(BaseHandler):
                                  "индекс_вопроса": question_num, "user_id": user_id})
         
         # Получаем актуальные данные перед изменением
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
+        schema = await self.refresh_questions()
         
         # Проверяем, что вопрос существует
-        if question not in self.questions_with_options:
+        if question not in schema.source:
             logger.warning("question_not_found", "Вопрос не найден в актуальном списке вопросов", 
                         details={"вопрос": question, "user_id": update.effective_user.id})
             await update.message.reply_text(
@@ -685,7 +681,7 @@ class EditHandler(BaseHandler):
             )
             return ConversationHandler.END
             
-        current_options = self.questions_with_options[question]
+        current_options = self.editable_options(schema, question)
         
         # Добавление нового вложенного варианта
         if choice == "➕ Добавить вложенный вариант" or choice == "✅ Да, добавить вложенные варианты" or choice == "➕ Добавить еще вложенный вариант":
@@ -730,21 +726,19 @@ class EditHandler(BaseHandler):
             parent_option["sub_options"] = []
             
             # Обновляем варианты ответов
-            success = self.sheets.edit_question_options(question_num, current_options)
+            success = await self.sheets.async_edit_question_options(question_num, current_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 await update.message.reply_text(
                     f"✅ Вложенные варианты для '{parent_option_text}' удалены. Теперь это свободный ответ.",
                     reply_markup=ReplyKeyboardRemove()
                 )
                 
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
-                
                 # Очищаем состояние
                 context.user_data.pop('editing_option', None)
                 context.user_data.pop('editing_option_index', None)
@@ -879,21 +873,19 @@ class EditHandler(BaseHandler):
                 parent_option["sub_options"] = []
                 
                 # Обновляем варианты ответов
-                success = self.sheets.edit_question_options(question_num, current_options)
+                success = await self.sheets.async_edit_question_options(question_num, current_options)
+                if await self.reply_if_write_unknown(update.message, success):
+                    return ConversationHandler.END
                 
                 if success:
                     # Обновляем список вопросов
-                    self.questions_with_options = self.sheets.get_questions_with_options()
-                    self.questions = list(self.questions_with_options.keys())
+                    schema = await self.refresh_questions()
                     
                     await update.message.reply_text(
                         f"✅ Вложенные варианты для '{parent_option_text}' удалены. Теперь это свободный ответ.",
                         reply_markup=ReplyKeyboardRemove()
                     )
                     
-                    # Обновляем списки вопросов в других обработчиках
-                    await self._update_handlers_questions(update)
-                    
                     # Очищаем состояние
                     context.user_data.pop('editing_option', None)
                     context.user_data.pop('editing_option_index', None)
@@ -955,6 +947,7 @@ class EditHandler(BaseHandler):
     
     async def handle_add_sub_option(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка добавления вложенного варианта ответа"""
+        schema = self.survey_store.current
         new_sub_option = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Добавление вложенного варианта", details={"вариант": new_sub_option})
@@ -986,10 +979,9 @@ class EditHandler(BaseHandler):
             question_num = context.user_data.get('editing_question_num', -1)
             
             # Обновляем список вариантов из базы данных перед обработкой
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
-            if question not in self.questions_with_options:
+            if question not in schema.source:
                 await update.message.reply_text(
                     f"❌ Ошибка: вопрос '{question}' не найден в базе данных",
                     reply_markup=ReplyKeyboardRemove()
@@ -1000,7 +992,7 @@ class EditHandler(BaseHandler):
                 context.user_data.pop('adding_sub_option', None)
                 return ConversationHandler.END
                 
-            current_options = self.questions_with_options[question]
+            current_options = self.editable_options(schema, question)
             
             # Проверяем индекс и пытаемся найти родительский вариант
             if parent_option_index < 0 or parent_option_index >= len(current_options):
@@ -1056,12 +1048,13 @@ class EditHandler(BaseHandler):
             parent_option["sub_options"].append(new_sub_option)
             
             # Обновляем варианты ответов
-            success = self.sheets.edit_question_options(question_num, current_options)
+            success = await self.sheets.async_edit_question_options(question_num, current_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 # Спрашиваем, нужно ли добавить еще вложенные варианты
                 keyboard = [
@@ -1071,7 +1064,7 @@ class EditHandler(BaseHandler):
                 reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
                 
                 # Получаем обновленные варианты
-                current_options = self.questions_with_options[question]
+                current_options = schema.source[question]
                 
                 # Убеждаемся, что индекс все еще валиден
                 if parent_option_index < len(current_options):
@@ -1092,9 +1085,6 @@ class EditHandler(BaseHandler):
                         "Хотите добавить еще вложенный вариант?",
                         reply_markup=reply_markup
                     )
-                    
-                    # Обновляем списки вопросов в других обработчиках
-                    await self._update_handlers_questions(update)
                 else:
                     await update.message.reply_text(
                         "❌ Ошибка: индекс родительского варианта стал недействительным",
@@ -1115,6 +1105,7 @@ class EditHandler(BaseHandler):
     
     async def handle_remove_sub_option(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка удаления вложенного варианта ответа"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Выбор вложенного варианта для удаления", details={"вариант": choice})
@@ -1140,11 +1131,10 @@ class EditHandler(BaseHandler):
         question_num = context.user_data.get('editing_question_num', -1)
         
         # Обновляем список вариантов из базы данных перед обработкой
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
+        schema = await self.refresh_questions()
         
         # Проверяем, что вопрос все еще существует
-        if question not in self.questions_with_options:
+        if question not in schema.source:
             logger.warning("question_not_found", "Вопрос не найден в актуальном списке вопросов", 
                          details={"вопрос": question, "user_id": update.effective_user.id,
                                  "действие": "Прерывание удаления вопроса"})
@@ -1158,7 +1148,7 @@ class EditHandler(BaseHandler):
             context.user_data.pop('removing_sub_option', None)
             return ConversationHandler.END
             
-        current_options = self.questions_with_options[question]
+        current_options = self.editable_options(schema, question)
         
         logger.data_processing("варианты", "Анализ вариантов ответов", details={"user_id": user_id})
         
@@ -1195,12 +1185,13 @@ class EditHandler(BaseHandler):
             parent_option["sub_options"].remove(choice)
             
             # Обновляем варианты ответов
-            success = self.sheets.edit_question_options(question_num, current_options)
+            success = await self.sheets.async_edit_question_options(question_num, current_options)
+            if await self.reply_if_write_unknown(update.message, success):
+                return ConversationHandler.END
             
             if success:
                 # Обновляем список вопросов
-                self.questions_with_options = self.sheets.get_questions_with_options()
-                self.questions = list(self.questions_with_options.keys())
+                schema = await self.refresh_questions()
                 
                 # Очищаем состояние удаления
                 context.user_data.pop('removing_sub_option', None)
@@ -1211,8 +1202,6 @@ class EditHandler(BaseHandler):
                     reply_markup=ReplyKeyboardRemove()
                 )
                 
-                # Обновляем списки вопросов в других обработчиках
-                await self._update_handlers_questions(update)
             else:
                 await update.message.reply_text(
                     "❌ Не удалось удалить подвариант.",
@@ -1230,6 +1219,7 @@ class EditHandler(BaseHandler):
 
     async def handle_add_free_text_prompt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка добавления вопроса для свободного ответа"""
+        schema = self.survey_store.current
         prompt = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Добавление вопроса для свободного ответа", details={"текст_вопроса": prompt})
@@ -1252,11 +1242,10 @@ class EditHandler(BaseHandler):
         logger.data_processing("вопросы", "Добавление вопроса для свободного ответа", details={"user_id": user_id})
         
         # Получаем актуальные данные перед изменением
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
+        schema = await self.refresh_questions()
         
         # Проверяем, что вопрос существует
-        if question not in self.questions_with_options:
+        if question not in schema.source:
             logger.warning("question_not_found", "Вопрос не найден в актуальном списке вопросов", details={"вопрос": question, "user_id": update.effective_user.id})
             await update.message.reply_text(
                 "❌ Ошибка: вопрос не найден в актуальном списке",
@@ -1264,7 +1253,7 @@ class EditHandler(BaseHandler):
             )
             return ConversationHandler.END
             
-        current_options = self.questions_with_options[question]
+        current_options = self.editable_options(schema, question)
         
         # Проверяем, что вариант существует и находим его
         parent_found = False
@@ -1297,20 +1286,19 @@ class EditHandler(BaseHandler):
         parent_option["free_text_prompt"] = prompt
         
         # Обновляем варианты ответов
-        success = self.sheets.edit_question_options(question_num, current_options)
+        success = await self.sheets.async_edit_question_options(question_num, current_options)
+        if await self.reply_if_write_unknown(update.message, success):
+            return ConversationHandler.END
         
         if success:
             # Обновляем список вопросов
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             await update.message.reply_text(
                 f"✅ Вопрос для свободного ответа добавлен: '{prompt}'",
                 reply_markup=ReplyKeyboardRemove()
             )
             
-            # Обновляем списки вопросов в других обработчиках
-            await self._update_handlers_questions(update)
         else:
             await update.message.reply_text(
                 "❌ Не удалось добавить вопрос для свободного ответа",
@@ -1324,6 +1312,7 @@ class EditHandler(BaseHandler):
 
     async def delete_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начало удаления вопроса"""
+        schema = self.survey_store.current
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Удаление вопроса", "Начало процесса")
         
@@ -1331,7 +1320,7 @@ class EditHandler(BaseHandler):
         context.user_data.clear()
         
         # Проверяем, есть ли вопросы
-        if not self.questions:
+        if not schema.texts:
             await update.message.reply_text(
                 "❌ В данный момент нет доступных вопросов для удаления.",
                 reply_markup=ReplyKeyboardRemove()
@@ -1340,7 +1329,7 @@ class EditHandler(BaseHandler):
         
         # Создаем клавиатуру с вопросами
         keyboard = []
-        for i, question in enumerate(self.questions):
+        for i, question in enumerate(schema.texts):
             # Ограничиваем длину вопроса для кнопки
             short_question = question[:30] + "..." if len(question) > 30 else question
             keyboard.append([KeyboardButton(f"{i+1}. {short_question}")])
@@ -1358,6 +1347,7 @@ class EditHandler(BaseHandler):
 
     async def handle_question_delete(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка удаления вопроса"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         logger.admin_action(user_id, "Удаление вопроса", "Выбор вопроса", details={"выбор": choice})
@@ -1381,85 +1371,31 @@ class EditHandler(BaseHandler):
                 
             logger.data_processing("вопросы", "Обработка выбора вопроса для удаления", details={"user_id": user_id})
             
-            if 0 <= question_num < len(self.questions):
-                question_to_delete = self.questions[question_num]
+            if 0 <= question_num < len(schema.texts):
+                question_to_delete = schema.texts[question_num]
                 
                 # Запоминаем количество вопросов до удаления
-                old_questions = self.questions.copy()
+                old_questions = list(schema.texts)
                 logger.data_processing("вопросы", "Удаление вопроса", details={"начало": True, "вопрос": question_to_delete})
                 
                 # Удаляем вопрос
-                success = self.sheets.delete_question(question_num)
+                success = await self.sheets.async_delete_question(question_num)
+                if await self.reply_if_write_unknown(update.message, success):
+                    return ConversationHandler.END
                 
                 if success:
                     # Сразу обновляем локальные списки вопросов
-                    self.questions_with_options = self.sheets.get_questions_with_options()
-                    self.questions = list(self.questions_with_options.keys())
+                    schema = await self.refresh_questions()
                     logger.data_processing("вопросы", "Удаление вопроса", details={"успех": True, "вопрос": question_to_delete})
                     
-                    # Обновляем списки вопросов во всех обработчиках через AdminHandler
-                    await self._update_handlers_questions(update)
-                    
-                    # Принудительное обновление через application
-                    if self.application:
-                        # Обходим все группы обработчиков
-                        for group_idx, group in enumerate(self.application.handlers):
-                            # Проверяем, что group является итерируемым объектом
-                            if not isinstance(group, (list, tuple)) or isinstance(group, (str, bytes, int)):
-                                logger.warning("invalid_handler_group", "Группа обработчиков не является списком", 
-                                          details={"индекс": group_idx, "тип": str(type(group))})
-                                continue
-                            
-                            for handler in group:
-                                if isinstance(handler, ConversationHandler) and hasattr(handler, 'name'):
-                                    logger.data_processing("Обновление обработчиков", "Найден обработчик", 
-                                                       details={"имя_обработчика": handler.name,
-                                                              "user_id": update.effective_user.id})
-                                    if hasattr(handler, 'entry_points'):
-                                        for entry_point in handler.entry_points:
-                                            if hasattr(entry_point.callback, '__self__'):
-                                                handler_instance = entry_point.callback.__self__
-                                                if hasattr(handler_instance, 'questions') and hasattr(handler_instance, 'questions_with_options'):
-                                                    # Обновляем списки вопросов
-                                                    old_len = len(handler_instance.questions) if hasattr(handler_instance, 'questions') else 0
-                                                    handler_instance.questions_with_options = self.sheets.get_questions_with_options()
-                                                    handler_instance.questions = list(handler_instance.questions_with_options.keys())
-                                                    new_len = len(handler_instance.questions)
-                                                    
-                                                    logger.data_processing("Обновление обработчиков", "Принудительное обновление", 
-                                                                      details={"обработчик": handler_instance.__class__.__name__,
-                                                                             "группа": group_idx,
-                                                                             "вопросов_было": old_len,
-                                                                             "вопросов_стало": new_len,
-                                                                             "user_id": update.effective_user.id})
-                    
                     await update.message.reply_text(
                         f"✅ Вопрос успешно удален:\n{question_to_delete}",
                         reply_markup=ReplyKeyboardRemove()
                     )
                     
-                    # Дополнительная проверка, что список вопросов обновлен и во всех обработчиках
-                    logger.data_processing("Обновление обработчиков", "Проверка синхронизации", 
-                                        details={"операция": "Удаление вопроса", 
-                                               "вопрос": question_to_delete,
-                                               "user_id": update.effective_user.id})
-                    for group_idx, group in enumerate(self.application.handlers):
-                        # Проверяем, что group является итерируемым объектом
-                        if not isinstance(group, (list, tuple)) or isinstance(group, (str, bytes, int)):
-                            continue
-                            
-                        for handler in group:
-                            if isinstance(handler, CommandHandler) and hasattr(handler.callback, '__name__') and handler.callback.__name__ == "list_questions":
-                                list_questions_handler = handler.callback.__self__
-                                if hasattr(list_questions_handler, 'questions'):
-                                    logger.data_processing("Синхронизация обработчиков", "Состояние list_questions", 
-                                                       details={"количество_вопросов": len(list_questions_handler.questions),
-                                                              "обработчик": "list_questions_handler", 
-                                                              "user_id": update.effective_user.id})
-                    
                     logger.admin_action(update.effective_user.id, "Удаление вопроса", "Завершено", 
                                      details={"вопрос": question_to_delete, 
-                                            "осталось_вопросов": len(self.questions)})
+                                            "осталось_вопросов": len(schema.texts)})
                 else:
                     await update.message.reply_text(
                         "❌ Не удалось удалить вопрос. Пожалуйста, попробуйте позже.",
@@ -1486,165 +1422,9 @@ class EditHandler(BaseHandler):
                         details={"текст": choice, "ошибка": str(e), "user_id": update.effective_user.id})
             return ConversationHandler.END
 
-    async def _update_handlers_questions(self, update: Update):
-        """Вызывает обновление списков вопросов в других обработчиках через AdminHandler"""
-        try:
-            if not self.application:
-                logger.error("application_missing", "Application не найден для обновления обработчиков", 
-                            details={"причина": "Компонент не был передан при инициализации"})
-                return
-
-            # Обновляем свои списки вопросов
-            old_questions_count = len(self.questions)
-            logger.data_processing("Обновление обработчиков", "Начало обновления списков вопросов", 
-                                details={"текущее_количество": old_questions_count,
-                                       "user_id": update.effective_user.id if update else "system"})
-            
-            # Получаем обновленные списки вопросов
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
-            logger.data_processing("Обновление обработчиков", "Локальное обновление", 
-                                details={"модуль": "EditHandler", 
-                                       "вопросов_было": old_questions_count, 
-                                       "вопросов_стало": len(self.questions),
-                                       "user_id": update.effective_user.id if update else "system"})
-            
-            # Флаг для отслеживания обновления list_questions
-            list_questions_handler_updated = False
-            admin_handler = None
-            
-            # Перебираем все группы обработчиков в application
-            for group in self.application.handlers.values():
-                if not isinstance(group, list):
-                    continue
-                
-                for handler in group:
-                    # Ищем AdminHandler
-                    if hasattr(handler, 'callback') and hasattr(handler.callback, '__self__'):
-                        handler_instance = handler.callback.__self__
-                        if handler_instance.__class__.__name__ == "AdminHandler":
-                            admin_handler = handler_instance
-                            logger.data_processing("Обновление обработчиков", "Найден AdminHandler", 
-                                               details={"обработчик": str(handler),
-                                                      "user_id": update.effective_user.id if update else "system"})
-                            break
-                    
-                    # Ищем ConversationHandler с именем add_question_conversation
-                    if isinstance(handler, ConversationHandler) and hasattr(handler, 'name') and handler.name == "add_question_conversation":
-                        for entry_point in handler.entry_points:
-                            if hasattr(entry_point.callback, '__self__'):
-                                handler_instance = entry_point.callback.__self__
-                                if handler_instance.__class__.__name__ == "AdminHandler":
-                                    admin_handler = handler_instance
-                                    logger.data_processing("Обновление обработчиков", "Найден AdminHandler", 
-                                                       details={"через": "ConversationHandler",
-                                                              "user_id": update.effective_user.id if update else "system"})
-                                    break
-                    
-                    # Ищем CommandHandler для команды list_questions
-                    if isinstance(handler, CommandHandler) and hasattr(handler.callback, '__name__') and handler.callback.__name__ == "list_questions":
-                        list_questions_handler = handler.callback.__self__
-                        if hasattr(list_questions_handler, 'questions'):
-                            old_len = len(list_questions_handler.questions)
-                            list_questions_handler.questions_with_options = self.sheets.get_questions_with_options()
-                            list_questions_handler.questions = list(list_questions_handler.questions_with_options.keys())
-                            
-                            list_questions_handler_updated = True
-                
-                if admin_handler:
-                    break
-            
-            # Вызываем обновление списков вопросов в обработчиках через AdminHandler
-            if admin_handler and hasattr(admin_handler, '_update_handlers_questions'):
-                logger.data_processing("Обновление обработчиков", "Делегирование AdminHandler", 
-                                    details={"метод": "_update_handlers_questions",
-                                           "user_id": update.effective_user.id if update else "system"})
-                await admin_handler._update_handlers_questions(update)
-                logger.data_processing("Обновление обработчиков", "Завершено через AdminHandler",
-                                    details={"статус": "успешно",
-                                           "user_id": update.effective_user.id if update else "system"})
-                return
-                
-            # Если AdminHandler не найден, выполняем принудительное обновление
-            logger.warning("admin_handler_missing", "AdminHandler не найден", 
-                         details={"действие": "Выполняем принудительное обновление обработчиков",
-                                 "причина": "Компонент недоступен"})
-            
-            # Обновляем все обработчики напрямую
-            updated_handlers = 0
-            for group in self.application.handlers.values():
-                if not isinstance(group, list):
-                    continue
-                    
-                for handler in group:
-                    handler_updated = False
-                    
-                    # Обновляем CommandHandler для list_questions, если ещё не обновлён
-                    if not list_questions_handler_updated and isinstance(handler, CommandHandler) and hasattr(handler.callback, '__name__') and handler.callback.__name__ == "list_questions":
-                        list_questions_handler = handler.callback.__self__
-                        if hasattr(list_questions_handler, 'questions'):
-                            old_len = len(list_questions_handler.questions)
-                            list_questions_handler.questions_with_options = self.sheets.get_questions_with_options()
-                            list_questions_handler.questions = list(list_questions_handler.questions_with_options.keys())
-                            logger.data_processing("Обновление обработчиков", "Обновление list_questions", 
-                                                details={"вопросов_было": old_len, 
-                                                       "вопросов_стало": len(list_questions_handler.questions),
-                                                       "user_id": update.effective_user.id if update else "system"})
-                            list_questions_handler_updated = True
-                            handler_updated = True
-                            updated_handlers += 1
-                    
-                    # Обновляем все обработчики с атрибутами questions и questions_with_options
-                    if isinstance(handler, ConversationHandler) and hasattr(handler, 'entry_points'):
-                        for entry_point in handler.entry_points:
-                            if hasattr(entry_point.callback, '__self__'):
-                                handler_instance = entry_point.callback.__self__
-                                if hasattr(handler_instance, 'questions') and hasattr(handler_instance, 'questions_with_options'):
-                                    old_len = len(handler_instance.questions) if hasattr(handler_instance, 'questions') else 0
-                                    handler_instance.questions_with_options = self.sheets.get_questions_with_options()
-                                    handler_instance.questions = list(handler_instance.questions_with_options.keys())
-                                    new_len = len(handler_instance.questions)
-                                    
-                                    handler_updated = True
-                                    updated_handlers += 1
-                    
-                    # Обновляем другие обработчики напрямую
-                    if hasattr(handler, 'callback') and hasattr(handler.callback, '__self__'):
-                        handler_instance = handler.callback.__self__
-                        if hasattr(handler_instance, 'questions') and hasattr(handler_instance, 'questions_with_options'):
-                            old_len = len(handler_instance.questions) if hasattr(handler_instance, 'questions') else 0
-                            handler_instance.questions_with_options = self.sheets.get_questions_with_options()
-                            handler_instance.questions = list(handler_instance.questions_with_options.keys())
-                            new_len = len(handler_instance.questions)
-                            if not handler_updated:  # Избегаем повторного логирования
-                                logger.data_processing("Обновление обработчиков", "Обновление списков вопросов", 
-                                                    details={"обработчик": handler_instance.__class__.__name__,
-                                                           "вопросов_было": old_len,
-                                                           "вопросов_стало": new_len,
-                                                           "user_id": update.effective_user.id if update else "system"})
-                                updated_handlers += 1
-            
-            if updated_handlers > 0:
-                logger.admin_action(update.effective_user.id, "Обновление обработчиков", 
-                                  details={"успешно_обновлено": updated_handlers})
-            else:
-                logger.warning("handlers_update_empty", "Не найдено обработчиков для обновления", 
-                             details={"причина": "Обработчики не зарегистрированы или недоступны"})
-                
-            # Проверяем, был ли обновлен обработчик list_questions
-            if not list_questions_handler_updated:
-                logger.warning("list_questions_not_updated", "Обработчик команды list_questions не обновлен", 
-                             details={"причина": "Обработчик не найден или не привязан к приложению"})
-                
-            logger.admin_action(update.effective_user.id, "Завершение обновления обработчиков", 
-                              details={"успешно": True, "количество": updated_handlers})
-        except Exception as e:
-            logger.error("questions_update_error", "Ошибка при обновлении списков вопросов", 
-                        details={"ошибка": str(e), "user_id": update.effective_user.id if update else "unknown"})
-            logger.exception(e)
-
     async def handle_option_text_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка выбора варианта для редактирования текста"""
+        schema = self.survey_store.current
         choice = update.message.text
         user_id = update.effective_user.id
         
@@ -1671,18 +1451,17 @@ class EditHandler(BaseHandler):
         question_num = context.user_data.get('editing_question_num', -1)
         
         # Обновляем данные из базы
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
+        schema = await self.refresh_questions()
         
         # Проверяем, что вопрос существует
-        if question not in self.questions_with_options:
+        if question not in schema.source:
             await update.message.reply_text(
                 "❌ Ошибка: вопрос не найден в актуальном списке",
                 reply_markup=ReplyKeyboardRemove()
             )
             return ConversationHandler.END
             
-        current_options = self.questions_with_options[question]
+        current_options = self.editable_options(schema, question)
         
         # Находим выбранный вариант
         selected_option = None
@@ -1717,6 +1496,7 @@ class EditHandler(BaseHandler):
         
     async def handle_option_text_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка ввода нового текста для варианта ответа"""
+        schema = self.survey_store.current
         new_text = update.message.text.strip()
         user_id = update.effective_user.id
         
@@ -1736,11 +1516,10 @@ class EditHandler(BaseHandler):
         selected_index = context.user_data['selected_option_index']
         
         # Обновляем данные из базы
-        self.questions_with_options = self.sheets.get_questions_with_options()
-        self.questions = list(self.questions_with_options.keys())
+        schema = await self.refresh_questions()
         
         # Проверяем, что вопрос существует
-        if question not in self.questions_with_options:
+        if question not in schema.source:
             await update.message.reply_text(
                 "❌ Ошибка: вопрос не найден в актуальном списке",
                 reply_markup=ReplyKeyboardRemove()
@@ -1751,7 +1530,7 @@ class EditHandler(BaseHandler):
             context.user_data.pop('old_option_text', None)
             return ConversationHandler.END
             
-        current_options = self.questions_with_options[question]
+        current_options = self.editable_options(schema, question)
         
         # Проверяем валидность индекса
         if selected_index < 0 or selected_index >= len(current_options):
@@ -1787,12 +1566,13 @@ class EditHandler(BaseHandler):
         selected_option["text"] = new_text
         
         # Сохраняем обновленные варианты
-        success = self.sheets.edit_question_options(question_num, current_options)
+        success = await self.sheets.async_edit_question_options(question_num, current_options)
+        if await self.reply_if_write_unknown(update.message, success):
+            return ConversationHandler.END
         
         if success:
             # Обновляем список вопросов
-            self.questions_with_options = self.sheets.get_questions_with_options()
-            self.questions = list(self.questions_with_options.keys())
+            schema = await self.refresh_questions()
             
             await update.message.reply_text(
                 f"✅ Текст варианта успешно обновлен\n"
@@ -1801,8 +1581,6 @@ class EditHandler(BaseHandler):
                 reply_markup=ReplyKeyboardRemove()
             )
             
-            # Обновляем списки вопросов в других обработчиках
-            await self._update_handlers_questions(update)
         else:
             await update.message.reply_text(
                 "❌ Не удалось обновить текст варианта",
@@ -21,7 +21,7 @@ class MessageHandler(BaseHandler):
         user_id = update.effective_user.id
         
         # Проверяем, является ли пользователь администратором
-        if user_id not in self.sheets.get_admins():
+        if user_id not in await self.sheets.async_get_admins():
             await update.message.reply_text(
                 "❌ У вас нет прав для редактирования сообщений.",
                 reply_markup=ReplyKeyboardRemove()
@@ -73,7 +73,7 @@ class MessageHandler(BaseHandler):
         context.user_data['editing_message_type'] = message_key
         
         # Получаем текущий текст сообщения и изображение
-        message_data = self.sheets.get_message(message_key)
+        message_data = await self.sheets.async_get_message(message_key)
         current_message = message_data["text"]
         current_image = message_data.get("image", "")
         
@@ -166,7 +166,11 @@ class MessageHandler(BaseHandler):
             # Сохраняем текст, но оставляем прежнее изображение
             current_image = context.user_data.get('current_image', '')
             
-            if self.sheets.update_message(message_type, new_text, current_image):
+            success = await self.sheets.async_update_message(message_type, new_text, current_image)
+            if await self.reply_if_write_unknown(update.message, success):
+                context.user_data.clear()
+                return ConversationHandler.END
+            if success:
                 await update.message.reply_text(
                     "✅ Сообщение успешно обновлено!",
                     reply_markup=ReplyKeyboardRemove()
@@ -183,7 +187,11 @@ class MessageHandler(BaseHandler):
         
         elif choice == "🗑️ Удалить существующее изображение":
             # Сохраняем текст и удаляем изображение
-            if self.sheets.update_message(message_type, new_text, ""):
+            success = await self.sheets.async_update_message(message_type, new_text, "")
+            if await self.reply_if_write_unknown(update.message, success):
+                context.user_data.clear()
+                return ConversationHandler.END
+            if success:
                 await update.message.reply_text(
                     "✅ Сообщение успешно обновлено, изображение удалено!",
                     reply_markup=ReplyKeyboardRemove()
@@ -231,7 +239,11 @@ class MessageHandler(BaseHandler):
             file_id = photo.file_id
             
             # Сохраняем текст и новое изображение
-            if self.sheets.update_message(message_type, new_text, file_id):
+            success = await self.sheets.async_update_message(message_type, new_text, file_id)
+            if await self.reply_if_write_unknown(update.message, success):
+                context.user_data.clear()
+                return ConversationHandler.END
+            if success:
                 await update.message.reply_text(
                     "✅ Сообщение и изображение успешно обновлены!",
                     reply_markup=ReplyKeyboardRemove()
@@ -251,7 +263,11 @@ class MessageHandler(BaseHandler):
                 any(ext in image_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp'])):
                 
                 # Сохраняем текст и новый URL изображения
-                if self.sheets.update_message(message_type, new_text, image_url):
+                success = await self.sheets.async_update_message(message_type, new_text, image_url)
+                if await self.reply_if_write_unknown(update.message, success):
+                    context.user_data.clear()
+                    return ConversationHandler.END
+                if success:
                     await update.message.reply_text(
                         "✅ Сообщение и изображение успешно обновлены!",
                         reply_markup=ReplyKeyboardRemove()
@@ -13,9 +13,10 @@ from telegram.constants import ParseMode, ChatAction
 
 from models.states import *
 from utils.sheets import GoogleSheets
-from handlers.base_handler import BaseHandler
-from config import MAX_IMAGE_SIZE
+from handlers.base_handler import BaseHandler, WRITE_RESULT_UNKNOWN_TEXT
+from config import MAX_IMAGE_SIZE, ADMIN_IDS
 from utils.logger import get_logger
+from utils.broadcast_jobs import broadcast_jobs, JOB_RUNNING, JOB_PAUSED, JOB_CANCELLED, JOB_FAILED, JOB_STATUS_NAMES
 
 # Получаем логгер для модуля
 logger = get_logger()
@@ -370,7 +371,7 @@ class PostHandler(BaseHandler):
             button_url = post.get('button_url', '')
             
             # Сохраняем пост в таблицу
-            post_id = self.sheets.save_post(
+            post_id = await self.sheets.async_save_post(
                 title=context.user_data['post'].get('title', 'Пост без названия'),
                 text=context.user_data['post'].get('text', ''),
                 image_url=image_file_id,
@@ -378,6 +379,8 @@ class PostHandler(BaseHandler):
                 button_url=context.user_data['post'].get('button_url', ''),
                 admin_id=user_id
             )
+            if await self.reply_if_write_unknown(update.message, post_id):
+                return ConversationHandler.END
             
             if post_id:
                 # Предлагаем отправить пост всем пользователям
@@ -438,8 +441,9 @@ class PostHandler(BaseHandler):
         
         return CONFIRMING_POST
     
-    async def update_progress_message(self, message, users_count, success_count, fail_count, is_final=False):
-        """Вспомогательный метод для обновления сообщения о прогрессе отправки"""
+    def _format_progress_text(self, users_count, success_count, fail_count, is_final=False,
+                              rate=None, eta=None, blocked_count=None):
+        """Формирует текст сообщения о прогрессе отправки"""
         if is_final:
             text = (
                 f"✅ Отправка поста завершена!\n\n"
@@ -448,6 +452,10 @@ class PostHandler(BaseHandler):
                 f"✅ Успешно отправлено: {success_count}\n"
                 f"❌ Не удалось отправить: {fail_count}"
             )
+            if blocked_count:
+                text += f"\n🚫 Из них заблокировали бота или удалены: {blocked_count}"
+            if rate:
+                text += f"\n⚡ Скорость: {rate:.1f} сообщ./сек"
         else:
             text = (
                 f"🚀 Отправка поста...\n"
@@ -455,6 +463,18 @@ class PostHandler(BaseHandler):
                 f"❌ Не удалось: {fail_count}\n"
                 f"📊 Прогресс: {success_count + fail_count}/{users_count}"
             )
+            if rate:
+                text += f"\n⚡ Скорость: {rate:.1f} сообщ./сек"
+            if eta is not None:
+                minutes, seconds = divmod(int(eta), 60)
+                text += f"\n⏱ Осталось примерно: {minutes} мин {seconds} сек"
+        return text
+    
+    async def update_progress_message(self, message, users_count, success_count, fail_count, is_final=False,
+                                      rate=None, eta=None, blocked_count=None):
+        """Вспомогательный метод для обновления сообщения о прогрессе отправки"""
+        text = self._format_progress_text(users_count, success_count, fail_count, is_final,
+                                          rate=rate, eta=eta, blocked_count=blocked_count)
         
         try:
             await message.edit_text(text)
@@ -465,17 +485,93 @@ class PostHandler(BaseHandler):
                     await message.reply_text(text)
                 except Exception as e2:
                     logger.error("не_удалось_отправить_новое_сообщение_о_прогрессе", e2)
-            else:
+            elif "Message is not modified" not in str(e):
                 logger.error("ошибка_при_обновлении_сообщения_о_прогрессе", e)
         except Exception as e:
             logger.error("ошибка_при_обновлении_сообщения_о_прогрессе", e)
     
-    async def send_post_to_users(self, message, post, users_data):
-        """Отправляет пост всем пользователям с обновлением прогресса"""
-        # Счетчики для успешных и неуспешных отправок
-        success_count = 0
-        fail_count = 0
+    def _broadcast_keyboard(self, job):
+        """Кнопки управления рассылкой для сообщения о прогрессе"""
+        if job.status == JOB_RUNNING:
+            buttons = [InlineKeyboardButton("⏸ Пауза", callback_data=f"bjob:pause:{job.job_id}")]
+        elif job.status == JOB_PAUSED:
+            buttons = [InlineKeyboardButton("▶️ Продолжить", callback_data=f"bjob:resume:{job.job_id}")]
+        else:
+            return None
+        buttons.append(InlineKeyboardButton("✖️ Отменить", callback_data=f"bjob:cancel:{job.job_id}"))
+        return InlineKeyboardMarkup([buttons])
+    
+    def _format_job_text(self, job, progress, is_final=False):
+        """Текст сообщения о прогрессе фоновой рассылки"""
+        users_count = job.total + job.invalid_count
+        fail_count = progress.fail_count + job.invalid_count
+        if job.status == JOB_CANCELLED:
+            text = (
+                f"✖️ Рассылка отменена\n\n"
+                f"👥 Всего пользователей: {users_count}\n"
+                f"✅ Успешно отправлено: {progress.sent}\n"
+                f"❌ Не удалось отправить: {fail_count}\n"
+                f"⏭️ Не отправлено: {job.total - progress.done}"
+            )
+        elif job.status == JOB_FAILED:
+            text = (
+                "⚠️ Рассылка прервана из-за ошибки\n\n"
+                f"👥 Всего пользователей: {users_count}\n"
+                f"✅ Успешно отправлено: {progress.sent}\n"
+                f"❌ Не удалось отправить: {fail_count}\n"
+                f"⏭️ Не отправлено: {job.total - progress.done}"
+            )
+        else:
+            text = self._format_progress_text(
+                users_count,
+                progress.sent,
+                fail_count,
+                is_final=is_final,
+                rate=progress.rate,
+                eta=progress.eta if job.status == JOB_RUNNING else None,
+                blocked_count=progress.blocked + progress.not_found
+            )
+            if job.status == JOB_PAUSED:
+                text = "⏸ Рассылка приостановлена\n" + text
+        return f"{text}\n\n🆔 Рассылка: {job.job_id}"
+    
+    async def update_job_progress(self, job, progress, is_final=False):
+        """Обновляет сообщение о прогрессе фоновой рассылки в чате администратора"""
+        text = self._format_job_text(job, progress, is_final)
+        reply_markup = self._broadcast_keyboard(job)
+        bot = self.application.bot
+        
+        if job.progress_message_id:
+            try:
+                await bot.edit_message_text(
+                    chat_id=job.admin_chat_id,
+                    message_id=job.progress_message_id,
+                    text=text,
+                    reply_markup=reply_markup
+                )
+                return
+            except telegram.error.BadRequest as e:
+                if "Message is not modified" in str(e):
+                    return
+                # Сообщение удалено или слишком старое - отправим новое ниже
+                logger.warning("ошибка_при_обновлении_сообщения_о_прогрессе",
+                              details={"job_id": job.job_id, "ошибка": str(e)})
+            except Exception as e:
+                logger.error("ошибка_при_обновлении_сообщения_о_прогрессе", e, details={"job_id": job.job_id})
+                return
         
+        try:
+            progress_message = await bot.send_message(
+                chat_id=job.admin_chat_id,
+                text=text,
+                reply_markup=reply_markup
+            )
+            broadcast_jobs.set_progress_message(job.job_id, progress_message.message_id)
+        except Exception as e:
+            logger.error("не_удалось_отправить_новое_сообщение_о_прогрессе", e, details={"job_id": job.job_id})
+    
+    def make_post_sender(self, post):
+        """Возвращает корутину отправки поста одному пользователю"""
         # Создаем клавиатуру с кнопкой, если она есть
         inline_keyboard = None
         if post.get('button_text') and post.get('button_url'):
@@ -486,122 +582,156 @@ class PostHandler(BaseHandler):
                 )]
             ])
         
+        # Формируем текст сообщения с названием поста если оно есть
+        post_title = post.get('title', '')
+        post_text = post.get('text', '')
+        message_text = post_text
+        if post_title:
+            message_text = f"<b>{post_title}</b>\n\n{post_text}"
+        
+        async def send(chat_id):
+            if post.get('image_url'):
+                await self.application.bot.send_photo(
+                    chat_id=chat_id,
+                    photo=post['image_url'],
+                    caption=message_text,
+                    parse_mode='HTML',
+                    reply_markup=inline_keyboard
+                )
+            else:
+                await self.application.bot.send_message(
+                    chat_id=chat_id,
+                    text=message_text,
+                    parse_mode='HTML',
+                    reply_markup=inline_keyboard
+                )
+        
+        return send
+    
+    async def send_post_to_users(self, message, post, users_data):
+        """
+        Запускает фоновую рассылку поста всем пользователям
+        
+        Рассылка сохраняется на диск и продолжается после перезапуска бота,
+        прогресс и кнопки управления выводятся отдельным сообщением.
+        Возвращает созданную рассылку, не дожидаясь окончания отправки.
+        """
+        # Собираем корректные Telegram ID, невалидные сразу считаем неудачными
+        chat_ids = []
+        invalid_count = 0
+        seen = set()
+        for user in users_data:
+            try:
+                telegram_id = int(user[1])
+            except (IndexError, ValueError, TypeError):
+                telegram_id = 0
+            if telegram_id <= 0:
+                username = user[0] if len(user) > 0 else "Неизвестный пользователь"
+                logger.warning("невалидный_id_пользователя", 
+                              details={"user_id": user[1] if len(user) > 1 else None, "username": username})
+                invalid_count += 1
+                continue
+            # Один пользователь получает пост один раз, даже если строка продублирована
+            if telegram_id in seen:
+                continue
+            seen.add(telegram_id)
+            chat_ids.append(telegram_id)
+        
+        users_count = len(chat_ids) + invalid_count
+        
         # Отправляем новое сообщение о прогрессе (вместо редактирования начального)
         progress_message = None
         try:
             progress_message = await message.reply_text(
                 f"🚀 Отправка поста...\n"
                 f"✅ Успешно: 0\n"
-                f"❌ Не удалось: 0\n"
-                f"📊 Прогресс: 0/{len(users_data)}"
+                f"❌ Не удалось: {invalid_count}\n"
+                f"📊 Прогресс: {invalid_count}/{users_count}"
             )
         except Exception as e:
             logger.error("ошибка_при_создании_сообщения_о_прогрессе", e)
-            # Если не получилось создать сообщение о прогрессе, используем исходное
-            progress_message = message
         
-        # Отправляем пост каждому пользователю
-        for user in users_data:
-            try:
-                telegram_id = int(user[1])  # Telegram ID пользователя
-                username = user[0] if len(user) > 0 else "Неизвестный пользователь"
-                
-                # Пропускаем невалидные ID
-                if telegram_id <= 0:
-                    logger.warning("невалидный_id_пользователя", 
-                                  details={"user_id": telegram_id, "username": username})
-                    fail_count += 1
-                    continue
-                
-                # Формируем текст сообщения с названием поста если оно есть
-                post_title = post.get('title', '')
-                post_text = post.get('text', '')
-                
-                # Если есть название, добавляем его в начало сообщения
-                message_text = post_text
-                if post_title:
-                    message_text = f"<b>{post_title}</b>\n\n{post_text}"
-                
-                # Отправляем пост
-                try:
-                    if post.get('image_url'):
-                        await self.application.bot.send_photo(
-                            chat_id=telegram_id,
-                            photo=post['image_url'],
-                            caption=message_text,
-                            parse_mode='HTML',
-                            reply_markup=inline_keyboard
-                        )
-                    else:
-                        await self.application.bot.send_message(
-                            chat_id=telegram_id,
-                            text=message_text,
-                            parse_mode='HTML',
-                            reply_markup=inline_keyboard
-                        )
-                    
-                    success_count += 1
-                    logger.info("отправка_поста_пользователю", 
-                               details={"user_id": telegram_id, "username": username, "статус": "успех"})
-                
-                except telegram.error.BadRequest as e:
-                    if "Chat not found" in str(e):
-                        logger.warning("чат_не_найден", 
-                                      details={"user_id": telegram_id, "username": username, "ошибка": str(e)})
-                    else:
-                        logger.error("ошибка_запроса_при_отправке", e, 
-                                    details={"user_id": telegram_id, "username": username, "тип_ошибки": "BadRequest"})
-                    fail_count += 1
-                
-                # Обрабатываем все остальные исключения Telegram API
-                except Exception as telegram_error:
-                    error_type = type(telegram_error).__name__
-                    logger.warning("ошибка_отправки_сообщения", 
-                                  details={"user_id": telegram_id, "username": username, 
-                                          "ошибка": str(telegram_error), "тип_ошибки": error_type})
-                    fail_count += 1
-                
-                # Обновляем сообщение о прогрессе каждые 10 пользователей
-                if (success_count + fail_count) % 10 == 0 and progress_message:
-                    await self.update_progress_message(
-                        progress_message, 
-                        len(users_data), 
-                        success_count, 
-                        fail_count
-                    )
-                
-            except Exception as e:
-                username = user[0] if len(user) > 0 else "Неизвестный пользователь"
-                logger.error("ошибка_при_отправке_поста_пользователю", e, 
-                            details={"user_id": telegram_id if 'telegram_id' in locals() else "неизвестный", 
-                                    "username": username, 
-                                    "error_type": type(e).__name__})
-                fail_count += 1
-        
-        # Отправляем финальное сообщение о результатах
-        if progress_message:
-            await self.update_progress_message(
-                progress_message,
-                len(users_data),
-                success_count,
-                fail_count,
-                is_final=True
+        job = broadcast_jobs.create(
+            post,
+            chat_ids,
+            admin_chat_id=message.chat_id,
+            progress_message_id=progress_message.message_id if progress_message else None,
+            invalid_count=invalid_count
+        )
+        
+        # Сразу показываем ID рассылки и кнопки управления
+        await self.update_job_progress(job, job.snapshot())
+        return job
+    
+    async def list_broadcasts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показывает активные и последние рассылки"""
+        user_id = update.effective_user.id
+        logger.admin_action(user_id, "Рассылки", "Просмотр списка рассылок")
+        
+        jobs = broadcast_jobs.list_jobs()
+        active_jobs = [job for job in jobs if job.is_active]
+        finished_jobs = [job for job in jobs if not job.is_active][:5]
+        
+        if not jobs:
+            await update.message.reply_text("📭 Рассылок пока не было.")
+            return
+        
+        lines = []
+        for job in active_jobs + finished_jobs:
+            progress = job.snapshot()
+            title = job.post.get('title') or job.post.get('text', '')[:30]
+            lines.append(
+                f"🆔 {job.job_id} — {JOB_STATUS_NAMES.get(job.status, job.status)}\n"
+                f"📝 {title}\n"
+                f"📊 {progress.done}/{job.total}, ✅ {progress.sent}, ❌ {progress.fail_count}"
             )
-        else:
-            # Если не удалось создать или использовать сообщение о прогрессе,
-            # отправляем новое финальное сообщение
-            try:
-                await message.reply_text(
-                    f"✅ Отправка поста завершена!\n\n"
-                    f"📊 Статистика отправки:\n"
-                    f"👥 Всего пользователей: {len(users_data)}\n"
-                    f"✅ Успешно отправлено: {success_count}\n"
-                    f"❌ Не удалось отправить: {fail_count}"
-                )
-            except Exception as e:
-                logger.error("не_удалось_отправить_финальное_сообщение", e)
         
-        return success_count, fail_count
+        await update.message.reply_text("📨 Рассылки:\n\n" + "\n\n".join(lines))
+        
+        # Для активных рассылок отправляем сообщение с кнопками управления
+        for job in active_jobs:
+            progress_message = await update.message.reply_text(
+                self._format_job_text(job, job.snapshot()),
+                reply_markup=self._broadcast_keyboard(job)
+            )
+            broadcast_jobs.set_progress_message(job.job_id, progress_message.message_id)
+    
+    async def handle_broadcast_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработка кнопок управления рассылкой (пауза, продолжение, отмена)"""
+        query = update.callback_query
+        user_id = query.from_user.id
+        
+        admin_ids = set(ADMIN_IDS)
+        try:
+            admin_ids.update(await self.sheets.async_get_admins())
+        except Exception as e:
+            logger.error("получение_списка_админов", e)
+        if user_id not in admin_ids:
+            await query.answer("⛔ Недостаточно прав", show_alert=True)
+            return
+        
+        _, action, job_id = query.data.split(":", 2)
+        logger.admin_action(user_id, "Рассылки", f"Управление рассылкой: {action}", details={"job_id": job_id})
+        
+        if action == "pause":
+            done = broadcast_jobs.pause(job_id)
+            answer = "⏸ Рассылка приостановлена" if done else "Рассылку нельзя приостановить"
+        elif action == "resume":
+            done = broadcast_jobs.resume(job_id)
+            answer = "▶️ Рассылка продолжена" if done else "Рассылку нельзя продолжить"
+        elif action == "cancel":
+            done = broadcast_jobs.cancel(job_id)
+            answer = "✖️ Рассылка отменяется" if done else "Рассылка уже завершена"
+        else:
+            answer = "❌ Неизвестное действие"
+        await query.answer(answer)
+        
+        job = broadcast_jobs.get(job_id)
+        if job and query.message:
+            # Управление могло прийти из другого сообщения - прогресс выводим в нем
+            if job.progress_message_id != query.message.message_id:
+                broadcast_jobs.set_progress_message(job_id, query.message.message_id)
+            await self.update_job_progress(job, job.snapshot(), is_final=not job.is_active)
     
     async def handle_send_to_all_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка подтверждения отправки поста всем пользователям"""
@@ -614,11 +744,11 @@ class PostHandler(BaseHandler):
             post_id = context.user_data.get('post_id')
             
             # Получаем информацию о посте
-            post = self.sheets.get_post_by_id(post_id)
+            post = await self.sheets.async_get_post_by_id(post_id)
             
             if post:
                 # Получаем список всех пользователей
-                users_data = self.sheets.get_users_list(page=1, page_size=10000)[0]
+                users_data = (await self.sheets.async_get_users_list(page=1, page_size=10000))[0]
                 
                 # Показываем сообщение о начале отправки
                 message = await update.message.reply_text(
@@ -626,7 +756,7 @@ class PostHandler(BaseHandler):
                     reply_markup=ReplyKeyboardRemove()
                 )
                 
-                # Отправляем пост пользователям
+                # Запускаем фоновую рассылку, диалог администратора сразу завершается
                 await self.send_post_to_users(message, post, users_data)
                 
                 # Очищаем данные о посте
@@ -681,7 +811,7 @@ class PostHandler(BaseHandler):
         logger.user_action(user_id, "Управление постами", "Просмотр списка постов")
         
         # Получаем все посты
-        posts = self.sheets.get_all_posts()
+        posts = await self.sheets.async_get_all_posts()
         
         if not posts:
             await update.message.reply_text(
@@ -691,7 +821,7 @@ class PostHandler(BaseHandler):
             return ConversationHandler.END
         
         # Получаем словарь админов для отображения имен
-        admin_data = self.sheets.get_admins_info()
+        admin_data = await self.sheets.async_get_admins_info()
         admin_names = {}
         for admin in admin_data:
             if len(admin) >= 3:  # ID, имя, описание
@@ -822,7 +952,7 @@ class PostHandler(BaseHandler):
             logger.user_action(user_id, "Отправка поста", "Выбор поста для отправки", details={"post_id": post_id})
             
             # Получаем информацию о посте
-            post = self.sheets.get_post_by_id(post_id)
+            post = await self.sheets.async_get_post_by_id(post_id)
             
             if not post:
                 await query.edit_message_text(
@@ -863,7 +993,7 @@ class PostHandler(BaseHandler):
             logger.user_action(user_id, "Отправка поста", "Подтверждение отправки", details={"post_id": post_id})
             
             # Получаем информацию о посте
-            post = self.sheets.get_post_by_id(post_id)
+            post = await self.sheets.async_get_post_by_id(post_id)
             
             if not post:
                 await query.edit_message_text(
@@ -879,9 +1009,9 @@ class PostHandler(BaseHandler):
             )
             
             # Получаем список всех пользователей
-            users_data = self.sheets.get_users_list(page=1, page_size=10000)[0]
+            users_data = (await self.sheets.async_get_users_list(page=1, page_size=10000))[0]
             
-            # Отправляем пост пользователям
+            # Запускаем фоновую рассылку
             await self.send_post_to_users(status_message, post, users_data)
             
             return ConversationHandler.END
@@ -892,7 +1022,7 @@ class PostHandler(BaseHandler):
             logger.user_action(user_id, "Управление постами", "Выбор поста для удаления", details={"post_id": post_id})
             
             # Получаем информацию о посте
-            post = self.sheets.get_post_by_id(post_id)
+            post = await self.sheets.async_get_post_by_id(post_id)
             
             if not post:
                 await query.edit_message_text(
@@ -934,7 +1064,10 @@ class PostHandler(BaseHandler):
             logger.user_action(user_id, "Управление постами", "Подтверждение удаления", details={"post_id": post_id})
             
             # Удаляем пост
-            if self.sheets.delete_post(post_id):
+            deleted = await self.sheets.async_delete_post(post_id)
+            if deleted is None:
+                await query.edit_message_text(WRITE_RESULT_UNKNOWN_TEXT, reply_markup=None)
+            elif deleted:
                 await query.edit_message_text(
                     "✅ Пост успешно удален.",
                     reply_markup=None
@@ -975,7 +1108,7 @@ class PostHandler(BaseHandler):
         logger.user_action(user_id, "Администрирование", "Открытие меню управления постами")
         
         # Получаем все посты
-        posts = self.sheets.get_all_posts()
+        posts = await self.sheets.async_get_all_posts()
         
         if not posts:
             await send_message(
@@ -986,7 +1119,7 @@ class PostHandler(BaseHandler):
             return ConversationHandler.END
         
         # Получаем словарь админов для отображения имен
-        admin_data = self.sheets.get_admins_info()
+        admin_data = await self.sheets.async_get_admins_info()
         admin_names = {}
         for admin in admin_data:
             if len(admin) >= 3:  # ID, имя, описание
@@ -20,6 +20,9 @@ from telegram import Update, BotCommand
 
 from config import BOT_TOKEN, ADMIN_IDS, SPREADSHEET_ID, configure_logging, GOOGLE_CREDENTIALS_FILE
 from utils.sheets import GoogleSheets
+from utils.sheets_cache import sheets_cache
+from utils.stats_refresher import stats_refresher
+from utils.broadcast_jobs import broadcast_jobs
 from utils.helpers import setup_commands, setup_commands_async, is_admin
 from utils.logger import get_logger
 from models.states import *
@@ -78,8 +81,9 @@ async def main():
         sys.exit(1)
     
     # Создаем приложение с настройками таймаутов
+    # Пул соединений рассчитан на параллельных отправителей рассылки и обычные запросы
     request = HTTPXRequest(
-        connection_pool_size=8,
+        connection_pool_size=8 + int(os.getenv("BROADCAST_CONCURRENCY", "8")),
         read_timeout=30,
         write_timeout=30,
         connect_timeout=30,
@@ -155,6 +159,11 @@ async def main():
                             pattern=r"^(send_post:|confirm_send:|cancel_posts|delete_post:|confirm_delete:|post_help|manage_posts_back)")
     )
     
+    # Добавляем обработчик кнопок управления рассылками
+    application.add_handler(
+        CallbackQueryHandler(post_handler.handle_broadcast_callback, pattern=r"^bjob:")
+    )
+    
     # Добавление обработчиков для административных команд
     application.add_handler(CommandHandler("restart", survey_handler.restart, 
                                           filters=filters.User(user_id=admin_ids)))
@@ -174,6 +183,58 @@ async def main():
     await application.start()
     await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
     
+    # Асинхронный транспорт Sheets (если выбран) открывает пул соединений в цикле событий бота
+    await sheets.start_transport()
+    
+    # Запускаем фоновую запись буфера ответов (ответы из журнала отправятся сразу)
+    sheets.answers_buffer.start()
+    # Очередь записей, отложенных пока таблица была недоступна
+    sheets.write_queue.start()
+    
+    # Локальное хранилище: изменения уходят в таблицу пачками, правки из таблицы загружаются периодически
+    if sheets.replicator is not None:
+        sheets.replicator.start()
+        local_store_pull_interval = int(os.getenv("LOCAL_STORE_PULL_INTERVAL", "120"))
+        application.job_queue.run_repeating(
+            sheets.async_pull_local_store,
+            interval=local_store_pull_interval,
+            first=local_store_pull_interval,
+            name="local_store_pull"
+        )
+    
+    # Фоновое обновление листа статистики: не чаще раза в интервал, запросы объединяются
+    stats_refresher.attach(
+        application.job_queue,
+        sheets.async_update_statistics,
+        interval=float(os.getenv("STATS_REFRESH_INTERVAL", "30"))
+    )
+    
+    # Фоновые рассылки: незавершенные до перезапуска продолжаются с места остановки
+    broadcast_jobs.attach(post_handler.make_post_sender, post_handler.update_job_progress)
+    
+    # Периодическая сверка индекса прошедших опрос: один запрос на чтение за интервал
+    respondents_resync_interval = int(os.getenv("RESPONDENTS_RESYNC_INTERVAL", "900"))
+    application.job_queue.run_repeating(
+        sheets.async_resync_respondents_index,
+        interval=respondents_resync_interval,
+        first=respondents_resync_interval,
+        name="respondents_resync"
+    )
+    
+    # Теплый запуск: бот уже отвечает по данным снимка, сверка с таблицей идет в фоне
+    if sheets.warm_started:
+        application.job_queue.run_once(sheets.async_reconcile_with_sheets, when=0,
+                                       name="warm_start_reconcile")
+    
+    # Периодическое сохранение снимка данных для следующего теплого запуска
+    warm_snapshot_interval = int(os.getenv("WARM_SNAPSHOT_INTERVAL", "300"))
+    application.job_queue.run_repeating(
+        sheets.async_save_warm_snapshot,
+        interval=warm_snapshot_interval,
+        first=warm_snapshot_interval,
+        name="warm_snapshot_save"
+    )
+    
     try:
         # Бесконечный цикл для поддержания работы бота
         # Будет прерван по изменению глобальной переменной running
@@ -184,7 +245,20 @@ async def main():
         logger.data_processing("система", "Бот остановлен пользователем", details={"action": "bot_shutdown"})
         # Плавное завершение работы updater и application
         await application.updater.stop()
+        # Останавливаем рассылки (прогресс сохранен, они продолжатся после запуска)
+        await broadcast_jobs.shutdown()
         await application.stop()
+        # Записываем в таблицу оставшиеся ответы из буфера
+        await sheets.answers_buffer.stop()
+        await sheets.write_queue.stop()
+        # Отправляем в таблицу оставшиеся изменения локального хранилища (в том числе ответы из буфера)
+        if sheets.replicator is not None:
+            await sheets.replicator.stop()
+        await sheets.close_transport()
+        # Сохраняем снимок данных для быстрого следующего запуска
+        sheets.save_warm_snapshot()
+        # Останавливаем пул потоков Sheets API
+        sheets_cache.shutdown()
 
 if __name__ == "__main__":
     try:
@@ -5,6 +5,8 @@
 # Состояния для основного опроса
 WAITING_START = "WAITING_START"
 CONFIRMING = "CONFIRMING"
+# Номер текущего вопроса хранится в context.user_data, поэтому состояние одно на все вопросы
+ANSWERING_QUESTION = "ANSWERING_QUESTION"
 
 # Состояния для вложенных вариантов ответов
 SUB_OPTIONS = "SUB_OPTIONS"
@@ -31,10 +33,6 @@ DELETING_QUESTION = "DELETING_QUESTION"
 # Состояние для подтверждения очистки данных
 CONFIRMING_CLEAR = "CONFIRMING_CLEAR"
 
-# Динамические состояния для вопросов
-# Будут генерироваться в формате QUESTION_0, QUESTION_1, ...
-# Для вложенных вариантов: QUESTION_0_SUB, QUESTION_1_SUB, ...
-
 # Состояния для управления администраторами
 ADDING_ADMIN = "ADDING_ADMIN"
 ADDING_ADMIN_NAME = "ADDING_ADMIN_NAME"
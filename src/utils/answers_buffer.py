@@ -0,0 +1,407 @@
+"""
+Модуль с буфером отложенной записи ответов в Google Sheets (write-behind)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from utils.logger import get_logger
+from utils.rate_limiter import PRIORITY_NORMAL, OPERATION_READ, OPERATION_WRITE
+from utils.sheets_cache import sheets_cache
+from utils.sheets_retry import sheets_retry
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Сколько discard ждет окончания отправки строк пользователя, секунды
+DISCARD_WAIT_TIMEOUT = 60
+
+
+class AnswersWriteBuffer:
+    """
+    Буфер строк с ответами, которые записываются в таблицу пачками.
+
+    Каждая строка сначала дописывается в локальный журнал (JSONL, fsync),
+    затем попадает в память. Фоновая задача отправляет накопленные строки
+    одним вызовом flush_function, когда их набирается max_rows или проходит
+    flush_interval_ms. После успешной записи журнал переписывается без
+    отправленных строк. При запуске журнал читается заново, поэтому ответы,
+    подтвержденные до падения бота, будут записаны после перезапуска.
+
+    Если исход записи неизвестен (таймаут, 5xx, обрыв соединения) или строки
+    восстановлены из журнала, перед повторной отправкой они сверяются с
+    листом через verify_function: уже записанные строки не отправляются
+    второй раз. Строки, которые таблица отклонила как некорректные,
+    переносятся в карантинный файл и не блокируют остальные.
+    """
+
+    def __init__(self, flush_function: Callable[[List[List[str]]], None], journal_path: str,
+                 max_rows: int = 20, flush_interval_ms: int = 2000,
+                 verify_function: Optional[Callable[[List[List[str]]], List[bool]]] = None):
+        """
+        Инициализация буфера
+
+        Args:
+            flush_function (Callable): Синхронная функция записи списка строк в таблицу
+            journal_path (str): Путь к файлу журнала
+            max_rows (int): Количество строк, при котором запись запускается сразу
+            flush_interval_ms (int): Максимальное время ожидания строки в буфере, мс
+            verify_function (Optional[Callable]): Синхронная функция, возвращающая для каждой
+                строки, есть ли она уже в листе (для строк с неизвестным исходом записи)
+        """
+        self.flush_function = flush_function
+        self.verify_function = verify_function
+        self.journal_path = journal_path
+        self.quarantine_path = os.path.splitext(journal_path)[0] + ".quarantine.jsonl"
+        self.max_rows = max(1, max_rows)
+        self.flush_interval = max(0.05, flush_interval_ms / 1000)
+
+        self._pending: List[Dict] = []  # [{"id": ..., "user_id": ..., "row": [...]}]
+        self._pending_users: Dict[str, int] = {}
+        self._uncertain = set()  # ID строк, которые могли уже попасть в таблицу
+        self._sending_ids = set()  # ID строк, которые сейчас отправляет поток пула
+        self._journal_lock = threading.Lock()
+        self._sent = threading.Condition(self._journal_lock)
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._flushed_rows = 0
+        self._flush_calls = 0
+        self._flush_errors = 0
+        self._verified_rows = 0
+        self._quarantined = 0
+
+        journal_dir = os.path.dirname(self.journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """Загружает незаписанные строки из журнала"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        restored = 0
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная последняя строка после падения - пропускаем
+                    logger.warning("Поврежденная запись в журнале ответов пропущена",
+                                   details={"файл": self.journal_path})
+                    continue
+                self._remember(entry)
+                # Бот мог упасть после записи в таблицу, но до очистки журнала
+                self._uncertain.add(entry["id"])
+                restored += 1
+
+        if restored:
+            logger.data_load("журнал ответов", self.journal_path, count=restored)
+
+    def _remember(self, entry: Dict):
+        """Добавляет строку в память буфера"""
+        self._pending.append(entry)
+        user_id = entry["user_id"]
+        self._pending_users[user_id] = self._pending_users.get(user_id, 0) + 1
+
+    def _forget(self, entries: List[Dict]):
+        """Убирает записанные строки из памяти буфера (строки, уже удаленные через discard, пропускаются)"""
+        written = {entry["id"] for entry in entries}
+        entries = [entry for entry in self._pending if entry["id"] in written]
+        self._pending = [entry for entry in self._pending if entry["id"] not in written]
+        self._uncertain -= written
+        for entry in entries:
+            user_id = entry["user_id"]
+            left = self._pending_users.get(user_id, 0) - 1
+            if left > 0:
+                self._pending_users[user_id] = left
+            else:
+                self._pending_users.pop(user_id, None)
+
+    def _append_to_journal(self, entry: Dict):
+        """Дописывает строку в журнал, сбрасывает его на диск и добавляет строку в память"""
+        # Запись и добавление в память под одной блокировкой, чтобы переписывание
+        # журнала в потоке пула не потеряло строку, добавленную между ними
+        with self._journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._remember(entry)
+
+    def _rewrite_journal(self):
+        """Переписывает журнал, оставляя только незаписанные строки"""
+        with self._journal_lock:
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as journal:
+                for entry in list(self._pending):
+                    journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def add(self, user_id: int, row: List[str]):
+        """
+        Добавляет строку с ответами в буфер
+
+        Строка считается принятой после записи в журнал: дальше она будет
+        отправлена в таблицу, даже если бот перезапустится.
+
+        Args:
+            user_id (int): Telegram ID пользователя
+            row (List[str]): Строка для листа ответов
+        """
+        entry = {"id": uuid.uuid4().hex, "user_id": str(user_id), "row": row}
+        self._append_to_journal(entry)
+
+        if len(self._pending) >= self.max_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        """Проверяет, есть ли у пользователя ответы, еще не записанные в таблицу"""
+        return str(user_id) in self._pending_users
+
+    def discard(self, user_id: Optional[int] = None) -> List[List[str]]:
+        """
+        Удаляет из буфера незаписанные строки пользователя (или все строки)
+
+        Если строки в этот момент отправляются, метод ждет окончания отправки:
+        после возврата они либо уже в листе, либо не будут отправлены, и их
+        можно удалять из листа. Вызывать из потока пула, не из цикла событий.
+
+        Args:
+            user_id (Optional[int]): Telegram ID пользователя; None - очистить весь буфер
+
+        Returns:
+            List[List[str]]: Удаленные строки
+        """
+        with self._journal_lock:
+            if user_id is None:
+                dropped = list(self._pending)
+            else:
+                dropped = [entry for entry in self._pending if entry["user_id"] == str(user_id)]
+            if not dropped:
+                return []
+            self._forget(dropped)
+            dropped_ids = {entry["id"] for entry in dropped}
+            if not self._sent.wait_for(lambda: not (self._sending_ids & dropped_ids), DISCARD_WAIT_TIMEOUT):
+                logger.warning("Отправка удаляемых ответов не завершилась, они могут появиться в таблице",
+                               details={"user_id": user_id, "ожидание": f"{DISCARD_WAIT_TIMEOUT}с"})
+        self._rewrite_journal()
+        logger.data_processing("ответы", "Незаписанные ответы удалены из буфера",
+                               details={"user_id": user_id, "строк": len(dropped)})
+        return [entry["row"] for entry in dropped]
+
+    def pending_rows(self) -> List[List[str]]:
+        """Возвращает незаписанные строки ответов"""
+        with self._journal_lock:
+            return [entry["row"] for entry in self._pending]
+
+    def pending_user_ids(self) -> List[str]:
+        """Возвращает telegram ID пользователей с незаписанными ответами"""
+        with self._journal_lock:
+            return list(self._pending_users)
+
+    def _send(self, entries: List[Dict]) -> List[Dict]:
+        """
+        Выполняется в потоке пула: отправляет строки, которые еще в буфере
+
+        Returns:
+            List[Dict]: Отправленные строки (без удаленных через discard)
+        """
+        with self._journal_lock:
+            pending_ids = {entry["id"] for entry in self._pending}
+            sending = [entry for entry in entries if entry["id"] in pending_ids]
+            self._sending_ids = {entry["id"] for entry in sending}
+        try:
+            if sending:
+                self.flush_function([entry["row"] for entry in sending])
+            return sending
+        finally:
+            with self._journal_lock:
+                self._sending_ids = set()
+                self._sent.notify_all()
+
+    def _quarantine(self, entry: Dict, error: Exception):
+        """Переносит строку, которую таблица не принимает, из буфера в карантинный файл"""
+        with self._journal_lock:
+            with open(self.quarantine_path, "a", encoding="utf-8") as quarantine:
+                quarantine.write(json.dumps(dict(entry, error=str(error)[:500], quarantined_at=int(time.time())),
+                                            ensure_ascii=False) + "\n")
+            self._forget([entry])
+        self._quarantined += 1
+        logger.error("запись_буфера_ответов", error,
+                     details={"user_id": entry["user_id"], "карантин": self.quarantine_path})
+
+    async def _verify(self, batch: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Сверяет с листом строки с неизвестным исходом записи
+
+        Returns:
+            Optional[List[Dict]]: Строки, которые еще нужно отправить; None - сверить не удалось
+        """
+        uncertain = [entry for entry in batch if entry["id"] in self._uncertain]
+        if not uncertain or self.verify_function is None:
+            return batch
+        try:
+            present = await sheets_cache.execute_with_rate_limit(
+                self.verify_function, [entry["row"] for entry in uncertain],
+                priority=PRIORITY_NORMAL, operation=OPERATION_READ
+            )
+        except Exception as e:
+            logger.warning("Не удалось сверить ответы с таблицей, отправка отложена",
+                           details={"строк": len(uncertain), "ошибка": str(e)[:200]})
+            return None
+
+        written = [entry for entry, found in zip(uncertain, present) if found]
+        with self._journal_lock:
+            self._forget(written)
+            self._uncertain.difference_update(entry["id"] for entry in uncertain)
+        if written:
+            self._verified_rows += len(written)
+            self._flushed_rows += len(written)
+            logger.data_processing("ответы", "Ответы уже были записаны в таблицу, повторно не отправляются",
+                                   details={"строк": len(written)})
+        written_ids = {entry["id"] for entry in written}
+        return [entry for entry in batch if entry["id"] not in written_ids]
+
+    async def _write(self, entries: List[Dict]) -> int:
+        """
+        Отправляет строки и разбирает исход записи
+
+        Returns:
+            int: Количество записанных строк
+        """
+        try:
+            sent = await sheets_cache.execute_with_rate_limit(
+                self._send, entries, priority=PRIORITY_NORMAL, operation=OPERATION_WRITE
+            )
+        except Exception as e:
+            self._flush_errors += 1
+            if sheets_retry.is_unsent_error(e):
+                # Ответы уже в журнале: буфер повторит запись, когда таблица станет доступна
+                logger.warning("Таблица недоступна, ответы остаются в буфере",
+                               details={"строк": len(entries)})
+                return 0
+            if sheets_retry.is_unavailable_error(e):
+                # Таймаут или 5xx: строки могли записаться, перед повтором их нужно сверить с листом
+                with self._journal_lock:
+                    self._uncertain.update(entry["id"] for entry in entries)
+                logger.warning("Исход записи ответов неизвестен, перед повтором они будут сверены с таблицей",
+                               details={"строк": len(entries), "ошибка": str(e)[:200]})
+                return 0
+            if len(entries) > 1:
+                # Таблица отклонила пачку: отправляем строки по одной, чтобы найти некорректные
+                written = 0
+                for entry in entries:
+                    written += await self._write([entry])
+                    if any(item["id"] == entry["id"] for item in self._pending):
+                        # Строка не записана и не в карантине - таблица недоступна, остальные ждут
+                        break
+                return written
+            self._quarantine(entries[0], e)
+            return 0
+
+        with self._journal_lock:
+            self._forget(sent)
+        self._flushed_rows += len(sent)
+        self._flush_calls += 1
+        return len(sent)
+
+    async def flush(self) -> int:
+        """
+        Отправляет накопленные строки в таблицу одним вызовом
+
+        Returns:
+            int: Количество записанных строк
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            with self._journal_lock:
+                batch = list(self._pending)
+                if self._sending_ids:
+                    # Предыдущая отправка еще идет в потоке пула (ее не дождались по таймауту)
+                    return 0
+            if not batch:
+                return 0
+
+            unsent = await self._verify(batch)
+            if unsent is None:
+                return 0
+            written = len(batch) - len(unsent)
+            if unsent:
+                written += await self._write(unsent)
+
+            await sheets_cache.run_in_executor(self._rewrite_journal)
+            if written:
+                logger.data_processing("ответы", "Буфер ответов записан в таблицу",
+                                       details={"строк": written, "осталось": len(self._pending)})
+            return written
+
+    async def _run(self):
+        """Фоновая задача периодической записи буфера"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Ошибка одной попытки (пул перегружен, журнал не переписан) не должна останавливать запись:
+                # строки остаются в буфере и журнале до следующей попытки
+                self._flush_errors += 1
+                logger.error("фоновая_запись_ответов", e, details={"в буфере": len(self._pending)})
+
+    def start(self):
+        """Запускает фоновую запись буфера (вызывать внутри цикла событий)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._pending:
+            # Сразу отправляем строки, восстановленные из журнала
+            self._wakeup.set()
+        logger.init("AnswersWriteBuffer", "Буфер ответов запущен",
+                    details={"строк в пачке": self.max_rows, "интервал": f"{self.flush_interval:.2f}с",
+                             "из журнала": len(self._pending)})
+
+    async def stop(self):
+        """Останавливает фоновую задачу и отправляет оставшиеся строки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            logger.warning("Не все ответы записаны в таблицу, они останутся в журнале",
+                           details={"строк": len(self._pending), "файл": self.journal_path})
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает состояние буфера"""
+        return {
+            "pending": len(self._pending),
+            "flushed_rows": self._flushed_rows,
+            "flush_calls": self._flush_calls,
+            "flush_errors": self._flush_errors,
+            "uncertain": len(self._uncertain),
+            "verified_rows": self._verified_rows,
+            "quarantined": self._quarantined,
+        }
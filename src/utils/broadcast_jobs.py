@@ -0,0 +1,358 @@
+"""
+Модуль с фоновыми рассылками, сохраняемыми на диск и продолжаемыми после перезапуска
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.broadcaster import BroadcastEngine, BroadcastProgress
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Состояния рассылки
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_CANCELLED = "cancelled"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_STATUS_NAMES = {
+    JOB_RUNNING: "идет отправка",
+    JOB_PAUSED: "приостановлена",
+    JOB_CANCELLED: "отменена",
+    JOB_DONE: "завершена",
+    JOB_FAILED: "прервана ошибкой",
+}
+
+
+class BroadcastJob:
+    """Рассылка поста: получатели, состояние и итоги отправки по каждому получателю"""
+
+    def __init__(self, job_id: str, post: Dict, chat_ids: List[int], admin_chat_id: int,
+                 progress_message_id: Optional[int] = None, status: str = JOB_RUNNING,
+                 created: Optional[float] = None, invalid_count: int = 0):
+        self.job_id = job_id
+        self.post = post
+        self.chat_ids = chat_ids
+        self.admin_chat_id = admin_chat_id
+        self.progress_message_id = progress_message_id
+        self.status = status
+        self.created = created or time.time()
+        self.invalid_count = invalid_count  # Строки с некорректным Telegram ID
+        self.delivered: Dict[int, str] = {}  # {telegram_id: итог отправки}
+
+    @property
+    def total(self) -> int:
+        """Количество получателей"""
+        return len(self.chat_ids)
+
+    @property
+    def is_active(self) -> bool:
+        """Рассылка еще не завершена и не отменена"""
+        return self.status in (JOB_RUNNING, JOB_PAUSED)
+
+    def pending_ids(self) -> List[int]:
+        """Получатели, которым пост еще не отправлялся"""
+        return [chat_id for chat_id in self.chat_ids if chat_id not in self.delivered]
+
+    def snapshot(self) -> BroadcastProgress:
+        """Счетчики рассылки по журналу итогов (без оценки скорости)"""
+        progress = BroadcastProgress(self.total)
+        progress.restore(self.delivered.values())
+        return progress
+
+    def to_dict(self) -> Dict:
+        """Описание рассылки для сохранения (без итогов отправки)"""
+        return {
+            "job_id": self.job_id,
+            "post": self.post,
+            "chat_ids": self.chat_ids,
+            "admin_chat_id": self.admin_chat_id,
+            "progress_message_id": self.progress_message_id,
+            "status": self.status,
+            "created": self.created,
+            "invalid_count": self.invalid_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BroadcastJob":
+        """Восстанавливает рассылку из сохраненного описания"""
+        return cls(
+            job_id=data["job_id"],
+            post=data["post"],
+            chat_ids=[int(chat_id) for chat_id in data["chat_ids"]],
+            admin_chat_id=data["admin_chat_id"],
+            progress_message_id=data.get("progress_message_id"),
+            status=data.get("status", JOB_RUNNING),
+            created=data.get("created"),
+            invalid_count=data.get("invalid_count", 0),
+        )
+
+
+class BroadcastJobManager:
+    """
+    Менеджер фоновых рассылок.
+
+    Каждая рассылка хранится в каталоге broadcasts двумя файлами:
+    <job_id>.json - описание (пост, получатели, состояние), перезаписывается
+    атомарно при смене состояния; <job_id>.log - журнал итогов, в который
+    дописывается строка "telegram_id итог" после каждой отправки. При запуске
+    незавершенные рассылки продолжаются с первого получателя, которого нет
+    в журнале, поэтому повторно пост может получить не больше пользователей,
+    чем было параллельных отправок в момент остановки.
+    """
+
+    def __init__(self, jobs_dir: str = None):
+        if jobs_dir is None:
+            jobs_dir = os.path.join(os.getenv("DATA_DIR", "/app/data"), "broadcasts")
+        self.jobs_dir = jobs_dir
+        self._jobs: Dict[str, BroadcastJob] = {}
+        self._engines: Dict[str, BroadcastEngine] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._send_factory: Optional[Callable[[Dict], Callable[[int], Awaitable]]] = None
+        self._progress_callback: Optional[Callable[[BroadcastJob, BroadcastProgress, bool], Awaitable]] = None
+        self._loaded = False
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _log_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.log")
+
+    def _save(self, job: BroadcastJob):
+        """Атомарно сохраняет описание рассылки"""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._meta_path(job.job_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _load_log(self, job: BroadcastJob):
+        """Читает журнал итогов отправки рассылки"""
+        try:
+            with open(self._log_path(job.job_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    # Последняя строка могла записаться не полностью
+                    if len(parts) != 2:
+                        continue
+                    try:
+                        job.delivered[int(parts[0])] = parts[1]
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        """Загружает сохраненные рассылки с диска"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.jobs_dir):
+            return
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = BroadcastJob.from_dict(json.load(f))
+            except Exception as e:
+                logger.error("загрузка_рассылки", e, details={"файл": name})
+                continue
+            self._load_log(job)
+            self._jobs[job.job_id] = job
+        logger.data_load("рассылки", self.jobs_dir, count=len(self._jobs),
+                         details={"активных": sum(1 for job in self._jobs.values() if job.is_active)})
+
+    def attach(self, send_factory: Callable[[Dict], Callable[[int], Awaitable]],
+               progress_callback: Callable[[BroadcastJob, BroadcastProgress, bool], Awaitable]):
+        """
+        Подключает отправку и вывод прогресса, продолжает незавершенные рассылки
+        (вызывать внутри цикла событий)
+
+        Args:
+            send_factory: Принимает пост и возвращает корутину отправки одному получателю
+            progress_callback: Корутина (рассылка, счетчики, is_final) для вывода прогресса
+        """
+        self._send_factory = send_factory
+        self._progress_callback = progress_callback
+        self._load()
+        for job in self._jobs.values():
+            if job.is_active and job.job_id not in self._tasks:
+                logger.data_processing("рассылка", "Продолжение рассылки после перезапуска",
+                                       details={"job_id": job.job_id, "статус": job.status,
+                                                "осталось": len(job.pending_ids())})
+                self._start(job)
+
+    def create(self, post: Dict, chat_ids: List[int], admin_chat_id: int,
+               progress_message_id: Optional[int] = None, invalid_count: int = 0) -> BroadcastJob:
+        """
+        Создает рассылку, сохраняет ее на диск и запускает в фоне
+
+        Args:
+            post (Dict): Пост для отправки
+            chat_ids (List[int]): Telegram ID получателей
+            admin_chat_id (int): Чат администратора для вывода прогресса
+            progress_message_id (Optional[int]): Сообщение с прогрессом в чате администратора
+            invalid_count (int): Пропущенные строки с некорректным Telegram ID
+
+        Returns:
+            BroadcastJob: Созданная рассылка
+        """
+        self._load()
+        job = BroadcastJob(
+            job_id=uuid.uuid4().hex[:8],
+            post=post,
+            chat_ids=list(chat_ids),
+            admin_chat_id=admin_chat_id,
+            progress_message_id=progress_message_id,
+            invalid_count=invalid_count,
+        )
+        self._save(job)
+        self._jobs[job.job_id] = job
+        logger.data_processing("рассылка", "Создана рассылка",
+                               details={"job_id": job.job_id, "post_id": post.get("id"), "получателей": job.total})
+        self._start(job)
+        return job
+
+    def _start(self, job: BroadcastJob):
+        """Запускает задачу рассылки"""
+        engine = BroadcastEngine()
+        if job.status == JOB_PAUSED:
+            engine.pause()
+        self._engines[job.job_id] = engine
+        task = asyncio.get_running_loop().create_task(self._run(job, engine))
+        self._tasks[job.job_id] = task
+
+    async def _run(self, job: BroadcastJob, engine: BroadcastEngine):
+        """Выполняет рассылку, записывая итог каждой отправки в журнал"""
+        progress = job.snapshot()
+        failed = False
+
+        async def on_progress(current: BroadcastProgress):
+            if self._progress_callback:
+                await self._progress_callback(job, current, False)
+
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            with open(self._log_path(job.job_id), "a", encoding="utf-8") as log_file:
+                def on_result(chat_id: int, result: str):
+                    job.delivered[chat_id] = result
+                    log_file.write(f"{chat_id} {result}\n")
+                    # Сбрасываем в ОС сразу: строка переживет падение процесса
+                    log_file.flush()
+
+                try:
+                    progress = await engine.run(
+                        job.pending_ids(),
+                        self._send_factory(job.post),
+                        on_progress=on_progress,
+                        on_result=on_result,
+                        progress=progress,
+                    )
+                finally:
+                    os.fsync(log_file.fileno())
+        except asyncio.CancelledError:
+            # Остановка бота: состояние не меняем, рассылка продолжится после запуска
+            raise
+        except Exception as e:
+            logger.error("ошибка_рассылки", e, details={"job_id": job.job_id})
+            # После перезапуска ошибка повторилась бы: рассылка завершается, отправленное остается в журнале
+            failed = True
+            progress = job.snapshot()
+        finally:
+            self._tasks.pop(job.job_id, None)
+            self._engines.pop(job.job_id, None)
+
+        if failed:
+            job.status = JOB_FAILED
+        else:
+            job.status = JOB_CANCELLED if engine.is_cancelled else JOB_DONE
+        self._save(job)
+
+        if self._progress_callback:
+            try:
+                await self._progress_callback(job, progress, True)
+            except Exception as e:
+                logger.error("ошибка_при_обновлении_сообщения_о_прогрессе", e, details={"job_id": job.job_id})
+
+    def set_progress_message(self, job_id: str, message_id: int):
+        """Запоминает сообщение, в котором выводится прогресс рассылки"""
+        job = self._jobs.get(job_id)
+        if job:
+            job.progress_message_id = message_id
+            self._save(job)
+
+    def pause(self, job_id: str) -> bool:
+        """Приостанавливает рассылку"""
+        job = self._jobs.get(job_id)
+        if not job or job.status != JOB_RUNNING:
+            return False
+        job.status = JOB_PAUSED
+        self._save(job)
+        engine = self._engines.get(job_id)
+        if engine:
+            engine.pause()
+        logger.data_processing("рассылка", "Рассылка приостановлена", details={"job_id": job_id})
+        return True
+
+    def resume(self, job_id: str) -> bool:
+        """Продолжает приостановленную рассылку"""
+        job = self._jobs.get(job_id)
+        if not job or job.status != JOB_PAUSED:
+            return False
+        job.status = JOB_RUNNING
+        self._save(job)
+        engine = self._engines.get(job_id)
+        if engine:
+            engine.resume()
+        elif self._send_factory:
+            self._start(job)
+        logger.data_processing("рассылка", "Рассылка продолжена", details={"job_id": job_id})
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет рассылку; уже отправленные сообщения остаются у пользователей"""
+        job = self._jobs.get(job_id)
+        if not job or not job.is_active:
+            return False
+        engine = self._engines.get(job_id)
+        if engine:
+            # Итоговое состояние сохранит задача рассылки после остановки отправителей
+            engine.cancel()
+        else:
+            job.status = JOB_CANCELLED
+            self._save(job)
+        logger.data_processing("рассылка", "Рассылка отменена администратором", details={"job_id": job_id})
+        return True
+
+    def get(self, job_id: str) -> Optional[BroadcastJob]:
+        """Возвращает рассылку по ID"""
+        self._load()
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, active_only: bool = False) -> List[BroadcastJob]:
+        """Список рассылок, новые первыми"""
+        self._load()
+        jobs = [job for job in self._jobs.values() if job.is_active or not active_only]
+        return sorted(jobs, key=lambda job: job.created, reverse=True)
+
+    async def shutdown(self):
+        """Останавливает задачи рассылок без смены состояния (они продолжатся после запуска)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Создаем глобальный экземпляр менеджера
+broadcast_jobs = BroadcastJobManager()
@@ -0,0 +1,328 @@
+"""
+Модуль с параллельной рассылкой сообщений пользователям с учетом лимитов Telegram
+"""
+
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+import telegram.error
+
+from utils.logger import get_logger
+from utils.rate_limiter import TokenBucket, PRIORITY_NORMAL
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Итог отправки одному пользователю
+RESULT_SENT = "sent"
+RESULT_BLOCKED = "blocked"      # Пользователь заблокировал бота или удален
+RESULT_NOT_FOUND = "not_found"  # Чат не найден
+RESULT_FAILED = "failed"        # Прочие ошибки (после повторов)
+
+# Фрагменты текста BadRequest, означающие, что писать в этот чат бессмысленно
+PERMANENT_BAD_REQUEST = (
+    "chat not found",
+    "user not found",
+    "user is deactivated",
+    "bot was blocked",
+    "peer_id_invalid",
+)
+
+
+class BroadcastProgress:
+    """Счетчики рассылки и оценка скорости и оставшегося времени"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.blocked = 0
+        self.not_found = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self._baseline = 0  # Обработано до текущего запуска (продолжение рассылки)
+
+    @property
+    def fail_count(self) -> int:
+        """Все неудачные отправки"""
+        return self.blocked + self.not_found + self.failed
+
+    @property
+    def done(self) -> int:
+        """Обработано пользователей"""
+        return self.sent + self.fail_count
+
+    @property
+    def elapsed(self) -> float:
+        """Прошло секунд с начала рассылки"""
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Скорость рассылки в текущем запуске, пользователей в секунду"""
+        elapsed = self.elapsed
+        return (self.done - self._baseline) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Оценка оставшегося времени в секундах"""
+        rate = self.rate
+        if rate <= 0:
+            return None
+        return (self.total - self.done) / rate
+
+    def record(self, result: str):
+        """Учитывает итог отправки одному пользователю"""
+        if result == RESULT_SENT:
+            self.sent += 1
+        elif result == RESULT_BLOCKED:
+            self.blocked += 1
+        elif result == RESULT_NOT_FOUND:
+            self.not_found += 1
+        else:
+            self.failed += 1
+
+    def restore(self, results: Iterable[str]):
+        """Восстанавливает счетчики по итогам прошлых запусков рассылки"""
+        for result in results:
+            self.record(result)
+        self._baseline = self.done
+
+    def as_dict(self) -> Dict[str, object]:
+        """Счетчики для логов"""
+        return {
+            "total": self.total,
+            "sent": self.sent,
+            "blocked": self.blocked,
+            "not_found": self.not_found,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate": round(self.rate, 2),
+            "elapsed": round(self.elapsed, 1),
+        }
+
+
+class BroadcastEngine:
+    """
+    Параллельная рассылка через пул отправителей под общим лимитом скорости.
+
+    Все отправители берут токен из одного token bucket (по умолчанию
+    30 сообщений в секунду - лимит Telegram для бота). RetryAfter от Telegram
+    приостанавливает всех отправителей на указанное время, затем сообщение
+    отправляется повторно. Сетевые ошибки и таймауты повторяются с
+    экспоненциальной задержкой. Заблокировавшие бота и ненайденные чаты
+    считаются постоянными ошибками и не повторяются.
+    """
+
+    def __init__(self, messages_per_second: float = None, concurrency: int = None,
+                 max_attempts: int = 3, max_retry_after: int = 5):
+        """
+        Инициализация рассылки
+
+        Args:
+            messages_per_second (float): Общий лимит отправки, сообщений в секунду
+            concurrency (int): Количество параллельных отправителей
+            max_attempts (int): Попыток при сетевых ошибках и таймаутах
+            max_retry_after (int): Сколько раз подряд выполнять повтор после RetryAfter
+        """
+        if messages_per_second is None:
+            messages_per_second = float(os.getenv("BROADCAST_MESSAGES_PER_SECOND", "30"))
+        if concurrency is None:
+            concurrency = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.max_retry_after = max(0, max_retry_after)
+        self._bucket = TokenBucket("telegram_broadcast", rate=messages_per_second,
+                                   capacity=messages_per_second)
+        self._paused_until = 0.0
+
+        # Управление рассылкой: пауза и отмена
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._cancelled = False
+
+    @property
+    def is_paused(self) -> bool:
+        """Приостановлена ли рассылка администратором"""
+        return not self._resumed.is_set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """Отменена ли рассылка"""
+        return self._cancelled
+
+    def pause(self):
+        """Приостанавливает рассылку: отправители дожидаются текущих сообщений и ждут resume"""
+        if not self._cancelled:
+            self._resumed.clear()
+
+    def resume(self):
+        """Продолжает приостановленную рассылку"""
+        self._resumed.set()
+
+    def cancel(self):
+        """Отменяет рассылку: новые сообщения больше не отправляются"""
+        self._cancelled = True
+        self._resumed.set()
+
+    async def _wait_pause(self):
+        """Ждет окончания паузы после RetryAfter"""
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def _pause(self, seconds: float):
+        """Приостанавливает всех отправителей"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @staticmethod
+    def _retry_after_seconds(error: telegram.error.RetryAfter) -> float:
+        """Время ожидания из RetryAfter (int или timedelta в зависимости от версии)"""
+        retry_after = error.retry_after
+        if isinstance(retry_after, timedelta):
+            return retry_after.total_seconds()
+        return float(retry_after)
+
+    @staticmethod
+    def classify_bad_request(error: telegram.error.BadRequest) -> str:
+        """Определяет итог по тексту BadRequest"""
+        message = str(error).lower()
+        if any(fragment in message for fragment in PERMANENT_BAD_REQUEST):
+            return RESULT_NOT_FOUND
+        return RESULT_FAILED
+
+    async def _deliver(self, chat_id: int, send: Callable[[int], Awaitable],
+                       progress: BroadcastProgress) -> Optional[str]:
+        """Отправляет сообщение одному пользователю с повторами (None - рассылка отменена до отправки)"""
+        attempt = 0
+        retry_after_count = 0
+        while True:
+            await self._wait_pause()
+            await self._bucket.acquire(PRIORITY_NORMAL)
+            if self._cancelled:
+                return None
+            try:
+                await send(chat_id)
+                return RESULT_SENT
+            except telegram.error.RetryAfter as e:
+                retry_after_count += 1
+                seconds = self._retry_after_seconds(e)
+                # Лимит общий для бота - останавливаем всех отправителей
+                self._pause(seconds + 0.5)
+                logger.warning("Превышен лимит Telegram при рассылке, пауза",
+                               details={"user_id": chat_id, "retry_after": seconds})
+                if retry_after_count > self.max_retry_after:
+                    return RESULT_FAILED
+                progress.retries += 1
+            except telegram.error.Forbidden as e:
+                logger.warning("пользователь_заблокировал_бота",
+                               details={"user_id": chat_id, "ошибка": str(e)})
+                return RESULT_BLOCKED
+            except telegram.error.BadRequest as e:
+                result = self.classify_bad_request(e)
+                if result == RESULT_NOT_FOUND:
+                    logger.warning("чат_не_найден", details={"user_id": chat_id, "ошибка": str(e)})
+                else:
+                    logger.error("ошибка_запроса_при_отправке", e,
+                                 details={"user_id": chat_id, "тип_ошибки": "BadRequest"})
+                return result
+            except (telegram.error.TimedOut, telegram.error.NetworkError) as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    logger.warning("ошибка_отправки_сообщения",
+                                   details={"user_id": chat_id, "ошибка": str(e),
+                                            "тип_ошибки": type(e).__name__, "попыток": attempt})
+                    return RESULT_FAILED
+                progress.retries += 1
+                # Экспоненциальная задержка перед повтором: 1, 2, 4... секунд
+                await asyncio.sleep(2 ** (attempt - 1))
+            except Exception as e:
+                logger.warning("ошибка_отправки_сообщения",
+                               details={"user_id": chat_id, "ошибка": str(e), "тип_ошибки": type(e).__name__})
+                return RESULT_FAILED
+
+    async def run(self, chat_ids: Iterable[int], send: Callable[[int], Awaitable],
+                  on_progress: Callable[[BroadcastProgress], Awaitable] = None,
+                  progress_interval: float = 3.0,
+                  on_result: Callable[[int, str], None] = None,
+                  progress: BroadcastProgress = None) -> BroadcastProgress:
+        """
+        Выполняет рассылку
+
+        Args:
+            chat_ids (Iterable[int]): Telegram ID получателей
+            send (Callable[[int], Awaitable]): Корутина отправки сообщения одному получателю
+            on_progress (Callable): Корутина, получающая BroadcastProgress для вывода прогресса
+            progress_interval (float): Интервал вызова on_progress в секундах
+            on_result (Callable[[int, str], None]): Вызывается с итогом отправки каждому получателю
+            progress (BroadcastProgress): Счетчики прошлых запусков при продолжении рассылки
+
+        Returns:
+            BroadcastProgress: Итоговые счетчики рассылки
+        """
+        chat_ids = list(chat_ids)
+        if progress is None:
+            progress = BroadcastProgress(len(chat_ids))
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        async def worker():
+            while True:
+                await self._resumed.wait()
+                if self._cancelled:
+                    return
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await self._deliver(chat_id, send, progress)
+                except Exception as e:
+                    logger.error("ошибка_при_отправке_поста_пользователю", e, details={"user_id": chat_id})
+                    result = RESULT_FAILED
+                if result is None:
+                    # Отменено до отправки - получатель остается неотправленным
+                    return
+                progress.record(result)
+                if on_result:
+                    on_result(chat_id, result)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                if self.is_paused:
+                    continue
+                try:
+                    await on_progress(progress)
+                except Exception as e:
+                    logger.error("ошибка_при_обновлении_сообщения_о_прогрессе", e)
+
+        logger.data_processing("рассылка", "Начало рассылки",
+                               details={"получателей": len(chat_ids), "отправителей": self.concurrency})
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, max(1, len(chat_ids))))]
+        reporter_task = asyncio.create_task(reporter()) if on_progress else None
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            if reporter_task:
+                reporter_task.cancel()
+            progress.finished = time.monotonic()
+
+        logger.data_processing("рассылка", "Рассылка отменена" if self._cancelled else "Рассылка завершена",
+                               duration=progress.elapsed, details=progress.as_dict())
+        return progress
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает метрики лимита отправки"""
+        return self._bucket.stats()
@@ -44,6 +44,7 @@ async def _async_setup_commands(application: Application, admin_ids: list):
         BotCommand("clear_data", "Очистить все ответы и статистику"),
         BotCommand("reset_user", "Сбросить прохождение опроса для пользователя"),
         BotCommand("list_users", "Показать список пользователей"),
+        BotCommand("health", "Состояние подключения к таблице"),
     ]
     
     # Команды для редактирования системных сообщений
@@ -58,6 +59,7 @@ async def _async_setup_commands(application: Application, admin_ids: list):
         BotCommand("manage_posts", "Управление постами (редактирование, удаление)"),
         BotCommand("edit_sent_post", "Редактировать текст отправленного поста"),
         BotCommand("edit_caption", "Редактировать подпись к изображению"),
+        BotCommand("broadcasts", "Рассылки: прогресс, пауза и отмена"),
     ]
     
     # Системные команды
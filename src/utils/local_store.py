@@ -0,0 +1,509 @@
+"""
+Модуль с локальным хранилищем листов таблицы в SQLite
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from gspread.utils import a1_range_to_grid_range, fill_gaps
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Виды изменений в очереди репликации
+OP_APPEND = "append"   # {"rows": [[...]]}
+OP_UPDATE = "update"   # {"row": 1, "col": 1, "values": [[...]], "input": "RAW", "before": [[...]]}
+OP_CLEAR = "clear"     # {"ranges": ["B2:F2", ...]}
+OP_DELETE = "delete"   # {"start": 1, "end": 1, "rows": [[...]]}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    title TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    pulled_at REAL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    title TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (title, row_number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rows_col1 ON rows (title, json_extract(data, '$[0]'));
+CREATE INDEX IF NOT EXISTS rows_col2 ON rows (title, json_extract(data, '$[1]'));
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_title ON outbox (title);
+"""
+
+# Столбцы, по которым построены индексы (ID записей в листах бота)
+INDEXED_COLUMNS = (1, 2)
+
+
+def _cell(value: Any) -> str:
+    """Значение ячейки в том виде, в каком его вернет чтение листа"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def grid_range(range_name: str) -> Dict[str, int]:
+    """Диапазон A1 (без названия листа, допускаются $) в виде GridRange"""
+    if "!" in range_name:
+        range_name = range_name.rsplit("!", 1)[1]
+    return a1_range_to_grid_range(range_name.replace("$", ""))
+
+
+def _trim(row: List[str]) -> List[str]:
+    """Убирает пустые ячейки в конце строки (как при чтении листа)"""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row[:end]
+
+
+def _write_cells(cells: List[str], col: int, line: List[str]) -> List[str]:
+    """Строка cells с записанными начиная со столбца col значениями line"""
+    cells = list(cells)
+    if len(cells) < col - 1 + len(line):
+        cells.extend([""] * (col - 1 + len(line) - len(cells)))
+    cells[col - 1:col - 1 + len(line)] = line
+    return cells
+
+
+def _clear_cells(cells: List[str], bounds: Dict[str, int]) -> List[str]:
+    """Строка cells с очищенными столбцами диапазона bounds (GridRange)"""
+    cells = list(cells)
+    last_col = bounds.get("endColumnIndex")
+    end = len(cells) if last_col is None else min(last_col, len(cells))
+    for index in range(bounds.get("startColumnIndex", 0), end):
+        cells[index] = ""
+    return cells
+
+
+def _locate(rows: List[List[str]], expected: List[List[str]], hint: int) -> Optional[int]:
+    """
+    Номер первой строки блока expected в rows; из нескольких совпадений - ближайший к hint
+
+    Блок пустых строк ищется только на прежнем месте: пустых строк в листе много,
+    и запись в них допустима, лишь пока их не заняли в таблице.
+    """
+    def row(number: int) -> List[str]:
+        return rows[number - 1] if 0 < number <= len(rows) else []
+
+    if not any(expected):
+        return hint if all(not row(hint + offset) for offset in range(len(expected))) else None
+    starts = [start for start in range(1, len(rows) - len(expected) + 2)
+              if all(row(start + offset) == line for offset, line in enumerate(expected))]
+    return min(starts, key=lambda start: abs(start - hint)) if starts else None
+
+
+def replay_ops(values: List[List[Any]], ops: List[Dict[str, Any]]
+               ) -> Tuple[List[List[str]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Применяет изменения очереди к значениям листа, прочитанным из таблицы
+
+    Строки изменений и удалений ищутся по содержимому, записанному в очередь
+    вместе с изменением (before/rows), а не по номеру: в таблице строки могли
+    сдвинуться из-за правок вручную. Изменение строки, которую в таблице уже
+    изменили по-другому, считается конфликтом и не применяется - правка в
+    таблице важнее. Изменение, которое таблица уже содержит (запись или
+    удаление с неизвестным исходом), пропускается.
+
+    Returns:
+        tuple: (значения листа после изменений, изменения с номерами строк в этих значениях
+            (порядок сохраняется), конфликтующие изменения)
+    """
+    rows = [_trim([_cell(value) for value in row]) for row in values]
+    resolved: List[Dict[str, Any]] = []
+    conflicts: List[Dict[str, Any]] = []
+    for op in ops:
+        kind, payload = op["op"], op["payload"]
+        if kind == OP_APPEND:
+            # Строки добавляются после последней непустой строки, как в values.append
+            while rows and not rows[-1]:
+                rows.pop()
+            rows.extend(_trim(list(row)) for row in payload["rows"])
+            resolved.append(op)
+        elif kind == OP_CLEAR:
+            for range_name in payload["ranges"]:
+                bounds = grid_range(range_name)
+                last = min(len(rows), bounds.get("endRowIndex", len(rows)))
+                for index in range(bounds.get("startRowIndex", 0), last):
+                    rows[index] = _trim(_clear_cells(rows[index], bounds))
+            resolved.append(op)
+        elif kind == OP_UPDATE:
+            start = payload["row"]
+            before = payload.get("before")
+            if before is not None:
+                start = _locate(rows, before, payload["row"])
+                if start is None:
+                    after = [_trim(_write_cells(cells, payload["col"], line))
+                             for cells, line in zip(before, payload["values"])]
+                    if _locate(rows, after, payload["row"]) is None:
+                        conflicts.append(op)
+                    continue
+            last = start + len(payload["values"]) - 1
+            if len(rows) < last:
+                rows.extend([] for _ in range(last - len(rows)))
+            for offset, line in enumerate(payload["values"]):
+                rows[start - 1 + offset] = _trim(_write_cells(rows[start - 1 + offset], payload["col"], line))
+            resolved.append(dict(op, payload=dict(payload, row=start)))
+        elif kind == OP_DELETE:
+            start = payload["start"]
+            if payload.get("rows") is not None:
+                start = _locate(rows, payload["rows"], payload["start"])
+                if start is None:
+                    # Строк уже нет в таблице
+                    continue
+            end = start + payload["end"] - payload["start"]
+            del rows[start - 1:end]
+            resolved.append(dict(op, payload=dict(payload, start=start, end=end)))
+        else:
+            resolved.append(op)
+    return rows, resolved, conflicts
+
+
+class SQLiteSheetStore:
+    """
+    Локальная копия листов таблицы в SQLite - основное хранилище данных бота.
+
+    Каждый лист хранится построчно: номер строки -> значения ячеек (JSON).
+    Пустые строки не хранятся, поэтому номера строк совпадают с таблицей.
+    Первые два столбца (ID записей во всех листах бота) проиндексированы.
+    Каждое изменение применяется к строкам и в той же транзакции
+    записывается в очередь репликации (outbox), откуда его отправляет в
+    таблицу SheetsReplicator. Изменения и удаления строк записываются вместе
+    с прежним содержимым строк: номерам строк таблицы доверять нельзя, их
+    сдвигают правки вручную. Номер версии листа растет с каждым локальным
+    изменением: по нему сверка с таблицей понимает, что за время чтения
+    таблицы лист изменили локально, и не затирает эти изменения.
+    """
+
+    def __init__(self, path: str):
+        """
+        Инициализация хранилища
+
+        Args:
+            path (str): Путь к файлу базы SQLite
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Изменение считается принятым после записи на диск, как и строка журнала ответов
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+
+        self._reads = 0
+        self._writes = 0
+        self._pulls = 0
+
+        pulled = self._db.execute("SELECT COUNT(*) FROM sheets WHERE pulled_at IS NOT NULL").fetchone()[0]
+        logger.init("SQLiteSheetStore", "Локальное хранилище открыто",
+                    details={"файл": path, "листов": pulled, "в очереди": self.pending_count()})
+
+    def _transaction(self):
+        """Транзакция с блокировкой записи (вызывать под self._lock)"""
+        return _Transaction(self._db)
+
+    def _bump(self, title: str):
+        """Увеличивает версию листа после локального изменения"""
+        self._db.execute(
+            "INSERT INTO sheets (title, version) VALUES (?, 1) "
+            "ON CONFLICT(title) DO UPDATE SET version = version + 1", (title,)
+        )
+
+    def _enqueue(self, title: str, op: str, payload: Dict[str, Any]):
+        """Записывает изменение в очередь репликации"""
+        self._db.execute(
+            "INSERT INTO outbox (title, op, payload, created) VALUES (?, ?, ?, ?)",
+            (title, op, json.dumps(payload, ensure_ascii=False), time.time())
+        )
+        self._bump(title)
+        self._writes += 1
+
+    def _rows(self, title: str, first: int = 1, last: Optional[int] = None) -> Dict[int, List[str]]:
+        """Хранимые строки листа в диапазоне номеров: {номер строки: значения}"""
+        if last is None:
+            cursor = self._db.execute(
+                "SELECT row_number, data FROM rows WHERE title = ? AND row_number >= ? ORDER BY row_number",
+                (title, first)
+            )
+        else:
+            cursor = self._db.execute(
+                "SELECT row_number, data FROM rows WHERE title = ? AND row_number BETWEEN ? AND ? "
+                "ORDER BY row_number", (title, first, last)
+            )
+        return {row_number: json.loads(data) for row_number, data in cursor}
+
+    def _put_row(self, title: str, row_number: int, values: List[str]):
+        """Сохраняет строку (пустая строка удаляется)"""
+        values = _trim(values)
+        if values:
+            self._db.execute(
+                "INSERT OR REPLACE INTO rows (title, row_number, data) VALUES (?, ?, ?)",
+                (title, row_number, json.dumps(values, ensure_ascii=False))
+            )
+        else:
+            self._db.execute("DELETE FROM rows WHERE title = ? AND row_number = ?", (title, row_number))
+
+    def _last_row(self, title: str) -> int:
+        """Номер последней непустой строки листа (0 - лист пуст)"""
+        return self._db.execute("SELECT COALESCE(MAX(row_number), 0) FROM rows WHERE title = ?",
+                                (title,)).fetchone()[0]
+
+    # Чтение
+
+    def is_pulled(self, title: str) -> bool:
+        """Загружен ли лист из таблицы хотя бы раз"""
+        with self._lock:
+            row = self._db.execute("SELECT pulled_at FROM sheets WHERE title = ?", (title,)).fetchone()
+            return bool(row and row[0] is not None)
+
+    def get_all_values(self, title: str) -> List[List[str]]:
+        """Все значения листа в формате Worksheet.get_all_values"""
+        with self._lock:
+            self._reads += 1
+            rows = self._rows(title)
+        if not rows:
+            return []
+        grid = [[] for _ in range(max(rows))]
+        for row_number, values in rows.items():
+            grid[row_number - 1] = values
+        return fill_gaps(grid)
+
+    def row_values(self, title: str, row_number: int) -> List[str]:
+        """Значения строки (без пустых ячеек в конце)"""
+        with self._lock:
+            self._reads += 1
+            return self._rows(title, row_number, row_number).get(row_number, [])
+
+    def find_rows(self, title: str, column: int, value: str) -> List[Tuple[int, List[str]]]:
+        """
+        Строки, в столбце column которых находится value
+
+        Для первых двух столбцов поиск идет по индексу, для остальных -
+        просмотром строк листа.
+        """
+        with self._lock:
+            self._reads += 1
+            if column in INDEXED_COLUMNS:
+                cursor = self._db.execute(
+                    f"SELECT row_number, data FROM rows WHERE title = ? AND json_extract(data, '$[{column - 1}]') = ? "
+                    "ORDER BY row_number", (title, value)
+                )
+                return [(row_number, json.loads(data)) for row_number, data in cursor]
+            rows = self._rows(title)
+        return [(row_number, values) for row_number, values in rows.items()
+                if len(values) >= column and values[column - 1] == value]
+
+    # Локальные изменения (с записью в очередь репликации)
+
+    def append_rows(self, title: str, rows: List[List[Any]]) -> int:
+        """
+        Добавляет строки после последней непустой строки листа
+
+        Returns:
+            int: Номер первой добавленной строки
+        """
+        rows = [[_cell(value) for value in row] for row in rows]
+        with self._lock, self._transaction():
+            first = self._last_row(title) + 1
+            for offset, row in enumerate(rows):
+                self._put_row(title, first + offset, row)
+            self._enqueue(title, OP_APPEND, {"rows": rows})
+        return first
+
+    def update(self, title: str, row: int, col: int, values: List[List[Any]], input_option: str = "RAW"):
+        """Записывает прямоугольник значений, начиная с ячейки (row, col)"""
+        values = [[_cell(value) for value in line] for line in values]
+        with self._lock, self._transaction():
+            current = self._rows(title, row, row + len(values) - 1)
+            before = [current.get(row + offset, []) for offset in range(len(values))]
+            for offset, line in enumerate(values):
+                self._put_row(title, row + offset, _write_cells(before[offset], col, line))
+            # Прежнее содержимое строк: по нему репликация найдет строки, если в таблице они сдвинулись
+            self._enqueue(title, OP_UPDATE, {"row": row, "col": col, "values": values, "input": input_option,
+                                             "before": before})
+
+    def clear(self, title: str, ranges: List[str]):
+        """Очищает диапазоны ячеек (A1: "B2:F2", "A2:Z")"""
+        with self._lock, self._transaction():
+            for range_name in ranges:
+                bounds = grid_range(range_name)
+                rows = self._rows(title, bounds.get("startRowIndex", 0) + 1, bounds.get("endRowIndex"))
+                for row_number, cells in rows.items():
+                    self._put_row(title, row_number, _clear_cells(cells, bounds))
+            self._enqueue(title, OP_CLEAR, {"ranges": list(ranges)})
+
+    def delete_rows(self, title: str, start: int, end: Optional[int] = None):
+        """Удаляет строки start..end и сдвигает следующие строки вверх"""
+        end = end or start
+        count = end - start + 1
+        with self._lock, self._transaction():
+            deleted = self._rows(title, start, end)
+            self._db.execute("DELETE FROM rows WHERE title = ? AND row_number BETWEEN ? AND ?", (title, start, end))
+            # Сдвиг в два шага через отрицательные номера, чтобы не нарушить первичный ключ
+            self._db.execute("UPDATE rows SET row_number = -(row_number - ?) WHERE title = ? AND row_number > ?",
+                             (count, title, end))
+            self._db.execute("UPDATE rows SET row_number = -row_number WHERE title = ? AND row_number < 0", (title,))
+            self._enqueue(title, OP_DELETE, {"start": start, "end": end,
+                                             "rows": [deleted.get(number, []) for number in range(start, end + 1)]})
+
+    # Загрузка из таблицы
+
+    def versions(self) -> Dict[str, int]:
+        """Версии листов (растут с каждым локальным изменением)"""
+        with self._lock:
+            return dict(self._db.execute("SELECT title, version FROM sheets"))
+
+    def _store_values(self, title: str, rows: Dict[int, List[str]]) -> bool:
+        """Записывает строки листа, прочитанные из таблицы (вызывать в транзакции)"""
+        changed = self._rows(title) != rows
+        if changed:
+            self._db.execute("DELETE FROM rows WHERE title = ?", (title,))
+            self._db.executemany(
+                "INSERT INTO rows (title, row_number, data) VALUES (?, ?, ?)",
+                [(title, row_number, json.dumps(row, ensure_ascii=False)) for row_number, row in rows.items()]
+            )
+        self._db.execute(
+            "INSERT INTO sheets (title, version, pulled_at) VALUES (?, 0, ?) "
+            "ON CONFLICT(title) DO UPDATE SET pulled_at = excluded.pulled_at", (title, time.time())
+        )
+        self._pulls += 1
+        return changed
+
+    @staticmethod
+    def _numbered(values: List[List[Any]]) -> Dict[int, List[str]]:
+        """Непустые строки значений листа: {номер строки: значения}"""
+        rows = {row_number: _trim([_cell(value) for value in row])
+                for row_number, row in enumerate(values, start=1)}
+        return {row_number: row for row_number, row in rows.items() if row}
+
+    def replace(self, title: str, values: List[List[str]], expected_version: Optional[int] = None) -> bool:
+        """
+        Заменяет локальную копию листа значениями из таблицы
+
+        Лист не заменяется, если в очереди есть его неотправленные изменения
+        или (при expected_version) его изменили локально после начала чтения
+        таблицы: такие изменения важнее прочитанных данных (см. rebase).
+
+        Returns:
+            bool: True, если локальная копия изменилась
+        """
+        rows = self._numbered(values)
+        with self._lock, self._transaction():
+            state = self._db.execute("SELECT version FROM sheets WHERE title = ?", (title,)).fetchone()
+            version = state[0] if state else 0
+            if expected_version is not None and version != expected_version:
+                return False
+            if self._db.execute("SELECT 1 FROM outbox WHERE title = ? LIMIT 1", (title,)).fetchone():
+                return False
+            changed = self._store_values(title, rows)
+        if changed:
+            logger.cache_update("local_store", key=title, count=len(rows), details={"source": "sheets"})
+        return changed
+
+    def rebase(self, title: str, values: List[List[str]]) -> bool:
+        """
+        Заменяет локальную копию листа значениями из таблицы и применяет поверх них
+        неотправленные изменения листа (replay_ops)
+
+        Вызывать, пока репликация не отправляет очередь (SheetsReplicator.flush_lock):
+        иначе отправленное во время чтения изменение применится к копии дважды.
+
+        Returns:
+            bool: True, если локальная копия изменилась
+        """
+        with self._lock, self._transaction():
+            cursor = self._db.execute("SELECT id, op, payload FROM outbox WHERE title = ? ORDER BY id", (title,))
+            ops = [{"id": op_id, "title": title, "op": op, "payload": json.loads(payload)}
+                   for op_id, op, payload in cursor]
+            rebased, _, conflicts = replay_ops(values, ops)
+            rows = self._numbered(rebased)
+            changed = self._store_values(title, rows)
+        if changed:
+            logger.cache_update("local_store", key=title, count=len(rows),
+                                details={"source": "sheets", "в очереди": len(ops), "конфликты": len(conflicts)})
+        return changed
+
+    # Очередь репликации
+
+    def pending_ops(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Первые изменения из очереди репликации, по порядку"""
+        with self._lock:
+            cursor = self._db.execute("SELECT id, title, op, payload FROM outbox ORDER BY id LIMIT ?", (limit,))
+            return [{"id": op_id, "title": title, "op": op, "payload": json.loads(payload)}
+                    for op_id, title, op, payload in cursor]
+
+    def ack(self, op_ids: List[int]):
+        """Удаляет из очереди изменения, отправленные в таблицу"""
+        if not op_ids:
+            return
+        with self._lock, self._transaction():
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", [(op_id,) for op_id in op_ids])
+
+    def pending_count(self, title: Optional[str] = None) -> int:
+        """Количество неотправленных изменений (листа title или всех)"""
+        with self._lock:
+            if title is None:
+                return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE title = ?", (title,)).fetchone()[0]
+
+    def oldest_pending_age(self) -> Optional[float]:
+        """Возраст самого старого неотправленного изменения, с"""
+        with self._lock:
+            created = self._db.execute("SELECT MIN(created) FROM outbox").fetchone()[0]
+        return round(time.time() - created, 1) if created else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние хранилища"""
+        with self._lock:
+            sheets = self._db.execute("SELECT COUNT(*) FROM sheets WHERE pulled_at IS NOT NULL").fetchone()[0]
+            rows = self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        return {
+            "sheets": sheets,
+            "rows": rows,
+            "pending": self.pending_count(),
+            "oldest_pending_age": self.oldest_pending_age(),
+            "reads": self._reads,
+            "writes": self._writes,
+            "pulls": self._pulls,
+        }
+
+    def close(self):
+        """Закрывает базу"""
+        with self._lock:
+            self._db.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK для соединения в режиме autocommit"""
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+
+    def __enter__(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,244 @@
+"""
+Модуль с листами таблицы, которые читаются и изменяются через локальное хранилище
+"""
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from gspread.cell import Cell
+from gspread.utils import rowcol_to_a1
+
+from utils.local_store import SQLiteSheetStore, grid_range
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class LocalWorksheet:
+    """
+    Лист таблицы, данные которого берутся из локального хранилища.
+
+    Повторяет методы gspread.Worksheet, которыми пользуется бот: чтение
+    значений, поиск ячеек, добавление, изменение, очистка и удаление строк.
+    Изменения применяются к SQLite сразу и попадают в таблицу через очередь
+    репликации. Остальные атрибуты (id, row_count, форматирование)
+    берутся у исходного листа gspread.
+    """
+
+    def __init__(self, worksheet, worksheets: "LocalWorksheets"):
+        self._worksheet = worksheet
+        self._worksheets = worksheets
+        self._store: SQLiteSheetStore = worksheets.store
+
+    def __getattr__(self, name: str):
+        """Остальные атрибуты - у исходного листа gspread"""
+        return getattr(self._worksheet, name)
+
+    @property
+    def title(self) -> str:
+        """Название листа"""
+        return self._worksheet.title
+
+    def _ready(self) -> str:
+        """Загружает лист из таблицы при первом обращении и возвращает его название"""
+        self._worksheets.ensure_pulled(self.title)
+        return self.title
+
+    # Чтение
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        """Все значения листа"""
+        return self._store.get_all_values(self._ready())
+
+    def row_values(self, row: int, **kwargs) -> List[str]:
+        """Значения строки (без пустых ячеек в конце)"""
+        return self._store.row_values(self._ready(), row)
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        """Значения столбца (без пустых ячеек в конце)"""
+        values = [row[col - 1] if len(row) >= col else "" for row in self.get_all_values()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def cell(self, row: int, col: int, **kwargs) -> Cell:
+        """Ячейка по номерам строки и столбца"""
+        values = self.row_values(row)
+        return Cell(row, col, values[col - 1] if len(values) >= col else "")
+
+    def findall(self, query: Union[str, re.Pattern], in_row: Optional[int] = None,
+                in_column: Optional[int] = None, case_sensitive: bool = True) -> List[Cell]:
+        """Все ячейки со значением query (или совпадающие с регулярным выражением)"""
+        title = self._ready()
+        if not isinstance(query, (str, re.Pattern)):
+            query = str(query)
+        if in_column and isinstance(query, str) and case_sensitive:
+            # Поиск по ID в столбце идет по индексу хранилища
+            return [Cell(row_number, in_column, query)
+                    for row_number, _ in self._store.find_rows(title, in_column, query)
+                    if in_row is None or row_number == in_row]
+
+        if isinstance(query, str):
+            expected = query if case_sensitive else query.lower()
+            matches = lambda value: (value if case_sensitive else value.lower()) == expected
+        else:
+            matches = lambda value: query.search(value) is not None
+
+        cells = []
+        for row_number, row in enumerate(self._store.get_all_values(title), start=1):
+            if in_row is not None and row_number != in_row:
+                continue
+            for col_number, value in enumerate(row, start=1):
+                if in_column is not None and col_number != in_column:
+                    continue
+                if matches(value):
+                    cells.append(Cell(row_number, col_number, value))
+        return cells
+
+    def find(self, query: Union[str, re.Pattern], in_row: Optional[int] = None,
+             in_column: Optional[int] = None, case_sensitive: bool = True) -> Optional[Cell]:
+        """Первая ячейка со значением query или None"""
+        cells = self.findall(query, in_row=in_row, in_column=in_column, case_sensitive=case_sensitive)
+        return cells[0] if cells else None
+
+    # Изменения
+
+    def append_rows(self, values: List[List[Any]], **kwargs) -> dict:
+        """Добавляет строки; ответ в формате values.append (updates.updatedRange)"""
+        title = self._ready()
+        first = self._store.append_rows(title, values)
+        width = max((len(row) for row in values), default=1) or 1
+        last = first + len(values) - 1
+        return {"updates": {"updatedRange": f"'{title}'!A{first}:{rowcol_to_a1(last, width)}",
+                            "updatedRows": len(values)}}
+
+    def append_row(self, values: List[Any], **kwargs) -> dict:
+        """Добавляет строку в конец листа"""
+        return self.append_rows([values])
+
+    def update(self, range_name: Union[str, List[List[Any]]] = None, values: Any = None, **kwargs) -> dict:
+        """Записывает значения, начиная с левой верхней ячейки range_name"""
+        if not isinstance(range_name, str):
+            # Как в gspread: update(values) записывает значения с A1
+            range_name, values = "A1", range_name
+        if not isinstance(values, list):
+            values = [[values]]
+        bounds = grid_range(range_name)
+        input_option = kwargs.get("value_input_option") or ("RAW" if kwargs.get("raw", True) else "USER_ENTERED")
+        self._store.update(self._ready(), bounds.get("startRowIndex", 0) + 1,
+                           bounds.get("startColumnIndex", 0) + 1, values, str(input_option))
+        return {"updatedRange": f"'{self.title}'!{range_name}"}
+
+    def update_cell(self, row: int, col: int, value: Any) -> dict:
+        """Записывает значение ячейки"""
+        # gspread записывает одиночную ячейку как введенную пользователем
+        self._store.update(self._ready(), row, col, [[value]], "USER_ENTERED")
+        return {"updatedRange": f"'{self.title}'!{rowcol_to_a1(row, col)}"}
+
+    def batch_update(self, data: Iterable[Dict[str, Any]], **kwargs) -> dict:
+        """Записывает несколько диапазонов ([{"range": ..., "values": ...}])"""
+        for item in data:
+            self.update(item["range"], item["values"], **kwargs)
+        return {}
+
+    def batch_clear(self, ranges: Iterable[str]) -> dict:
+        """Очищает диапазоны ячеек"""
+        self._store.clear(self._ready(), [range_name.rsplit("!", 1)[-1] for range_name in ranges])
+        return {}
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None) -> dict:
+        """Удаляет строки start_index..end_index"""
+        self._store.delete_rows(self._ready(), start_index, end_index)
+        return {}
+
+
+class LocalWorksheets:
+    """
+    Реестр листов, в котором листы данных бота обслуживает локальное хранилище.
+
+    Заменяет WorksheetRegistry для GoogleSheets: get() для листов из
+    mirrored_titles возвращает LocalWorksheet, остальные листы (статистика)
+    и операции со структурой таблицы идут в реестр напрямую. Лист
+    загружается из таблицы при первом обращении и дальше читается из SQLite.
+    """
+
+    def __init__(self, registry, store: SQLiteSheetStore, remote_loader, mirrored_titles: Iterable[str]):
+        """
+        Инициализация реестра
+
+        Args:
+            registry: Реестр листов таблицы (WorksheetRegistry)
+            store (SQLiteSheetStore): Локальное хранилище
+            remote_loader: Загрузчик значений листов из таблицы (SheetsReadLoader)
+            mirrored_titles: Названия листов, которые хранятся локально
+        """
+        self.registry = registry
+        self.store = store
+        self.remote_loader = remote_loader
+        self.mirrored_titles = set(mirrored_titles)
+        self._pull_lock = threading.Lock()
+        self._pulled = set()
+
+    def __getattr__(self, name: str):
+        """Остальные методы - у реестра листов"""
+        return getattr(self.registry, name)
+
+    def _wrap(self, worksheet):
+        """Лист данных бота - через хранилище, остальные - как есть"""
+        if worksheet.title in self.mirrored_titles:
+            return LocalWorksheet(worksheet, self)
+        return worksheet
+
+    def get(self, name: str):
+        """Лист по логическому имени или названию"""
+        return self._wrap(self.registry.get(name))
+
+    def add(self, title: str, rows: int, cols: int):
+        """Создает лист"""
+        return self._wrap(self.registry.add(title, rows, cols))
+
+    def rename(self, name: str, new_title: str):
+        """Переименовывает лист"""
+        return self._wrap(self.registry.rename(name, new_title))
+
+    def ensure_pulled(self, title: str):
+        """Загружает лист из таблицы, если его еще нет в хранилище"""
+        if title in self._pulled:
+            return
+        with self._pull_lock:
+            if not self.store.is_pulled(title):
+                values = self.remote_loader.load(title)
+                self.store.replace(title, values)
+                logger.data_load("локальное хранилище", f"Google Sheets/{title}", count=len(values))
+            self._pulled.add(title)
+
+
+class LocalReadLoader:
+    """
+    Чтение целых листов: листы данных - из локального хранилища, остальные - из таблицы.
+
+    Заменяет SheetsReadLoader для GoogleSheets при локальном хранилище.
+    """
+
+    def __init__(self, worksheets: LocalWorksheets):
+        self._worksheets = worksheets
+        self.remote = worksheets.remote_loader
+
+    def get_all_values(self, worksheet) -> List[List[str]]:
+        """Аналог worksheet.get_all_values()"""
+        if isinstance(worksheet, LocalWorksheet):
+            return worksheet.get_all_values()
+        return self.remote.get_all_values(worksheet)
+
+    def load(self, title: str) -> List[List[str]]:
+        """Все значения листа по названию"""
+        if title in self._worksheets.mirrored_titles:
+            self._worksheets.ensure_pulled(title)
+            return self._worksheets.store.get_all_values(title)
+        return self.remote.load(title)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики чтений из таблицы"""
+        return self.remote.stats()
@@ -2,18 +2,26 @@
 Модуль с классом-синглтоном для кэша вопросов
 """
 
-import time
+import threading
 from typing import Dict, List, Any, Optional, Callable
 
 from utils.logger import get_logger
+from utils.sheets_cache import sheets_cache
+from utils.sheets_retry import sheets_retry
+from utils.single_flight import MISS
+from utils.swr_cache import SWRCache, ttl_from_env
 
 # Получаем логгер для модуля
 logger = get_logger()
 
+# Ключ единственной записи кэша
+QUESTIONS_KEY = "questions"
+
 class QuestionsCache:
     """Синглтон-класс для хранения и управления кэшем вопросов"""
     
     _instance = None
+    _lock = threading.RLock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -25,54 +33,67 @@ class QuestionsCache:
         if self._initialized:
             return
             
-        # Инициализация кэша и настроек
-        self._questions_cache: Optional[Dict[str, List[Any]]] = None
-        self._questions_cache_time: float = 0
-        self._questions_cache_ttl: int = 30  # время жизни кэша в секундах
+        # Вопросы после мягкого TTL отдаются сразу и обновляются в фоне
+        soft_ttl, hard_ttl = ttl_from_env("questions", 30, 600)
+        # Пока Sheets API недоступен, отдаются последние загруженные вопросы независимо от возраста
+        self._cache = SWRCache("questions", soft_ttl, hard_ttl,
+                               scheduler=sheets_cache.schedule_background, copy_values=True,
+                               serve_expired=lambda: sheets_retry.is_degraded)
+        
         self._initialized = True
         logger.init("QuestionsCache", "Инициализирован синглтон")
     
-    def get_questions(self, fetch_function: Callable[[], Dict[str, List[Any]]]) -> Dict[str, List[Any]]:
+    def peek_questions(self) -> Any:
+        """Возвращает копию вопросов из кэша или MISS (устаревшие - с обновлением в фоне)"""
+        return self._cache.peek(QUESTIONS_KEY)
+    
+    def get_questions(self, fetch_function: Callable[[], Dict[str, List[Any]]],
+                      fallback: Callable[[], Dict[str, List[Any]]] = None) -> Dict[str, List[Any]]:
         """
         Получает вопросы из кэша или через функцию fetch_function если кэш устарел
         
+        Одновременные промахи выполняют одну загрузку и получают ее результат.
+        После мягкого TTL вопросы отдаются из кэша, а загрузка выполняется в фоне.
+        
         Args:
             fetch_function: Функция для получения вопросов из источника данных
+            fallback: Значение, если загрузка не удалась и отдать из кэша нечего
             
         Returns:
             Dict[str, List[Any]]: Словарь с вопросами и вариантами ответов
         """
-        current_time = time.time()
-        
-        # Проверка наличия актуального кэша
-        if (self._questions_cache is not None and 
-            current_time - self._questions_cache_time < self._questions_cache_ttl):
-            # Сообщаем о кэше только при debug-уровне логирования
-            questions_count = len(self._questions_cache) if self._questions_cache else 0
-            logger.cache_hit("questions", details={"count": questions_count})
-            return self._questions_cache.copy()
-        
-        # Запрашиваем новые данные
-        logger.cache_miss("questions")
-        questions = fetch_function()
-        
-        # Обновляем кэш
-        self._questions_cache = questions
-        self._questions_cache_time = current_time
-        questions_count = len(questions) if questions else 0
-        logger.cache_update("questions", count=questions_count)
-        
-        return questions.copy()
+        return self._cache.get(QUESTIONS_KEY, fetch_function, fallback)
+    
+    def get_cached_questions(self) -> Optional[Dict[str, List[Any]]]:
+        """Возвращает последние загруженные вопросы без обращения к источнику (даже если TTL истек)"""
+        cached = self._cache.peek_any(QUESTIONS_KEY)
+        return None if cached is MISS else cached
     
     def invalidate_cache(self):
         """Сбрасывает кэш вопросов, чтобы при следующем вызове данные были загружены заново"""
-        self._questions_cache = None
-        self._questions_cache_time = 0
+        self._cache.invalidate()
         logger.cache_update("questions", details={"action": "reset"})
     
     def update_cache(self, questions: Dict[str, List[Any]]):
         """Принудительное обновление кэша новыми данными"""
-        self._questions_cache = questions
-        self._questions_cache_time = time.time()
-        questions_count = len(questions) if questions else 0
-        logger.cache_update("questions", count=questions_count, details={"forced": True}) 
\ No newline at end of file
+        self._cache.set(QUESTIONS_KEY, questions)
+    
+    def reload(self, fetch_function: Callable[[], Dict[str, List[Any]]]) -> bool:
+        """Загружает вопросы заново, даже если кэш свежий (при ошибке кэш не меняется)"""
+        return self._cache.reload(QUESTIONS_KEY, fetch_function)
+    
+    def apply_change(self, mutate: Callable[[Dict[str, List[Any]]], Dict[str, List[Any]]]) -> bool:
+        """
+        Применяет к кэшу изменение, уже записанное в таблицу (без повторной загрузки)
+        
+        Args:
+            mutate: Получает текущие вопросы и возвращает новый словарь
+            
+        Returns:
+            bool: True, если кэш обновлен; False, если вопросы не загружены или изменение не применимо
+        """
+        return self._cache.update(QUESTIONS_KEY, mutate)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Возвращает попадания, промахи, фоновые обновления и возраст отданных вопросов"""
+        return self._cache.stats()
@@ -0,0 +1,207 @@
+"""
+Модуль с ограничителем частоты запросов к Google Sheets API (token bucket)
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Классы приоритета: чем меньше значение, тем раньше запрос получит токен
+PRIORITY_INTERACTIVE = 0  # Действия пользователя: сохранение ответов, проверка регистрации
+PRIORITY_NORMAL = 1       # Обычные запросы админ-команд
+PRIORITY_BACKGROUND = 2   # Фоновые задачи: пересчет статистики и т.п.
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_NORMAL: "normal",
+    PRIORITY_BACKGROUND: "background",
+}
+
+OPERATION_READ = "read"
+OPERATION_WRITE = "write"
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket с приоритетной очередью ожидающих.
+
+    Токены пополняются непрерывно со скоростью rate в секунду до capacity.
+    Если токенов нет или впереди есть ожидающие, запрос ставится в кучу
+    (priority, порядковый номер). Выдачей токенов ожидающим занимается одна
+    задача-диспетчер на бакет, поэтому параллельных обработчиков очереди нет.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        """
+        Инициализация бакета
+
+        Args:
+            name (str): Имя бакета для логов и метрик
+            rate (float): Скорость пополнения, токенов в секунду
+            capacity (float): Максимальный запас токенов (размер всплеска)
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters: List[tuple] = []  # Куча (priority, seq, future, tokens, enqueued_at)
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Метрики
+        self._acquired = 0
+        self._delayed = 0
+        self._wait_total: Dict[int, float] = {}
+        self._wait_count: Dict[int, int] = {}
+        self._wait_max: Dict[int, float] = {}
+
+    def _refill(self):
+        """Начисляет токены за прошедшее время"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _record_wait(self, priority: int, waited: float):
+        """Обновляет метрики времени ожидания в очереди"""
+        self._acquired += 1
+        if waited > 0:
+            self._delayed += 1
+        self._wait_total[priority] = self._wait_total.get(priority, 0.0) + waited
+        self._wait_count[priority] = self._wait_count.get(priority, 0) + 1
+        self._wait_max[priority] = max(self._wait_max.get(priority, 0.0), waited)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL, tokens: float = 1) -> float:
+        """
+        Ожидает и забирает токены
+
+        Args:
+            priority (int): Класс приоритета (PRIORITY_*)
+            tokens (float): Количество токенов (стоимость запроса)
+
+        Returns:
+            float: Время ожидания в очереди в секундах
+        """
+        tokens = min(tokens, self.capacity)
+        self._refill()
+
+        # Свободный токен и пустая очередь - проходим сразу
+        if not self._waiters and self._tokens >= tokens:
+            self._tokens -= tokens
+            self._record_wait(priority, 0.0)
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        enqueued_at = time.monotonic()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, tokens, enqueued_at))
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+
+        await future
+        waited = time.monotonic() - enqueued_at
+        self._record_wait(priority, waited)
+        return waited
+
+    async def _dispatch(self):
+        """Выдает токены ожидающим в порядке приоритета"""
+        while self._waiters:
+            priority, _, future, tokens, _ = self._waiters[0]
+            if future.done():
+                # Ожидающий отменен - просто убираем его
+                heapq.heappop(self._waiters)
+                continue
+
+            self._refill()
+            if self._tokens >= tokens:
+                heapq.heappop(self._waiters)
+                self._tokens -= tokens
+                future.set_result(None)
+                continue
+
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает метрики бакета"""
+        self._refill()
+        queued: Dict[str, int] = {}
+        for priority, _, future, _, _ in self._waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued[name] = queued.get(name, 0) + 1
+
+        wait = {}
+        for priority, count in self._wait_count.items():
+            wait[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "count": count,
+                "avg_wait": round(self._wait_total[priority] / count, 3),
+                "max_wait": round(self._wait_max[priority], 3),
+            }
+
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "capacity": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "acquired": self._acquired,
+            "delayed": self._delayed,
+            "queued": queued,
+            "wait": wait,
+        }
+
+
+class SheetsRateLimiter:
+    """Ограничитель запросов к Sheets API с отдельными бакетами на чтение и запись"""
+
+    def __init__(self, read_per_minute: int = 60, write_per_minute: int = 60, burst: int = 10):
+        """
+        Инициализация ограничителя
+
+        Args:
+            read_per_minute (int): Квота чтения в минуту (Read requests per minute per user)
+            write_per_minute (int): Квота записи в минуту (Write requests per minute per user)
+            burst (int): Сколько запросов каждого типа можно выполнить подряд без ожидания
+        """
+        self._buckets = {
+            OPERATION_READ: TokenBucket(OPERATION_READ, read_per_minute / 60.0, min(burst, read_per_minute)),
+            OPERATION_WRITE: TokenBucket(OPERATION_WRITE, write_per_minute / 60.0, min(burst, write_per_minute)),
+        }
+        logger.init("SheetsRateLimiter", "Ограничитель запросов к Sheets API создан",
+                    details={"чтение/мин": read_per_minute, "запись/мин": write_per_minute, "всплеск": burst})
+
+    async def acquire(self, operation: str = OPERATION_READ, priority: int = PRIORITY_NORMAL,
+                      tokens: float = 1) -> float:
+        """
+        Ожидает разрешения на запрос
+
+        Args:
+            operation (str): Тип запроса: OPERATION_READ или OPERATION_WRITE
+            priority (int): Класс приоритета (PRIORITY_*)
+            tokens (float): Стоимость запроса в токенах
+
+        Returns:
+            float: Время ожидания в очереди в секундах
+        """
+        bucket = self._buckets.get(operation)
+        if bucket is None:
+            raise ValueError(f"Неизвестный тип операции Sheets API: {operation}")
+
+        waited = await bucket.acquire(priority, tokens)
+        if waited >= 5:
+            logger.warning("Запрос к Sheets API ожидал квоту (rate_limit)",
+                           details={"операция": operation,
+                                    "приоритет": PRIORITY_NAMES.get(priority, priority),
+                                    "ожидание": f"{waited:.2f}с"})
+        return waited
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Возвращает метрики по бакетам чтения и записи"""
+        return {name: bucket.stats() for name, bucket in self._buckets.items()}
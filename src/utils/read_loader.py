@@ -0,0 +1,181 @@
+"""
+Модуль с объединением одновременных чтений листов в один запрос values.batchGet
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from gspread.utils import fill_gaps
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class _ReadBatch:
+    """Чтения, собранные за одно окно"""
+
+    def __init__(self):
+        self.ranges: Dict[str, Future] = {}  # {название листа: результат}
+        self.full = threading.Event()
+
+
+class SheetsReadLoader:
+    """
+    Объединяет чтения целых листов в один запрос values_batch_get (как DataLoader).
+
+    Первый вызов открывает пакет и ждет window_ms; все чтения, пришедшие за
+    это время из других потоков, добавляются в тот же пакет. Затем выполняется
+    один запрос batchGet, и каждый вызывающий получает значения своего листа.
+    Повторные чтения одного листа в пакете выполняются один раз. Пакет
+    отправляется после того, как в него вошел запрос, поэтому данные не
+    старше, чем при отдельном get_all_values.
+    """
+
+    def __init__(self, spreadsheet, window_ms: int = 5, max_batch: int = 20):
+        """
+        Инициализация загрузчика
+
+        Args:
+            spreadsheet: Таблица gspread
+            window_ms (int): Сколько миллисекунд собирать чтения в пакет
+            max_batch (int): Максимум листов в одном пакете
+        """
+        self._spreadsheet = spreadsheet
+        self.window = max(0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._open_batch: Optional[_ReadBatch] = None
+
+        # Метрики
+        self._requests = 0
+        self._deduplicated = 0
+        self._api_calls = 0
+        self._fallbacks = 0
+
+    @staticmethod
+    def _range(title: str) -> str:
+        """Диапазон A1 для всего листа"""
+        return "'{}'".format(title.replace("'", "''"))
+
+    @staticmethod
+    def _values(value_range: dict) -> List[List[str]]:
+        """Значения диапазона в формате Worksheet.get_all_values"""
+        return fill_gaps(value_range.get("values", []))
+
+    def get_all_values(self, worksheet) -> List[List[str]]:
+        """Аналог worksheet.get_all_values() с объединением одновременных чтений"""
+        return self.load(worksheet.title)
+
+    def load(self, title: str) -> List[List[str]]:
+        """
+        Читает все значения листа
+
+        Args:
+            title (str): Название листа
+
+        Returns:
+            List[List[str]]: Значения листа (копия, ее можно изменять)
+        """
+        with self._lock:
+            self._requests += 1
+            batch = self._open_batch
+            leader = batch is None
+            if leader:
+                batch = self._open_batch = _ReadBatch()
+
+            future = batch.ranges.get(title)
+            if future is None:
+                future = batch.ranges[title] = Future()
+            else:
+                self._deduplicated += 1
+
+            if len(batch.ranges) >= self.max_batch:
+                # Пакет заполнен - новые чтения пойдут в следующий
+                self._open_batch = None
+                batch.full.set()
+
+        if leader:
+            if self.window:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open_batch is batch:
+                    self._open_batch = None
+            self._execute(batch)
+
+        return [list(row) for row in future.result()]
+
+    def load_many(self, titles: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Читает несколько листов одним запросом, не дожидаясь окна объединения
+
+        Returns:
+            Dict[str, List[List[str]]]: {название листа: значения}; листы, которые не удалось прочитать, пропускаются
+
+        Raises:
+            Exception: Ошибка API, если не удалось прочитать ни один лист
+        """
+        batch = _ReadBatch()
+        for title in titles:
+            batch.ranges.setdefault(title, Future())
+        with self._lock:
+            self._requests += len(batch.ranges)
+        if not batch.ranges:
+            return {}
+        self._execute(batch)
+
+        values, errors = {}, []
+        for title, future in batch.ranges.items():
+            if future.exception() is None:
+                values[title] = future.result()
+            else:
+                errors.append(future.exception())
+        if errors and not values:
+            raise errors[0]
+        return values
+
+    def _execute(self, batch: _ReadBatch):
+        """Выполняет пакет одним запросом и раздает результаты"""
+        titles = list(batch.ranges)
+        started = time.time()
+        try:
+            self._api_calls += 1
+            response = self._spreadsheet.values_batch_get([self._range(title) for title in titles])
+            value_ranges = response.get("valueRanges", [])
+            for index, title in enumerate(titles):
+                value_range = value_ranges[index] if index < len(value_ranges) else {}
+                batch.ranges[title].set_result(self._values(value_range))
+        except Exception as e:
+            if len(titles) == 1:
+                batch.ranges[titles[0]].set_exception(e)
+                return
+            # Ошибка одного диапазона (например, лист переименован) не должна ломать чтение остальных
+            self._fallbacks += 1
+            logger.warning("Пакетное чтение листов не удалось, читаем по отдельности",
+                           details={"листы": titles, "ошибка": str(e)[:200]})
+            for title in titles:
+                try:
+                    self._api_calls += 1
+                    value_range = self._spreadsheet.values_get(self._range(title))
+                    batch.ranges[title].set_result(self._values(value_range))
+                except Exception as single_error:
+                    batch.ranges[title].set_exception(single_error)
+            return
+
+        if len(titles) > 1:
+            logger.data_load("листы", "Google Sheets (batchGet)", count=len(titles),
+                             details={"время": f"{time.time() - started:.2f}с"})
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает метрики объединения чтений"""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "api_calls": self._api_calls,
+                "deduplicated": self._deduplicated,
+                "fallbacks": self._fallbacks,
+                "window_ms": int(self.window * 1000),
+            }
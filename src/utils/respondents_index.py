@@ -0,0 +1,176 @@
+"""
+Модуль с индексом пользователей, прошедших опрос
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+class RespondentsIndex:
+    """
+    Синглтон-класс с множеством telegram ID пользователей, прошедших опрос.
+
+    Индекс загружается один раз при запуске и дальше обновляется вместе
+    с сохранением, удалением и очисткой ответов. Периодическая сверка
+    с листом ответов заменяет множество целиком; изменения, сделанные
+    во время сверки, применяются поверх загруженных данных.
+    """
+
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RespondentsIndex, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._respondents: Set[str] = set()
+        self._loaded = False
+        self._loaded_time = 0
+
+        # Изменения, сделанные во время сверки с таблицей
+        self._resync_started = False
+        self._added_during_resync: Set[str] = set()
+        self._removed_during_resync: Set[str] = set()
+
+        self._hits = 0
+        self._resyncs = 0
+        self._last_drift = 0
+
+        self._initialized = True
+        logger.init("RespondentsIndex", "Инициализирован индекс прошедших опрос")
+
+    @property
+    def is_loaded(self) -> bool:
+        """Загружен ли индекс из таблицы"""
+        return self._loaded
+
+    def contains(self, telegram_id: int) -> Optional[bool]:
+        """
+        Проверяет, проходил ли пользователь опрос
+
+        Returns:
+            Optional[bool]: Результат проверки или None, если индекс еще не загружен
+        """
+        with self._lock:
+            if not self._loaded:
+                return None
+            self._hits += 1
+            return str(telegram_id) in self._respondents
+
+    def add(self, telegram_id: int):
+        """Отмечает пользователя как прошедшего опрос"""
+        key = str(telegram_id)
+        with self._lock:
+            self._respondents.add(key)
+            if self._resync_started:
+                self._added_during_resync.add(key)
+                self._removed_during_resync.discard(key)
+
+    def remove(self, telegram_id: int):
+        """Убирает пользователя из индекса (ответы удалены)"""
+        key = str(telegram_id)
+        with self._lock:
+            self._respondents.discard(key)
+            if self._resync_started:
+                self._removed_during_resync.add(key)
+                self._added_during_resync.discard(key)
+
+    def clear(self):
+        """Очищает индекс (все ответы удалены), индекс остается загруженным"""
+        with self._lock:
+            if self._resync_started:
+                self._removed_during_resync.update(self._respondents)
+                self._added_during_resync.clear()
+            self._respondents = set()
+            self._loaded = True
+            self._loaded_time = time.time()
+        logger.cache_update("respondents", details={"action": "clear"})
+
+    def begin_resync(self):
+        """Начинает сверку: дальше изменения запоминаются до вызова load"""
+        with self._lock:
+            self._resync_started = True
+            self._added_during_resync = set()
+            self._removed_during_resync = set()
+
+    def load(self, telegram_ids: Iterable):
+        """
+        Заменяет содержимое индекса данными из таблицы
+
+        Если перед чтением таблицы был вызван begin_resync, изменения,
+        сделанные за время чтения, накладываются на загруженные данные.
+
+        Args:
+            telegram_ids (Iterable): Telegram ID из листа ответов
+        """
+        respondents = {str(telegram_id).strip() for telegram_id in telegram_ids if str(telegram_id).strip()}
+        with self._lock:
+            if self._resync_started:
+                respondents |= self._added_during_resync
+                respondents -= self._removed_during_resync
+                self._resync_started = False
+                self._added_during_resync = set()
+                self._removed_during_resync = set()
+
+            if self._loaded:
+                self._last_drift = len(respondents ^ self._respondents)
+                self._resyncs += 1
+                if self._last_drift:
+                    logger.warning("Индекс прошедших опрос расходился с таблицей",
+                                   details={"расхождений": self._last_drift})
+
+            self._respondents = respondents
+            self._loaded = True
+            self._loaded_time = time.time()
+        logger.cache_update("respondents", count=len(respondents))
+
+    def export(self) -> List[str]:
+        """Содержимое индекса для снимка на диске"""
+        with self._lock:
+            return sorted(self._respondents)
+
+    def restore(self, telegram_ids: Iterable):
+        """Восстанавливает индекс из снимка (до сверки с листом ответов)"""
+        with self._lock:
+            self._respondents = {str(telegram_id) for telegram_id in telegram_ids}
+            self._loaded = True
+            self._loaded_time = time.time()
+        logger.cache_update("respondents", count=len(self._respondents), details={"source": "snapshot"})
+
+    def cancel_resync(self):
+        """Отменяет сверку после ошибки чтения таблицы"""
+        with self._lock:
+            self._resync_started = False
+            self._added_during_resync = set()
+            self._removed_during_resync = set()
+
+    def count(self) -> int:
+        """Количество пользователей в индексе"""
+        with self._lock:
+            return len(self._respondents)
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает состояние индекса"""
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "size": len(self._respondents),
+                "hits": self._hits,
+                "resyncs": self._resyncs,
+                "last_drift": self._last_drift,
+                "age": round(time.time() - self._loaded_time, 1) if self._loaded else None,
+            }
+
+# Создаем глобальный экземпляр индекса
+respondents_index = RespondentsIndex()
@@ -0,0 +1,85 @@
+"""
+Модуль с индексом строк листа по ключу в первом столбце
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+from utils.users_index import UsersIndex
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class SheetRowIndex:
+    """
+    Индекс небольшого листа: ключ из первого столбца -> (номер строки, значения строки).
+
+    Строится из значений, которые бот и так читает для кэша (посты,
+    сообщения), и дальше обновляется вместе с записями бота, поэтому
+    изменение или удаление строки не требует повторного чтения листа.
+    Правки, сделанные в таблице вручную, попадают в индекс при следующей
+    загрузке листа в кэш.
+    """
+
+    def __init__(self, name: str):
+        """
+        Инициализация индекса
+
+        Args:
+            name (str): Название индекса для журнала
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Tuple[int, List[str]]] = {}
+        self._loaded = False
+
+    @property
+    def is_loaded(self) -> bool:
+        """Загружен ли индекс из листа"""
+        return self._loaded
+
+    def load(self, values: List[List[str]]):
+        """
+        Строит индекс по значениям листа
+
+        Args:
+            values (List[List[str]]): Все значения листа, включая строку заголовков
+        """
+        rows = {}
+        for row_number, row in enumerate(values[1:], start=2):
+            if row and row[0] and row[0] not in rows:
+                rows[row[0]] = (row_number, list(row))
+        with self._lock:
+            self._rows = rows
+            self._loaded = True
+        logger.cache_update(f"{self.name}_rows", count=len(rows))
+
+    def get(self, key: str) -> Optional[Tuple[int, List[str]]]:
+        """Номер строки и копия ее значений или None"""
+        with self._lock:
+            found = self._rows.get(str(key))
+            return (found[0], list(found[1])) if found else None
+
+    def set(self, key: str, row_number: Optional[int], row: List[str]):
+        """Запоминает записанную строку (без номера строки ключ удаляется из индекса)"""
+        with self._lock:
+            if row_number:
+                self._rows[str(key)] = (row_number, list(row))
+            else:
+                self._rows.pop(str(key), None)
+
+    def append(self, key: str, append_response: dict, row: List[str]):
+        """Запоминает строку, добавленную в конец листа (номер строки - из ответа values.append)"""
+        self.set(key, UsersIndex.parse_updated_row(append_response), row)
+
+    def remove(self, key: str):
+        """Удаляет строку из индекса; строки ниже сдвигаются вверх, как в листе"""
+        with self._lock:
+            found = self._rows.pop(str(key), None)
+            if found is None:
+                return
+            deleted = found[0]
+            self._rows = {item: (number - 1 if number > deleted else number, row)
+                          for item, (number, row) in self._rows.items()}
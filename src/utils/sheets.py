@@ -8,11 +8,32 @@ from google.oauth2.service_account import Credentials
 import os
 import time
 import asyncio
+from collections import Counter
+from typing import Optional
 
 # Избегаем циклического импорта, перенесем константы из config непосредственно сюда
 # Для гибкости сохраним возможность переопределения этих значений при инициализации
 from utils.questions_cache import QuestionsCache
 from utils.sheets_cache import sheets_cache
+from utils.sheets_executor import SheetsCallTimeout
+from utils.answers_buffer import AnswersWriteBuffer
+from utils.write_queue import DeferredWriteQueue
+from utils.respondents_index import respondents_index
+from utils.users_index import users_index
+from utils.row_index import SheetRowIndex
+from utils.stats_aggregator import stats_aggregator
+from utils.stats_renderer import stats_renderer
+from utils.worksheet_registry import worksheet_registry
+from utils.read_loader import SheetsReadLoader
+from utils.local_store import SQLiteSheetStore
+from utils.local_worksheets import LocalWorksheets, LocalReadLoader
+from utils.sheets_replicator import SheetsReplicator
+from utils.survey_store import survey_store
+from utils.sheets_bootstrap import SheetsBootstrap
+from utils.warm_snapshot import warm_snapshot
+from utils.sheets_transport import AsyncSheetsTransport, SpreadsheetBridge
+from utils.sheets_retry import sheets_retry
+from utils.rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, OPERATION_READ, OPERATION_WRITE
 from utils.logger import get_logger
 
 # Получаем логгер для модуля
@@ -42,6 +63,8 @@ class GoogleSheets:
             
         # Загружаем конфигурацию названий листов, если она не предоставлена
         self._load_sheet_config(sheet_names, sheet_headers, default_messages, message_types)
+        self.spreadsheet_id = spreadsheet_id
+        self.warm_started = False
         
         # Область видимости, необходимая для работы с Google Sheets
         scope = [
@@ -53,19 +76,211 @@ class GoogleSheets:
         # Создаем клиент для работы с Google Sheets
         try:
             creds = Credentials.from_service_account_file(google_credentials_file, scopes=scope)
-            self.sheet = gspread.authorize(creds).open_by_key(spreadsheet_id)
+            client = gspread.authorize(creds)
+            # Все запросы gspread выполняются по общей политике повторов и через выключатель
+            sheets_retry.watch_client(client)
+            self.sheet = client.open_by_key(spreadsheet_id)
             self.logger.init("GoogleSheets", "Подключение установлено")
             
+            # Запросы к значениям таблицы: через gspread или через асинхронный транспорт (SHEETS_TRANSPORT)
+            self.transport = self._create_transport(google_credentials_file, spreadsheet_id, scope)
+            self.api = SpreadsheetBridge(self.sheet, self.transport) if self.transport else self.sheet
+            
+            # Реестр листов: метаданные таблицы загружаются одним запросом и кэшируются;
+            # листы создаются поверх self.api, поэтому их запросы тоже идут через транспорт
+            self.worksheets = worksheet_registry
+            self.worksheets.bind(self.api, self.SHEET_NAMES)
+            
+            # Одновременные чтения листов объединяются в один values_batch_get
+            self.read_loader = SheetsReadLoader(
+                self.api,
+                window_ms=int(os.getenv("SHEETS_READ_COALESCE_MS", "5"))
+            )
+            
+            # Локальное хранилище (включается STORAGE_BACKEND=sqlite): листы данных читаются и изменяются
+            # в SQLite, изменения уходят в таблицу фоновой репликацией
+            data_dir = os.getenv("DATA_DIR", "/app/data")
+            self.local_store = None
+            self.replicator = None
+            if os.getenv("STORAGE_BACKEND", "sheets").strip().lower() == "sqlite":
+                self._enable_local_store(data_dir)
+            
             # Инициализируем кэш вопросов
             self.questions_cache = QuestionsCache()
             
-            # Инициализируем листы таблицы, если они не существуют
-            self.initialize_sheets()
+            # Строки постов и сообщений по ID: изменение и удаление без повторного чтения листа
+            self.posts_rows = SheetRowIndex("posts")
+            self.messages_rows = SheetRowIndex("messages")
+            
+            # Буфер отложенной записи ответов: строки копятся в журнале и уходят одним values_append
+            self.answers_buffer = AnswersWriteBuffer(
+                self._append_answer_rows,
+                os.path.join(data_dir, "answers_journal.jsonl"),
+                max_rows=int(os.getenv("ANSWERS_FLUSH_ROWS", "20")),
+                flush_interval_ms=int(os.getenv("ANSWERS_FLUSH_INTERVAL_MS", "2000")),
+                verify_function=lambda rows: self._find_written_rows(self.ANSWERS_SHEET, rows)
+            )
+            
+            # Очередь отложенных записей: новые пользователи и посты, пока таблица недоступна
+            self.write_queue = DeferredWriteQueue(
+                self._append_rows,
+                os.path.join(data_dir, "deferred_writes.jsonl"),
+                drain_interval=float(os.getenv("DEFERRED_WRITES_DRAIN_INTERVAL", "15")),
+                verify_function=self._find_written_rows
+            )
+            self.write_queue.register("users", self._on_deferred_user_written,
+                                      on_quarantined=lambda entry: users_index.release(entry["key"]),
+                                      prepare=self._assign_deferred_user_ids)
+            
+            # Теплый запуск: данные из снимка на диске, сверка с таблицей - в фоне после запуска
+            self.warm_started = self.restore_warm_snapshot()
+            if not self.warm_started:
+                # Инициализируем листы таблицы, если они не существуют
+                self.initialize_sheets()
+                
+                # Загружаем индексы пользователей и прошедших опрос, чтобы проверки не читали листы
+                self.load_users_index()
+                self.load_respondents_index()
             
         except Exception as e:
             self.logger.error("подключение_к_sheets", e)
             raise e
     
+    def _create_transport(self, credentials_file: str, spreadsheet_id: str, scope: list) -> Optional[AsyncSheetsTransport]:
+        """Создает асинхронный транспорт, если он выбран в настройках (SHEETS_TRANSPORT=httpx)"""
+        if os.getenv("SHEETS_TRANSPORT", "gspread").strip().lower() != "httpx":
+            return None
+        try:
+            return AsyncSheetsTransport(
+                credentials_file, spreadsheet_id, scope,
+                max_connections=int(os.getenv("SHEETS_HTTP_MAX_CONNECTIONS", "10")),
+                max_in_flight=int(os.getenv("SHEETS_HTTP_MAX_IN_FLIGHT", "10")),
+                timeout=float(os.getenv("SHEETS_CALL_TIMEOUT", "30")),
+                http2=os.getenv("SHEETS_HTTP2", "0") == "1"
+            )
+        except Exception as e:
+            # Без асинхронного транспорта бот работает через gspread
+            self.logger.error("создание_транспорта_sheets", e)
+            return None
+    
+    def _enable_local_store(self, data_dir: str):
+        """Подключает локальное хранилище листов и репликацию в таблицу"""
+        try:
+            store = SQLiteSheetStore(os.path.join(data_dir, "sheets_store.sqlite3"))
+        except Exception as e:
+            # Без локального хранилища бот работает напрямую с таблицей
+            self.logger.error("открытие_локального_хранилища", e)
+            return
+        mirrored = [title for name, title in self.SHEET_NAMES.items() if name != 'statistics']
+        self.local_store = store
+        self.worksheets = LocalWorksheets(worksheet_registry, store, self.read_loader, mirrored)
+        self.read_loader = LocalReadLoader(self.worksheets)
+        self.replicator = SheetsReplicator(
+            store, self.async_api_request, lambda title: worksheet_registry.get(title).id,
+            interval_ms=int(os.getenv("LOCAL_STORE_REPLICATION_INTERVAL_MS", "2000")),
+            on_conflict=lambda titles: self.async_pull_local_store(titles=titles)
+        )
+    
+    def pull_local_store(self, titles: list = None) -> list:
+        """
+        Загружает в локальное хранилище изменения, сделанные в таблице вручную
+        
+        Все листы данных читаются одним values_batch_get. Локальная копия
+        листа заменяется прочитанными значениями, поверх которых применяются
+        неотправленные локальные изменения (SQLiteSheetStore.rebase), поэтому
+        правки из таблицы загружаются и для листов с очередью изменений.
+        Вызывать под SheetsReplicator.flush_lock (см. async_pull_local_store).
+        Для измененных листов перечитываются индексы и кэши.
+        
+        Args:
+            titles (list): Названия листов (по умолчанию - все листы данных)
+        
+        Returns:
+            list: Названия листов, которые изменились в таблице
+        """
+        if self.local_store is None:
+            return []
+        started = time.time()
+        titles = [title for title in sorted(titles or self.worksheets.mirrored_titles)
+                  if title in self.worksheets.mirrored_titles and worksheet_registry.exists(title)]
+        changed = []
+        for title, values in self.worksheets.remote_loader.load_many(titles).items():
+            if self.local_store.rebase(title, values):
+                changed.append(title)
+        if changed:
+            self._reload_local_data(changed)
+        self.logger.data_processing("system", "Сверка локального хранилища с таблицей",
+                                    duration=time.time() - started,
+                                    details={"листов": len(titles), "изменены": changed})
+        return changed
+    
+    def _reload_local_data(self, titles: list):
+        """Перечитывает из локального хранилища индексы и кэши листов, измененных в таблице"""
+        if self.SHEET_NAMES['users'] in titles:
+            self.load_users_index()
+        if self.ANSWERS_SHEET in titles:
+            self.load_respondents_index()
+        if self.QUESTIONS_SHEET in titles and self.questions_cache.reload(self._fetch_questions_from_sheet):
+            # Новые вопросы получают опросы, начатые после сверки
+            survey_store.publish(self.get_questions_with_options())
+        if self.ADMINS_SHEET in titles:
+            sheets_cache.reload("admins", "admins", self._fetch_admins)
+        if self.SHEET_NAMES['posts'] in titles:
+            sheets_cache.reload("posts", "posts", self._fetch_all_posts)
+        if self.SHEET_NAMES['messages'] in titles:
+            for message_type in self.MESSAGE_TYPES:
+                sheets_cache.reload("messages", message_type, lambda mt=message_type: self._fetch_message(mt))
+    
+    async def async_pull_local_store(self, context=None, titles: list = None) -> list:
+        """Фоновая сверка локального хранилища с таблицей (для JobQueue и после конфликтов репликации)"""
+        if self.replicator is None:
+            return []
+        try:
+            # Пока идет сверка, очередь не отправляется: иначе отправленное во время
+            # чтения изменение применилось бы к локальной копии дважды
+            async with self.replicator.flush_lock:
+                return await sheets_cache.execute_with_rate_limit(self.pull_local_store, titles,
+                                                                  priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            if sheets_retry.is_unavailable_error(e):
+                self.logger.warning("Таблица недоступна, сверка локального хранилища отложена")
+            else:
+                self.logger.error("сверка_локального_хранилища", e)
+            return []
+    
+    async def start_transport(self):
+        """Открывает пул соединений асинхронного транспорта в цикле событий бота"""
+        if self.transport is None:
+            return
+        try:
+            await self.transport.start()
+        except Exception as e:
+            # Запросы продолжат выполняться через gspread
+            self.logger.error("запуск_транспорта_sheets", e)
+    
+    async def close_transport(self):
+        """Закрывает пул соединений асинхронного транспорта"""
+        if self.transport is not None:
+            await self.transport.close()
+    
+    async def async_api_request(self, method: str, *args, priority: int = PRIORITY_BACKGROUND,
+                                operation: str = OPERATION_READ, **kwargs):
+        """
+        Один запрос к API таблицы из асинхронного кода
+        
+        При запущенном транспорте запрос выполняется прямо в цикле событий
+        (без потока пула и синхронного ожидания), иначе - методом gspread в
+        пуле потоков. Повторы и квота - как у остальных запросов.
+        
+        Args:
+            method (str): Метод gspread.Spreadsheet (values_append, values_batch_update, batch_update...)
+        """
+        if self.transport is not None and self.transport.is_running and self.transport.is_loop_thread():
+            return await sheets_cache.execute_async(getattr(self.transport, method), *args, priority=priority,
+                                                    operation=operation, **kwargs)
+        return await sheets_cache.execute_with_rate_limit(getattr(self.api, method), *args, priority=priority,
+                                                          operation=operation, **kwargs)
+    
     def _load_sheet_config(self, sheet_names=None, sheet_headers=None, default_messages=None, message_types=None):
         """Загружает конфигурацию листов и другие настройки из переменных окружения"""
         # Импортируем здесь, чтобы избежать циклической зависимости
@@ -86,21 +301,98 @@ class GoogleSheets:
         self.STATS_SHEET = STATS_SHEET
         self.ADMINS_SHEET = ADMINS_SHEET
     
-    def initialize_sheets(self):
+    def _snapshot_fingerprint(self) -> dict:
+        """Таблица и листы, к которым относится снимок данных"""
+        return {"spreadsheet_id": self.spreadsheet_id, "sheets": self.SHEET_NAMES}
+    
+    def restore_warm_snapshot(self) -> bool:
+        """
+        Восстанавливает кэши и индексы из снимка на диске без обращений к API
+        
+        Returns:
+            bool: True, если бот запущен из снимка и требуется сверка с таблицей
+        """
+        data = warm_snapshot.load(self._snapshot_fingerprint())
+        if not data:
+            return False
+        try:
+            self.questions_cache.update_cache(data["questions"])
+            sheets_cache.restore_snapshot(data)
+            users_index.restore(data["users_index"])
+            # Ответы из журнала буфера могли не попасть в снимок
+            respondents_index.restore(data["respondents"] + self.answers_buffer.pending_user_ids())
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            self.logger.error("восстановление_снимка_данных", e)
+            self.questions_cache.invalidate_cache()
+            sheets_cache.invalidate_all_caches()
+            return False
+        self.logger.init("GoogleSheets", "Данные восстановлены из снимка, сверка с таблицей - в фоне")
+        return True
+    
+    def save_warm_snapshot(self) -> bool:
+        """Сохраняет текущие кэши и индексы в снимок на диске (без обращений к API)"""
+        questions = self.questions_cache.get_cached_questions()
+        if questions is None or not users_index.is_loaded or users_index.is_restored:
+            # Неполные или еще не сверенные данные не сохраняем: снимок остается прежним
+            return False
+        data = {
+            "questions": questions,
+            "users_index": users_index.export(),
+            "respondents": respondents_index.export(),
+        }
+        data.update(sheets_cache.export_snapshot())
+        return warm_snapshot.save(self._snapshot_fingerprint(), data)
+    
+    def reconcile_with_sheets(self) -> bool:
+        """
+        Сверяет данные, восстановленные из снимка, с таблицей
+        
+        Проверяет структуру листов, перечитывает индексы и кэши. При ошибке
+        чтения в кэше остаются данные снимка. После сверки сохраняет новый снимок.
+        
+        Returns:
+            bool: True, если все данные сверены
+        """
+        started = time.time()
+        try:
+            self.initialize_sheets()
+        except Exception as e:
+            self.logger.error("сверка_снимка_данных", e)
+        reconciled = self.load_users_index() and self.load_respondents_index()
+        reconciled = self.questions_cache.reload(self._fetch_questions_from_sheet) and reconciled
+        reconciled = sheets_cache.reload("admins", "admins", self._fetch_admins) and reconciled
+        reconciled = sheets_cache.reload("posts", "posts", self._fetch_all_posts) and reconciled
+        for message_type in self.MESSAGE_TYPES:
+            reconciled = sheets_cache.reload(
+                "messages", message_type, lambda mt=message_type: self._fetch_message(mt)
+            ) and reconciled
+        if reconciled:
+            self.warm_started = False
+            self.save_warm_snapshot()
+        self.logger.data_processing("system", "Сверка снимка данных с таблицей",
+                                    duration=time.time() - started,
+                                    details={"успешно": reconciled})
+        return reconciled
+    
+    async def async_reconcile_with_sheets(self, context=None) -> bool:
+        """Фоновая сверка снимка данных с таблицей (для JobQueue)"""
+        return await sheets_cache.execute_with_rate_limit(self.reconcile_with_sheets,
+                                                          priority=PRIORITY_BACKGROUND)
+    
+    async def async_save_warm_snapshot(self, context=None) -> bool:
+        """Периодическое сохранение снимка данных (для JobQueue)"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.save_warm_snapshot)
+    
+    def initialize_sheets(self) -> bool:
         """Инициализация всех необходимых листов"""
         try:
             self.logger.init("sheets", "Инициализация листов таблицы")
             
-            # Инициализируем лист пользователей
-            self.initialize_users_sheet()
-            
-            # Инициализируем лист сообщений
-            self.initialize_messages_sheet()
-            
-            # Инициализируем лист постов
-            self.initialize_posts_sheet()
-            
-            # Здесь можно добавить инициализацию других листов при необходимости
+            # Заголовки всех листов читаются одним запросом, исправления записываются одним batch_update
+            return SheetsBootstrap(
+                self.api, self.worksheets, self.SHEET_NAMES, self.SHEET_HEADERS,
+                self.DEFAULT_MESSAGES, self.MESSAGE_TYPES
+            ).run()
             
         except Exception as e:
             self.logger.error("инициализация_листов", e)
@@ -109,21 +401,134 @@ class GoogleSheets:
     def get_questions_with_options(self) -> dict:
         """Получение вопросов с вариантами ответов из таблицы с кэшированием"""
         # Используем синглтон-кэш для получения вопросов
-        return self.questions_cache.get_questions(self._fetch_questions_from_sheet)
+        # При ошибке загрузки и пустом кэше возвращается пустой словарь
+        return self.questions_cache.get_questions(self._fetch_questions_from_sheet, fallback=dict)
             
     # Метод для принудительного обновления кэша
     def invalidate_questions_cache(self):
         """Сбрасывает кэш вопросов, чтобы при следующем вызове данные были загружены заново"""
         self.questions_cache.invalidate_cache()
+    
+    def _cache_question_row(self, question_index: Optional[int], row: list, expected_question: str = None):
+        """
+        Применяет записанную в лист строку вопроса к кэшу без повторного чтения листа
+        
+        Строка разбирается так же, как при загрузке, поэтому кэш совпадает
+        с тем, что вернуло бы повторное чтение.
+        
+        Args:
+            question_index (Optional[int]): Индекс вопроса (None - вопрос добавлен в конец)
+            row (list): Записанные значения строки: вопрос и ячейки вариантов
+            expected_question (str): Текст вопроса по этому индексу до изменения (для проверки кэша)
+        """
+        parsed = self._parse_question_row(row)
         
+        def change(items: list) -> list:
+            if question_index is None:
+                return items + [parsed]
+            if question_index >= len(items) or (expected_question is not None and
+                                                items[question_index][0] != expected_question):
+                raise LookupError(f"Вопрос {question_index} в кэше не совпадает с таблицей")
+            items[question_index] = parsed
+            return items
+        
+        self.questions_cache.apply_change(lambda questions: dict(change(list(questions.items()))))
+    
+    def _uncache_question(self, question_index: int, question: str):
+        """Удаляет из кэша вопрос, удаленный из листа"""
+        def change(items: list) -> list:
+            if question_index >= len(items) or items[question_index][0] != question:
+                raise LookupError(f"Вопрос {question_index} в кэше не совпадает с таблицей")
+            del items[question_index]
+            return items
+        
+        self.questions_cache.apply_change(lambda questions: dict(change(list(questions.items()))))
+        
+    def _parse_question_row(self, row: list) -> tuple:
+        """
+        Разбирает строку листа вопросов
+        
+        Args:
+            row (list): Значения строки: вопрос и ячейки вариантов ответов
+            
+        Returns:
+            tuple: (текст вопроса, список вариантов ответов)
+        """
+        question = row[0]
+        # Получаем варианты ответов, пропуская пустые
+        options = []
+        for opt in row[1:]:
+            if not opt:  # Пропускаем пустые ячейки
+                continue
+            
+            # Проверяем, содержит ли опция вложенные варианты (формат: "Вариант::подвариант1;подвариант2")
+            if "::" in opt:
+                main_opt, sub_opts_str = opt.split("::", 1)
+                main_opt = main_opt.strip()  # Важно очистить пробелы до проверки
+                
+                # Проверяем, является ли это свободным ответом или подсказкой
+                if sub_opts_str.strip() == "":
+                    # Пустая строка после :: означает свободный ввод
+                    self.logger.data_processing("options", "Обработка варианта ответа", 
+                                              details={"тип": "свободный_ответ", "вариант": main_opt})
+                    options.append({"text": main_opt, "sub_options": []})
+                # Проверяем формат с префиксом prompt=
+                elif sub_opts_str.strip().startswith("prompt="):
+                    # Это специальный формат для сохранения подсказки для свободного ввода
+                    free_text_prompt = sub_opts_str.strip()[7:]  # Убираем префикс "prompt="
+                    self.logger.data_processing("options", "Обработка варианта ответа", 
+                                              details={"тип": "свободный_ответ_с_подсказкой", 
+                                                      "вариант": main_opt, 
+                                                      "подсказка": free_text_prompt})
+                    options.append({
+                        "text": main_opt,
+                        "sub_options": [], # Пустой список означает свободный ответ
+                        "free_text_prompt": free_text_prompt
+                    })
+                # Проверяем другие форматы подсказок
+                elif ";" not in sub_opts_str and ("вопрос" in sub_opts_str.lower() or "введите" in sub_opts_str.lower()):
+                    # Это подсказка для свободного ввода, а не список подвариантов
+                    self.logger.data_processing("options", "Обработка варианта ответа", 
+                                              details={"тип": "свободный_ответ_с_подсказкой", 
+                                                      "вариант": main_opt, 
+                                                      "подсказка": sub_opts_str.strip()})
+                    options.append({
+                        "text": main_opt,
+                        "sub_options": [], # Пустой список означает свободный ответ
+                        "free_text_prompt": sub_opts_str.strip()
+                    })
+                else:
+                    # Парсим подварианты
+                    sub_options_list = [sub_opt.strip() for sub_opt in sub_opts_str.split(";") if sub_opt.strip()]
+                    
+                    if len(sub_options_list) == 1 and ("вопрос для" in sub_options_list[0].lower() or "введите" in sub_options_list[0].lower()):
+                        # Это подсказка для свободного ввода, преобразуем в соответствующий формат
+                        self.logger.data_processing("options", "Обработка варианта ответа", 
+                                                  details={"тип": "свободный_ответ_с_подсказкой", 
+                                                          "вариант": main_opt, 
+                                                          "подсказка": sub_options_list[0]})
+                        options.append({
+                            "text": main_opt, 
+                            "sub_options": [], 
+                            "free_text_prompt": sub_options_list[0]
+                        })
+                    else:
+                        # Обычные подварианты
+                        options.append({"text": main_opt, "sub_options": sub_options_list})
+            else:
+                # Обычный вариант без подвариантов
+                options.append({"text": opt.strip()})
+        
+        return question, options
+    
     def _fetch_questions_from_sheet(self) -> dict:
         """Загружает вопросы с вариантами ответов из таблицы напрямую"""
         try:
             self.logger.data_load("вопросы", f"Google Sheets/{self.QUESTIONS_SHEET}")
-            questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+            questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
             
             # Получаем все данные из таблицы
-            data = questions_sheet.get_all_values()
+            data = self.read_loader.get_all_values(questions_sheet)
             
             # Пропускаем заголовок
             if data and len(data) > 0:
@@ -135,72 +540,8 @@ class GoogleSheets:
                 if not row or not row[0]:  # Пропускаем пустые строки
                     continue
                     
-                question = row[0]
-                # Получаем варианты ответов, пропуская пустые
-                options = []
-                for opt in row[1:]:
-                    if not opt:  # Пропускаем пустые ячейки
-                        continue
-                    
-                    # Проверяем, содержит ли опция вложенные варианты (формат: "Вариант::подвариант1;подвариант2")
-                    if "::" in opt:
-                        main_opt, sub_opts_str = opt.split("::", 1)
-                        main_opt = main_opt.strip()  # Важно очистить пробелы до проверки
-                        
-                        # Проверяем, является ли это свободным ответом или подсказкой
-                        if sub_opts_str.strip() == "":
-                            # Пустая строка после :: означает свободный ввод
-                            self.logger.data_processing("options", "Обработка варианта ответа", 
-                                                      details={"тип": "свободный_ответ", "вариант": main_opt})
-                            options.append({"text": main_opt, "sub_options": []})
-                        # Проверяем формат с префиксом prompt=
-                        elif sub_opts_str.strip().startswith("prompt="):
-                            # Это специальный формат для сохранения подсказки для свободного ввода
-                            free_text_prompt = sub_opts_str.strip()[7:]  # Убираем префикс "prompt="
-                            self.logger.data_processing("options", "Обработка варианта ответа", 
-                                                      details={"тип": "свободный_ответ_с_подсказкой", 
-                                                              "вариант": main_opt, 
-                                                              "подсказка": free_text_prompt})
-                            options.append({
-                                "text": main_opt,
-                                "sub_options": [], # Пустой список означает свободный ответ
-                                "free_text_prompt": free_text_prompt
-                            })
-                        # Проверяем другие форматы подсказок
-                        elif ";" not in sub_opts_str and ("вопрос" in sub_opts_str.lower() or "введите" in sub_opts_str.lower()):
-                            # Это подсказка для свободного ввода, а не список подвариантов
-                            self.logger.data_processing("options", "Обработка варианта ответа", 
-                                                      details={"тип": "свободный_ответ_с_подсказкой", 
-                                                              "вариант": main_opt, 
-                                                              "подсказка": sub_opts_str.strip()})
-                            options.append({
-                                "text": main_opt,
-                                "sub_options": [], # Пустой список означает свободный ответ
-                                "free_text_prompt": sub_opts_str.strip()
-                            })
-                        else:
-                            # Парсим подварианты
-                            sub_options_list = [sub_opt.strip() for sub_opt in sub_opts_str.split(";") if sub_opt.strip()]
-                            
-                            if len(sub_options_list) == 1 and ("вопрос для" in sub_options_list[0].lower() or "введите" in sub_options_list[0].lower()):
-                                # Это подсказка для свободного ввода, преобразуем в соответствующий формат
-                                self.logger.data_processing("options", "Обработка варианта ответа", 
-                                                          details={"тип": "свободный_ответ_с_подсказкой", 
-                                                                  "вариант": main_opt, 
-                                                                  "подсказка": sub_options_list[0]})
-                                options.append({
-                                    "text": main_opt, 
-                                    "sub_options": [], 
-                                    "free_text_prompt": sub_options_list[0]
-                                })
-                            else:
-                                # Обычные подварианты
-                                options.append({"text": main_opt, "sub_options": sub_options_list})
-                    else:
-                        # Обычный вариант без подвариантов
-                        options.append({"text": opt.strip()})
-                
-                questions_with_options[question] = options
+                parsed = self._parse_question_row(row)
+                questions_with_options[parsed[0]] = parsed[1]
             
             # Логируем структуру вариантов для проверки только при отладке
             options_structure = {}
@@ -227,151 +568,178 @@ class GoogleSheets:
             
         except Exception as e:
             self.logger.error("получение_вопросов", e, details={"sheet": self.QUESTIONS_SHEET})
-            # Возвращаем пустой словарь в случае ошибки
-            return {}
+            # Ошибку обрабатывает кэш: он оставит последние загруженные вопросы
+            raise
+    
+    def _build_answers_row(self, answers: list, user_id: int, question_count: int = None) -> list:
+        """
+        Проверяет ответы и формирует строку для листа ответов
+        
+        Args:
+            question_count (int): Число вопросов в схеме, по которой проходил опрос;
+                если передано, лист вопросов не нужен (сохранение работает и без таблицы)
+        
+        Returns:
+            list: Строка [время, telegram_id, ответы...] или None, если ответы не соответствуют вопросам
+        """
+        if question_count is None:
+            # Для проверки достаточно уже загруженных вопросов, лишний раз лист вопросов не читаем
+            questions_with_options = self.questions_cache.get_cached_questions()
+            if questions_with_options is None:
+                questions_with_options = self.get_questions_with_options()
+            question_count = len(questions_with_options)
+        
+        if len(answers) != question_count:
+            self.logger.error("несоответствие_данных", 
+                             f"Количество ответов не соответствует количеству вопросов", 
+                             details={"user_id": user_id, 
+                                     "answers_count": len(answers), 
+                                     "questions_count": question_count})
+            self.logger.data_processing("answer_data", "Данные ответов пользователя", 
+                                     details={"user_id": user_id, "answers": str(answers)[:300]})
+            return None
+        
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return [current_time, str(user_id)] + answers
     
-    def save_answers(self, answers: list, user_id: int) -> bool:
-        """Сохранение ответов пользователя в таблицу"""
+    def load_respondents_index(self) -> bool:
+        """Загружает (или сверяет) индекс прошедших опрос по столбцу ID листа ответов"""
+        respondents_index.begin_resync()
         try:
-            self.logger.user_action(user_id, "Сохранение ответов", f"Начало сохранения: {len(answers)} ответов")
-            start_time = datetime.now()
-            
-            # Получаем список вопросов
-            questions = list(self.get_questions_with_options().keys())
-            
-            # Проверяем, что количество ответов соответствует количеству вопросов
-            if len(answers) != len(questions):
-                self.logger.error("несоответствие_данных", 
-                                 f"Количество ответов не соответствует количеству вопросов", 
-                                 details={"user_id": user_id, 
-                                         "answers_count": len(answers), 
-                                         "questions_count": len(questions)})
-                self.logger.data_processing("answer_data", "Данные ответов пользователя", 
-                                         details={"user_id": user_id, "answers": str(answers)[:300]})
-                self.logger.data_processing("question_data", "Данные вопросов", 
-                                         details={"user_id": user_id, "questions": str(questions)[:300]})
-                return False
-            
-            # Получаем текущую дату и время
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Сохраняем ответы в таблицу ответов
-            answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
-            
-            # Подготавливаем данные для добавления
-            row_data = [current_time, str(user_id)] + answers
-            
-            self.logger.data_processing(user_id, "Отправка данных в таблицу")
-            # Добавляем ответы
-            answers_sheet.append_row(row_data)
-            
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            self.logger.data_processing(user_id, "Ответы успешно сохранены", 
-                                       details={"duration": f"{duration:.2f}"})
+            answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
+            # Ответы из буфера еще не попали в таблицу, но пользователь опрос уже прошел.
+            # Буфер читаем до столбца: строка, записанная во время чтения, окажется хотя бы
+            # в одном из списков (в худшем случае в обоих - это лишь лишний пересчет статистики)
+            pending_user_ids = self.answers_buffer.pending_user_ids()
+            pending_rows = len(self.answers_buffer.pending_rows())
+            # Один запрос на чтение столбца, независимо от частоты проверок
+            user_ids = answers_sheet.col_values(2)[1:]
+            respondents_index.load(user_ids + pending_user_ids)
+            # Заодно сверяем число анкет в статистике: расхождение вызовет полный пересчет
+            stats_aggregator.check_drift(len(user_ids) + pending_rows)
             return True
-            
         except Exception as e:
-            self.logger.error("сохранение_ответов", e, details={"user_id": user_id})
+            respondents_index.cancel_resync()
+            self.logger.error("загрузка_индекса_прошедших_опрос", e)
             return False
     
+    async def async_resync_respondents_index(self, context=None) -> bool:
+        """Фоновая сверка индекса прошедших опрос с таблицей (для JobQueue)"""
+        return await sheets_cache.execute_with_rate_limit(self.load_respondents_index,
+                                                          priority=PRIORITY_BACKGROUND)
+    
+    def _append_answer_rows(self, rows: list):
+        """Добавляет пачку строк в лист ответов одним запросом values_append"""
+        if self.local_store is not None:
+            # Строки сохраняются локально, в таблицу их отправит репликация
+            self.worksheets.get(self.ANSWERS_SHEET).append_rows(rows)
+            return
+        self.api.values_append(
+            f"'{self.ANSWERS_SHEET}'!A1",
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows}
+        )
+        self.logger.data_save("ответы", f"Google Sheets/{self.ANSWERS_SHEET}", count=len(rows))
+    
+    def _append_rows(self, sheet_title: str, rows: list) -> dict:
+        """Добавляет строки в конец листа одним запросом values_append (для очереди отложенных записей)"""
+        if self.local_store is not None:
+            return self.worksheets.get(sheet_title).append_rows(rows)
+        response = self.api.values_append(
+            f"'{sheet_title}'!A1",
+            params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows}
+        )
+        self.logger.data_save("отложенные записи", f"Google Sheets/{sheet_title}", count=len(rows))
+        return response
+    
+    def _find_written_rows(self, sheet_title: str, rows: list, key_columns: int = 2) -> list:
+        """
+        Проверяет, какие строки уже есть в листе (после записи с неизвестным исходом)
+        
+        Строки сравниваются по первым key_columns столбцам: для ответов это время
+        и telegram ID, для пользователей и постов - ID записи.
+        
+        Args:
+            sheet_title (str): Название листа
+            rows (list): Строки, исход записи которых неизвестен
+            key_columns (int): Сколько первых столбцов образуют ключ строки
+            
+        Returns:
+            list: Для каждой строки - True, если она уже записана
+        """
+        if self.local_store is not None:
+            values = self.worksheets.get(sheet_title).get_all_values()
+        else:
+            last_column = gspread.utils.rowcol_to_a1(1, key_columns).rstrip("1")
+            values = self.api.values_get(f"'{sheet_title}'!A:{last_column}").get("values", [])
+        present = Counter(tuple(str(value) for value in row[:key_columns]) for row in values)
+        found = []
+        for row in rows:
+            key = tuple(str(value) for value in row[:key_columns])
+            found.append(present[key] > 0)
+            if present[key] > 0:
+                # Одинаковые строки в пачке сопоставляются с разными строками листа
+                present[key] -= 1
+        return found
+    
+    def _should_defer_write(self) -> bool:
+        """Нужно ли ставить запись в очередь, не обращаясь к таблице"""
+        if self.local_store is not None:
+            # Записи и так идут в локальное хранилище, а в таблицу - через репликацию
+            return False
+        # Пока очередь не пуста, новые строки идут за ней, чтобы сохранить порядок
+        return sheets_retry.is_degraded or self.write_queue.has_pending()
+    
+    def _assign_deferred_user_ids(self, entries: list) -> bool:
+        """
+        Выдает ID пользователям, отложенным без ID (индекс не загружен или восстановлен из снимка)
+        
+        Перед выдачей индекс сверяется с листом пользователей, поэтому ID
+        продолжают нумерацию таблицы, а не устаревшего снимка.
+        
+        Returns:
+            bool: Выданы ли ID (строки изменены)
+        """
+        provisional = [entry for entry in entries if not entry["row"][0]]
+        if not provisional:
+            return False
+        if (users_index.is_restored or not users_index.is_loaded) and not self.load_users_index():
+            raise RuntimeError("Индекс пользователей не сверен с таблицей")
+        for entry in provisional:
+            entry["row"][0] = str(users_index.allocate_id())
+        self.logger.data_processing("отложенные записи", "Пользователям из очереди выданы ID",
+                                    details={"ID": [entry["row"][0] for entry in provisional]})
+        return True
+    
+    def _on_deferred_user_written(self, entry: dict, row_number: Optional[int]):
+        """Фиксирует в индексе строку пользователя, записанного из очереди"""
+        users_index.commit(entry["key"], row_number)
+    
+    def get_health(self) -> dict:
+        """Состояние подключения к таблице и локальных очередей (для администраторов)"""
+        retry_stats = sheets_retry.stats()
+        return {
+            "degraded": sheets_retry.is_degraded,
+            "retry": retry_stats,
+            "answers_buffer": self.answers_buffer.stats(),
+            "write_queue": self.write_queue.stats(),
+            "questions_cache": self.questions_cache.get_cache_stats(),
+            "replication": self.replicator.stats() if self.replicator else None,
+        }
+    
     def update_statistics_sheet(self) -> bool:
-        """Полное обновление листа статистики на основе всех ответов"""
+        """Полное обновление листа статистики в виде отчета по вопросам (подварианты строками "└")"""
         try:
             self.logger.data_processing("system", "Обновление листа статистики")
             
-            # Получаем вопросы с вариантами ответов
-            questions_with_options = self.get_questions_with_options()
-            
-            # Получаем данные из листа ответов
-            answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
-            answers_data = answers_sheet.get_all_values()
-            
-            if len(answers_data) <= 1:  # Только заголовок или пусто
-                self.logger.data_processing("system", "Нет данных для обновления статистики", 
-                                          details={"причина": "Таблица содержит только заголовки или пуста"})
-                stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-                stats_sheet.clear()
-                stats_sheet.append_row(["Статистика опроса"])
-                stats_sheet.append_row(["Всего пройдено опросов:", "0"])
-                return True
-            
-            # Инициализируем словарь для статистики
-            stats = {}
-            
-            # Получаем список вопросов
-            questions = list(questions_with_options.keys())
-            
-            # Инициализируем статистику для каждого вопроса с вариантами
-            for question, options in questions_with_options.items():
-                if options:  # Только для вопросов с вариантами ответов
-                    stats[question] = {}
-                    for option in options:
-                        # Добавляем основной вариант
-                        option_text = option["text"]
-                        stats[question][option_text] = 0
-                        
-                        # Добавляем вложенные варианты, если они есть
-                        if option.get("sub_options"):
-                            for sub_option in option["sub_options"]:
-                                combined_option = f"{option_text} - {sub_option}"
-                                stats[question][combined_option] = 0
-            
-            # Обрабатываем ответы (пропускаем заголовок)
-            for row in answers_data[1:]:
-                # Пропускаем дату и ID пользователя
-                for i, answer in enumerate(row[2:]):
-                    if i < len(questions):
-                        question = questions[i]
-                        # Учитываем только вопросы с вариантами ответов
-                        if question in stats:
-                            if answer in stats[question]:
-                                stats[question][answer] += 1
-            
-            # Обновляем лист статистики
-            stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-            
-            # Очищаем текущие данные
-            stats_sheet.clear()
-            
-            # Добавляем заголовок
-            stats_sheet.append_row(["Статистика опроса"])
-            
-            # Для каждого вопроса с вариантами добавляем строки с вариантами и процентами
-            for question, answers_count in stats.items():
-                # Добавляем строку с вопросом
-                stats_sheet.append_row([question])
-                
-                # Получаем общее количество ответов на этот вопрос
-                total_answers = sum(answers_count.values())
-                
-                # Сортируем ответы: сначала основные варианты, потом вложенные
-                main_options = {}
-                nested_options = {}
-                
-                for option, count in answers_count.items():
-                    if " - " in option:
-                        main_opt, sub_opt = option.split(" - ", 1)
-                        if main_opt not in nested_options:
-                            nested_options[main_opt] = []
-                        nested_options[main_opt].append((sub_opt, count))
-                    else:
-                        main_options[option] = count
-                
-                # Выводим статистику для каждого основного варианта и его вложенных вариантов
-                for option, count in main_options.items():
-                    percentage = (count / total_answers * 100) if total_answers > 0 else 0
-                    stats_sheet.append_row([option, f"{percentage:.1f}%", str(count)])
-                    
-                    # Если у этого варианта есть вложенные, выводим их с отступом
-                    if option in nested_options:
-                        for sub_opt, sub_count in nested_options[option]:
-                            sub_percentage = (sub_count / total_answers * 100) if total_answers > 0 else 0
-                            stats_sheet.append_row([f"  └ {sub_opt}", f"{sub_percentage:.1f}%", str(sub_count)])
+            if not self.ensure_statistics():
+                return False
             
-            # Добавляем общее количество опросов
-            total_surveys = len(answers_data) - 1  # -1 для заголовка
-            stats_sheet.append_row(["Всего пройдено опросов:", str(total_surveys)])
+            # Отчет собирается в памяти и записывается одним запросом
+            grid = stats_renderer.build_report_grid(stats_aggregator.get_statistics(),
+                                                    stats_aggregator.get_total_responses())
+            stats_renderer.write(self.worksheets.get(self.STATS_SHEET), grid)
             
             self.logger.data_processing("system", "Лист статистики успешно обновлен")
             return True
@@ -387,354 +755,71 @@ class GoogleSheets:
         Подсчитывает количество и процент для каждого варианта ответа по каждому вопросу.
         Учитывает только вопросы с предопределенными вариантами ответов.
         Свободные ответы исключаются из статистики.
+        Счетчики берутся из агрегатора статистики, лист ответов читается только при полном пересчете.
         """
         try:
             # Проверяем наличие листа статистики
-            stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
+            stats_sheet = self.worksheets.get(self.STATS_SHEET)
             
-            if not stats_sheet:
-                self.logger.warning("statistics_sheet_missing", "Лист статистики не найден", 
-                                  details={"причина": "Лист не существует", "действие": "Создание невозможно"})
-                return False
-                
-            # Получаем все ответы
             self.logger.data_processing("system", "Начало обновления статистики...")
             
-            # Получаем все ответы из листа ответов
-            answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
-            all_responses = answers_sheet.get_all_values()
-            
-            if len(all_responses) <= 1:  # Только заголовки или пусто
-                self.logger.warning("no_statistics_data", "Нет данных для обновления статистики", 
-                                  details={"причина": "Таблица содержит только заголовки или пуста"})
+            # Пересчитываем статистику полностью только при необходимости
+            if not self.ensure_statistics():
                 return False
-                
-            # Пропускаем заголовок
-            responses = all_responses[1:]
-            
-            # Получаем вопросы
-            questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
-            questions_data = questions_sheet.get_all_values()
-            
-            if len(questions_data) <= 1:  # Только заголовки или пусто
-                self.logger.warning("no_questions_for_statistics", "Нет вопросов для обработки статистики", 
-                                  details={"причина": "Таблица вопросов содержит только заголовки или пуста"})
-                return False
-                
-            # Пропускаем заголовок
-            questions = [row[0] for row in questions_data[1:] if row and len(row) > 0]
             
-            # Получаем структуру вопросов с вариантами для определения типа вопроса
-            questions_with_options = self.get_questions_with_options()
-            
-            # Словарь для подсчета статистики
-            stats = {}
-            
-            # Для отладки - записываем информацию о структуре ответов
-            self.logger.data_processing("statistics", "Анализ структуры ответов", 
-                                     details={"заголовки": all_responses[0][:5], 
-                                            "ответы_пример": str(responses[0][:5]) if responses else "нет ответов"})
-            
-            # Индексы вопросов в ответах
-            # Первый столбец в responses - это timestamp, второй - user_id, начиная с третьего идут ответы
-            for i, question in enumerate(questions):
-                question_idx = i + 2  # +2 потому что первые два столбца - timestamp и user_id
-                
-                # Проверка на корректность индекса
-                if question_idx >= len(all_responses[0]) and len(all_responses[0]) > 0:
-                    self.logger.warning("incorrect_question_index", "Некорректный индекс вопроса", 
-                                     details={"вопрос": question, "индекс": question_idx, 
-                                            "количество_столбцов": len(all_responses[0])})
-                    continue
-                
-                # Получаем варианты ответов для этого вопроса, чтобы определить тип
-                question_options = questions_with_options.get(question, [])
-                
-                # Улучшенная проверка: вопрос считается с предопределенными вариантами, 
-                # только если у него есть хотя бы один фиксированный вариант ответа
-                has_predefined_options = False
-                predefined_option_texts = []
-                
-                # Логируем информацию о вариантах ответов для отладки
-                self.logger.data_processing("statistics", f"Анализ вариантов вопроса: {question}", 
-                                         details={"варианты": str(question_options)[:300]})
-                
-                for opt in question_options:
-                    # Если это простой текстовый вариант
-                    if not isinstance(opt, dict):
-                        has_predefined_options = True
-                        predefined_option_texts.append(str(opt))
-                        continue
-                    
-                    # Если это словарь с текстом
-                    if isinstance(opt, dict) and "text" in opt:
-                        # Проверяем, имеет ли вариант подварианты для выбора или это просто контейнер для свободного ввода
-                        if "sub_options" not in opt or (isinstance(opt["sub_options"], list) and len(opt["sub_options"]) > 0):
-                            # Вариант имеет подварианты для выбора или не имеет подвариантов вообще (обычный вариант)
-                            has_predefined_options = True
-                            predefined_option_texts.append(opt["text"])
-                
-                # Если у вопроса нет предопределенных вариантов, это свободный ввод - пропускаем его
-                if not has_predefined_options or len(predefined_option_texts) == 0:
-                    self.logger.data_processing("statistics", "Пропуск вопроса со свободным вводом", 
-                                               details={"вопрос": question})
-                    continue
-                
-                # Логируем найденные предопределенные варианты
-                self.logger.data_processing("statistics", f"Предопределенные варианты для вопроса: {question}", 
-                                        details={"варианты": str(predefined_option_texts)})
-                
-                # Список всех ответов на этот вопрос
-                answers = []
-                for row in responses:
-                    if len(row) > question_idx:
-                        answer = row[question_idx]
-                        # Проверяем, является ли ответ одним из предопределенных вариантов или начинается с него
-                        for opt_text in predefined_option_texts:
-                            if answer == opt_text or answer.startswith(opt_text + " - "):
-                                answers.append(answer)
-                                break
-                
-                # Логируем количество найденных ответов для отладки
-                self.logger.data_processing("statistics", f"Найдено ответов для вопроса: {question}", 
-                                        details={"количество": len(answers), 
-                                                "примеры": str(answers[:3]) if answers else "нет ответов"})
-                
-                # Группируем ответы для подсчета статистики
-                answer_counts = {}
-                for answer in answers:
-                    # Проверяем, является ли ответ свободным вводом для варианта
-                    is_free_text_answer = False
-                    
-                    # Обрабатываем составные ответы
-                    if " - " in answer:
-                        parts = answer.split(" - ", 1)
-                        main_part = parts[0]
-                        
-                        # Проверяем, соответствует ли основная часть варианту со свободным вводом
-                        for opt in question_options:
-                            if isinstance(opt, dict) and "text" in opt and opt["text"] == main_part:
-                                # Если для этого варианта есть свободный ввод, пропускаем детальную статистику
-                                if "sub_options" in opt and isinstance(opt["sub_options"], list) and not opt["sub_options"]:
-                                    # Учитываем только основной вариант, а не подварианты
-                                    if main_part not in answer_counts:
-                                        answer_counts[main_part] = 0
-                                    answer_counts[main_part] += 1
-                                    is_free_text_answer = True
-                                    break
-                        
-                        # Если это не свободный ввод, обрабатываем как обычный подвариант
-                        if not is_free_text_answer and len(parts) > 1:
-                            sub_part = parts[1]
-                            
-                            # Учитываем основной вариант
-                            if main_part not in answer_counts:
-                                answer_counts[main_part] = 0
-                            answer_counts[main_part] += 1
-                            
-                            # Учитываем подвариант (без добавочного текста)
-                            compound_key = f"{main_part} - {sub_part.split(' (на вопрос:', 1)[0]}"
-                            if compound_key not in answer_counts:
-                                answer_counts[compound_key] = 0
-                            answer_counts[compound_key] += 1
-                    else:
-                        # Простой ответ
-                        if answer not in answer_counts:
-                            answer_counts[answer] = 0
-                        answer_counts[answer] += 1
-                
-                # Если есть ответы для этого вопроса, добавляем в статистику
-                if answer_counts:
-                    stats[question] = answer_counts
-                    self.logger.data_processing("statistics", f"Подсчитанная статистика для вопроса: {question}", 
-                                            details={"статистика": str(answer_counts)})
-            
-            # Очищаем лист статистики и обновляем заголовки
-            stats_sheet.clear()
-            stats_sheet.update_cell(1, 1, "Вопрос")
-            stats_sheet.update_cell(1, 2, "Вариант ответа")
-            stats_sheet.update_cell(1, 3, "Количество")
-            stats_sheet.update_cell(1, 4, "Процент")
-            
-            # Если нет данных для статистики, завершаем работу
-            if not stats:
-                self.logger.warning("no_statistics_data", "Нет данных для статистики", 
+            statistics = stats_aggregator.get_statistics()
+            if not statistics:
+                self.logger.warning("Нет данных для статистики (no_statistics_data)", 
                                   details={"причина": "Все вопросы являются вопросами со свободным вводом или нет ответов на вопросы с вариантами"})
-                return True
-            
-            # Заполняем статистику
-            row = 2
-            for question, answer_counts in stats.items():
-                # Получаем только ответы, которые соответствуют предопределенным вариантам
-                question_options = questions_with_options.get(question, [])
-                predefined_option_texts = []
-                
-                for opt in question_options:
-                    if not isinstance(opt, dict):
-                        predefined_option_texts.append(str(opt))
-                    elif "text" in opt:
-                        predefined_option_texts.append(opt["text"])
-                
-                for answer, count in answer_counts.items():
-                    # Проверяем, соответствует ли ответ предопределенному варианту или его подварианту
-                    is_predefined = False
-                    for opt_text in predefined_option_texts:
-                        if answer == opt_text or (isinstance(answer, str) and " - " in answer and answer.startswith(opt_text + " - ")):
-                            is_predefined = True
-                            break
-                    
-                    if not is_predefined:
-                        # Пропускаем ответы, которые не соответствуют предопределенным вариантам
-                        self.logger.data_processing("statistics", f"Пропуск неопределенного ответа", 
-                                                details={"вопрос": question, "ответ": answer})
-                        continue
-                        
-                    # Вычисляем процент
-                    total_answers = sum(answer_counts.values())
-                    percentage = 0 if total_answers == 0 else (count / total_answers) * 100
-                    
-                    # Добавляем строку статистики
-                    stats_sheet.update_cell(row, 1, question)
-                    stats_sheet.update_cell(row, 2, answer)
-                    stats_sheet.update_cell(row, 3, count)
-                    stats_sheet.update_cell(row, 4, f"{percentage:.1f}%")
-                    
-                    row += 1
+            
+            # Вся таблица (заголовки, варианты и строки подвариантов "└") уходит одним запросом,
+            # остаток прошлой таблицы очищается одним batch_clear
+            stats_renderer.write(stats_sheet, stats_renderer.build_table_grid(statistics))
             
             self.logger.data_processing("system", "Статистика успешно обновлена", 
-                                       details={"responses": len(responses), 
-                                               "questions": len(questions), 
-                                               "questions_in_stats": len(stats)})
+                                       details={"responses": stats_aggregator.get_total_responses(), 
+                                               "rows": len(statistics)})
             return True
             
         except Exception as e:
             self.logger.error("обновление_статистики", e)
             return False
 
+    def rebuild_statistics(self) -> bool:
+        """Полный пересчет агрегатора статистики по листу ответов"""
+        stats_aggregator.begin_rebuild()
+        try:
+            questions_with_options = self.get_questions_with_options()
+            answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
+            all_values = self.read_loader.get_all_values(answers_sheet)
+            # Строк из буфера записи в таблице еще нет, но их нужно учесть
+            rows = all_values[1:] + self.answers_buffer.pending_rows()
+            stats_aggregator.rebuild(questions_with_options, rows)
+            return True
+        except Exception as e:
+            stats_aggregator.cancel_rebuild()
+            self.logger.error("пересчет_статистики", e)
+            return False
+
+    def ensure_statistics(self) -> bool:
+        """Проверяет актуальность агрегатора статистики и при необходимости пересчитывает его"""
+        if stats_aggregator.needs_rebuild(self.get_questions_with_options()):
+            return self.rebuild_statistics()
+        return True
+
     def update_stats_sheet_with_percentages(self) -> bool:
         """Обновление листа статистики с процентами для всех вариантов ответов"""
         try:
             self.logger.data_processing("system", "Обновление листа статистики с процентами")
             
-            # Получаем данные для статистики
-            answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
-            answers_data = answers_sheet.get_all_values()
-            
-            # Пропускаем заголовок
-            if len(answers_data) <= 1:
-                self.logger.data_processing("system", "Нет данных для статистики")
-                return True
-            
-            # Получаем вопросы с вариантами ответов
-            questions_with_options = self.get_questions_with_options()
-            questions = list(questions_with_options.keys())
-            
-            # Создаем словарь для подсчета ответов
-            question_answers = {}
-            question_totals = {}
-            
-            # Индексы столбцов с ответами (пропускаем дату/время и ID пользователя)
-            answer_start_index = 2
-            
-            # Подсчитываем ответы
-            for row in answers_data[1:]:  # Пропускаем заголовок
-                for i, question in enumerate(questions):
-                    if i + answer_start_index < len(row):
-                        answer = row[i + answer_start_index]
-                        
-                        # Инициализируем счетчики, если нужно
-                        if question not in question_answers:
-                            question_answers[question] = {}
-                            question_totals[question] = 0
-                        
-                        # Увеличиваем счетчик для этого ответа
-                        if answer not in question_answers[question]:
-                            question_answers[question][answer] = 0
-                        question_answers[question][answer] += 1
-                        question_totals[question] += 1
-            
-            # Обновляем лист статистики
-            stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-            
-            # Очищаем текущие данные
-            stats_sheet.clear()
-            
-            # Добавляем заголовок
-            stats_sheet.append_row(["Статистика опроса"])
-            
-            # Добавляем статистику по каждому вопросу
-            for question, total in question_totals.items():
-                # Получаем все возможные варианты ответов для этого вопроса
-                all_options = questions_with_options.get(question, [])
-                
-                # Проверяем, имеет ли вопрос предопределенные варианты ответов
-                has_predefined_options = False
-                for opt in all_options:
-                    # Если это обычный вариант ответа (текст или словарь без свободного ввода)
-                    if isinstance(opt, dict) and "sub_options" in opt:
-                        # Если sub_options непустой список или отсутствует, это предопределенный вариант
-                        if "sub_options" not in opt or (isinstance(opt["sub_options"], list) and opt["sub_options"]):
-                            has_predefined_options = True
-                            break
-                    else:
-                        # Простой текстовый вариант считается предопределенным
-                        has_predefined_options = True
-                        break
-                
-                # Пропускаем вопросы со свободным вводом
-                if not has_predefined_options:
-                    self.logger.data_processing("statistics", "Пропуск вопроса со свободным вводом", 
-                                               details={"вопрос": question})
-                    continue
-                
-                # Добавляем строку с вопросом
-                stats_sheet.append_row([question])
-                
-                # Обрабатываем ответы с вариантами выбора
-                processed_options = {}
-                
-                # Обрабатываем все полученные ответы
-                for answer, count in question_answers[question].items():
-                    # Проверяем, является ли ответ составным (с вложенным свободным вводом)
-                    if " - " in answer:
-                        parts = answer.split(" - ", 1)
-                        main_part = parts[0]
-                        
-                        # Проверяем, является ли основной вариант свободным вводом
-                        is_free_text_option = False
-                        for opt in all_options:
-                            if isinstance(opt, dict) and "text" in opt and opt["text"] == main_part:
-                                if "sub_options" in opt and isinstance(opt["sub_options"], list) and not opt["sub_options"]:
-                                    is_free_text_option = True
-                                    break
-                        
-                        # Если вариант со свободным вводом, учитываем только основную часть
-                        if is_free_text_option:
-                            if main_part not in processed_options:
-                                processed_options[main_part] = 0
-                            processed_options[main_part] += count
-                        else:
-                            # Обычный вариант с подвариантом, учитываем полный ответ
-                            if answer not in processed_options:
-                                processed_options[answer] = 0
-                            processed_options[answer] += count
-                    else:
-                        # Простой ответ
-                        if answer not in processed_options:
-                            processed_options[answer] = 0
-                        processed_options[answer] += count
-                
-                # Выводим статистику по обработанным вариантам
-                for option, count in processed_options.items():
-                    percentage = (count / total * 100) if total > 0 else 0
-                    stats_sheet.append_row([option, f"{percentage:.1f}%", str(count)])
-                
-                # Добавляем пустую строку после вопроса
-                stats_sheet.append_row([""])
+            if not self.ensure_statistics():
+                return False
             
-            # Добавляем общее количество опросов
-            total_surveys = len(answers_data) - 1
-            stats_sheet.append_row(["Всего пройдено опросов:", str(total_surveys)])
+            # Отчет без подвариантов, вопросы разделены пустой строкой; запись одним запросом
+            grid = stats_renderer.build_report_grid(stats_aggregator.get_statistics(),
+                                                    stats_aggregator.get_total_responses(),
+                                                    nested=False)
+            stats_renderer.write(self.worksheets.get(self.STATS_SHEET), grid)
             
             self.logger.data_processing("system", "Лист статистики успешно обновлен с процентами")
             return True
@@ -749,8 +834,8 @@ class GoogleSheets:
             self.logger.data_processing("system", "Получение статистики из листа")
             
             # Получаем данные из листа статистики
-            stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-            stats_data = stats_sheet.get_all_values()
+            stats_sheet = self.worksheets.get(self.STATS_SHEET)
+            stats_data = self.read_loader.get_all_values(stats_sheet)
             
             if len(stats_data) <= 1:  # Только заголовок или пусто
                 return "📊 Статистика опроса:\n\n"
@@ -784,61 +869,69 @@ class GoogleSheets:
             self.logger.error("получение_статистики", e)
             return "❌ Ошибка при получении статистики"
     
+    @staticmethod
+    def _env_admin_ids() -> list:
+        """ID админов из переменной окружения ADMIN_IDS"""
+        return [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
+    
+    def _fetch_admins(self) -> list:
+        """Загружает ID админов из таблицы (при ошибке выбрасывает исключение)"""
+        try:
+            self.logger.data_processing("system", "Получение списка админов из таблицы")
+
+            # Проверяем существование листа с админами
+            try:
+                admins_sheet = self.worksheets.get(self.ADMINS_SHEET)
+            except gspread.exceptions.WorksheetNotFound:
+                self.logger.warning("admins_sheet_not_found", "Лист администраторов не найден", 
+                                  details={"лист": self.ADMINS_SHEET, "действие": "Создание нового листа"})
+                # Создаем лист с админами, если его нет
+                admins_sheet = self.worksheets.add(title=self.ADMINS_SHEET, rows=100, cols=2)
+                # Добавляем заголовок
+                admins_sheet.update('A1:B1', [['ID', 'Имя']])
+
+            # Получаем все данные из таблицы
+            data = self.read_loader.get_all_values(admins_sheet)
+
+            # Пропускаем заголовок
+            if data and len(data) > 0:
+                data = data[1:]
+
+            # Извлекаем ID админов
+            admin_ids = []
+            for row in data:
+                if row and row[0]:  # Проверяем, что строка не пустая и есть ID
+                    try:
+                        admin_id = int(row[0])
+                        admin_ids.append(admin_id)
+                    except ValueError:
+                        self.logger.warning("invalid_admin_id", "Некорректный формат ID администратора", 
+                                         details={"значение": row[0], "ожидаемый_тип": "целое число"})
+
+            # Добавляем админов из переменной окружения
+            for admin_id in self._env_admin_ids():
+                if admin_id not in admin_ids:
+                    admin_ids.append(admin_id)
+
+            self.logger.data_processing("system", f"Получено {len(admin_ids)} админов", 
+                                       details={"admins": admin_ids})
+            return admin_ids
+
+        except Exception as e:
+            self.logger.error("получение_списка_админов", e)
+            raise
+    
     def get_admins(self) -> list:
         """Получение списка ID админов из таблицы"""
         # Используем кэш для получения списка админов
-        def actual_fetch():
-            try:
-                self.logger.data_processing("system", "Получение списка админов из таблицы")
-                
-                # Проверяем существование листа с админами
-                try:
-                    admins_sheet = self.sheet.worksheet(self.ADMINS_SHEET)
-                except gspread.exceptions.WorksheetNotFound:
-                    self.logger.warning("admins_sheet_not_found", "Лист администраторов не найден", 
-                                      details={"лист": self.ADMINS_SHEET, "действие": "Создание нового листа"})
-                    # Создаем лист с админами, если его нет
-                    admins_sheet = self.sheet.add_worksheet(title=self.ADMINS_SHEET, rows=100, cols=2)
-                    # Добавляем заголовок
-                    admins_sheet.update('A1:B1', [['ID', 'Имя']])
-                
-                # Получаем все данные из таблицы
-                data = admins_sheet.get_all_values()
-                
-                # Пропускаем заголовок
-                if data and len(data) > 0:
-                    data = data[1:]
-                    
-                # Извлекаем ID админов
-                admin_ids = []
-                for row in data:
-                    if row and row[0]:  # Проверяем, что строка не пустая и есть ID
-                        try:
-                            admin_id = int(row[0])
-                            admin_ids.append(admin_id)
-                        except ValueError:
-                            self.logger.warning("invalid_admin_id", "Некорректный формат ID администратора", 
-                                             details={"значение": row[0], "ожидаемый_тип": "целое число"})
-                
-                # Добавляем админов из переменной окружения
-                env_admins = [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
-                for admin_id in env_admins:
-                    if admin_id not in admin_ids:
-                        admin_ids.append(admin_id)
-                
-                self.logger.data_processing("system", f"Получено {len(admin_ids)} админов", 
-                                           details={"admins": admin_ids})
-                return admin_ids
-                
-            except Exception as e:
-                self.logger.error("получение_списка_админов", e)
-                # Возвращаем админов из переменной окружения в случае ошибки
-                env_admins = [int(id.strip()) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip()]
-                self.logger.data_processing("system", "Используем админов из переменной окружения", 
-                                           details={"admins": env_admins})
-                return env_admins
-                
-        return sheets_cache.get_admins(actual_fetch)
+        def env_fallback():
+            # Возвращаем админов из переменной окружения в случае ошибки (в кэш не попадает)
+            env_admins = self._env_admin_ids()
+            self.logger.data_processing("system", "Используем админов из переменной окружения", 
+                                       details={"admins": env_admins})
+            return env_admins
+                
+        return sheets_cache.get_admins(self._fetch_admins, env_fallback)
 
     def get_admins_info(self) -> list:
         """Получает полную информацию об администраторах (ID, имя, описание)"""
@@ -846,8 +939,8 @@ class GoogleSheets:
             self.logger.data_processing("system", "Получение информации об администраторах")
             
             # Получаем данные из листа администраторов
-            admins_sheet = self.sheet.worksheet(self.ADMINS_SHEET)
-            data = admins_sheet.get_all_values()
+            admins_sheet = self.worksheets.get(self.ADMINS_SHEET)
+            data = self.read_loader.get_all_values(admins_sheet)
             
             # Если есть данные, пропускаем заголовки
             if data and len(data) > 1:
@@ -874,85 +967,12 @@ class GoogleSheets:
         try:
             self.logger.data_processing("system", "Получение статистики ответов")
             
-            # Получаем вопросы с вариантами ответов
-            questions_with_options = self.get_questions_with_options()
-            
-            # Получаем все ответы
-            answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
-            all_values = answers_sheet.get_all_values()
-            
-            if len(all_values) < 2:  # Если есть только заголовки или лист пустой
+            # Статистика берется из агрегатора, лист ответов читается только при полном пересчете
+            if not self.ensure_statistics():
                 return []
             
-            headers = all_values[0]
-            answers = all_values[1:]
-            
-            statistics = []
-            
-            # Для каждого вопроса с вариантами
-            for question, options in questions_with_options.items():
-                # Проверяем, является ли вопрос вопросом со свободным вводом
-                has_predefined_options = False
-                for opt in options:
-                    # Если это обычный вариант ответа (текст или словарь без свободного ввода)
-                    if isinstance(opt, dict) and "sub_options" in opt:
-                        # Если sub_options непустой список или отсутствует, это предопределенный вариант
-                        if "sub_options" not in opt or (isinstance(opt["sub_options"], list) and opt["sub_options"]):
-                            has_predefined_options = True
-                            break
-                    else:
-                        # Простой текстовый вариант считается предопределенным
-                        has_predefined_options = True
-                        break
-                
-                # Пропускаем вопросы со свободным вводом
-                if not has_predefined_options:
-                    self.logger.data_processing("statistics", "Пропуск вопроса со свободным вводом", 
-                                               details={"вопрос": question})
-                    continue
-                    
-                # Находим индекс колонки для текущего вопроса
-                try:
-                    question_index = headers.index(question)
-                except ValueError:
-                    continue
-                    
-                # Подсчитываем количество каждого варианта ответа
-                option_counts = {}
-                total_answers = 0
-                
-                for row in answers:
-                    if question_index < len(row):
-                        answer = row[question_index]
-                        if answer:  # Учитываем только непустые ответы
-                            # Обрабатываем составные ответы для свободного ввода
-                            if " - " in answer:
-                                parts = answer.split(" - ", 1)
-                                main_part = parts[0]
-                                
-                                # Проверяем, является ли основной вариант свободным вводом
-                                is_free_text_option = False
-                                for opt in options:
-                                    if isinstance(opt, dict) and "text" in opt and opt["text"] == main_part:
-                                        if "sub_options" in opt and isinstance(opt["sub_options"], list) and not opt["sub_options"]:
-                                            is_free_text_option = True
-                                            break
-                                
-                                # Если это свободный ввод, учитываем только основную часть
-                                if is_free_text_option:
-                                    option_counts[main_part] = option_counts.get(main_part, 0) + 1
-                                    total_answers += 1
-                                else:
-                                    option_counts[answer] = option_counts.get(answer, 0) + 1
-                                    total_answers += 1
-                            else:
-                                option_counts[answer] = option_counts.get(answer, 0) + 1
-                                total_answers += 1
-                
-                # Формируем статистику 
-                for answer, count in option_counts.items():
-                    percentage = round((count / total_answers * 100) if total_answers > 0 else 0)
-                    statistics.append([question, answer, count])
+            statistics = [[question, answer, count]
+                          for question, answer, count, _ in stats_aggregator.get_statistics()]
             
             self.logger.data_processing("system", f"Получено {len(statistics)} строк статистики")
             return statistics
@@ -974,8 +994,8 @@ class GoogleSheets:
             else:
                 actual_sheet_name = sheet_name
                 
-            worksheet = self.sheet.worksheet(actual_sheet_name)
-            values = worksheet.get_all_values()
+            worksheet = self.worksheets.get(actual_sheet_name)
+            values = self.read_loader.get_all_values(worksheet)
             self.logger.data_load("sheet_values", f"Получено данных с листа {sheet_name}", 
                                 count=len(values))
             return values
@@ -983,11 +1003,25 @@ class GoogleSheets:
             self.logger.error("получение_данных_листа", e, details={"sheet_name": sheet_name})
             return None
 
-    def get_next_user_id(self) -> int:
-        """Получение следующего доступного ID пользователя"""
+    def load_users_index(self) -> bool:
+        """Загружает индекс листа пользователей одним чтением листа"""
+        try:
+            # Пользователи из очереди отложенных записей еще не в листе, но уже зарегистрированы
+            pending_rows = [entry["row"] for entry in self.write_queue.pending_entries("users")]
+            users_index.load(self.get_sheet_values('users') + pending_rows)
+            return True
+        except Exception as e:
+            self.logger.error("загрузка_индекса_пользователей", e)
+            return False
+
+    def get_next_user_id(self) -> Optional[int]:
+        """Получение следующего доступного ID пользователя (None - лист не удалось прочитать)"""
         try:
             values = self.get_sheet_values('users')
-            if not values or len(values) == 1:  # Только заголовки
+            if values is None:
+                # Ошибка чтения: ID 1 совпал бы с ID уже зарегистрированного пользователя
+                return None
+            if len(values) <= 1:  # Только заголовки
                 return 1
                 
             # Безопасное извлечение ID с обработкой ошибок
@@ -1005,66 +1039,60 @@ class GoogleSheets:
             return max_id + 1
         except Exception as e:
             self.logger.error("получение_id_пользователя", e)
-            return 1
-
-    def initialize_users_sheet(self) -> bool:
-        """Инициализация листа пользователей"""
-        try:
-            self.logger.init("sheets", "Инициализация листа пользователей")
-            
-            # Проверяем существование листа
-            try:
-                users_sheet = self.sheet.worksheet(self.SHEET_NAMES['users'])
-            except gspread.exceptions.WorksheetNotFound:
-                self.logger.init("sheets", "Создание нового листа пользователей")
-                users_sheet = self.sheet.add_worksheet(
-                    title=self.SHEET_NAMES['users'],
-                    rows=1000,
-                    cols=len(self.SHEET_HEADERS['users'])
-                )
-                # Добавляем заголовки
-                users_sheet.update('A1:D1', [self.SHEET_HEADERS['users']])
-                self.logger.init("sheets", "Заголовки листа пользователей установлены")
-                return True
-            
-            # Проверяем и обновляем заголовки
-            current_headers = users_sheet.row_values(1)
-            if not current_headers or current_headers != self.SHEET_HEADERS['users']:
-                self.logger.init("sheets", "Обновление заголовков листа пользователей")
-                users_sheet.update('A1:D1', [self.SHEET_HEADERS['users']])
-                self.logger.init("sheets", "Заголовки листа пользователей обновлены")
-            
-            return True
-        except Exception as e:
-            self.logger.error("инициализация_листа_пользователей", e)
-            return False
+            return None
 
     def add_user(self, telegram_id: int, username: str) -> bool:
         """Добавление нового пользователя"""
         try:
-            # Проверяем, существует ли пользователь с таким telegram_id
-            if self.is_user_exists(telegram_id):
-                self.logger.user_action(telegram_id, "Повторная регистрация", 
-                                      details={"username": username})
-                return True  # Пользователь уже существует, считаем операцию успешной
+            defer = self._should_defer_write()
+            if users_index.is_loaded and (defer or not users_index.is_restored):
+                # ID выдается индексом; None - пользователь уже есть или регистрируется параллельно.
+                # Счетчик индекса из снимка мог устареть, а сверить его без таблицы нельзя:
+                # строка уходит в очередь без ID, ID выдается перед отправкой (_assign_deferred_user_ids)
+                user_id = users_index.reserve(telegram_id, allocate_id=not users_index.is_restored)
+                if user_id is None:
+                    self.logger.user_action(telegram_id, "Повторная регистрация", 
+                                          details={"username": username})
+                    return True
+            else:
+                # Проверяем, существует ли пользователь с таким telegram_id
+                if self.is_user_exists(telegram_id):
+                    self.logger.user_action(telegram_id, "Повторная регистрация", 
+                                          details={"username": username})
+                    return True  # Пользователь уже существует, считаем операцию успешной
+                if defer:
+                    # Индекс не загружен, а таблица недоступна: строка уходит в очередь без ID,
+                    # ID выдается перед отправкой (_assign_deferred_user_ids)
+                    user_id = 0
+                else:
+                    # Получаем следующий ID
+                    user_id = self.get_next_user_id()
+                    if user_id is None:
+                        raise RuntimeError("Не удалось получить следующий ID пользователя")
                 
-            # Получаем лист пользователей
-            users_sheet = self.sheet.worksheet(self.SHEET_NAMES['users'])
-            
-            # Получаем следующий ID
-            user_id = self.get_next_user_id()
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            row_data = [str(user_id) if user_id else "", str(telegram_id), username, current_time]
             
-            # Добавляем пользователя
-            users_sheet.append_row([
-                str(user_id),
-                str(telegram_id),
-                username,
-                current_time
-            ])
-            
-            # Инвалидируем кэш пользователей
-            sheets_cache.invalidate_user_cache()
+            response = None
+            if not defer:
+                # Добавляем пользователя
+                try:
+                    users_sheet = self.worksheets.get(self.SHEET_NAMES['users'])
+                    response = users_sheet.append_row(row_data)
+                except Exception as e:
+                    if not sheets_retry.is_unavailable_error(e):
+                        users_index.release(telegram_id)
+                        raise
+                    defer = True
+            
+            if defer:
+                # Таблица недоступна: пользователь регистрируется локально, строка уйдет из очереди
+                self.write_queue.enqueue("users", self.SHEET_NAMES['users'], row_data, key=str(telegram_id))
+                response = None
+            
+            # Обновляем индекс и кэш только для нового пользователя
+            users_index.commit(telegram_id, users_index.parse_updated_row(response))
+            sheets_cache.remember_user(telegram_id)
             
             self.logger.admin_action("system", "Добавление пользователя", 
                                     details={"user_id": user_id, "telegram_id": telegram_id, "username": username})
@@ -1075,14 +1103,19 @@ class GoogleSheets:
 
     def is_user_exists(self, telegram_id: int) -> bool:
         """Проверка существования пользователя"""
+        # Загруженный индекс отвечает без обращения к API
+        exists = users_index.contains(telegram_id)
+        if exists is not None:
+            return exists
+        
         # Используем кэш для проверки существования пользователя
         def actual_check(telegram_id):
             try:
                 # Оптимизированный поиск с использованием фильтра по столбцу telegram_id
-                users_sheet = self.sheet.worksheet(self.SHEET_NAMES['users'])
+                users_sheet = self.worksheets.get(self.SHEET_NAMES['users'])
                 
                 # Находим ячейки, содержащие telegram_id
-                cell_list = users_sheet.findall(str(telegram_id))
+                cell_list = users_sheet.findall(str(telegram_id), in_column=2)
                 
                 # Проверяем, находится ли хотя бы одна из найденных ячеек во 2-м столбце (индекс 1)
                 for cell in cell_list:
@@ -1092,9 +1125,10 @@ class GoogleSheets:
                 return False
             except Exception as e:
                 self.logger.error("проверка_существования_пользователя", e, details={"telegram_id": telegram_id})
-                return False
+                # Ошибка API не должна попасть в кэш как "пользователь не найден"
+                raise
                 
-        return sheets_cache.is_user_exists(telegram_id, lambda tid: actual_check(tid))
+        return sheets_cache.is_user_exists(telegram_id, lambda tid: actual_check(tid), fallback=lambda: False)
 
     def get_users_list(self, page: int = 1, page_size: int = 10) -> tuple:
         """Получение списка пользователей с пагинацией
@@ -1112,6 +1146,9 @@ class GoogleSheets:
             if not values or len(values) <= 1:  # Только заголовки или нет данных
                 return [], 0, 0
                 
+            # Лист все равно прочитан целиком - заодно сверяем индекс пользователей
+            users_index.load(values)
+            
             # Пропускаем заголовок
             user_rows = values[1:]
             total_users = len(user_rows)
@@ -1145,89 +1182,61 @@ class GoogleSheets:
                              details={"page": page, "page_size": page_size})
             return [], 0, 0
 
-    def initialize_messages_sheet(self) -> bool:
-        """Инициализация листа сообщений"""
+    def _fetch_message(self, message_type: str) -> dict:
+        """Загружает сообщение из таблицы (при ошибке выбрасывает исключение)"""
         try:
-            self.logger.init("sheets", "Инициализация листа сообщений")
-            
-            # Проверяем существование листа
-            try:
-                messages_sheet = self.sheet.worksheet(self.SHEET_NAMES['messages'])
-                
-                # Проверяем и обновляем структуру при необходимости
-                headers = messages_sheet.row_values(1)
-                if len(headers) < len(self.SHEET_HEADERS['messages']):
-                    self.logger.init("sheets", "Обновление структуры таблицы сообщений")
-                    messages_sheet.update('A1:D1', [self.SHEET_HEADERS['messages']])
-                    
-                    # Обновляем существующие данные, добавляя пустое значение для изображения
-                    rows = messages_sheet.get_all_values()[1:]  # Пропускаем заголовок
-                    for i, row in enumerate(rows, start=2):
-                        # Если строка имеет только тип и текст (и возможно дату)
-                        if len(row) < 3 or 'Изображение' not in headers:
-                            # Добавляем пустое значение для изображения перед датой
-                            message_type = row[0]
-                            message_text = row[1]
-                            date = row[2] if len(row) > 2 else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            messages_sheet.update(f'A{i}:D{i}', [[message_type, message_text, "", date]])
-                
-            except gspread.exceptions.WorksheetNotFound:
-                self.logger.init("sheets", "Создание нового листа сообщений")
-                messages_sheet = self.sheet.add_worksheet(
-                    title=self.SHEET_NAMES['messages'],
-                    rows=100,
-                    cols=len(self.SHEET_HEADERS['messages'])
-                )
-                # Добавляем заголовки
-                messages_sheet.update('A1:D1', [self.SHEET_HEADERS['messages']])
-                
-                # Добавляем сообщения по умолчанию
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                default_rows = [
-                    ['start', self.DEFAULT_MESSAGES['start'], "", current_time],
-                    ['finish', self.DEFAULT_MESSAGES['finish'], "", current_time]
-                ]
-                messages_sheet.update('A2:D3', default_rows)
-                self.logger.init("sheets", "Добавлены сообщения по умолчанию")
-            
-            return True
-        except Exception as e:
-            self.logger.error("инициализация_листа_сообщений", e)
-            return False
+            messages_sheet = self.worksheets.get(self.SHEET_NAMES['messages'])
+            all_messages = self.read_loader.get_all_values(messages_sheet)
+            self.messages_rows.load(all_messages)
+
+            # Пропускаем заголовок
+            if len(all_messages) > 1:
+                for row in all_messages[1:]:
+                    if row[0] == message_type:
+                        # Возвращаем текст и изображение
+                        image_url = row[2] if len(row) > 2 else ""
+                        return {
+                            "text": row[1],
+                            "image": image_url
+                        }
 
+            # Если сообщение не найдено, возвращаем значение по умолчанию
+            return {
+                "text": self.DEFAULT_MESSAGES.get(message_type, ''),
+                "image": ""
+            }
+
+        except Exception as e:
+            self.logger.error("получение_сообщения", e, details={"message_type": message_type})
+            raise
+    
     def get_message(self, message_type: str) -> dict:
         """Получение текста и изображения сообщения по его типу"""
         # Используем кэш для получения сообщения
-        def actual_fetch(message_type):
-            try:
-                messages_sheet = self.sheet.worksheet(self.SHEET_NAMES['messages'])
-                all_messages = messages_sheet.get_all_values()
-                
-                # Пропускаем заголовок
-                if len(all_messages) > 1:
-                    for row in all_messages[1:]:
-                        if row[0] == message_type:
-                            # Возвращаем текст и изображение
-                            image_url = row[2] if len(row) > 2 else ""
-                            return {
-                                "text": row[1],
-                                "image": image_url
-                            }
-                
-                # Если сообщение не найдено, возвращаем значение по умолчанию
-                return {
-                    "text": self.DEFAULT_MESSAGES.get(message_type, ''),
-                    "image": ""
-                }
-                
-            except Exception as e:
-                self.logger.error("получение_сообщения", e, details={"message_type": message_type})
-                return {
-                    "text": self.DEFAULT_MESSAGES.get(message_type, ''),
-                    "image": ""
-                }
-                
-        return sheets_cache.get_message(message_type, lambda mt: actual_fetch(mt))
+        def default_message():
+            # Значение по умолчанию при ошибке, если в кэше нет сообщения (в кэш не попадает)
+            return {
+                "text": self.DEFAULT_MESSAGES.get(message_type, ''),
+                "image": ""
+            }
+                
+        return sheets_cache.get_message(message_type, self._fetch_message, default_message)
+
+    def _find_row(self, index: SheetRowIndex, worksheet, key: str) -> Optional[tuple]:
+        """
+        Находит строку листа по ключу в первом столбце
+        
+        Строка берется из индекса; лист читается, только если ключа в индексе
+        нет (индекс еще не загружен или строку добавили в таблицу вручную).
+        
+        Returns:
+            Optional[tuple]: (номер строки, значения строки) или None
+        """
+        found = index.get(key)
+        if found is None:
+            index.load(self.read_loader.get_all_values(worksheet))
+            found = index.get(key)
+        return found
 
     def update_message(self, message_type: str, new_text: str, image_url: str = None) -> bool:
         """Обновление текста и изображения сообщения"""
@@ -1236,39 +1245,40 @@ class GoogleSheets:
                 self.logger.error("неизвестный_тип_сообщения", f"Неизвестный тип сообщения", details={"message_type": message_type})
                 return False
                 
-            messages_sheet = self.sheet.worksheet(self.SHEET_NAMES['messages'])
-            all_messages = messages_sheet.get_all_values()
+            messages_sheet = self.worksheets.get(self.SHEET_NAMES['messages'])
             
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            message_row = None
             
-            # Ищем строку с нужным типом сообщения
-            for i, row in enumerate(all_messages):
-                if row[0] == message_type:
-                    message_row = i + 1  # +1 так как индексация с 1
-                    break
+            # Ищем строку с нужным типом сообщения по индексу строк
+            found = self._find_row(self.messages_rows, messages_sheet, message_type)
             
-            if message_row:
+            if found:
+                message_row, row = found
                 # Если image_url не передан, сохраняем текущее значение
-                current_image = ""
-                if len(all_messages[message_row-1]) > 2:
-                    current_image = all_messages[message_row-1][2]
+                current_image = row[2] if len(row) > 2 else ""
                 
                 image_to_save = image_url if image_url is not None else current_image
                 
                 # Обновляем существующую строку
                 messages_sheet.update(f'B{message_row}:D{message_row}', [[new_text, image_to_save, current_time]])
+                self.messages_rows.set(message_type, message_row,
+                                       [message_type, new_text, image_to_save, current_time])
             else:
                 # Добавляем новую строку
-                messages_sheet.append_row([
+                image_to_save = image_url if image_url is not None else ""
+                row_data = [
                     message_type, 
                     new_text, 
-                    image_url if image_url is not None else "", 
+                    image_to_save, 
                     current_time
-                ])
+                ]
+                self.messages_rows.append(message_type, messages_sheet.append_row(row_data), row_data)
             
-            # Инвалидируем кэш сообщений для обновленного типа
-            sheets_cache.invalidate_messages_cache(message_type)
+            # Записываем сохраненное сообщение в кэш без повторного чтения листа
+            sheets_cache.remember_message(message_type, {
+                "text": new_text,
+                "image": image_to_save
+            })
             
             self.logger.admin_action("system", "Сообщение успешно обновлено", details={"message_type": message_type})
             return True
@@ -1277,103 +1287,11 @@ class GoogleSheets:
             self.logger.error("обновление_сообщения", e, details={"message_type": message_type})
             return False
 
-    def initialize_posts_sheet(self) -> bool:
-        """Инициализация листа постов"""
-        try:
-            self.logger.init("sheets", "Инициализация листа постов")
-            
-            # Проверяем, существует ли уже лист с постами
-            try:
-                posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-                self.logger.init("sheets", "Лист постов уже существует")
-                
-                # Проверяем и обновляем заголовки для существующего листа
-                current_headers = posts_sheet.row_values(1)
-                if current_headers and len(current_headers) < len(self.SHEET_HEADERS['posts']):
-                    self.logger.init("sheets", "Обновление структуры таблицы постов")
-                    posts_sheet.update('A1:H1', [self.SHEET_HEADERS['posts']])
-                    self.logger.init("sheets", "Структура таблицы постов обновлена")
-                    
-                    # Мигрируем существующие данные
-                    self.migrate_posts_data()
-                
-            except gspread.exceptions.WorksheetNotFound:
-                # Создаем новый лист для постов
-                posts_sheet = self.sheet.add_worksheet(
-                    title=self.SHEET_NAMES['posts'],
-                    rows=1000,
-                    cols=10
-                )
-                self.logger.init("sheets", "Создан новый лист для постов")
-                
-                # Добавляем заголовки
-                posts_sheet.append_row(self.SHEET_HEADERS['posts'])
-                self.logger.init("sheets", "Добавлены заголовки в лист постов")
-            
-            return True
-            
-        except Exception as e:
-            self.logger.error("инициализация_листа_постов", e)
-            return False
-
-    def migrate_posts_data(self):
-        """Миграция данных в таблице постов для добавления столбца 'Название'"""
-        try:
-            self.logger.data_processing("Начало миграции данных постов")
-            
-            # Получаем лист с постами
-            posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-            
-            # Получаем все данные (пропускаем заголовок)
-            data = posts_sheet.get_all_values()
-            if len(data) <= 1:  # Только заголовок или пусто
-                self.logger.data_processing("Миграция данных постов не требуется", details={"reason": "Нет данных для миграции"})
-                return True
-            
-            # Пропускаем заголовок
-            rows = data[1:]
-            
-            # Обрабатываем каждую строку
-            for i, row in enumerate(rows, start=2):  # начинаем с индекса 2 (после заголовка)
-                if len(row) < 7:  # Пропускаем некорректные строки
-                    continue
-                
-                post_id = row[0]
-                old_text = row[1]  # Старый текст в столбце B
-                
-                # Формируем название (первые 30 символов текста или ID поста)
-                title = f"Пост №{post_id}"
-                if old_text:
-                    title_from_text = old_text[:30].strip()
-                    if title_from_text:
-                        title = title_from_text + ("..." if len(old_text) > 30 else "")
-                
-                # Вставляем новую ячейку с названием (столбец B)
-                posts_sheet.update_cell(i, 2, title)
-                
-                # Если нужно, смещаем остальные данные
-                # Для этого получаем оставшиеся данные и обновляем их
-                remaining_data = row[1:]  # Текст, Изображение, Кнопка (текст), Кнопка (ссылка), Дата создания, Создал
-                if remaining_data:
-                    # Обновляем ячейки C-H
-                    cell_range = f"C{i}:H{i}" if len(remaining_data) >= 6 else f"C{i}:{chr(66+len(remaining_data)+1)}{i}"
-                    posts_sheet.update(cell_range, [remaining_data])
-            
-            self.logger.init("sheets", "Миграция данных постов завершена успешно")
-            return True
-            
-        except Exception as e:
-            self.logger.error("миграция_данных_постов", e)
-            return False
-    
     def save_post(self, title: str, text: str, image_url: str, button_text: str, button_url: str, admin_id: int) -> int:
         """Сохранение поста в таблицу"""
         try:
             self.logger.admin_action(admin_id, "Сохранение поста", f"Заголовок: {title[:30]}...")
             
-            # Открываем лист с постами
-            posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-            
             # Получаем текущую дату и время
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
@@ -1383,11 +1301,22 @@ class GoogleSheets:
             # Подготавливаем данные для добавления
             row_data = [post_id, title, text, image_url, button_text, button_url, current_time, str(admin_id)]
             
-            # Добавляем пост
-            posts_sheet.append_row(row_data)
-            
-            # Инвалидируем кэш постов
-            sheets_cache.invalidate_posts_cache()
+            # Добавляем пост; если таблица недоступна, строка уйдет из очереди отложенных записей
+            defer = self._should_defer_write()
+            if not defer:
+                try:
+                    posts_sheet = self.worksheets.get(self.SHEET_NAMES['posts'])
+                    self.posts_rows.append(post_id, posts_sheet.append_row(row_data), row_data)
+                except Exception as e:
+                    if not sheets_retry.is_unavailable_error(e):
+                        raise
+                    defer = True
+            if defer:
+                self.write_queue.enqueue("posts", self.SHEET_NAMES['posts'], row_data, key=post_id)
+            
+            # Добавляем пост в кэш без повторного чтения листа
+            new_post = self._parse_post_row(row_data)
+            sheets_cache.update_posts(lambda posts: posts + [new_post])
             
             self.logger.admin_action("system", "Пост успешно сохранен", details={"post_id": post_id, "admin_id": admin_id})
             return post_id
@@ -1396,77 +1325,86 @@ class GoogleSheets:
             self.logger.error("сохранение_поста", e)
             return 0
     
+    @staticmethod
+    def _parse_post_row(row: list) -> dict:
+        """Преобразует строку листа постов в словарь (поддерживает старые форматы без названия и кнопок)"""
+        if len(row) >= 8:  # Новый формат с названием
+            return {
+                'id': row[0],
+                'title': row[1],
+                'text': row[2],
+                'image_url': row[3],
+                'button_text': row[4],
+                'button_url': row[5],
+                'created_at': row[6],
+                'admin_id': row[7]
+            }
+        if len(row) >= 7:  # Старый формат без названия, но с кнопками
+            return {
+                'id': row[0],
+                'title': 'Пост №' + row[0],  # Генерируем название для старых постов
+                'text': row[1],
+                'image_url': row[2],
+                'button_text': row[3],
+                'button_url': row[4],
+                'created_at': row[5],
+                'admin_id': row[6]
+            }
+        # Обрабатываем самые старые посты без кнопок
+        return {
+            'id': row[0],
+            'title': 'Пост №' + row[0],  # Генерируем название
+            'text': row[1],
+            'image_url': row[2],
+            'button_text': '',
+            'button_url': '',
+            'created_at': row[3] if len(row) > 3 else '',
+            'admin_id': row[4] if len(row) > 4 else ''
+        }
+    
+    def _fetch_all_posts(self) -> list:
+        """Загружает все посты из таблицы (при ошибке выбрасывает исключение)"""
+        try:
+            self.logger.data_processing("system", "Получение всех постов")
+            posts_sheet = self.worksheets.get(self.SHEET_NAMES['posts'])
+
+            # Получаем все данные из таблицы
+            data = self.read_loader.get_all_values(posts_sheet)
+            self.posts_rows.load(data)
+
+            # Пропускаем заголовок
+            if data and len(data) > 0:
+                data = data[1:]
+
+            # Посты из очереди отложенных записей еще не в листе
+            data = list(data or []) + [entry["row"] for entry in self.write_queue.pending_entries("posts")]
+            
+            # Преобразуем данные в список словарей
+            posts = []
+            for row in data:
+                post = self._parse_post_row(row)
+                posts.append(post)
+
+            self.logger.data_processing("system", f"Получено {len(posts)} постов")
+            return posts
+
+        except Exception as e:
+            self.logger.error("получение_постов", e)
+            raise
+    
     def get_all_posts(self) -> list:
         """Получение всех постов из таблицы"""
         # Используем кэш для получения постов
-        def actual_fetch():
-            try:
-                self.logger.data_processing("system", "Получение всех постов")
-                posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-                
-                # Получаем все данные из таблицы
-                data = posts_sheet.get_all_values()
-                
-                # Пропускаем заголовок
-                if data and len(data) > 0:
-                    data = data[1:]
-                
-                # Преобразуем данные в список словарей
-                posts = []
-                for row in data:
-                    if len(row) >= 8:  # Новый формат с названием
-                        post = {
-                            'id': row[0],
-                            'title': row[1],
-                            'text': row[2],
-                            'image_url': row[3],
-                            'button_text': row[4],
-                            'button_url': row[5],
-                            'created_at': row[6],
-                            'admin_id': row[7]
-                        }
-                    elif len(row) >= 7:  # Старый формат без названия, но с кнопками
-                        post = {
-                            'id': row[0],
-                            'title': 'Пост №' + row[0],  # Генерируем название для старых постов
-                            'text': row[1],
-                            'image_url': row[2],
-                            'button_text': row[3],
-                            'button_url': row[4],
-                            'created_at': row[5],
-                            'admin_id': row[6]
-                        }
-                    else:
-                        # Обрабатываем самые старые посты без кнопок
-                        post = {
-                            'id': row[0],
-                            'title': 'Пост №' + row[0],  # Генерируем название
-                            'text': row[1],
-                            'image_url': row[2],
-                            'button_text': '',
-                            'button_url': '',
-                            'created_at': row[3] if len(row) > 3 else '',
-                            'admin_id': row[4] if len(row) > 4 else ''
-                        }
-                    posts.append(post)
-                
-                self.logger.data_processing("system", f"Получено {len(posts)} постов")
-                return posts
-                
-            except Exception as e:
-                self.logger.error("получение_постов", e)
-                return []
-                
-        return sheets_cache.get_posts(actual_fetch)
+        return sheets_cache.get_posts(self._fetch_all_posts, fallback=list)
     
     def get_post_by_id(self, post_id: str) -> dict:
         """Получение поста по ID"""
         try:
             self.logger.data_processing("system", f"Получение поста с ID {post_id}")
-            posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
+            posts_sheet = self.worksheets.get(self.SHEET_NAMES['posts'])
             
             # Находим пост по ID
-            cell = posts_sheet.find(post_id)
+            cell = posts_sheet.find(str(post_id), in_column=1)
             if not cell:
                 self.logger.warning("post_not_found", "Пост не найден в таблице", 
                                   details={"post_id": post_id, "действие": "Пропуск операции"})
@@ -1476,40 +1414,7 @@ class GoogleSheets:
             row_data = posts_sheet.row_values(cell.row)
             
             # Преобразуем данные в словарь
-            if len(row_data) >= 8:  # Новый формат с названием
-                post = {
-                    'id': row_data[0],
-                    'title': row_data[1],
-                    'text': row_data[2],
-                    'image_url': row_data[3],
-                    'button_text': row_data[4],
-                    'button_url': row_data[5],
-                    'created_at': row_data[6],
-                    'admin_id': row_data[7]
-                }
-            elif len(row_data) >= 7:  # Старый формат без названия, но с кнопками
-                post = {
-                    'id': row_data[0],
-                    'title': 'Пост №' + row_data[0],  # Генерируем название для старых постов
-                    'text': row_data[1],
-                    'image_url': row_data[2],
-                    'button_text': row_data[3],
-                    'button_url': row_data[4],
-                    'created_at': row_data[5],
-                    'admin_id': row_data[6]
-                }
-            else:
-                # Обрабатываем самые старые посты без кнопок
-                post = {
-                    'id': row_data[0],
-                    'title': 'Пост №' + row_data[0],  # Генерируем название
-                    'text': row_data[1],
-                    'image_url': row_data[2],
-                    'button_text': '',
-                    'button_url': '',
-                    'created_at': row_data[3] if len(row_data) > 3 else '',
-                    'admin_id': row_data[4] if len(row_data) > 4 else ''
-                }
+            post = self._parse_post_row(row_data)
             
             self.logger.data_processing("system", f"Пост с ID {post_id} успешно получен")
             return post
@@ -1526,44 +1431,48 @@ class GoogleSheets:
                                         "button_url": button_url})
         
         try:
-            # Получаем все посты
-            posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-            rows = posts_sheet.get_all_values()
-            
-            # Ищем пост по ID
-            row_index = None
-            for idx, row in enumerate(rows[1:], 2):  # Начинаем с 2, так как первая строка - заголовки
-                if len(row) >= 1 and row[0] == str(post_id):
-                    row_index = idx
-                    self.logger.data_processing("posts", "Найден пост в таблице", 
-                                             details={"post_id": post_id, "строка": row_index})
-                    break
-            
-            if row_index is None:
+            # Ищем пост по ID по индексу строк
+            posts_sheet = self.worksheets.get(self.SHEET_NAMES['posts'])
+            found = self._find_row(self.posts_rows, posts_sheet, str(post_id))
+            
+            if found is None:
                 self.logger.warning("post_not_found", "Пост не найден для обновления", 
                                   details={"post_id": post_id, "действие": "Пропуск обновления"})
                 return False
             
-            # Обновляем только те поля, которые переданы
-            if text is not None:
-                self.logger.data_processing("posts", "Обновление поля поста", 
-                                         details={"post_id": post_id, "поле": "текст", "предпросмотр": text[:30]+"..." if len(text) > 30 else text})
-                posts_sheet.update_cell(row_index, 2, text)
-            
-            if image_url is not None:
-                self.logger.data_processing("posts", "Обновление поля поста", 
-                                         details={"post_id": post_id, "поле": "изображение", "url": image_url})
-                posts_sheet.update_cell(row_index, 3, image_url)
-            
-            if button_text is not None:
+            row_index, row = found
+            self.logger.data_processing("posts", "Найден пост в таблице", 
+                                     details={"post_id": post_id, "строка": row_index})
+            
+            # Колонки полей зависят от формата строки (в новом формате вторая колонка - название)
+            first_column = 3 if len(row) >= 8 else 2
+            fields = [
+                ("текст", text, first_column),
+                ("изображение", image_url, first_column + 1),
+                ("текст кнопки", button_text, first_column + 2),
+                ("url кнопки", button_url, first_column + 3),
+            ]
+            
+            # Обновляем только те поля, которые переданы, одним запросом
+            updates = []
+            for field_name, value, column in fields:
+                if value is None:
+                    continue
                 self.logger.data_processing("posts", "Обновление поля поста", 
-                                         details={"post_id": post_id, "поле": "текст кнопки", "значение": button_text})
-                posts_sheet.update_cell(row_index, 4, button_text)
+                                         details={"post_id": post_id, "поле": field_name, 
+                                                  "значение": value[:30]+"..." if len(value) > 30 else value})
+                updates.append({"range": gspread.utils.rowcol_to_a1(row_index, column), "values": [[value]]})
+                row.extend([''] * (column - len(row)))
+                row[column - 1] = value
             
-            if button_url is not None:
-                self.logger.data_processing("posts", "Обновление поля поста", 
-                                         details={"post_id": post_id, "поле": "url кнопки", "значение": button_url})
-                posts_sheet.update_cell(row_index, 5, button_url)
+            if updates:
+                posts_sheet.batch_update(updates)
+                self.posts_rows.set(str(post_id), row_index, row)
+                
+                # Заменяем пост в кэше без повторного чтения листа
+                updated_post = self._parse_post_row(row)
+                sheets_cache.update_posts(lambda posts: [updated_post if post['id'] == str(post_id) else post
+                                                         for post in posts])
             
             self.logger.admin_action("system", "Пост успешно обновлен", details={"post_id": post_id})
             return True
@@ -1577,27 +1486,21 @@ class GoogleSheets:
         self.logger.admin_action("system", "Удаление поста", details={"post_id": post_id})
         
         try:
-            # Получаем все посты
-            posts_sheet = self.sheet.worksheet(self.SHEET_NAMES['posts'])
-            rows = posts_sheet.get_all_values()
-            
-            # Ищем пост по ID
-            row_index = None
-            for idx, row in enumerate(rows[1:], 2):  # Начинаем с 2, так как первая строка - заголовки
-                if len(row) >= 1 and row[0] == str(post_id):
-                    row_index = idx
-                    break
-            
-            if row_index is None:
+            # Ищем пост по ID по индексу строк
+            posts_sheet = self.worksheets.get(self.SHEET_NAMES['posts'])
+            found = self._find_row(self.posts_rows, posts_sheet, str(post_id))
+            
+            if found is None:
                 self.logger.warning("post_not_found", "Пост не найден для удаления", 
                                   details={"post_id": post_id, "действие": "Пропуск удаления"})
                 return False
             
             # Удаляем строку
-            posts_sheet.delete_rows(row_index)
+            posts_sheet.delete_rows(found[0])
+            self.posts_rows.remove(str(post_id))
             
-            # Инвалидируем кэш постов
-            sheets_cache.invalidate_posts_cache()
+            # Удаляем пост из кэша без повторного чтения листа
+            sheets_cache.update_posts(lambda posts: [post for post in posts if post['id'] != str(post_id)])
             
             self.logger.admin_action("system", "Пост успешно удален", details={"post_id": post_id})
             return True
@@ -1607,29 +1510,169 @@ class GoogleSheets:
             return False
 
     # Асинхронная реализация для операций с Google Sheets с учетом ограничения запросов
+    async def _async_read(self, func, *args, **kwargs):
+        """Чтение из таблицы в пуле потоков Sheets с интерактивным приоритетом"""
+        return await sheets_cache.execute_with_rate_limit(func, *args, priority=PRIORITY_INTERACTIVE, **kwargs)
+    
+    async def _async_write(self, func, *args, **kwargs):
+        """
+        Запись в таблицу в пуле потоков Sheets с интерактивным приоритетом
+        
+        Returns:
+            Результат func или None, если результата не дождались: запись продолжается
+            в потоке пула и может примениться позже, поэтому это не ошибка
+        """
+        try:
+            return await sheets_cache.execute_with_rate_limit(func, *args, priority=PRIORITY_INTERACTIVE,
+                                                              operation=OPERATION_WRITE, **kwargs)
+        except SheetsCallTimeout:
+            self.logger.warning("Результат записи в таблицу неизвестен: запись продолжается в фоне",
+                                details={"функция": getattr(func, "__name__", str(func))})
+            return None
+    
+    async def async_get_questions_with_options(self) -> dict:
+        """Асинхронное получение вопросов с вариантами ответов"""
+        return await self._async_read(self.get_questions_with_options)
+    
+    async def async_add_question(self, question: str, options: list = None) -> Optional[bool]:
+        """Асинхронное добавление вопроса (None - результат неизвестен)"""
+        return await self._async_write(self.add_question, question, options)
+    
+    async def async_edit_question_text(self, question_index: int, new_text: str) -> Optional[bool]:
+        """Асинхронное изменение текста вопроса (None - результат неизвестен)"""
+        return await self._async_write(self.edit_question_text, question_index, new_text)
+    
+    async def async_edit_question_options(self, question_index: int, options: list, **kwargs) -> Optional[bool]:
+        """Асинхронное изменение вариантов ответов (None - результат неизвестен)"""
+        return await self._async_write(self.edit_question_options, question_index, options, **kwargs)
+    
+    async def async_delete_question(self, question_or_index) -> Optional[bool]:
+        """Асинхронное удаление вопроса (None - результат неизвестен)"""
+        return await self._async_write(self.delete_question, question_or_index)
+    
+    async def async_clear_answers_and_stats(self) -> Optional[bool]:
+        """Асинхронная очистка ответов и статистики (None - результат неизвестен)"""
+        return await self._async_write(self.clear_answers_and_stats)
+    
+    async def async_add_admin(self, admin_id: int, admin_name: str, admin_description: str) -> Optional[bool]:
+        """Асинхронное добавление администратора (None - результат неизвестен)"""
+        return await self._async_write(self.add_admin, admin_id, admin_name, admin_description)
+    
+    async def async_remove_admin(self, admin_id: int) -> Optional[bool]:
+        """Асинхронное удаление администратора (None - результат неизвестен)"""
+        return await self._async_write(self.remove_admin, admin_id)
+    
+    async def async_reset_user_survey(self, user_id: int) -> Optional[bool]:
+        """Асинхронный сброс опроса пользователя (None - результат неизвестен)"""
+        return await self._async_write(self.reset_user_survey, user_id)
+    
+    async def async_get_users_list(self, page: int = 1, page_size: int = 10) -> tuple:
+        """Асинхронное получение списка пользователей с пагинацией"""
+        return await self._async_read(self.get_users_list, page, page_size)
+    
+    async def async_get_admins_info(self) -> list:
+        """Асинхронное получение информации об администраторах"""
+        return await self._async_read(self.get_admins_info)
+    
+    async def async_update_message(self, message_type: str, new_text: str, image_url: str = None) -> Optional[bool]:
+        """Асинхронное обновление системного сообщения (None - результат неизвестен)"""
+        return await self._async_write(self.update_message, message_type, new_text, image_url)
+    
+    async def async_save_post(self, title: str, text: str, image_url: str, button_text: str,
+                              button_url: str, admin_id: int):
+        """Асинхронное сохранение поста (None - результат неизвестен)"""
+        return await self._async_write(self.save_post, title, text, image_url, button_text, button_url, admin_id)
+    
+    async def async_get_post_by_id(self, post_id: str) -> dict:
+        """Асинхронное получение поста по ID"""
+        return await self._async_read(self.get_post_by_id, post_id)
+    
+    async def async_delete_post(self, post_id) -> Optional[bool]:
+        """Асинхронное удаление поста (None - результат неизвестен)"""
+        return await self._async_write(self.delete_post, post_id)
+    
     async def async_is_user_exists(self, telegram_id: int) -> bool:
         """Асинхронная проверка существования пользователя с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.is_user_exists, telegram_id)
+        # Загруженный индекс отвечает без обращения к API
+        exists = users_index.contains(telegram_id)
+        if exists is not None:
+            return exists
+        return await sheets_cache.execute_cached(
+            "users_exists", telegram_id,
+            lambda: sheets_cache.peek_user_exists(telegram_id),
+            self.is_user_exists, telegram_id,
+            priority=PRIORITY_INTERACTIVE
+        )
         
     async def async_add_user(self, telegram_id: int, username: str) -> bool:
         """Асинхронное добавление пользователя с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.add_user, telegram_id, username)
+        return await sheets_cache.execute_with_rate_limit(self.add_user, telegram_id, username,
+                                                          priority=PRIORITY_INTERACTIVE,
+                                                          operation=OPERATION_WRITE)
         
     async def async_get_message(self, message_type: str) -> dict:
         """Асинхронное получение сообщения с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.get_message, message_type)
+        # Попадание в кэш и ожидание уже идущей загрузки не занимают поток пула и квоту
+        return await sheets_cache.execute_cached(
+            "messages", message_type,
+            lambda: sheets_cache.peek_message(message_type),
+            self.get_message, message_type,
+            priority=PRIORITY_INTERACTIVE
+        )
         
     async def async_get_admins(self) -> list:
         """Асинхронное получение списка админов с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.get_admins)
+        return await sheets_cache.execute_cached(
+            "admins", "admins", sheets_cache.peek_admins, self.get_admins, copy_result=True
+        )
         
     async def async_get_all_posts(self) -> list:
         """Асинхронное получение всех постов с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.get_all_posts)
+        return await sheets_cache.execute_cached(
+            "posts", "posts", sheets_cache.peek_posts, self.get_all_posts, copy_result=True
+        )
+        
+    async def async_save_answers(self, answers: list, user_id: int, question_count: int = None) -> bool:
+        """Асинхронное сохранение ответов через буфер отложенной записи"""
+        row_data = self._build_answers_row(answers, user_id, question_count)
+        if row_data is None:
+            return False
+        
+        try:
+            # Строка записывается в журнал на диске и уходит в таблицу вместе с остальными
+            await sheets_cache.run_in_executor(self.answers_buffer.add, user_id, row_data)
+        except Exception as e:
+            self.logger.error("сохранение_ответов", e, details={"user_id": user_id})
+            return False
+        
+        respondents_index.add(user_id)
+        stats_aggregator.add_answers(user_id, answers)
+        
+        self.logger.user_action(user_id, "Сохранение ответов", "Ответы приняты в буфер записи")
+        return True
+        
+    async def async_has_user_completed_survey(self, telegram_id: int) -> bool:
+        """Асинхронная проверка прохождения опроса с учетом ограничения запросов"""
+        # Загруженный индекс отвечает без обращения к API
+        completed = respondents_index.contains(telegram_id)
+        if completed is not None:
+            return completed
+        return await sheets_cache.execute_with_rate_limit(self.has_user_completed_survey, telegram_id,
+                                                          priority=PRIORITY_INTERACTIVE)
+        
+    async def async_get_total_surveys_count(self) -> int:
+        """Асинхронное получение количества пройденных опросов с учетом ограничения запросов"""
+        return await sheets_cache.execute_with_rate_limit(self.get_total_surveys_count)
+        
+    async def async_update_statistics(self) -> bool:
+        """Асинхронное обновление листа статистики (фоновый приоритет, квота записи)"""
+        return await sheets_cache.execute_with_rate_limit(self.update_statistics,
+                                                          priority=PRIORITY_BACKGROUND,
+                                                          operation=OPERATION_WRITE)
         
-    async def async_save_answers(self, answers: list, user_id: int) -> bool:
-        """Асинхронное сохранение ответов с учетом ограничения запросов"""
-        return await sheets_cache.execute_with_rate_limit(self.save_answers, answers, user_id)
+    async def async_get_statistics(self) -> list:
+        """Асинхронное получение статистики с учетом ограничения запросов"""
+        return await sheets_cache.execute_with_rate_limit(self.get_statistics)
 
 # Импортируем и добавляем методы из sheets_questions к классу GoogleSheets
 # Размещаем импорт в конце файла чтобы избежать циклических зависимостей
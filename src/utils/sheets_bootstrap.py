@@ -0,0 +1,242 @@
+"""
+Модуль с проверкой и исправлением структуры листов таблицы при запуске
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import gspread
+from gspread.utils import fill_gaps
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class SheetsBootstrap:
+    """
+    Проверка структуры листов за постоянное число запросов.
+
+    Метаданные таблицы берутся из реестра листов (один запрос), строки
+    заголовков всех листов SHEET_NAMES читаются одним values_batch_get.
+    По ним составляется список исправлений: создание листов, заголовки,
+    сообщения по умолчанию, переносы данных старых форматов. Все исправления
+    отправляются одним batch_update таблицы. Данные листов читаются (одним
+    дополнительным запросом) только если нужен перенос данных.
+    """
+
+    def __init__(self, spreadsheet: gspread.Spreadsheet, worksheets, sheet_names: Dict[str, str],
+                 sheet_headers: Dict[str, List[str]], default_messages: Dict[str, str],
+                 message_types: Dict[str, str]):
+        """
+        Инициализация проверки
+
+        Args:
+            spreadsheet (gspread.Spreadsheet): Открытая таблица
+            worksheets: Реестр листов
+            sheet_names (Dict[str, str]): Логические имена листов -> названия
+            sheet_headers (Dict[str, List[str]]): Ожидаемые заголовки листов
+            default_messages (Dict[str, str]): Тексты системных сообщений по умолчанию
+            message_types (Dict[str, str]): Типы системных сообщений
+        """
+        self._spreadsheet = spreadsheet
+        self._worksheets = worksheets
+        self.sheet_names = sheet_names
+        self.sheet_headers = sheet_headers
+        self.default_messages = default_messages
+        self.message_types = message_types
+
+        # Заголовки листов после чтения: {логическое имя: заголовки или None, если листа нет}
+        self.headers: Dict[str, Optional[List[str]]] = {}
+
+        self._requests: List[dict] = []
+        self._sheet_ids: Dict[str, int] = {}  # {название листа: sheetId}
+        self._grid: Dict[str, List[int]] = {}  # {название листа: [строк, столбцов]}
+        self._resized = False
+        self._api_calls = 0
+
+    @staticmethod
+    def _range(title: str, a1: str = None) -> str:
+        """Диапазон A1 листа (весь лист, если a1 не указан)"""
+        quoted = "'{}'".format(title.replace("'", "''"))
+        return f"{quoted}!{a1}" if a1 else quoted
+
+    def run(self) -> bool:
+        """
+        Проверяет листы и применяет исправления
+
+        Returns:
+            bool: True, если структура листов в порядке или исправлена
+        """
+        started = time.time()
+        try:
+            existing = self._worksheets.all()
+            self._api_calls += 1
+            for title, worksheet in existing.items():
+                self._sheet_ids[title] = worksheet.id
+                self._grid[title] = [worksheet.row_count, worksheet.col_count]
+
+            self.headers = self._read_headers(existing)
+
+            # Данные нужны только для переноса старых форматов (однократно)
+            migrations = [name for name in ("messages", "posts") if self._needs_migration(name)]
+            data = self._read_values([self.sheet_names[name] for name in migrations])
+
+            self._plan_users()
+            self._plan_messages(data.get(self.sheet_names['messages'], []))
+            self._plan_posts(data.get(self.sheet_names['posts'], []))
+
+            if self._requests:
+                self._apply()
+
+            logger.data_processing("sheets", "Проверка структуры листов",
+                                   duration=time.time() - started,
+                                   details={"запросов_api": self._api_calls,
+                                            "исправлений": len(self._requests),
+                                            "нет_листов": [name for name, headers in self.headers.items()
+                                                           if headers is None]})
+            return True
+        except Exception as e:
+            logger.error("проверка_структуры_листов", e)
+            return False
+
+    def _read_headers(self, existing: Dict[str, gspread.Worksheet]) -> Dict[str, Optional[List[str]]]:
+        """Читает строки заголовков всех существующих листов одним запросом"""
+        present = [name for name, title in self.sheet_names.items() if title in existing]
+        headers = {name: None for name in self.sheet_names}
+        if not present:
+            return headers
+        response = self._spreadsheet.values_batch_get(
+            [self._range(self.sheet_names[name], "1:1") for name in present]
+        )
+        self._api_calls += 1
+        for name, value_range in zip(present, response.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            headers[name] = values[0] if values else []
+        return headers
+
+    def _read_values(self, titles: List[str]) -> Dict[str, List[List[str]]]:
+        """Читает все значения листов одним запросом"""
+        if not titles:
+            return {}
+        response = self._spreadsheet.values_batch_get([self._range(title) for title in titles])
+        self._api_calls += 1
+        return {title: fill_gaps(value_range.get("values", []))
+                for title, value_range in zip(titles, response.get("valueRanges", []))}
+
+    def _needs_migration(self, name: str) -> bool:
+        """Нужен ли перенос данных листа в новый формат"""
+        headers = self.headers.get(name)
+        return bool(headers) and len(headers) < len(self.sheet_headers[name])
+
+    def _add_sheet(self, name: str, rows: int, cols: int):
+        """Планирует создание листа"""
+        title = self.sheet_names[name]
+        sheet_id = max(self._sheet_ids.values(), default=0) + 1
+        self._sheet_ids[title] = sheet_id
+        self._grid[title] = [rows, cols]
+        self._requests.append({
+            "addSheet": {
+                "properties": {
+                    "sheetId": sheet_id,
+                    "title": title,
+                    "gridProperties": {"rowCount": rows, "columnCount": cols},
+                }
+            }
+        })
+        logger.init("sheets", f"Создание нового листа {title}")
+
+    def _write(self, name: str, row: int, values: List[List[str]], col: int = 1):
+        """Планирует запись значений, начиная с ячейки (row, col); при нехватке места расширяет лист"""
+        title = self.sheet_names[name]
+        sheet_id = self._sheet_ids[title]
+        grid = self._grid[title]
+        for index, dimension in ((0, "ROWS"), (1, "COLUMNS")):
+            needed = row + len(values) - 1 if index == 0 else col + max(map(len, values)) - 1
+            if needed > grid[index]:
+                self._requests.append({
+                    "appendDimension": {"sheetId": sheet_id, "dimension": dimension,
+                                        "length": needed - grid[index]}
+                })
+                grid[index] = needed
+                self._resized = True
+        self._requests.append({
+            "updateCells": {
+                "start": {"sheetId": sheet_id, "rowIndex": row - 1, "columnIndex": col - 1},
+                "rows": [{"values": [{"userEnteredValue": {"stringValue": str(value)}} for value in row_values]}
+                         for row_values in values],
+                "fields": "userEnteredValue",
+            }
+        })
+
+    def _plan_users(self):
+        """Лист пользователей: создание и заголовки"""
+        expected = self.sheet_headers['users']
+        headers = self.headers.get('users')
+        if headers is None:
+            self._add_sheet('users', rows=1000, cols=len(expected))
+            self._write('users', 1, [expected])
+        elif headers != expected:
+            logger.init("sheets", "Обновление заголовков листа пользователей")
+            self._write('users', 1, [expected])
+
+    def _plan_messages(self, data: List[List[str]]):
+        """Лист сообщений: создание с сообщениями по умолчанию, столбец изображения"""
+        expected = self.sheet_headers['messages']
+        headers = self.headers.get('messages')
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if headers is None:
+            self._add_sheet('messages', rows=100, cols=len(expected))
+            self._write('messages', 1, [expected])
+            default_rows = [[message_type, self.default_messages.get(message_type, ''), "", current_time]
+                            for message_type in self.message_types]
+            self._write('messages', 2, default_rows)
+            logger.init("sheets", "Добавлены сообщения по умолчанию")
+        elif self._needs_migration('messages'):
+            logger.init("sheets", "Обновление структуры таблицы сообщений")
+            self._write('messages', 1, [expected])
+            # Добавляем пустое значение для изображения перед датой
+            for i, row in enumerate(data[1:], start=2):
+                if not row or not any(row):
+                    continue
+                if len(row) < 3 or 'Изображение' not in headers:
+                    message_text = row[1] if len(row) > 1 else ""
+                    date = row[2] if len(row) > 2 else current_time
+                    self._write('messages', i, [[row[0], message_text, "", date]])
+
+    def _plan_posts(self, data: List[List[str]]):
+        """Лист постов: создание и перенос данных в формат со столбцом 'Название'"""
+        expected = self.sheet_headers['posts']
+        headers = self.headers.get('posts')
+        if headers is None:
+            self._add_sheet('posts', rows=1000, cols=10)
+            self._write('posts', 1, [expected])
+        elif self._needs_migration('posts'):
+            logger.init("sheets", "Обновление структуры таблицы постов")
+            self._write('posts', 1, [expected])
+            for i, row in enumerate(data[1:], start=2):
+                if len(row) < 7:  # Пропускаем некорректные строки
+                    continue
+                post_id, old_text = row[0], row[1]
+                # Название - первые 30 символов текста или ID поста
+                title = f"Пост №{post_id}"
+                if old_text:
+                    title_from_text = old_text[:30].strip()
+                    if title_from_text:
+                        title = title_from_text + ("..." if len(old_text) > 30 else "")
+                # Название в столбце B, остальные данные сдвигаются вправо
+                self._write('posts', i, [[title] + row[1:]], col=2)
+
+    def _apply(self):
+        """Отправляет все исправления одним batch_update и обновляет реестр листов"""
+        response = self._spreadsheet.batch_update({"requests": self._requests})
+        self._api_calls += 1
+        for reply in response.get("replies", []):
+            if "addSheet" in reply:
+                self._worksheets.register(gspread.Worksheet(self._spreadsheet, reply["addSheet"]["properties"]))
+        if self._resized:
+            # Размеры существующих листов изменились - список листов перечитается при обращении
+            self._worksheets.invalidate()
+        logger.init("sheets", "Структура листов обновлена")
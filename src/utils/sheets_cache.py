@@ -2,13 +2,17 @@
 Модуль для кэширования данных из Google Sheets
 """
 
-import time
+import os
 from typing import Dict, List, Any, Optional, Callable
 import threading
 import asyncio
-from datetime import datetime
 
 from utils.logger import get_logger
+from utils.sheets_executor import SheetsExecutor, SheetsCallTimeout
+from utils.rate_limiter import SheetsRateLimiter, PRIORITY_NORMAL, PRIORITY_BACKGROUND, OPERATION_READ
+from utils.single_flight import MISS
+from utils.sheets_retry import sheets_retry
+from utils.swr_cache import SWRCache, ttl_from_env
 
 # Получаем логгер для модуля
 logger = get_logger()
@@ -30,224 +34,300 @@ class SheetsCache:
             return
             
         # Инициализация кэшей и настроек
-        self._users_cache = {}  # Кэш пользователей: {telegram_id: user_data}
-        self._users_cache_time = 0
-        self._users_cache_ttl = 300  # 5 минут
+        # Пользователи: у каждой записи свое время загрузки, число записей ограничено (LRU)
+        users_ttl = int(os.getenv("CACHE_USERS_TTL", "300"))
+        users_max_entries = int(os.getenv("CACHE_USERS_MAX_ENTRIES", "10000"))
+        self._users_cache = SWRCache("users", users_ttl, users_ttl,
+                                     max_entries=users_max_entries)  # {telegram_id: user_data}
+        # Проверки регистрации; "не найден" кэшируется ненадолго, чтобы новый пользователь быстро стал виден
+        self._users_exists_cache = SWRCache(
+            "users_exists", users_ttl, users_ttl, max_entries=users_max_entries,
+            negative_ttl=int(os.getenv("CACHE_USERS_NEGATIVE_TTL", "30")),
+            is_negative=lambda exists: exists is False
+        )  # {telegram_id: bool}
         
-        self._messages_cache = {}  # Кэш сообщений: {message_type: message_data}
-        self._messages_cache_time = 0
-        self._messages_cache_ttl = 600  # 10 минут
+        # Сообщения, администраторы и посты после мягкого TTL отдаются сразу и обновляются в фоне
+        # Пока Sheets API недоступен, записи отдаются и после жесткого TTL (деградированный режим)
+        degraded = lambda: sheets_retry.is_degraded
+        self._messages_cache = SWRCache("messages", *ttl_from_env("messages", 600, 3600),
+                                        scheduler=self.schedule_background,
+                                        max_entries=256, serve_expired=degraded)  # {message_type: message_data}
+        self._admins_cache = SWRCache("admins", *ttl_from_env("admins", 300, 3600),
+                                      scheduler=self.schedule_background, copy_values=True,
+                                      serve_expired=degraded)
+        self._posts_cache = SWRCache("posts", *ttl_from_env("posts", 600, 3600),
+                                     scheduler=self.schedule_background, copy_values=True,
+                                     serve_expired=degraded)
+        # Семейства кэша; в каждом одна загрузка на ключ - одновременные промахи ждут общий результат
+        self._caches = {
+            "users": self._users_cache,
+            "users_exists": self._users_exists_cache,
+            "messages": self._messages_cache,
+            "admins": self._admins_cache,
+            "posts": self._posts_cache,
+        }
         
-        self._posts_cache = []  # Кэш постов
-        self._posts_cache_time = 0
-        self._posts_cache_ttl = 600  # 10 минут
+        # Цикл событий бота, в котором выполняются фоновые обновления кэша
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
-        self._admins_cache = []  # Кэш администраторов
-        self._admins_cache_time = 0
-        self._admins_cache_ttl = 300  # 5 минут
+        # Ограничитель запросов: отдельные квоты на чтение и запись
+        self._rate_limiter = SheetsRateLimiter(
+            read_per_minute=int(os.getenv("SHEETS_READ_REQUESTS_PER_MINUTE", "60")),
+            write_per_minute=int(os.getenv("SHEETS_WRITE_REQUESTS_PER_MINUTE", "60")),
+            burst=int(os.getenv("SHEETS_RATE_BURST", "10"))
+        )
         
-        # Счетчик запросов
-        self._requests_count = 0
-        self._requests_time = time.time()
-        self._requests_limit = 60  # Лимит запросов в минуту
-        self._requests_queue = []  # Очередь отложенных запросов
+        # Пул потоков для синхронных вызовов gspread, чтобы не блокировать цикл событий
+        self._executor = SheetsExecutor(
+            max_workers=int(os.getenv("SHEETS_EXECUTOR_WORKERS", "4")),
+            max_queue=int(os.getenv("SHEETS_EXECUTOR_QUEUE_SIZE", "100")),
+            call_timeout=float(os.getenv("SHEETS_CALL_TIMEOUT", "30"))
+        )
         
         self._initialized = True
         logger.init("SheetsCache", "Инициализирован синглтон кэша для Sheets API")
     
-    async def _process_queue(self):
-        """Обрабатывает очередь отложенных запросов"""
-        while self._requests_queue:
-            # Проверяем, можем ли выполнить запрос
-            current_time = time.time()
-            if current_time - self._requests_time >= 60:
-                # Прошла минута, сбрасываем счетчик
-                self._requests_count = 0
-                self._requests_time = current_time
-            
-            if self._requests_count < self._requests_limit:
-                # Можем выполнить запрос
-                func, args, kwargs, future = self._requests_queue.pop(0)
-                try:
-                    self._requests_count += 1
-                    result = func(*args, **kwargs)
-                    future.set_result(result)
-                except Exception as e:
-                    future.set_exception(e)
-            else:
-                # Нужно подождать до сброса счетчика
-                wait_time = 60 - (current_time - self._requests_time)
-                logger.warning("rate_limit", f"Достигнут лимит запросов к API, ожидание {wait_time:.2f}с")
-                await asyncio.sleep(wait_time)
-    
-    async def execute_with_rate_limit(self, func, *args, **kwargs):
-        """Выполняет функцию с учетом ограничения на количество запросов"""
-        with self._lock:
-            current_time = time.time()
-            if current_time - self._requests_time >= 60:
-                # Прошла минута, сбрасываем счетчик
-                self._requests_count = 0
-                self._requests_time = current_time
-            
-            if self._requests_count < self._requests_limit:
-                # Можем выполнить запрос немедленно
-                self._requests_count += 1
-                return func(*args, **kwargs)
-            else:
-                # Ставим запрос в очередь
-                future = asyncio.Future()
-                self._requests_queue.append((func, args, kwargs, future))
-                
-                # Запускаем обработку очереди, если она еще не запущена
-                asyncio.create_task(self._process_queue())
-                
-                # Ждем результата
-                return await future
+    async def execute_with_rate_limit(self, func, *args, priority: int = PRIORITY_NORMAL,
+                                      operation: str = OPERATION_READ, cost: int = 1, **kwargs):
+        """
+        Выполняет функцию в пуле потоков Sheets с учетом квоты запросов
+        
+        Args:
+            func: Синхронная функция, обращающаяся к Sheets API
+            priority (int): Класс приоритета (PRIORITY_INTERACTIVE/NORMAL/BACKGROUND)
+            operation (str): Квота, из которой расходуется запрос: чтение или запись
+            cost (int): Сколько запросов к API делает функция
+        
+        Raises:
+            SheetsCallTimeout: Результат не дождались за SHEETS_CALL_TIMEOUT (вместе с повторами); функция продолжает
+                выполняться в потоке, поэтому исход записи неизвестен (не ошибка)
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        if not sheets_retry.is_open:
+            await self._rate_limiter.acquire(operation, priority, cost)
+        # При разомкнутом выключателе запросы завершатся сразу - квоту не ждем
+        # Синхронный вызов gspread выполняется в отдельном потоке; повторы с паузами -
+        # в цикле событий и вместе укладываются в таймаут вызова
+        return await sheets_retry.run_in_pool(
+            lambda call, timeout: self._executor.run(call, timeout=timeout),
+            func, *args, timeout=self._executor.call_timeout, **kwargs
+        )
+    
+    async def execute_async(self, func, *args, priority: int = PRIORITY_NORMAL,
+                            operation: str = OPERATION_READ, cost: int = 1, **kwargs):
+        """
+        Выполняет асинхронный запрос (метод AsyncSheetsTransport) с учетом квоты, без потока пула
+        
+        Повторяются только чтения; все попытки вместе с паузами укладываются в SHEETS_CALL_TIMEOUT.
+        
+        Raises:
+            SheetsCallTimeout: Запрос не завершился за SHEETS_CALL_TIMEOUT (исход записи неизвестен)
+        """
+        if not sheets_retry.is_open:
+            await self._rate_limiter.acquire(operation, priority, cost)
+        timeout = self._executor.call_timeout
+        try:
+            return await asyncio.wait_for(
+                sheets_retry.run(func, *args, idempotent=operation == OPERATION_READ, timeout=timeout, **kwargs),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            raise SheetsCallTimeout(
+                f"Запрос {getattr(func, '__name__', func)} не завершился за {timeout}с, исход неизвестен"
+            ) from None
+    
+    async def run_in_executor(self, func, *args, **kwargs):
+        """
+        Выполняет синхронную функцию в пуле потоков Sheets без учета лимита запросов
+        
+        Таймаут (SheetsCallTimeout) прекращает только ожидание: поток доработает в фоне.
+        """
+        return await self._executor.run(func, *args, **kwargs)
+    
+    def get_executor_stats(self) -> dict:
+        """Возвращает загрузку пула потоков Sheets (выполняется/в очереди)"""
+        return self._executor.stats()
+    
+    def get_rate_limit_stats(self) -> dict:
+        """Возвращает состояние квот Sheets API и время ожидания в очереди по приоритетам"""
+        return self._rate_limiter.stats()
+    
+    def schedule_background(self, func: Callable[[], Any]) -> bool:
+        """
+        Запускает синхронную функцию в пуле Sheets с фоновым приоритетом квоты, не дожидаясь ее
+        
+        Можно вызывать из любого потока. Возвращает False, если цикл событий
+        еще не запущен или уже закрыт.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        
+        async def run():
+            try:
+                await self.execute_with_rate_limit(func, priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                logger.error("фоновое_обновление_кэша", e)
+        
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(run())
+        else:
+            asyncio.run_coroutine_threadsafe(run(), loop)
+        return True
+    
+    def shutdown(self):
+        """Останавливает пул потоков Sheets"""
+        self._executor.shutdown(wait=False)
+    
+    def peek_user(self, telegram_id: int) -> Any:
+        """Возвращает пользователя из кэша без обращения к API или MISS"""
+        return self._users_cache.peek(telegram_id)
     
     def get_user(self, telegram_id: int, fetch_function: Callable) -> dict:
         """Получает данные пользователя из кэша или через fetch_function"""
-        with self._lock:
-            current_time = time.time()
-            
-            # Проверяем наличие пользователя в кэше
-            if (telegram_id in self._users_cache and 
-                current_time - self._users_cache_time < self._users_cache_ttl):
-                logger.cache_hit("users", details={"telegram_id": telegram_id})
-                return self._users_cache[telegram_id]
-            
-            # Запрашиваем данные у API
-            logger.cache_miss("users", details={"telegram_id": telegram_id})
-            user_data = fetch_function(telegram_id)
-            
-            # Обновляем кэш
-            self._users_cache[telegram_id] = user_data
-            self._users_cache_time = current_time
-            logger.cache_update("users", details={"telegram_id": telegram_id})
-            
-            return user_data
+        return self._users_cache.get(telegram_id, lambda: fetch_function(telegram_id))
+    
+    def peek_user_exists(self, telegram_id: int) -> Any:
+        """Возвращает результат проверки регистрации из кэша (True/False) или MISS"""
+        return self._users_exists_cache.peek(telegram_id)
     
-    def is_user_exists(self, telegram_id: int, fetch_function: Callable) -> bool:
+    def is_user_exists(self, telegram_id: int, fetch_function: Callable, fallback: Callable = None) -> bool:
         """Проверяет существование пользователя через кэш или fetch_function"""
-        with self._lock:
-            # Если пользователь есть в кэше, значит он существует
-            if telegram_id in self._users_cache:
-                logger.cache_hit("users_exists", details={"telegram_id": telegram_id})
-                return True
-            
-            # Иначе проверяем через API
-            logger.cache_miss("users_exists", details={"telegram_id": telegram_id})
-            exists = fetch_function(telegram_id)
-            
-            # Если пользователь существует, добавляем пустую запись в кэш
-            if exists:
-                self._users_cache[telegram_id] = {"exists": True}
-                logger.cache_update("users_exists", details={"telegram_id": telegram_id, "exists": True})
-            
-            return exists
+        return self._users_exists_cache.get(telegram_id, lambda: fetch_function(telegram_id), fallback)
     
-    def get_message(self, message_type: str, fetch_function: Callable) -> dict:
-        """Получает сообщение из кэша или через fetch_function"""
-        with self._lock:
-            current_time = time.time()
-            
-            # Проверяем наличие сообщения в кэше
-            if (message_type in self._messages_cache and 
-                current_time - self._messages_cache_time < self._messages_cache_ttl):
-                logger.cache_hit("messages", details={"message_type": message_type})
-                return self._messages_cache[message_type]
-            
-            # Запрашиваем данные у API
-            logger.cache_miss("messages", details={"message_type": message_type})
-            message_data = fetch_function(message_type)
-            
-            # Обновляем кэш
-            self._messages_cache[message_type] = message_data
-            self._messages_cache_time = current_time
-            logger.cache_update("messages", details={"message_type": message_type})
-            
-            return message_data
+    def peek_message(self, message_type: str) -> Any:
+        """Возвращает сообщение из кэша без ожидания API или MISS (устаревшее - с обновлением в фоне)"""
+        return self._messages_cache.peek(message_type)
+    
+    def get_message(self, message_type: str, fetch_function: Callable, fallback: Callable = None) -> dict:
+        """Получает сообщение из кэша или через fetch_function (fallback - при ошибке загрузки)"""
+        return self._messages_cache.get(message_type, lambda: fetch_function(message_type), fallback)
+    
+    def peek_admins(self) -> Any:
+        """Возвращает копию списка администраторов из кэша или MISS"""
+        return self._admins_cache.peek("admins")
     
-    def get_admins(self, fetch_function: Callable) -> list:
+    def get_admins(self, fetch_function: Callable, fallback: Callable = None) -> list:
         """Получает список администраторов из кэша или через fetch_function"""
-        with self._lock:
-            current_time = time.time()
-            
-            # Проверяем актуальность кэша
-            if (self._admins_cache and 
-                current_time - self._admins_cache_time < self._admins_cache_ttl):
-                logger.cache_hit("admins", details={"count": len(self._admins_cache)})
-                return self._admins_cache.copy()
-            
-            # Запрашиваем данные у API
-            logger.cache_miss("admins")
-            admins = fetch_function()
-            
-            # Обновляем кэш
-            self._admins_cache = admins
-            self._admins_cache_time = current_time
-            logger.cache_update("admins", details={"count": len(admins)})
-            
-            return admins.copy()
+        return self._admins_cache.get("admins", fetch_function, fallback)
+    
+    def peek_posts(self) -> Any:
+        """Возвращает копию списка постов из кэша или MISS"""
+        return self._posts_cache.peek("posts")
     
-    def get_posts(self, fetch_function: Callable) -> list:
+    def get_posts(self, fetch_function: Callable, fallback: Callable = None) -> list:
         """Получает список постов из кэша или через fetch_function"""
-        with self._lock:
-            current_time = time.time()
-            
-            # Проверяем актуальность кэша
-            if (self._posts_cache and 
-                current_time - self._posts_cache_time < self._posts_cache_ttl):
-                logger.cache_hit("posts", details={"count": len(self._posts_cache)})
-                return self._posts_cache.copy()
-            
-            # Запрашиваем данные у API
-            logger.cache_miss("posts")
-            posts = fetch_function()
-            
-            # Обновляем кэш
-            self._posts_cache = posts
-            self._posts_cache_time = current_time
-            logger.cache_update("posts", details={"count": len(posts)})
-            
-            return posts.copy()
+        return self._posts_cache.get("posts", fetch_function, fallback)
+    
+    def remember_message(self, message_type: str, message_data: dict):
+        """Записывает в кэш сообщение, сохраненное в таблицу (без повторного чтения)"""
+        self._messages_cache.set(message_type, message_data)
+    
+    def update_admins(self, mutate: Callable[[list], list]) -> bool:
+        """Применяет к кэшу администраторов изменение, уже записанное в таблицу"""
+        return self._admins_cache.update("admins", mutate)
+    
+    def update_posts(self, mutate: Callable[[list], list]) -> bool:
+        """Применяет к кэшу постов изменение, уже записанное в таблицу"""
+        return self._posts_cache.update("posts", mutate)
+    
+    async def execute_cached(self, family: str, key, peek: Callable[[], Any], func, *args,
+                             copy_result: bool = False, **kwargs):
+        """
+        Асинхронный доступ к кэшу: попадание и ожидание чужой загрузки
+        обрабатываются в цикле событий без потока пула и без расхода квоты
+        
+        Args:
+            family (str): Семейство кэша (users, messages, admins, posts)
+            key: Ключ записи, под которым синхронный метод загружает значение
+            peek (Callable): Проверка кэша, возвращает значение или MISS
+            func: Синхронный метод кэша, выполняемый в пуле при промахе
+            copy_result (bool): Возвращать копию результата чужой загрузки (для списков)
+        """
+        cached = peek()
+        if cached is not MISS:
+            return cached
+        
+        cache = self._caches[family]
+        flight = cache.in_flight(key)
+        if flight is not None:
+            cache.note_coalesced()
+            try:
+                result = await asyncio.wrap_future(flight)
+                return result.copy() if copy_result else result
+            except Exception:
+                # Чужая загрузка не удалась - синхронный метод вернет последнее значение или значение по умолчанию
+                pass
+        
+        return await self.execute_with_rate_limit(func, *args, **kwargs)
+    
+    def reload(self, family: str, key, fetch_function: Callable) -> bool:
+        """Загружает запись семейства заново, даже если она свежая (при ошибке запись остается)"""
+        return self._caches[family].reload(key, fetch_function)
+    
+    def export_snapshot(self) -> dict:
+        """Сообщения, администраторы и посты для снимка на диске (пользователей заменяет индекс)"""
+        admins = self._admins_cache.peek_any("admins")
+        posts = self._posts_cache.peek_any("posts")
+        return {
+            "messages": self._messages_cache.items(),
+            "admins": None if admins is MISS else admins,
+            "posts": None if posts is MISS else posts,
+        }
+    
+    def restore_snapshot(self, data: dict):
+        """Заполняет кэши из снимка на диске без обращения к API"""
+        for message_type, message_data in (data.get("messages") or {}).items():
+            self._messages_cache.set(message_type, message_data)
+        if data.get("admins") is not None:
+            self._admins_cache.set("admins", data["admins"])
+        if data.get("posts") is not None:
+            self._posts_cache.set("posts", data["posts"])
+    
+    def get_cache_stats(self) -> dict:
+        """Возвращает попадания, промахи, вытеснения и объем памяти по семействам кэша"""
+        return {family: cache.stats() for family, cache in self._caches.items()}
+    
+    def remember_user(self, telegram_id: int, user_data: dict = None):
+        """Добавляет пользователя в кэш без обращения к API (после регистрации)"""
+        self._users_exists_cache.set(telegram_id, True)
+        if user_data is not None:
+            self._users_cache.set(telegram_id, user_data)
     
     def invalidate_user_cache(self, telegram_id: int = None):
         """Сбрасывает кэш пользователя или всех пользователей"""
-        with self._lock:
-            if telegram_id is not None:
-                if telegram_id in self._users_cache:
-                    del self._users_cache[telegram_id]
-                    logger.cache_update("users", details={"action": "invalidate", "telegram_id": telegram_id})
-            else:
-                self._users_cache = {}
-                self._users_cache_time = 0
-                logger.cache_update("users", details={"action": "invalidate_all"})
+        if telegram_id is not None:
+            self._users_cache.invalidate(telegram_id)
+            self._users_exists_cache.invalidate(telegram_id)
+            logger.cache_update("users", details={"action": "invalidate", "telegram_id": telegram_id})
+        else:
+            self._users_cache.invalidate()
+            self._users_exists_cache.invalidate()
+            logger.cache_update("users", details={"action": "invalidate_all"})
     
     def invalidate_messages_cache(self, message_type: str = None):
         """Сбрасывает кэш сообщения или всех сообщений"""
-        with self._lock:
-            if message_type is not None:
-                if message_type in self._messages_cache:
-                    del self._messages_cache[message_type]
-                    logger.cache_update("messages", details={"action": "invalidate", "message_type": message_type})
-            else:
-                self._messages_cache = {}
-                self._messages_cache_time = 0
-                logger.cache_update("messages", details={"action": "invalidate_all"})
+        if message_type is not None:
+            self._messages_cache.invalidate(message_type)
+            logger.cache_update("messages", details={"action": "invalidate", "message_type": message_type})
+        else:
+            self._messages_cache.invalidate()
+            logger.cache_update("messages", details={"action": "invalidate_all"})
     
     def invalidate_posts_cache(self):
         """Сбрасывает кэш постов"""
-        with self._lock:
-            self._posts_cache = []
-            self._posts_cache_time = 0
-            logger.cache_update("posts", details={"action": "invalidate"})
+        self._posts_cache.invalidate()
+        logger.cache_update("posts", details={"action": "invalidate"})
     
     def invalidate_admins_cache(self):
         """Сбрасывает кэш администраторов"""
-        with self._lock:
-            self._admins_cache = []
-            self._admins_cache_time = 0
-            logger.cache_update("admins", details={"action": "invalidate"})
+        self._admins_cache.invalidate()
+        logger.cache_update("admins", details={"action": "invalidate"})
     
     def invalidate_all_caches(self):
         """Сбрасывает все кэши"""
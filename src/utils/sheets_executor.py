@@ -0,0 +1,161 @@
+"""
+Модуль с пулом потоков для выполнения синхронных вызовов Google Sheets API
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class SheetsExecutorOverloaded(Exception):
+    """Очередь пула Sheets переполнена, новый вызов отклонен"""
+
+
+class SheetsCallTimeout(asyncio.TimeoutError):
+    """
+    Результат вызова Sheets API не дождались за отведенное время.
+
+    Исход неизвестен: поток пула не прерывается и продолжает вызов, поэтому
+    запись может завершиться уже после таймаута. Вызывающая сторона не должна
+    считать такую запись неудачной и повторять ее вслепую.
+    """
+
+
+class SheetsExecutor:
+    """
+    Ограниченный пул потоков для синхронных методов gspread.
+
+    Каждый вызов выполняется в отдельном потоке, поэтому цикл событий бота
+    не блокируется на время HTTP-запроса к Google. Количество одновременно
+    выполняемых вызовов ограничено числом потоков, количество ожидающих -
+    размером очереди. Слот освобождается только после фактического завершения
+    потока, даже если вызывающая сторона перестала ждать по таймауту.
+
+    Таймаут ограничивает только ожидание: Python не умеет прерывать поток,
+    поэтому вызов доработает в фоне, а вызывающий получит SheetsCallTimeout.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 100, call_timeout: float = 30.0):
+        """
+        Инициализация пула
+
+        Args:
+            max_workers (int): Количество потоков для вызовов Sheets API
+            max_queue (int): Максимальное количество вызовов, ожидающих свободный поток
+            call_timeout (float): Таймаут ожидания результата одного вызова в секундах
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.call_timeout = call_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sheets")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+
+        # Счетчики для мониторинга насыщения пула
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._rejected = 0
+
+        logger.init("SheetsExecutor", "Пул потоков для Sheets API создан",
+                    details={"потоков": self.max_workers, "очередь": self.max_queue,
+                             "таймаут": self.call_timeout})
+
+    def _on_done(self, future):
+        """Освобождает слот после завершения потока"""
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def _run_tracked(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        """Выполняется в потоке пула: переводит вызов из очереди в работу"""
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        return func(*args, **kwargs)
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Выполняет синхронную функцию в пуле потоков
+
+        Args:
+            func (Callable): Синхронная функция (обычно метод GoogleSheets)
+            timeout (Optional[float]): Таймаут вызова; по умолчанию call_timeout пула
+
+        Returns:
+            Any: Результат функции
+
+        Raises:
+            SheetsExecutorOverloaded: Если очередь пула заполнена
+            SheetsCallTimeout: Если вызов не завершился за отведенное время (исход неизвестен,
+                поток продолжает выполнение)
+        """
+        with self._lock:
+            if self._queued >= self.max_queue + max(0, self.max_workers - self._in_flight):
+                self._rejected += 1
+                raise SheetsExecutorOverloaded(
+                    f"Очередь Sheets API переполнена ({self._queued} ожидающих, {self._in_flight} выполняется)"
+                )
+            self._queued += 1
+
+        try:
+            future = self._executor.submit(self._run_tracked, func, args, kwargs)
+        except RuntimeError:
+            # Пул уже остановлен
+            with self._lock:
+                self._queued -= 1
+            raise
+
+        def on_done(f):
+            # Вызов отменен до старта потока - он так и не попал в работу
+            if f.cancelled():
+                with self._lock:
+                    self._queued -= 1
+                    self._failed += 1
+                return
+            self._on_done(f)
+
+        future.add_done_callback(on_done)
+
+        call_timeout = self.call_timeout if timeout is None else timeout
+        try:
+            # shield не дает wait_for отменить concurrent-future: поток все равно доработает
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), call_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            logger.warning("Превышено время ожидания вызова Sheets API (sheets_call_timeout)",
+                           details={"функция": getattr(func, "__name__", str(func)), "таймаут": call_timeout})
+            raise SheetsCallTimeout(
+                f"Вызов {getattr(func, '__name__', func)} не завершился за {call_timeout}с, исход неизвестен"
+            ) from None
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает текущую загрузку пула"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timed_out": self._timed_out,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Останавливает пул потоков"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.init("SheetsExecutor", "Пул потоков остановлен", details=self.stats())
@@ -2,41 +2,38 @@
 Методы для работы с вопросами в Google Sheets
 """
 
-import time
 from utils.sheets import GoogleSheets
+from utils.sheets_cache import sheets_cache
+from utils.respondents_index import respondents_index
+from utils.stats_aggregator import stats_aggregator
+from utils.stats_renderer import stats_renderer
+from utils.stats_refresher import stats_refresher
 from utils.logger import get_logger
+from utils.sheets_retry import SheetsCircuitOpen
+from utils.rate_limiter import PRIORITY_INTERACTIVE
 from gspread.exceptions import APIError
 
 # Получаем логгер для модуля
 logger = get_logger()
 
-# Добавление функции для безопасного выполнения API-запросов с повторными попытками
-def safe_api_call(func, max_retries=3, base_delay=2):
-    """Декоратор для безопасного выполнения API-запросов с повторными попытками при превышении квоты"""
+# Обработка ошибок API-запросов; повторы при превышении квоты выполняет клиент (sheets_retry)
+def safe_api_call(func):
+    """Декоратор для безопасного выполнения API-запросов: ошибка записывается в лог, результат - False"""
     def wrapper(*args, **kwargs):
-        retries = 0
-        while retries < max_retries:
-            try:
-                return func(*args, **kwargs)
-            except APIError as e:
-                if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
-                    wait_time = base_delay * (2 ** retries)  # экспоненциальная задержка
-                    logger.data_processing("api_quota_exceeded", f"Превышение квоты API Google Sheets", 
-                                         details={"ожидание": f"{wait_time} сек", "попытка": f"{retries+1}/{max_retries}"})
-                    time.sleep(wait_time)
-                    retries += 1
-                    if retries == max_retries:
-                        logger.error("исчерпаны_все_попытки_выполнения_api_запроса_последняя_ошибка", e, 
-                                    details={"модуль": "sheets_questions"})
-                        return False
-                else:
-                    logger.error("ошибка_api_google_sheets", e, 
-                                details={"модуль": "sheets_questions"})
-                    return False
-            except Exception as e:
-                logger.error("неожиданная_ошибка", e, 
-                            details={"модуль": "sheets_questions"})
-                return False
+        try:
+            return func(*args, **kwargs)
+        except SheetsCircuitOpen:
+            logger.warning("Запрос к Google Sheets не отправлен: API временно недоступен (circuit_open)",
+                           details={"модуль": "sheets_questions"})
+            return False
+        except APIError as e:
+            logger.error("ошибка_api_google_sheets", e, 
+                        details={"модуль": "sheets_questions"})
+            return False
+        except Exception as e:
+            logger.error("неожиданная_ошибка", e, 
+                        details={"модуль": "sheets_questions"})
+            return False
     return wrapper
 
 # Добавляем методы в класс GoogleSheets
@@ -48,7 +45,7 @@ def add_question(self, question: str, options: list = None) -> bool:
         logger.data_processing("варианты", f"Варианты ответов: {options}", 
                                details={"количество": len(options) if options else 0})
         
-        questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+        questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
         
         # Подготавливаем данные для добавления
         row_data = [question]
@@ -93,10 +90,12 @@ def add_question(self, question: str, options: list = None) -> bool:
         def append_row():
             return questions_sheet.append_row(row_data, value_input_option='USER_ENTERED')
         
-        append_row()
-        
-        # Инвалидируем кэш вопросов
-        self.invalidate_questions_cache()
+        if append_row() is False:
+            # Запись не подтверждена - кэш перечитается из таблицы
+            self.invalidate_questions_cache()
+        else:
+            # Добавляем вопрос в кэш без повторного чтения листа
+            self._cache_question_row(None, row_data)
         
         # Обновляем структуру других листов
         self.update_sheets_structure()
@@ -139,7 +138,7 @@ def edit_question_text(self, question_index: int, new_text: str) -> bool:
         logger.data_processing("вопрос", f"Редактирование текста вопроса", 
                              details={"индекс": question_index, "новый_текст": new_text})
         
-        questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+        questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
         
         # Проверяем, что индекс - это число
         if not isinstance(question_index, int):
@@ -156,6 +155,15 @@ def edit_question_text(self, question_index: int, new_text: str) -> bool:
         # Обновляем текст вопроса
         questions_sheet.update_cell(row_index, 1, new_text)
         
+        # Переименовываем вопрос в кэше, сохраняя его варианты
+        def rename(questions: dict) -> dict:
+            items = list(questions.items())
+            if question_index >= len(items):
+                raise LookupError(f"Вопрос {question_index} отсутствует в кэше")
+            items[question_index] = (new_text, items[question_index][1])
+            return dict(items)
+        self.questions_cache.apply_change(rename)
+        
         # Обновляем структуру других листов
         self.update_sheets_structure()
         
@@ -177,7 +185,7 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
 
     try:
         # Получаем таблицу вопросов
-        questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+        questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
         
         # Получаем текст вопроса из листа
         row = question_index + 2  # +2 для учета заголовка и 0-индексации
@@ -194,7 +202,7 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
                                 details={"free_text_prompt": free_text_prompt, "parent_option_text": parent_option_text})
             
             # Очищаем существующие варианты ответов
-            all_values = questions_sheet.get_all_values()
+            all_values = self.read_loader.get_all_values(questions_sheet)
             num_columns = len(all_values[0]) if all_values else 5
             clear_range = f"B{row}:{chr(65 + min(num_columns, 26))}{row}"
             questions_sheet.batch_clear([clear_range])
@@ -204,6 +212,7 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
             
             # Теперь сохраняем варианты с учетом free_text_prompt
             col = 2  # Начинаем со второго столбца (B)
+            written_row = [question_text]
             
             for i, opt in enumerate(options):
                 if isinstance(opt, dict) and "text" in opt:
@@ -236,8 +245,12 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
                 logger.data_processing("таблицы", f"Добавляем в строку вариант для свободного ввода", 
                                     details={"столбец": col, "вариант": options_str})
                 questions_sheet.update_cell(row, col, options_str)
+                written_row.append(options_str)
                 col += 1
             
+            # Применяем записанную строку к кэшу вопросов
+            self._cache_question_row(question_index, written_row, question_text)
+            
             # Обновляем структуру листов после редактирования
             self.update_sheets_structure()
             
@@ -259,7 +272,7 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
         
         # Сначала очистим все существующие варианты ответов в строке
         # Получаем общее количество столбцов в таблице
-        all_values = questions_sheet.get_all_values()
+        all_values = self.read_loader.get_all_values(questions_sheet)
         num_columns = len(all_values[0]) if all_values else 5  # По умолчанию 5 столбцов
         
         # Очищаем ячейки со 2-й по последнюю в строке
@@ -271,6 +284,7 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
         
         # Теперь сохраняем новые варианты ответов в отдельные ячейки
         col = 2  # Начинаем со второго столбца (B)
+        written_row = [question_text]
         for opt in options:
             if isinstance(opt, dict) and "text" in opt:
                 if "sub_options" in opt and isinstance(opt["sub_options"], list):
@@ -302,9 +316,13 @@ def edit_question_options(self, question_index: int, options: list, free_text_pr
             # Сохраняем в ячейку в текущем столбце
             logger.data_processing("таблицы", f"Добавляем в строку вариант", details={"вариант": options_str})
             questions_sheet.update_cell(row, col, options_str)
+            written_row.append(options_str)
             # Переходим к следующему столбцу
             col += 1
 
+        # Применяем записанную строку к кэшу вопросов
+        self._cache_question_row(question_index, written_row, question_text)
+
         # Обновляем структуру листов после редактирования
         self.update_sheets_structure()
         
@@ -398,7 +416,7 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
         # Если опция не найдена, проверяем варианты с другой структурой в таблице
         if not option_found:
             # Получаем напрямую данные из таблицы для проверки
-            questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+            questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
             row_index = question_index + 2  # +2 для учета заголовка и индексации с 0
             row_data = questions_sheet.row_values(row_index)
             
@@ -421,8 +439,10 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
                     
                     option_found = True
                     
-                    # Инвалидируем кэш и обновляем структуру листов
-                    self.invalidate_questions_cache()
+                    # Применяем измененную ячейку к кэшу и обновляем структуру листов
+                    updated_row = list(row_data)
+                    updated_row[col_index - 1] = formatted_value
+                    self._cache_question_row(question_index, updated_row, question)
                     self.update_sheets_structure()
                     return True
             
@@ -447,7 +467,7 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
                                 option_found = True
                                 
                                 # Обновляем вариант
-                                questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+                                questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
                                 # Находим колонку с этим вариантом
                                 row_data = questions_sheet.row_values(row_index)
                                 for col_index, cell_value in enumerate(row_data[1:], start=2):
@@ -458,10 +478,11 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
                                         questions_sheet.update_cell(row_index, col_index, formatted_value)
                                         logger.data_processing("таблицы", f"Обновлена ячейка {row_index}:{col_index} со значением '{formatted_value}'", 
                                                              details={"действие": "операция"})
+                                        row_data[col_index - 1] = formatted_value
                                         break
                                 
-                                # Инвалидируем кэш и обновляем структуру листов
-                                self.invalidate_questions_cache()
+                                # Применяем измененную строку к кэшу и обновляем структуру листов
+                                self._cache_question_row(question_index, row_data, question)
                                 self.update_sheets_structure()
                                 return True
                 
@@ -470,7 +491,7 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
         # Сохраняем обновленные варианты в случае, если опция найдена через обычные методы
         @safe_api_call
         def update_options():
-            questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+            questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
             # Учитываем заголовок (+2)
             row = question_index + 2
             
@@ -524,13 +545,14 @@ def edit_question_options_with_free_text(self, question_index: int, option_text:
             logger.data_processing("таблицы", f"Обновлён диапазон {range_name}", 
                                  details={"действие": "операция"})
             
-            return True
+            return row_data
         
-        success = update_options()
+        written_row = update_options()
+        success = bool(written_row)
         
         if success:
-            # Инвалидируем кэш вопросов
-            self.invalidate_questions_cache()
+            # Применяем записанную строку к кэшу вопросов
+            self._cache_question_row(question_index, written_row, question)
             
             # Обновляем структуру других листов
             self.update_sheets_structure()
@@ -574,7 +596,7 @@ def delete_question(self, question_or_index) -> bool:
         logger.data_processing("таблицы", f"Запрос на удаление вопроса: {question_or_index}", 
                              details={"действие": "операция"})
         
-        questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+        questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
         all_questions = questions_sheet.col_values(1)
         
         # Пропускаем заголовок
@@ -608,6 +630,9 @@ def delete_question(self, question_or_index) -> bool:
         # Удаляем строку
         questions_sheet.delete_rows(row_index)
         
+        # Удаляем вопрос из кэша без повторного чтения листа
+        self._uncache_question(question_index, all_questions[question_index])
+        
         # Обновляем структуру других листов
         self.update_sheets_structure()
         
@@ -626,19 +651,23 @@ def clear_answers_and_stats(self) -> bool:
         logger.data_processing("таблицы", "Начало очистки таблиц с ответами и статистикой", 
                              details={"действие": "операция"})
         
+        # Сбрасываем ответы, ожидающие записи
+        self.answers_buffer.discard()
+        
         # Очищаем таблицу ответов
-        answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
+        answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
         # Получаем все значения для определения диапазона данных
-        all_values = answers_sheet.get_all_values()
+        all_values = self.read_loader.get_all_values(answers_sheet)
         if len(all_values) > 1:  # Если есть данные кроме заголовка
             # Очищаем все строки кроме заголовка
             answers_sheet.batch_clear([f"A2:Z{len(all_values)}"])
         
-        # Очищаем таблицу статистики
-        stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-        all_values = stats_sheet.get_all_values()
-        if len(all_values) > 1:
-            stats_sheet.batch_clear([f"A2:Z{len(all_values)}"])
+        # Очищаем таблицу статистики, оставляя заголовки
+        stats_sheet = self.worksheets.get(self.STATS_SHEET)
+        stats_renderer.write(stats_sheet, stats_renderer.build_table_grid([]))
+        
+        respondents_index.clear()
+        stats_aggregator.clear()
         
         logger.data_processing("очистка", "Таблицы успешно очищены", 
                              details={"действие": "операция"})
@@ -683,10 +712,10 @@ def add_admin(self, admin_id: int, admin_name: str, admin_description: str) -> b
     try:
         logger.data_processing("таблицы", f"Добавление нового администратора: {admin_id}", 
                              details={"действие": "операция"})
-        admins_sheet = self.sheet.worksheet(self.ADMINS_SHEET)
+        admins_sheet = self.worksheets.get(self.ADMINS_SHEET)
         
         # Получаем текущий список администраторов
-        admins = admins_sheet.get_all_values()
+        admins = self.read_loader.get_all_values(admins_sheet)
         
         # Проверяем, есть ли уже такой администратор
         if str(admin_id) in [admin[0] for admin in admins]:
@@ -697,6 +726,11 @@ def add_admin(self, admin_id: int, admin_name: str, admin_description: str) -> b
         
         # Добавляем нового админа
         admins_sheet.append_row([str(admin_id), admin_name, admin_description])
+        
+        # Добавляем админа в кэш без повторного чтения листа
+        new_admin_id = int(admin_id)
+        sheets_cache.update_admins(lambda admin_ids: admin_ids if new_admin_id in admin_ids
+                                   else admin_ids + [new_admin_id])
         logger.data_processing("успех", f"Администратор {admin_id} успешно добавлен", 
                                 details={"действие": "операция"})
         return True
@@ -711,13 +745,13 @@ def remove_admin(self, admin_id: int) -> bool:
     try:
         logger.data_processing("таблицы", f"Удаление администратора: {admin_id}", 
                              details={"действие": "операция"})
-        admins_sheet = self.sheet.worksheet(self.ADMINS_SHEET)
+        admins_sheet = self.worksheets.get(self.ADMINS_SHEET)
         
         # Получаем все ID админов
         admin_cells = admins_sheet.col_values(1)
         
         # Проверяем наличие администратора
-        if str(admin_id) not in [admin[0] for admin in admins_sheet.get_all_values()]:
+        if str(admin_id) not in [admin[0] for admin in self.read_loader.get_all_values(admins_sheet)]:
             logger.data_processing(f"Администратор не найден", 
                                  details={"admin_id": admin_id}, 
                                  type="admin_not_found")
@@ -725,6 +759,11 @@ def remove_admin(self, admin_id: int) -> bool:
         
         # Удаляем строку
         admins_sheet.delete_rows(admin_cells.index(str(admin_id)) + 1)
+        
+        # Убираем админа из кэша (админы из ADMIN_IDS остаются в списке, как при загрузке)
+        removed_admin_id = int(admin_id)
+        if removed_admin_id not in self._env_admin_ids():
+            sheets_cache.update_admins(lambda admin_ids: [item for item in admin_ids if item != removed_admin_id])
         logger.data_processing("успех", f"Администратор {admin_id} успешно удален", 
                                 details={"действие": "операция"})
         return True
@@ -739,8 +778,11 @@ async def get_admins_list(self) -> list:
     try:
         from telegram.error import TimedOut, NetworkError
         
-        admins_sheet = self.sheet.worksheet(self.ADMINS_SHEET)
-        admin_ids = [int(id) for id in admins_sheet.col_values(1)[1:]]  # Пропускаем заголовок
+        # Чтение листа выполняется в пуле потоков Sheets, чтобы не блокировать цикл событий
+        admin_cells = await sheets_cache.execute_with_rate_limit(
+            lambda: self.worksheets.get(self.ADMINS_SHEET).col_values(1), priority=PRIORITY_INTERACTIVE
+        )
+        admin_ids = [int(id) for id in admin_cells[1:]]  # Пропускаем заголовок
         
         admin_info = []
         for admin_id in admin_ids:
@@ -803,12 +845,12 @@ def update_sheets_structure(self) -> bool:
         question_texts = list(questions.keys())
         
         # Обновляем лист ответов
-        answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
+        answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
         # Формируем заголовки: Timestamp, User ID, все вопросы
         new_headers = ['Timestamp', 'User ID'] + question_texts
         
         # Получаем текущие данные
-        existing_data = answers_sheet.get_all_values()
+        existing_data = self.read_loader.get_all_values(answers_sheet)
         if len(existing_data) > 0:
             # Сохраняем все строки кроме заголовка
             existing_rows = existing_data[1:] if len(existing_data) > 1 else []
@@ -838,7 +880,7 @@ def update_sheets_structure(self) -> bool:
             answers_sheet.update('A1', [new_headers])
         
         # Обновляем лист статистики
-        stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
+        stats_sheet = self.worksheets.get(self.STATS_SHEET)
         stats_data = []
         
         # Добавляем заголовки
@@ -872,13 +914,8 @@ def update_sheets_structure(self) -> bool:
                         # Для обратной совместимости со старым форматом
                         stats_data.append([question, option, '0'])
         
-        # Обновляем весь лист статистики
-        if stats_data:
-            stats_sheet.clear()  # Очищаем текущие данные
-            stats_sheet.update('A1', stats_data)  # Добавляем новые данные
-        else:
-            # Если нет вопросов с вариантами, оставляем только заголовки
-            stats_sheet.update('A1', [['Вопрос', 'Вариант ответа', 'Количество']])
+        # Обновляем весь лист статистики одним запросом (остаток старой таблицы очищается)
+        stats_renderer.write(stats_sheet, stats_data)
         
         # Повторно получаем вопросы для проверки сохранения структуры
         updated_questions = self.get_questions_with_options()
@@ -886,7 +923,7 @@ def update_sheets_structure(self) -> bool:
                              details={"действие": "операция"})
         
         # Проверяем сохранение вариантов с пустыми списками sub_options и free_text_prompt после обновления
-        questions_sheet = self.sheet.worksheet(self.QUESTIONS_SHEET)
+        questions_sheet = self.worksheets.get(self.QUESTIONS_SHEET)
         
         # Проверяем строки для восстановления free_text_prompt если необходимо
         for i, (question, options) in enumerate(original_questions.items(), start=1):
@@ -939,7 +976,14 @@ def update_sheets_structure(self) -> bool:
 def has_user_completed_survey(self, user_id: int) -> bool:
     """Проверка, проходил ли пользователь опрос"""
     try:
-        answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
+        # Загруженный индекс отвечает без обращения к API
+        completed = respondents_index.contains(user_id)
+        if completed is not None:
+            return completed
+        # Ответы могут еще находиться в буфере отложенной записи
+        if self.answers_buffer.has_pending(user_id):
+            return True
+        answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
         # Получаем столбец с ID пользователей
         user_ids = answers_sheet.col_values(2)[1:]  # Пропускаем заголовок
         # Проверяем, есть ли ID пользователя в списке
@@ -952,23 +996,26 @@ def has_user_completed_survey(self, user_id: int) -> bool:
 def reset_user_survey(self, user_id: int) -> bool:
     """Удаление ответов конкретного пользователя"""
     try:
-        answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
+        # Ответы, еще не записанные в таблицу, просто убираем из буфера
+        for row in self.answers_buffer.discard(user_id):
+            stats_aggregator.remove_answers(user_id, row[2:])
+        respondents_index.remove(user_id)
+        answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
         # Получаем все данные
-        all_values = answers_sheet.get_all_values()
+        all_values = self.read_loader.get_all_values(answers_sheet)
         if len(all_values) <= 1:  # Только заголовок или пустой лист
             return True
             
         # Ищем строки с ответами пользователя
-        headers = all_values[0]
         rows_to_delete = []
         
         # Собираем ответы пользователя для обновления статистики
-        user_answers = []
+        removed_answers = []
         
         for i, row in enumerate(all_values[1:], start=2):  # start=2 для учета реальных номеров строк
-            if row[1] == str(user_id):  # Проверяем ID пользователя (второй столбец)
+            if len(row) > 1 and row[1] == str(user_id):  # Проверяем ID пользователя (второй столбец)
                 rows_to_delete.append(i)
-                user_answers = row[2:]  # Сохраняем ответы пользователя (начиная с 3-го столбца)
+                removed_answers.append(row[2:])  # Ответы пользователя (начиная с 3-го столбца)
         
         if not rows_to_delete:
             return True  # Нет ответов для удаления
@@ -977,24 +1024,10 @@ def reset_user_survey(self, user_id: int) -> bool:
         for row_index in sorted(rows_to_delete, reverse=True):
             answers_sheet.delete_rows(row_index)
             
-        # Обновляем статистику
-        stats_sheet = self.sheet.worksheet(self.STATS_SHEET)
-        questions = headers[2:]  # Получаем список вопросов
-        questions_with_options = self.get_questions_with_options()
-        
-        # Получаем текущую статистику
-        stats_data = stats_sheet.get_all_values()
-        if len(stats_data) > 1:  # Есть данные кроме заголовка
-            for q_idx, (question, answer) in enumerate(zip(questions, user_answers)):
-                if question in questions_with_options and questions_with_options[question]:
-                    # Ищем строку с соответствующим вопросом и ответом
-                    for row_idx, row in enumerate(stats_data[1:], start=2):
-                        if row[0] == question and row[1] == answer:
-                            # Уменьшаем счетчик
-                            current_count = int(row[2])
-                            if current_count > 0:
-                                stats_sheet.update_cell(row_idx, 3, str(current_count - 1))
-                            break
+        # Вычитаем удаленные ответы из статистики, лист статистики обновится в фоне
+        for answers in removed_answers:
+            stats_aggregator.remove_answers(user_id, answers)
+        stats_refresher.mark_dirty("сброс ответов пользователя")
         
         logger.data_processing("успех", f"Ответы пользователя {user_id} успешно удалены и статистика обновлена", 
                                         details={"действие": "операция"})
@@ -1008,9 +1041,12 @@ def reset_user_survey(self, user_id: int) -> bool:
 def get_total_surveys_count(self) -> int:
     """Получение общего количества пройденных опросов"""
     try:
-        answers_sheet = self.sheet.worksheet(self.ANSWERS_SHEET)
+        # Агрегатор статистики знает количество анкет без чтения листа
+        if stats_aggregator.is_loaded:
+            return stats_aggregator.get_total_responses()
+        answers_sheet = self.worksheets.get(self.ANSWERS_SHEET)
         # Получаем все значения из листа ответов
-        all_values = answers_sheet.get_all_values()
+        all_values = self.read_loader.get_all_values(answers_sheet)
         # Вычитаем 1 для учета заголовка
         return len(all_values) - 1 if len(all_values) > 1 else 0
     except Exception as e:
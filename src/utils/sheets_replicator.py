@@ -0,0 +1,289 @@
+"""
+Модуль с репликацией изменений локального хранилища в Google Sheets
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from utils.local_store import SQLiteSheetStore, OP_APPEND, OP_UPDATE, OP_CLEAR, OP_DELETE, replay_ops
+from utils.logger import get_logger
+from utils.rate_limiter import PRIORITY_BACKGROUND, OPERATION_READ, OPERATION_WRITE
+from utils.sheets_cache import sheets_cache
+from utils.sheets_retry import sheets_retry
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+def _range(title: str, a1: str = None) -> str:
+    """Диапазон A1 листа (весь лист, если a1 не указан)"""
+    quoted = "'{}'".format(title.replace("'", "''"))
+    return f"{quoted}!{a1}" if a1 else quoted
+
+
+class SheetsReplicator:
+    """
+    Отправляет изменения из очереди локального хранилища в таблицу пачками.
+
+    Изменения отправляются строго по порядку. Подряд идущие изменения одного
+    вида объединяются в один запрос: добавления строк в лист - в один
+    values_append, записи значений всех листов - в один values_batch_update,
+    очистки - в один values_batch_clear, удаления строк - в один batch_update.
+    Изменение удаляется из очереди только после успешного ответа API, поэтому
+    после перезапуска бота отправка продолжится с того же места. Если таблица
+    недоступна, отправка останавливается до следующего интервала; изменение,
+    которое таблица отклонила как некорректное (4xx), пропускается с ошибкой
+    в журнале, чтобы не блокировать очередь.
+
+    Номерам строк из очереди не доверяем: перед отправкой изменений и
+    удалений строк листы читаются из таблицы, и строки находятся по
+    содержимому (replay_ops). Изменение строки, которую в таблице уже
+    изменили вручную, не отправляется (конфликт): лист перезагружается
+    из таблицы через on_conflict.
+    """
+
+    def __init__(self, store: SQLiteSheetStore, request: Callable[..., Awaitable[Any]],
+                 sheet_id: Callable[[str], int], interval_ms: int = 2000, max_ops: int = 200,
+                 on_conflict: Optional[Callable[[List[str]], Awaitable[Any]]] = None):
+        """
+        Инициализация репликации
+
+        Args:
+            store (SQLiteSheetStore): Локальное хранилище с очередью изменений
+            request (Callable): Корутина request(метод таблицы, *args, priority=..., operation=..., **kwargs),
+                выполняющая один запрос к API (GoogleSheets.async_api_request)
+            sheet_id (Callable): Возвращает sheetId по названию листа (для удаления строк)
+            interval_ms (int): Интервал отправки очереди, мс
+            max_ops (int): Максимум изменений, читаемых из очереди за один проход
+            on_conflict (Callable): Корутина on_conflict(названия листов) - перезагрузка листов,
+                изменения которых пропущены из-за конфликта с правками в таблице
+        """
+        self.store = store
+        self._request = request
+        self._sheet_id = sheet_id
+        self.interval = max(0.1, interval_ms / 1000)
+        self.max_ops = max(1, max_ops)
+        self.on_conflict = on_conflict
+
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._replicated_ops = 0
+        self._api_calls = 0
+        self._errors = 0
+        self._skipped = 0
+        self._conflicts = 0
+        self._conflicted_titles = set()
+
+    @property
+    def flush_lock(self) -> asyncio.Lock:
+        """Блокировка отправки очереди (ее держит и загрузка правок из таблицы)"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    @staticmethod
+    def _groups(ops: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Разбивает изменения на подряд идущие группы, отправляемые одним запросом"""
+        def group_key(op: Dict[str, Any]) -> tuple:
+            if op["op"] == OP_APPEND:
+                return (OP_APPEND, op["title"])
+            if op["op"] == OP_UPDATE:
+                return (OP_UPDATE, op["payload"]["input"])
+            return (op["op"],)
+
+        groups: List[List[Dict[str, Any]]] = []
+        for op in ops:
+            if groups and group_key(groups[-1][0]) == group_key(op):
+                groups[-1].append(op)
+            else:
+                groups.append([op])
+        return groups
+
+    async def _write(self, method: str, *args, **kwargs):
+        """Один запрос записи к API таблицы с фоновым приоритетом"""
+        return await self._request(method, *args, priority=PRIORITY_BACKGROUND, operation=OPERATION_WRITE,
+                                   **kwargs)
+
+    async def _send(self, group: List[Dict[str, Any]]):
+        """Отправляет группу изменений одним запросом"""
+        kind = group[0]["op"]
+        if kind == OP_APPEND:
+            await self._write(
+                "values_append", _range(group[0]["title"], "A1"),
+                params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                body={"values": [row for op in group for row in op["payload"]["rows"]]}
+            )
+        elif kind == OP_UPDATE:
+            await self._write("values_batch_update", body={
+                "valueInputOption": group[0]["payload"]["input"],
+                "data": [{"range": _range(op["title"], rowcol_to_a1(op["payload"]["row"], op["payload"]["col"])),
+                          "values": op["payload"]["values"]} for op in group]
+            })
+        elif kind == OP_CLEAR:
+            await self._write("values_batch_clear", body={
+                "ranges": [_range(op["title"], range_name)
+                           for op in group for range_name in op["payload"]["ranges"]]
+            })
+        elif kind == OP_DELETE:
+            # sheetId берется из реестра листов (при первом обращении - запросом метаданных в пуле)
+            sheet_ids = {title: await sheets_cache.run_in_executor(self._sheet_id, title)
+                         for title in {op["title"] for op in group}}
+            await self._write("batch_update", {"requests": [{
+                "deleteDimension": {"range": {
+                    "sheetId": sheet_ids[op["title"]],
+                    "dimension": "ROWS",
+                    "startIndex": op["payload"]["start"] - 1,
+                    "endIndex": op["payload"]["end"],
+                }}
+            } for op in group]})
+        else:
+            raise ValueError(f"Неизвестное изменение: {kind}")
+
+    async def _resolve(self, ops: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """
+        Находит в таблице строки изменений и удалений по их содержимому
+
+        Returns:
+            tuple: (изменения с актуальными номерами строк, ID изменений, которые отправлять
+                не нужно: конфликт с правкой в таблице или изменение уже в таблице)
+        """
+        titles = sorted({op["title"] for op in ops if op["op"] in (OP_UPDATE, OP_DELETE)})
+        if not titles:
+            return ops, []
+        try:
+            response = await self._request("values_batch_get", [_range(title) for title in titles],
+                                           priority=PRIORITY_BACKGROUND, operation=OPERATION_READ)
+        except Exception as e:
+            if not sheets_retry.is_rejected_error(e):
+                raise
+            # Лист удален или переименован - отправляем как есть, таблица отклонит такие изменения
+            logger.error("чтение_листов_для_репликации", e, details={"листы": titles})
+            return ops, []
+        value_ranges = response.get("valueRanges", [])
+
+        resolved: Dict[int, Dict[str, Any]] = {}
+        for index, title in enumerate(titles):
+            values = value_ranges[index].get("values", []) if index < len(value_ranges) else []
+            _, title_ops, conflicts = replay_ops(values, [op for op in ops if op["title"] == title])
+            resolved.update((op["id"], op) for op in title_ops)
+            if conflicts:
+                self._conflicts += len(conflicts)
+                self._conflicted_titles.add(title)
+                logger.warning("Строки изменены в таблице вручную, локальные изменения не отправлены",
+                               details={"лист": title, "изменений": len(conflicts)})
+        sendable = [resolved.get(op["id"], op) for op in ops
+                    if op["title"] not in titles or op["id"] in resolved]
+        dropped = [op["id"] for op in ops if op["title"] in titles and op["id"] not in resolved]
+        return sendable, dropped
+
+    async def flush(self) -> int:
+        """
+        Отправляет очередь изменений в таблицу
+
+        Returns:
+            int: Количество отправленных изменений
+        """
+        replicated = 0
+        async with self.flush_lock:
+            while True:
+                ops = await sheets_cache.run_in_executor(self.store.pending_ops, self.max_ops)
+                if not ops:
+                    break
+                try:
+                    ops, dropped = await self._resolve(ops)
+                except Exception as e:
+                    self._errors += 1
+                    if sheets_retry.is_unavailable_error(e):
+                        logger.warning("Таблица недоступна, изменения остаются в локальной очереди",
+                                       details={"в очереди": self.store.pending_count()})
+                    else:
+                        logger.error("репликация_в_таблицу", e)
+                    return replicated
+                await sheets_cache.run_in_executor(self.store.ack, dropped)
+                for group in self._groups(ops):
+                    op_ids = [op["id"] for op in group]
+                    sent = True
+                    try:
+                        await self._send(group)
+                        self._api_calls += 1
+                    except Exception as e:
+                        self._errors += 1
+                        if not sheets_retry.is_rejected_error(e):
+                            if sheets_retry.is_unavailable_error(e):
+                                logger.warning("Таблица недоступна, изменения остаются в локальной очереди",
+                                               details={"в очереди": self.store.pending_count()})
+                            else:
+                                logger.error("репликация_в_таблицу", e, details={"изменений": len(group)})
+                            return replicated
+                        # Таблица не примет это изменение и при повторе (лист удален, неверный диапазон)
+                        sent = False
+                        self._skipped += len(group)
+                        logger.error("репликация_в_таблицу", e,
+                                     details={"пропущено": len(group), "вид": group[0]["op"],
+                                              "лист": group[0]["title"]})
+                    await sheets_cache.run_in_executor(self.store.ack, op_ids)
+                    if sent:
+                        replicated += len(group)
+                        self._replicated_ops += len(group)
+
+        if replicated:
+            logger.data_save("изменения локального хранилища", "Google Sheets", count=replicated)
+        return replicated
+
+    async def _run(self):
+        """Фоновая задача периодической отправки очереди"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._conflicted_titles and self.on_conflict is not None:
+                titles, self._conflicted_titles = sorted(self._conflicted_titles), set()
+                await self.on_conflict(titles)
+
+    def start(self):
+        """Запускает фоновую репликацию (вызывать внутри цикла событий)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        pending = self.store.pending_count()
+        if pending:
+            # Изменения, не отправленные до перезапуска, отправляем сразу
+            self._wakeup.set()
+        logger.init("SheetsReplicator", "Репликация в таблицу запущена",
+                    details={"интервал": f"{self.interval:.2f}с", "в очереди": pending})
+
+    async def stop(self):
+        """Останавливает фоновую задачу и отправляет оставшиеся изменения"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        pending = self.store.pending_count()
+        if pending:
+            logger.warning("Не все изменения отправлены в таблицу, они останутся в локальном хранилище",
+                           details={"изменений": pending, "файл": self.store.path})
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние репликации"""
+        return {
+            "pending": self.store.pending_count(),
+            "oldest_pending_age": self.store.oldest_pending_age(),
+            "replicated_ops": self._replicated_ops,
+            "api_calls": self._api_calls,
+            "errors": self._errors,
+            "skipped": self._skipped,
+            "conflicts": self._conflicts,
+        }
+
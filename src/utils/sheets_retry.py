@@ -0,0 +1,450 @@
+"""
+Модуль с политикой повторных попыток запросов к Google Sheets API и автоматическим выключателем
+"""
+
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from gspread.exceptions import APIError
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
+
+from utils.logger import get_logger
+from utils.sheets_executor import SheetsExecutorOverloaded
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Ответ 429 означает, что запрос не выполнялся, поэтому его можно повторить и для записи
+REJECTED_STATUSES = {429}
+
+# Сколько времени должно остаться на попытку после паузы, чтобы повтор имел смысл
+MIN_ATTEMPT_TIME = 2.0
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class SheetsCircuitOpen(Exception):
+    """Выключатель разомкнут: Sheets API недоступен, запрос не отправлялся"""
+
+
+class _CallScope:
+    """Запросы одного выполнения синхронной функции в потоке пула"""
+
+    __slots__ = ("replayable",)
+
+    def __init__(self):
+        # Выполнение можно повторить целиком, пока ни одна запись не могла примениться
+        self.replayable = True
+
+
+class RetryBudget:
+    """
+    Бюджет повторных попыток.
+
+    Каждый первый запрос пополняет бюджет на ratio, каждый повтор тратит
+    единицу. Пока API отвечает нормально, бюджет копится до max_tokens; при
+    массовых ошибках повторы ограничены долей ratio от общего числа запросов
+    и не умножают нагрузку на API.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self._exhausted = 0
+
+    def deposit(self):
+        """Учитывает первый запрос"""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Забирает единицу бюджета на повтор; False, если бюджет исчерпан"""
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self._exhausted += 1
+            return False
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"tokens": round(self._tokens, 2), "exhausted": self._exhausted}
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель запросов к API.
+
+    После failure_threshold ошибок подряд (недоступность, квота, таймауты)
+    размыкается: запросы сразу завершаются SheetsCircuitOpen и не занимают
+    потоки и квоту. Через reset_timeout секунд пропускает один пробный запрос:
+    успех замыкает выключатель, ошибка размыкает его снова.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def consecutive_failures(self) -> int:
+        return self._failures
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос"""
+        with self._lock:
+            if self._state == CIRCUIT_CLOSED:
+                return True
+            if self._state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = CIRCUIT_HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        """Запрос выполнен (или отклонен по причине, не связанной с доступностью API)"""
+        with self._lock:
+            recovered = self._state != CIRCUIT_CLOSED
+            self._state = CIRCUIT_CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+        if recovered:
+            logger.data_processing("sheets", "Выключатель Sheets API замкнут", details={"состояние": CIRCUIT_CLOSED})
+
+    def record_failure(self):
+        """Запрос не выполнен из-за недоступности API"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == CIRCUIT_OPEN:
+                return
+            if self._state == CIRCUIT_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+                self._opened += 1
+                failures = self._failures
+            else:
+                return
+        logger.warning("Выключатель Sheets API разомкнут, запросы временно не отправляются (circuit_open)",
+                       details={"ошибок_подряд": failures, "пауза": f"{self.reset_timeout:.0f}с"})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened": self._opened,
+                "rejected": self._rejected,
+                "open_for": round(time.monotonic() - self._opened_at, 1) if self._state != CIRCUIT_CLOSED else 0,
+            }
+
+
+class SheetsRetry:
+    """
+    Синглтон-класс с единой политикой повторов для всех запросов к Sheets API.
+
+    Задержка - экспоненциальная с полным джиттером (случайная от нуля до
+    base_delay * 2^попытка), но не меньше Retry-After из ответа. Чтения
+    повторяются при 429, 5xx и сетевых ошибках, записи - только при 429.
+    Ожидание между попытками всегда асинхронное (asyncio.sleep), поэтому
+    потоки пула Sheets не заняты паузами.
+
+    Синхронные функции gspread повторяются целиком на стороне цикла событий
+    (run_in_pool): каждый HTTP-запрос функции проходит через watch_client,
+    который учитывает его в выключателе и отмечает, могла ли примениться
+    запись. Выполнение повторяется, только если ни одна запись не могла
+    быть применена, поэтому уже выполненные записи не дублируются. Все
+    попытки вместе с паузами укладываются в таймаут вызова пула.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SheetsRetry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.max_attempts = max(1, int(os.getenv("SHEETS_RETRY_MAX_ATTEMPTS", "4")))
+        self.base_delay = float(os.getenv("SHEETS_RETRY_BASE_DELAY", "1"))
+        self.max_delay = float(os.getenv("SHEETS_RETRY_MAX_DELAY", "30"))
+        self.budget = RetryBudget(ratio=float(os.getenv("SHEETS_RETRY_BUDGET_RATIO", "0.2")))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("SHEETS_CIRCUIT_FAILURES", "5")),
+            reset_timeout=float(os.getenv("SHEETS_CIRCUIT_RESET_TIMEOUT", "30"))
+        )
+
+        # Метрики
+        self._requests = 0
+        self._retries = 0
+        self._gave_up = 0
+        # Попытка выполнения в текущем потоке пула (для run_in_pool)
+        self._local = threading.local()
+
+        self._initialized = True
+        logger.init("SheetsRetry", "Политика повторов запросов к Sheets API",
+                    details={"попыток": self.max_attempts, "задержка": self.base_delay,
+                             "макс_задержка": self.max_delay})
+
+    @property
+    def is_open(self) -> bool:
+        """Разомкнут ли выключатель (запросы завершаются сразу)"""
+        return self.breaker.state == CIRCUIT_OPEN
+
+    @property
+    def is_degraded(self) -> bool:
+        """
+        Работает ли бот в деградированном режиме: выключатель разомкнут или ждет пробного запроса
+
+        Одиночная ошибка 5xx не переводит бота в деградированный режим - для
+        этого нужно SHEETS_CIRCUIT_FAILURES ошибок подряд.
+        """
+        return self.breaker.state != CIRCUIT_CLOSED
+
+    @property
+    def has_recent_failures(self) -> bool:
+        """Не удался ли последний запрос к API (в том числе до размыкания выключателя)"""
+        return self.breaker.consecutive_failures > 0
+
+    def is_unavailable_error(self, error: Exception) -> bool:
+        """Вызвана ли ошибка недоступностью API (а не ошибкой в самом запросе)"""
+        return isinstance(error, SheetsCircuitOpen) or self.classify(error)[2]
+
+    def is_rejected_error(self, error: Exception) -> bool:
+        """Отклонила ли таблица запрос как некорректный (4xx): он не выполнен, и повтор не поможет"""
+        status, _, unavailable = self.classify(error)
+        return not unavailable and status is not None and 400 <= status < 500
+
+    def is_unsent_error(self, error: Exception) -> bool:
+        """Известно ли, что запрос не выполнялся (выключатель разомкнут, очередь пула полна, 429)"""
+        if isinstance(error, (SheetsCircuitOpen, SheetsExecutorOverloaded)):
+            return True
+        return self.classify(error)[0] in REJECTED_STATUSES
+
+    @staticmethod
+    def classify(error: Exception):
+        """
+        Разбирает ошибку запроса
+
+        Returns:
+            tuple: (статус или None для сетевой ошибки, Retry-After в секундах или None, ошибка доступности API)
+        """
+        if isinstance(error, APIError):
+            response = getattr(error, "response", None)
+            status = getattr(response, "status_code", None)
+            retry_after = None
+            try:
+                retry_after = float(response.headers.get("Retry-After"))
+            except (AttributeError, TypeError, ValueError):
+                pass
+            return status, retry_after, status in RETRYABLE_STATUSES
+        if isinstance(error, (RequestsConnectionError, RequestsTimeout, asyncio.TimeoutError)):
+            return None, None, True
+        if hasattr(error, "status") and hasattr(error, "retry_after"):
+            # Ошибка асинхронного транспорта (SheetsTransportError); status None - сетевая ошибка
+            return error.status, error.retry_after, error.status is None or error.status in RETRYABLE_STATUSES
+        return None, None, False
+
+    def _next_delay(self, error: Exception, attempt: int, idempotent: bool,
+                    deadline: Optional[float] = None) -> Optional[float]:
+        """Задержка перед следующей попыткой или None, если повторять не нужно (или не успеть до deadline)"""
+        status, retry_after, unavailable = self.classify(error)
+        if not unavailable:
+            return None
+        if not idempotent and status not in REJECTED_STATUSES:
+            # Запись могла быть выполнена до ошибки - повтор может ее продублировать
+            return None
+        if attempt + 1 >= self.max_attempts or self.is_open:
+            return None
+        if retry_after is not None and retry_after > self.max_delay:
+            # Ждать дольше допустимого не будем - ошибка вернется вызывающему сразу
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if deadline is not None and time.monotonic() + delay + MIN_ATTEMPT_TIME > deadline:
+            # Повтор не успеет до таймаута вызова - ошибка вернется вызывающему сразу
+            return None
+        if not self.budget.withdraw():
+            return None
+        self._retries += 1
+        logger.data_processing("api_quota_exceeded", "Повтор запроса к Google Sheets API",
+                               details={"статус": status, "ожидание": f"{delay:.2f} сек",
+                                        "попытка": f"{attempt + 2}/{self.max_attempts}"})
+        return delay
+
+    def _before_attempt(self, attempt: int):
+        """Проверяет выключатель перед попыткой"""
+        if not self.breaker.allow():
+            raise SheetsCircuitOpen("Sheets API временно недоступен, запрос не отправлен")
+        if attempt == 0:
+            self._requests += 1
+            self.budget.deposit()
+
+    def _record_error(self, error: Exception):
+        """Учитывает ошибку запроса в выключателе"""
+        if self.classify(error)[2]:
+            self.breaker.record_failure()
+        else:
+            # API ответил (например, 400 или 404) - он доступен
+            self.breaker.record_success()
+
+    def _give_up(self, error: Exception):
+        """Учитывает отказ от повтора после ошибки недоступности"""
+        if self.is_unavailable_error(error):
+            self._gave_up += 1
+
+    async def run(self, func: Callable, *args, idempotent: bool = True,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Выполняет асинхронный запрос с повторами (ожидание не блокирует цикл событий)
+
+        Args:
+            func (Callable): Корутинная функция одного запроса
+            idempotent (bool): Можно ли повторять запрос после ошибок сервера
+            timeout (Optional[float]): Предел общего времени попыток и пауз; повтор, который
+                не успевает в него, не выполняется
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        attempt = 0
+        while True:
+            self._before_attempt(attempt)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                self._record_error(e)
+                delay = self._next_delay(e, attempt, idempotent, deadline)
+                if delay is None:
+                    self._give_up(e)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def run_in_pool(self, submit: Callable[[Callable, float], Awaitable], func: Callable, *args,
+                          timeout: float, **kwargs) -> Any:
+        """
+        Выполняет синхронную функцию gspread в пуле потоков с повторами
+
+        Пауза между попытками - asyncio.sleep в цикле событий, поток пула
+        на время паузы освобождается. Функция повторяется целиком, только
+        если ни одна ее запись не могла примениться (см. call), и только
+        пока повтор успевает до timeout.
+
+        Args:
+            submit (Callable): Корутина submit(call, timeout), выполняющая call в пуле
+            func (Callable): Синхронная функция (обычно метод GoogleSheets)
+            timeout (float): Общий предел времени всех попыток и пауз в секундах
+
+        Raises:
+            SheetsCallTimeout: Попытка не завершилась до предела (исход неизвестен, не повторяется)
+        """
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            scope = _CallScope()
+            call = functools.partial(self._run_scoped, scope, func, args, kwargs)
+            call.__name__ = getattr(func, "__name__", str(func))
+            try:
+                return await submit(call, max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                # Попытка еще выполняется в потоке - повтор мог бы ее продублировать
+                raise
+            except Exception as e:
+                delay = None
+                if scope.replayable:
+                    delay = self._next_delay(e, attempt, True, deadline)
+                if delay is None:
+                    self._give_up(e)
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _run_scoped(self, scope: _CallScope, func: Callable, args: tuple, kwargs: dict) -> Any:
+        """Выполняется в потоке пула: связывает запросы функции с ее попыткой"""
+        self._local.scope = scope
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.scope = None
+
+    def call(self, func: Callable, *args, idempotent: bool = True, **kwargs) -> Any:
+        """
+        Выполняет один синхронный HTTP-запрос: учитывает его в выключателе, без повторов
+
+        Повтор и ожидание - на стороне run_in_pool. Здесь запрос только
+        отмечает, что запись могла примениться: после этого выполнение
+        функции целиком больше не повторяется.
+        """
+        scope = getattr(self._local, "scope", None)
+        self._before_attempt(0)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._record_error(e)
+            if scope is not None and not idempotent and self.classify(e)[0] not in REJECTED_STATUSES:
+                # Запись могла выполниться до ошибки
+                scope.replayable = False
+            raise
+        self.breaker.record_success()
+        if scope is not None and not idempotent:
+            scope.replayable = False
+        return result
+
+    def watch_client(self, client):
+        """Выполняет все запросы клиента gspread через политику повторов"""
+        if getattr(client, "_sheets_retry_watch", False):
+            return
+        request = client.request
+
+        def retried_request(method, *args, **kwargs):
+            return self.call(request, method, *args, idempotent=str(method).lower() == "get", **kwargs)
+
+        client.request = retried_request
+        client._sheets_retry_watch = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает метрики повторов, бюджета и выключателя"""
+        return {
+            "requests": self._requests,
+            "retries": self._retries,
+            "gave_up": self._gave_up,
+            "budget": self.budget.stats(),
+            "circuit": self.breaker.stats(),
+        }
+
+# Создаем глобальный экземпляр политики повторов
+sheets_retry = SheetsRetry()
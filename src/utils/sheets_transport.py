@@ -0,0 +1,493 @@
+"""
+Модуль с асинхронным HTTP-транспортом Google Sheets API (пул соединений httpx)
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+import gspread
+from gspread.exceptions import WorksheetNotFound
+
+try:
+    import httpx
+except ImportError:  # httpx устанавливается вместе с python-telegram-bot, но транспорт необязателен
+    httpx = None
+
+from google.auth import crypt, jwt
+
+from utils.sheets_retry import sheets_retry
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+TOKEN_GRANT_TYPE = "urn:ietf:params:oauth:grant-type:jwt-bearer"
+TOKEN_LIFETIME = 3600
+
+# Методы таблицы, которые только читают данные (их можно повторять)
+READ_METHODS = {"values_get", "values_batch_get", "fetch_sheet_metadata"}
+
+
+class SheetsTransportError(Exception):
+    """Ошибка HTTP-запроса к Sheets API"""
+
+    def __init__(self, message: str, status: int = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status  # HTTP-статус ответа (None - сетевая ошибка)
+        self.retry_after = retry_after  # Значение заголовка Retry-After в секундах
+
+
+class ServiceAccountToken:
+    """
+    Токен доступа сервисного аккаунта с кэшированием и упреждающим обновлением.
+
+    Токен запрашивается обменом подписанного JWT на access token через тот же
+    пул соединений. Обновление выполняется заранее, за refresh_margin секунд до
+    истечения, фоновой задачей; одновременные запросы токена ждут одно обновление.
+    """
+
+    def __init__(self, credentials_file: str, scopes: List[str], refresh_margin: float = 300):
+        """
+        Инициализация токена
+
+        Args:
+            credentials_file (str): JSON-файл сервисного аккаунта
+            scopes (List[str]): Области доступа
+            refresh_margin (float): За сколько секунд до истечения обновлять токен
+        """
+        with open(credentials_file, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self._signer = crypt.RSASigner.from_service_account_info(info)
+        self._email = info["client_email"]
+        self._token_uri = info.get("token_uri", "https://oauth2.googleapis.com/token")
+        self._scopes = " ".join(scopes)
+        self.refresh_margin = refresh_margin
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        # Метрики
+        self._refreshes = 0
+        self._refresh_errors = 0
+
+    @property
+    def expires_in(self) -> float:
+        """Сколько секунд осталось до истечения токена"""
+        return max(0.0, self._expires_at - time.time())
+
+    def _assertion(self) -> bytes:
+        """Подписанный JWT для обмена на токен доступа"""
+        now = int(time.time())
+        payload = {
+            "iss": self._email,
+            "scope": self._scopes,
+            "aud": self._token_uri,
+            "iat": now,
+            "exp": now + TOKEN_LIFETIME,
+        }
+        return jwt.encode(self._signer, payload)
+
+    async def get(self, client: "httpx.AsyncClient") -> str:
+        """Возвращает действующий токен, обновляя его только при необходимости"""
+        if self._token and self.expires_in > self.refresh_margin / 2:
+            return self._token
+        return await self.refresh(client, force=False)
+
+    async def refresh(self, client: "httpx.AsyncClient", force: bool = True) -> str:
+        """Запрашивает новый токен (одновременные вызовы ждут один запрос)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        stale_token = self._token
+        async with self._lock:
+            # Пока ждали блокировку, токен мог обновить другой вызов
+            if self._token and (self._token != stale_token or not force) \
+                    and self.expires_in > self.refresh_margin / 2:
+                return self._token
+            started = time.time()
+            try:
+                response = await client.post(self._token_uri, data={
+                    "grant_type": TOKEN_GRANT_TYPE,
+                    "assertion": self._assertion(),
+                })
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                self._refresh_errors += 1
+                logger.error("обновление_токена_sheets", e)
+                raise SheetsTransportError(f"Не удалось получить токен доступа: {e}") from e
+            self._token = data["access_token"]
+            self._expires_at = started + float(data.get("expires_in", TOKEN_LIFETIME))
+            self._refreshes += 1
+        logger.data_processing("sheets", "Обновление токена доступа",
+                               duration=time.time() - started,
+                               details={"действует": f"{self.expires_in:.0f}с"})
+        return self._token
+
+    def start(self, client: "httpx.AsyncClient"):
+        """Запускает фоновое упреждающее обновление токена"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.get_running_loop().create_task(self._refresh_loop(client))
+
+    async def _refresh_loop(self, client: "httpx.AsyncClient"):
+        """Обновляет токен за refresh_margin секунд до истечения"""
+        while True:
+            await asyncio.sleep(max(1.0, self.expires_in - self.refresh_margin))
+            try:
+                await self.refresh(client)
+            except SheetsTransportError:
+                # Повторим позже; до истечения токена запросы используют старый
+                await asyncio.sleep(30)
+
+    async def stop(self):
+        """Останавливает фоновое обновление"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние токена"""
+        return {
+            "expires_in": round(self.expires_in, 1),
+            "refreshes": self._refreshes,
+            "refresh_errors": self._refresh_errors,
+        }
+
+
+class AsyncSheetsTransport:
+    """
+    Асинхронный клиент Sheets API поверх httpx.AsyncClient.
+
+    Соединения с Google держатся открытыми (keep-alive) и переиспользуются
+    всеми запросами; при включенном HTTP/2 запросы мультиплексируются в одном
+    соединении. Запросы разных корутин выполняются одновременно, их число в
+    полете ограничено max_in_flight. Методы повторяют одноименные методы
+    gspread.Spreadsheet и возвращают тот же JSON. Каждый метод - одна попытка
+    запроса: повторы выполняет вызывающий (sheets_retry.run в асинхронном коде,
+    sheets_retry.run_in_pool для функций в пуле потоков), чтобы они не
+    складывались на двух уровнях.
+    """
+
+    def __init__(self, credentials_file: str, spreadsheet_id: str, scopes: List[str],
+                 max_connections: int = 10, max_in_flight: int = 10, timeout: float = 30.0,
+                 http2: bool = False, keepalive_expiry: float = 60.0):
+        """
+        Инициализация транспорта (соединения открываются в start)
+
+        Args:
+            credentials_file (str): JSON-файл сервисного аккаунта
+            spreadsheet_id (str): ID таблицы
+            scopes (List[str]): Области доступа
+            max_connections (int): Размер пула соединений
+            max_in_flight (int): Максимум одновременных запросов
+            timeout (float): Таймаут запроса в секундах
+            http2 (bool): Использовать HTTP/2 (нужен пакет h2)
+            keepalive_expiry (float): Сколько секунд держать неиспользуемое соединение
+        """
+        if httpx is None:
+            raise RuntimeError("Для асинхронного транспорта Sheets нужен пакет httpx")
+        self.spreadsheet_id = spreadsheet_id
+        self.max_connections = max(1, max_connections)
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.http2 = http2
+        self.keepalive_expiry = keepalive_expiry
+        self.token = ServiceAccountToken(credentials_file, scopes)
+
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._error_listeners: List[Callable[[Exception], None]] = []
+
+        # Метрики
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._max_seen_in_flight = 0
+
+    @property
+    def is_running(self) -> bool:
+        """Открыт ли пул соединений"""
+        return self._client is not None
+
+    async def start(self):
+        """Открывает пул соединений в текущем цикле событий и получает первый токен"""
+        if self._client is not None:
+            return
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections,
+                              keepalive_expiry=self.keepalive_expiry)
+        try:
+            client = httpx.AsyncClient(limits=limits, timeout=self.timeout, http2=self.http2)
+        except ImportError:
+            # Пакет h2 не установлен - работаем по HTTP/1.1 с тем же пулом
+            logger.warning("HTTP/2 недоступен, транспорт Sheets использует HTTP/1.1",
+                           details={"пакет": "h2"})
+            self.http2 = False
+            client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        try:
+            await self.token.refresh(client)
+        except Exception:
+            await client.aclose()
+            raise
+        self.token.start(client)
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._client = client
+        logger.init("AsyncSheetsTransport", "Асинхронный транспорт Sheets запущен",
+                    details={"соединений": self.max_connections, "в_полете": self.max_in_flight,
+                             "http2": self.http2})
+
+    async def close(self):
+        """Закрывает пул соединений"""
+        client, self._client = self._client, None
+        if client is None:
+            return
+        await self.token.stop()
+        await client.aclose()
+        logger.init("AsyncSheetsTransport", "Асинхронный транспорт Sheets остановлен", details=self.stats())
+
+    def is_loop_thread(self) -> bool:
+        """Выполняется ли вызов в потоке цикла событий транспорта"""
+        return threading.get_ident() == self._loop_thread
+
+    def can_call_from_thread(self) -> bool:
+        """Можно ли выполнить запрос через транспорт из текущего потока (call_from_thread)"""
+        return self._client is not None and self._loop is not None and not self._loop.is_closed() \
+            and not self.is_loop_thread()
+
+    def watch_errors(self, listener: Callable[[Exception], None]):
+        """Подписывает listener на ошибки запросов (например, реестр листов)"""
+        if listener not in self._error_listeners:
+            self._error_listeners.append(listener)
+
+    async def _request(self, method: str, path: str, params: Optional[dict] = None,
+                       body: Optional[dict] = None) -> dict:
+        """Одна попытка запроса к API таблицы; об ошибке сообщает подписчикам watch_errors"""
+        try:
+            return await self._send(method, path, params, body)
+        except SheetsTransportError as e:
+            for listener in self._error_listeners:
+                listener(e)
+            raise
+
+    async def _send(self, method: str, path: str, params: Optional[dict] = None,
+                    body: Optional[dict] = None) -> dict:
+        """Одна попытка запроса; при 401 один раз обновляет токен и повторяет"""
+        client = self._client
+        if client is None:
+            raise SheetsTransportError("Транспорт Sheets не запущен")
+        url = f"{SHEETS_API_URL}/{self.spreadsheet_id}{path}"
+        async with self._slots:
+            self._requests += 1
+            self._in_flight += 1
+            self._max_seen_in_flight = max(self._max_seen_in_flight, self._in_flight)
+            try:
+                for attempt in range(2):
+                    token = await self.token.get(client) if attempt == 0 else await self.token.refresh(client)
+                    try:
+                        response = await client.request(method, url, params=params, json=body,
+                                                        headers={"Authorization": f"Bearer {token}"})
+                    except httpx.HTTPError as e:
+                        self._errors += 1
+                        raise SheetsTransportError(f"{method} {path}: {e}") from e
+                    if response.status_code != 401:
+                        break
+            finally:
+                self._in_flight -= 1
+
+        if response.is_success:
+            return response.json()
+        self._errors += 1
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        raise SheetsTransportError(f"{method} {path}: {response.status_code} {response.text[:200]}",
+                                   status=response.status_code, retry_after=retry_after)
+
+    @staticmethod
+    def _quote_range(a1_range: str) -> str:
+        """Диапазон A1 для подстановки в путь запроса"""
+        return quote(a1_range, safe="")
+
+    async def values_get(self, range: str, params: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.values_get"""
+        return await self._request("GET", f"/values/{self._quote_range(range)}", params=params)
+
+    async def values_batch_get(self, ranges: List[str], params: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.values_batch_get"""
+        query = dict(params or {})
+        query["ranges"] = list(ranges)
+        return await self._request("GET", "/values:batchGet", params=query)
+
+    async def values_append(self, range: str, params: dict, body: dict) -> dict:
+        """Аналог Spreadsheet.values_append"""
+        return await self._request("POST", f"/values/{self._quote_range(range)}:append",
+                                   params=params, body=body)
+
+    async def values_update(self, range: str, params: Optional[dict] = None, body: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.values_update"""
+        return await self._request("PUT", f"/values/{self._quote_range(range)}", params=params, body=body)
+
+    async def batch_update(self, body: dict) -> dict:
+        """Аналог Spreadsheet.batch_update"""
+        return await self._request("POST", ":batchUpdate", body=body)
+
+    async def values_clear(self, range: str) -> dict:
+        """Аналог Spreadsheet.values_clear"""
+        return await self._request("POST", f"/values/{self._quote_range(range)}:clear")
+
+    async def values_batch_clear(self, params: Optional[dict] = None, body: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.values_batch_clear"""
+        return await self._request("POST", "/values:batchClear", params=params, body=body)
+
+    async def values_batch_update(self, params: Optional[dict] = None, body: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.values_batch_update"""
+        return await self._request("POST", "/values:batchUpdate", params=params, body=body)
+
+    async def fetch_sheet_metadata(self, params: Optional[dict] = None) -> dict:
+        """Аналог Spreadsheet.fetch_sheet_metadata"""
+        return await self._request("GET", "", params=params or {"includeGridData": "false"})
+
+    def call_from_thread(self, method: str, *args, **kwargs) -> Any:
+        """
+        Выполняет запрос из рабочего потока в цикле событий транспорта и ждет результат
+
+        Returns:
+            Any: Ответ API
+
+        Raises:
+            RuntimeError: Если транспорт не запущен или вызов сделан из потока цикла событий
+        """
+        if self._client is None or self._loop is None or self._loop.is_closed():
+            raise RuntimeError("Транспорт Sheets не запущен")
+        if self.is_loop_thread():
+            # Синхронное ожидание в потоке цикла событий заблокировало бы сам запрос
+            raise RuntimeError("Синхронный вызов транспорта из цикла событий")
+        coroutine = getattr(self, method)(*args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(self.timeout * 2)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает метрики транспорта"""
+        return {
+            "running": self.is_running,
+            "http2": self.http2,
+            "requests": self._requests,
+            "errors": self._errors,
+            "in_flight": self._in_flight,
+            "max_seen_in_flight": self._max_seen_in_flight,
+            "token": self.token.stats(),
+        }
+
+
+class SpreadsheetBridge:
+    """
+    Таблица gspread, все запросы которой идут через асинхронный транспорт.
+
+    Мост заменяет gspread.Spreadsheet для синхронного кода GoogleSheets,
+    выполняемого в потоках пула: методы значений (values_*), batch_update и
+    метаданные передаются в цикл событий транспорта, а листы (worksheets,
+    worksheet, add_worksheet) создаются поверх моста, поэтому запросы
+    gspread.Worksheet тоже идут через транспорт. Каждый запрос - одна попытка,
+    учтенная в выключателе (sheets_retry.call); повтор всей функции выполняет
+    sheets_retry.run_in_pool. Асинхронный код вызывает транспорт напрямую
+    (GoogleSheets.async_api_request), не занимая поток пула.
+    Пока транспорт не запущен (загрузка при старте) запрос выполняет gspread.
+    Остальные атрибуты (id, client, title) берутся у исходной таблицы.
+    """
+
+    def __init__(self, spreadsheet, transport: AsyncSheetsTransport):
+        self._spreadsheet = spreadsheet
+        self._transport = transport
+        self._fallbacks = 0
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        """Выполняет запрос через транспорт или, если он недоступен, через gspread"""
+        if not self._transport.can_call_from_thread():
+            # Запрос gspread учитывается в выключателе через watch_client клиента
+            self._fallbacks += 1
+            return getattr(self._spreadsheet, method)(*args, **kwargs)
+        return sheets_retry.call(self._transport.call_from_thread, method, *args,
+                                 idempotent=method in READ_METHODS, **kwargs)
+
+    def values_get(self, range, params=None):
+        return self._call("values_get", range, params=params)
+
+    def values_batch_get(self, ranges, params=None):
+        return self._call("values_batch_get", ranges, params=params)
+
+    def values_append(self, range, params, body):
+        return self._call("values_append", range, params, body)
+
+    def values_update(self, range, params=None, body=None):
+        return self._call("values_update", range, params=params, body=body)
+
+    def values_clear(self, range):
+        return self._call("values_clear", range)
+
+    def values_batch_clear(self, params=None, body=None):
+        return self._call("values_batch_clear", params=params, body=body)
+
+    def values_batch_update(self, params=None, body=None):
+        return self._call("values_batch_update", params=params, body=body)
+
+    def batch_update(self, body):
+        return self._call("batch_update", body)
+
+    def fetch_sheet_metadata(self, params=None):
+        return self._call("fetch_sheet_metadata", params=params)
+
+    def worksheets(self, exclude_hidden: bool = False) -> List[gspread.Worksheet]:
+        """Все листы таблицы (запросы листов идут через мост)"""
+        sheets = self.fetch_sheet_metadata()["sheets"]
+        worksheets = [gspread.Worksheet(self, sheet["properties"]) for sheet in sheets]
+        if exclude_hidden:
+            worksheets = [worksheet for worksheet in worksheets if not worksheet.isSheetHidden]
+        return worksheets
+
+    def worksheet(self, title: str) -> gspread.Worksheet:
+        """Лист по названию"""
+        for worksheet in self.worksheets():
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def add_worksheet(self, title: str, rows: int, cols: int, index: Optional[int] = None) -> gspread.Worksheet:
+        """Создает лист"""
+        properties = {"title": title, "sheetType": "GRID",
+                      "gridProperties": {"rowCount": rows, "columnCount": cols}}
+        if index is not None:
+            properties["index"] = index
+        response = self.batch_update({"requests": [{"addSheet": {"properties": properties}}]})
+        return gspread.Worksheet(self, response["replies"][0]["addSheet"]["properties"])
+
+    def del_worksheet(self, worksheet: gspread.Worksheet) -> dict:
+        """Удаляет лист"""
+        return self.batch_update({"requests": [{"deleteSheet": {"sheetId": worksheet.id}}]})
+
+    def watch_errors(self, listener: Callable[[Exception], None]):
+        """Подписывает listener на ошибки запросов транспорта"""
+        self._transport.watch_errors(listener)
+
+    def __getattr__(self, name):
+        return getattr(self._spreadsheet, name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики транспорта и число запросов, выполненных через gspread"""
+        stats = self._transport.stats()
+        stats["gspread_fallbacks"] = self._fallbacks
+        return stats
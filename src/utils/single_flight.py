@@ -0,0 +1,102 @@
+"""
+Модуль с объединением одновременных загрузок одного ключа кэша (single-flight)
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Признак отсутствия значения в кэше (None может быть корректным значением)
+MISS = object()
+
+
+class SingleFlight:
+    """
+    Одна загрузка на ключ: пока загрузка выполняется, остальные вызовы
+    с тем же ключом не обращаются к API, а ждут ее результат.
+
+    Результат хранится в concurrent.futures.Future, поэтому его можно
+    дождаться и из потока пула Sheets (do), и из цикла событий
+    (asyncio.wrap_future(in_flight(key))).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+        # Метрики
+        self._leaders = 0
+        self._coalesced = 0
+
+    def in_flight(self, key: Hashable) -> Optional[Future]:
+        """Возвращает выполняющуюся загрузку ключа или None"""
+        with self._lock:
+            return self._flights.get(key)
+
+    def note_coalesced(self):
+        """Учитывает ожидание чужой загрузки вне do (из асинхронного кода)"""
+        with self._lock:
+            self._coalesced += 1
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Выполняет function для ключа или ждет уже выполняющуюся загрузку
+
+        Args:
+            key: Ключ кэша
+            function: Загрузка значения (вызывается не более одного раза на все одновременные вызовы)
+
+        Returns:
+            Any: Результат загрузки (исключение загрузки пробрасывается всем ожидающим)
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self._leaders += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            logger.cache_hit(self.name, details={"ожидание загрузки": str(key)})
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                # Ключ мог быть сброшен через forget и занят новой загрузкой
+                if self._flights.get(key) is future:
+                    del self._flights[key]
+
+    def forget(self):
+        """
+        Отвязывает выполняющиеся загрузки: следующие вызовы начнут новую загрузку
+
+        Вызывается при сбросе кэша, чтобы после изменения данных никто
+        не получил результат загрузки, начатой до изменения.
+        """
+        with self._lock:
+            self._flights = {}
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает количество загрузок и объединенных ожиданий"""
+        with self._lock:
+            return {
+                "fetches": self._leaders,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._flights),
+            }
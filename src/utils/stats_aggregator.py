@@ -0,0 +1,270 @@
+"""
+Модуль с инкрементальным подсчетом статистики ответов
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+class StatsAggregator:
+    """
+    Синглтон-класс со счетчиками ответов по вопросам и вариантам.
+
+    Полный пересчет по листу ответов выполняется только при первом обращении,
+    после изменения вопросов, по запросу или при обнаружении расхождения.
+    Каждый сохраненный ответ добавляется к счетчикам, удаленный - вычитается.
+
+    Правила подсчета для вопросов с предопределенными вариантами:
+    - "Вариант" учитывается как вариант;
+    - "Вариант - подвариант" учитывается и как вариант, и как подвариант;
+    - "Вариант - текст" для варианта со свободным вводом учитывается как вариант.
+    Вопросы только со свободным вводом в статистику не входят.
+    """
+
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StatsAggregator, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._questions: Optional[Dict] = None  # Вопросы, по которым построены счетчики
+        self._schema: List[Tuple[str, int, List[Tuple[str, bool, List[str]]]]] = []
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._responses = 0
+        self._loaded = False
+        self._drift = False
+        self._built_time = 0
+
+        # Изменения, сделанные во время полного пересчета: (user_id, answers, sign)
+        self._rebuilding = False
+        self._deltas_during_rebuild: List[Tuple[str, List[str], int]] = []
+
+        self._rebuilds = 0
+        self._deltas = 0
+
+        self._initialized = True
+        logger.init("StatsAggregator", "Инициализирован агрегатор статистики")
+
+    @staticmethod
+    def _is_free_text(option) -> bool:
+        """Вариант со свободным вводом (пустой список подвариантов или подсказка)"""
+        return (isinstance(option, dict) and
+                ((isinstance(option.get("sub_options"), list) and not option["sub_options"]) or
+                 bool(option.get("free_text_prompt"))))
+
+    def _build_schema(self, questions_with_options: Dict) -> List[Tuple[str, int, List[Tuple[str, bool, List[str]]]]]:
+        """Готовит список (вопрос, индекс ответа, варианты) в порядке вывода статистики"""
+        schema = []
+        for column, (question, options) in enumerate(questions_with_options.items()):
+            entries = []
+            for opt in options:
+                if isinstance(opt, dict):
+                    if "text" not in opt:
+                        continue
+                    free_text = self._is_free_text(opt)
+                    sub_options = [] if free_text else list(opt.get("sub_options") or [])
+                    entries.append((opt["text"], free_text, sub_options))
+                else:
+                    entries.append((str(opt), False, []))
+
+            # Вопросы без фиксированных вариантов (только свободный ввод) пропускаем
+            if any(not free_text for _, free_text, _ in entries):
+                schema.append((question, column, entries))
+        return schema
+
+    def _classify(self, entries: List[Tuple[str, bool, List[str]]], answer: str) -> List[str]:
+        """Возвращает ключи счетчиков, которые затрагивает ответ"""
+        if not answer:
+            return []
+        for text, _, _ in entries:
+            if answer == text:
+                return [text]
+        for text, free_text, _ in entries:
+            if answer.startswith(text + " - "):
+                if free_text:
+                    return [text]
+                sub_part = answer[len(text) + 3:].split(" (на вопрос:", 1)[0]
+                return [text, f"{text} - {sub_part}"]
+        return []
+
+    def _apply(self, answers: List[str], sign: int):
+        """Добавляет (sign=1) или вычитает (sign=-1) ответы одной анкеты"""
+        for question, column, entries in self._schema:
+            if column >= len(answers):
+                continue
+            counts = self._counts.setdefault(question, {})
+            for key in self._classify(entries, answers[column]):
+                value = counts.get(key, 0) + sign
+                if value < 0:
+                    # Вычитание того, чего не было - счетчики разошлись с таблицей
+                    self._drift = True
+                    value = 0
+                counts[key] = value
+        self._responses = max(0, self._responses + sign)
+
+    @property
+    def is_loaded(self) -> bool:
+        """Построены ли счетчики"""
+        return self._loaded
+
+    def needs_rebuild(self, questions_with_options: Dict) -> bool:
+        """Нужен ли полный пересчет (нет данных, изменились вопросы или обнаружено расхождение)"""
+        with self._lock:
+            return not self._loaded or self._drift or questions_with_options != self._questions
+
+    def begin_rebuild(self):
+        """Начинает полный пересчет: дальше изменения запоминаются до вызова rebuild"""
+        with self._lock:
+            self._rebuilding = True
+            self._deltas_during_rebuild = []
+
+    def cancel_rebuild(self):
+        """Отменяет пересчет после ошибки чтения таблицы"""
+        with self._lock:
+            self._rebuilding = False
+            self._deltas_during_rebuild = []
+
+    def rebuild(self, questions_with_options: Dict, rows: List[List[str]]):
+        """
+        Полностью пересчитывает статистику
+
+        Args:
+            questions_with_options (Dict): Вопросы с вариантами ответов
+            rows (List[List[str]]): Строки ответов без заголовка: [время, telegram_id, ответы...]
+        """
+        started = time.time()
+        with self._lock:
+            self._questions = dict(questions_with_options)
+            self._schema = self._build_schema(questions_with_options)
+            self._counts = {}
+            self._responses = 0
+            for row in rows:
+                self._apply(row[2:], 1)
+
+            if self._rebuilding:
+                # Применяем изменения, которых еще не было в прочитанных строках
+                counted_users = {row[1] for row in rows if len(row) > 1}
+                for user_id, answers, sign in self._deltas_during_rebuild:
+                    if (sign > 0) != (user_id in counted_users):
+                        self._apply(answers, sign)
+                self._rebuilding = False
+                self._deltas_during_rebuild = []
+
+            self._drift = False
+            self._loaded = True
+            self._built_time = time.time()
+            self._rebuilds += 1
+
+        logger.data_processing("статистика", "Полный пересчет статистики",
+                               duration=time.time() - started,
+                               details={"ответов": self._responses, "вопросов": len(self._schema)})
+
+    def add_answers(self, user_id: int, answers: List[str]):
+        """Учитывает сохраненные ответы пользователя"""
+        self._delta(user_id, answers, 1)
+
+    def remove_answers(self, user_id: int, answers: List[str]):
+        """Вычитает удаленные ответы пользователя"""
+        self._delta(user_id, answers, -1)
+
+    def _delta(self, user_id: int, answers: List[str], sign: int):
+        """Применяет изменение к счетчикам"""
+        with self._lock:
+            if self._rebuilding:
+                self._deltas_during_rebuild.append((str(user_id), list(answers), sign))
+            if not self._loaded:
+                return
+            self._apply(answers, sign)
+            self._deltas += 1
+
+    def clear(self):
+        """Обнуляет статистику (все ответы удалены)"""
+        with self._lock:
+            self._counts = {}
+            self._responses = 0
+            self._drift = False
+            if self._rebuilding:
+                self._deltas_during_rebuild = []
+        logger.cache_update("statistics", details={"action": "clear"})
+
+    def check_drift(self, responses_in_sheet: int):
+        """
+        Сверяет количество учтенных анкет с количеством строк в таблице
+
+        Args:
+            responses_in_sheet (int): Количество анкет в листе ответов и в буфере записи
+        """
+        with self._lock:
+            if self._loaded and not self._rebuilding and responses_in_sheet != self._responses:
+                self._drift = True
+                logger.warning("Статистика разошлась с листом ответов, будет выполнен полный пересчет",
+                               details={"учтено": self._responses, "в таблице": responses_in_sheet})
+
+    def mark_drift(self):
+        """Принудительно помечает статистику для полного пересчета"""
+        with self._lock:
+            self._drift = True
+
+    def get_total_responses(self) -> int:
+        """Количество учтенных анкет"""
+        with self._lock:
+            return self._responses
+
+    def get_statistics(self) -> List[Tuple[str, str, int, int]]:
+        """
+        Возвращает статистику в порядке вопросов и вариантов
+
+        Returns:
+            List[Tuple[str, str, int, int]]: (вопрос, вариант или "вариант - подвариант",
+                количество, количество ответов на вопрос). Строки подвариантов идут
+                сразу после своего варианта; варианты без ответов не выводятся.
+        """
+        with self._lock:
+            result = []
+            for question, _, entries in self._schema:
+                counts = self._counts.get(question, {})
+                total = sum(counts.get(text, 0) for text, _, _ in entries)
+                if total == 0:
+                    continue
+                for text, _, sub_options in entries:
+                    count = counts.get(text, 0)
+                    if count == 0:
+                        continue
+                    result.append((question, text, count, total))
+
+                    prefix = f"{text} - "
+                    sub_keys = [prefix + sub for sub in sub_options]
+                    # Подварианты, которых уже нет в вопросах, но есть в ответах
+                    sub_keys += sorted(key for key in counts
+                                       if key.startswith(prefix) and key not in sub_keys)
+                    for key in sub_keys:
+                        if counts.get(key, 0) > 0:
+                            result.append((question, key, counts[key], total))
+            return result
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает состояние агрегатора"""
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "responses": self._responses,
+                "drift": self._drift,
+                "rebuilds": self._rebuilds,
+                "deltas": self._deltas,
+                "age": round(time.time() - self._built_time, 1) if self._loaded else None,
+            }
+
+# Создаем глобальный экземпляр агрегатора
+stats_aggregator = StatsAggregator()
@@ -0,0 +1,144 @@
+"""
+Модуль с фоновым обновлением листа статистики
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class StatsRefresher:
+    """
+    Отложенное обновление листа статистики через JobQueue.
+
+    Вызов mark_dirty только помечает статистику устаревшей. Обновление
+    запускается одной задачей JobQueue не чаще раза в interval секунд;
+    все отметки, пришедшие до старта задачи, объединяются в одно обновление.
+    Отметка во время выполнения обновления приводит ровно к одному
+    повторному запуску после него.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._job_queue = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_function: Optional[Callable[[], Awaitable]] = None
+        self.interval = 30.0
+
+        self._dirty = False
+        self._running = False
+        self._job = None
+        self._last_started = 0.0
+
+        # Метрики
+        self._triggers = 0
+        self._coalesced = 0
+        self._refreshes = 0
+        self._failures = 0
+        self._last_latency: Optional[float] = None
+        self._last_refresh_time: Optional[float] = None
+
+    def attach(self, job_queue, refresh_function: Callable[[], Awaitable], interval: float = 30.0):
+        """
+        Подключает обновление к JobQueue приложения (вызывать внутри цикла событий)
+
+        Args:
+            job_queue: JobQueue приложения Telegram
+            refresh_function: Корутина, выполняющая обновление листа статистики
+            interval (float): Минимальный интервал между обновлениями в секундах
+        """
+        self._job_queue = job_queue
+        self._loop = asyncio.get_running_loop()
+        self._refresh_function = refresh_function
+        self.interval = max(0.0, interval)
+        logger.init("StatsRefresher", "Фоновое обновление статистики подключено",
+                    details={"интервал": f"{self.interval:.0f}с"})
+        if self._dirty:
+            self._schedule()
+
+    def mark_dirty(self, reason: str = None):
+        """Помечает статистику устаревшей; обновление будет выполнено в фоне"""
+        with self._lock:
+            self._triggers += 1
+            if self._dirty:
+                # Обновление уже запланировано - этот запрос будет выполнен вместе с ним
+                self._coalesced += 1
+            self._dirty = True
+
+        logger.data_processing("статистика", "Статистика помечена для обновления",
+                               details={"причина": reason or "не указана"})
+
+        if self._loop is None:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._schedule()
+        else:
+            # Вызов из потока пула Sheets - планируем в цикле событий
+            self._loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        """Планирует задачу обновления с учетом минимального интервала"""
+        with self._lock:
+            if not self._dirty or self._running or self._job is not None:
+                return
+            delay = max(0.0, self._last_started + self.interval - time.monotonic())
+            self._job = self._job_queue.run_once(self._run, when=delay, name="stats_refresh")
+
+    async def _run(self, context=None):
+        """Задача JobQueue: выполняет одно обновление за все накопленные отметки"""
+        with self._lock:
+            self._job = None
+            self._running = True
+            self._dirty = False
+            self._last_started = time.monotonic()
+
+        started = time.monotonic()
+        try:
+            result = await self._refresh_function()
+            if result is False:
+                raise RuntimeError("Обновление листа статистики завершилось неудачно")
+            self._refreshes += 1
+            self._last_refresh_time = time.time()
+        except Exception as e:
+            self._failures += 1
+            # Повторим при следующем запуске
+            with self._lock:
+                self._dirty = True
+            logger.error("фоновое_обновление_статистики", e)
+        finally:
+            self._last_latency = time.monotonic() - started
+            with self._lock:
+                self._running = False
+            logger.data_processing("статистика", "Фоновое обновление статистики",
+                                   duration=self._last_latency,
+                                   details={"объединено запросов": self._coalesced})
+            # Отметки, пришедшие во время обновления, запускают еще одно
+            self._schedule()
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает метрики обновления статистики"""
+        with self._lock:
+            return {
+                "dirty": self._dirty,
+                "running": self._running,
+                "triggers": self._triggers,
+                "coalesced": self._coalesced,
+                "refreshes": self._refreshes,
+                "failures": self._failures,
+                "last_latency": round(self._last_latency, 3) if self._last_latency is not None else None,
+                "last_refresh_age": round(time.time() - self._last_refresh_time, 1)
+                if self._last_refresh_time else None,
+            }
+
+# Создаем глобальный экземпляр
+stats_refresher = StatsRefresher()
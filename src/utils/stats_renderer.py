@@ -0,0 +1,144 @@
+"""
+Модуль для вывода статистики на лист Google Sheets одним запросом
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+STATS_TABLE_HEADERS = ["Вопрос", "Вариант ответа", "Количество", "Процент"]
+SUB_OPTION_PREFIX = "  └ "
+
+
+class StatsRenderer:
+    """
+    Формирует таблицу статистики целиком в памяти и записывает ее на лист.
+
+    Запись выполняется одним вызовом update от A1. Если на листе раньше было
+    больше строк или столбцов, чем в новой таблице, остаток очищается одним
+    batch_clear.
+    Количество записанных строк запоминается для каждого листа, поэтому
+    при неизменном или растущем размере таблицы очистка не нужна.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._written: Dict[str, Tuple[int, int]] = {}  # {название листа: (строк, столбцов) в прошлый раз}
+
+    @staticmethod
+    def _percentage(count: int, total: int) -> str:
+        """Процент в формате листа статистики"""
+        return f"{(count / total * 100) if total > 0 else 0:.1f}%"
+
+    def build_table_grid(self, statistics: Sequence[Tuple[str, str, int, int]]) -> List[List]:
+        """
+        Таблица статистики: вопрос, вариант, количество, процент
+
+        Подварианты выводятся строкой под своим вариантом с префиксом "└".
+
+        Args:
+            statistics: Строки (вопрос, вариант или "вариант - подвариант", количество, ответов на вопрос)
+        """
+        grid = [list(STATS_TABLE_HEADERS)]
+        for question, answer, count, total in statistics:
+            option = answer
+            if " - " in answer:
+                option = SUB_OPTION_PREFIX + answer.split(" - ", 1)[1]
+            grid.append([question, option, count, self._percentage(count, total)])
+        return grid
+
+    def build_report_grid(self, statistics: Sequence[Tuple[str, str, int, int]], total_surveys: int,
+                          nested: bool = True) -> List[List]:
+        """
+        Отчет по вопросам: строка вопроса, затем варианты с процентом и количеством
+
+        Args:
+            statistics: Строки (вопрос, вариант или "вариант - подвариант", количество, ответов на вопрос)
+            total_surveys (int): Всего пройдено опросов
+            nested (bool): Выводить подварианты строками "└"; иначе после каждого вопроса пустая строка
+        """
+        grid = [["Статистика опроса"]]
+        current_question = None
+        for question, answer, count, total in statistics:
+            if question != current_question:
+                if current_question is not None and not nested:
+                    grid.append([""])
+                grid.append([question])
+                current_question = question
+
+            if " - " in answer:
+                if not nested:
+                    continue
+                grid.append([SUB_OPTION_PREFIX + answer.split(" - ", 1)[1], self._percentage(count, total), str(count)])
+            else:
+                grid.append([answer, self._percentage(count, total), str(count)])
+
+        if current_question is not None and not nested:
+            grid.append([""])
+        grid.append(["Всего пройдено опросов:", str(total_surveys)])
+        return grid
+
+    def write(self, worksheet, grid: List[List]) -> int:
+        """
+        Записывает таблицу на лист: один update и, при необходимости, один batch_clear
+
+        Args:
+            worksheet: Лист gspread
+            grid (List[List]): Строки таблицы, начиная с A1
+
+        Returns:
+            int: Количество API-запросов
+        """
+        with self._lock:
+            previous = self._written.get(worksheet.title)
+
+        width = max(len(row) for row in grid)
+        if previous is None:
+            # После запуска бота прежний размер неизвестен - считаем занятым весь лист
+            previous_rows, previous_columns = worksheet.row_count, worksheet.col_count
+        else:
+            previous_rows, previous_columns = previous
+            # Прошлая таблица была шире - затираем лишние столбцы тем же запросом
+            width = max(width, previous_columns)
+
+        # Выравниваем строки, чтобы короткие строки затирали старые значения справа
+        padded = [list(row) + [""] * (width - len(row)) for row in grid]
+
+        calls = 0
+        worksheet.update(f"A1:{rowcol_to_a1(len(padded), width)}", padded,
+                         value_input_option="USER_ENTERED")
+        calls += 1
+
+        # Очищаем строки и столбцы, оставшиеся от прошлой, более длинной таблицы
+        leftover = []
+        if previous_rows > len(padded):
+            leftover.append(f"A{len(padded) + 1}:{rowcol_to_a1(previous_rows, max(width, previous_columns))}")
+        if previous_columns > width:
+            leftover.append(f"{rowcol_to_a1(1, width + 1)}:{rowcol_to_a1(len(padded), previous_columns)}")
+        if leftover:
+            worksheet.batch_clear(leftover)
+            calls += 1
+
+        with self._lock:
+            self._written[worksheet.title] = (len(padded), width)
+
+        logger.data_save("статистика", f"Google Sheets/{worksheet.title}", count=len(padded) - 1,
+                         details={"запросов": calls})
+        return calls
+
+    def forget(self, worksheet_title: str = None):
+        """Сбрасывает запомненный размер таблицы (лист изменен в обход рендерера)"""
+        with self._lock:
+            if worksheet_title is None:
+                self._written = {}
+            else:
+                self._written.pop(worksheet_title, None)
+
+# Создаем глобальный экземпляр рендерера
+stats_renderer = StatsRenderer()
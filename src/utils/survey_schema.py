@@ -0,0 +1,191 @@
+"""
+Модуль со скомпилированной схемой опроса
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, KeyboardButton
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Виды вариантов ответа
+OPTION_PLAIN = "plain"          # Ответ сохраняется сразу
+OPTION_FREE_TEXT = "free_text"  # После выбора пользователь вводит свой ответ
+OPTION_CHOICE = "choice"        # После выбора пользователь выбирает подвариант
+
+BACK_TO_OPTIONS = "◀️ Назад к вариантам"
+CONFIRM_ANSWERS = "✅ Подтвердить"
+RESTART_SURVEY = "🔄 Начать заново"
+
+# Клавиатуры не изменяются, поэтому одни и те же объекты отправляются всем пользователям
+BACK_KEYBOARD = ReplyKeyboardMarkup([[KeyboardButton(BACK_TO_OPTIONS)]], resize_keyboard=True)
+CONFIRM_KEYBOARD = ReplyKeyboardMarkup([
+    [KeyboardButton(CONFIRM_ANSWERS)],
+    [KeyboardButton(RESTART_SURVEY)]
+], resize_keyboard=True)
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
+
+
+def is_short_question(text: str) -> bool:
+    """Похож ли текст вопроса на номер без формулировки ("3", "12.")"""
+    text = str(text)
+    return len(text) <= 3 or text.isdigit()
+
+
+def is_prompt_text(text: str) -> bool:
+    """Является ли подвариант подсказкой для свободного ввода, а не вариантом выбора"""
+    lowered = text.lower()
+    return "вопрос для" in lowered or "введите" in lowered
+
+
+class SurveyOption:
+    """Вариант ответа на вопрос"""
+
+    __slots__ = ("text", "kind", "prompt", "sub_options", "keyboard")
+
+    def __init__(self, text: str, kind: str, prompt: str = "",
+                 sub_options: Tuple[str, ...] = ()):
+        self.text = text
+        self.kind = kind
+        self.prompt = prompt  # Подсказка для свободного ввода
+        # Подварианты: {текст: текст} - проверка ответа без перебора, порядок сохраняется
+        self.sub_options: Dict[str, str] = {sub_option: sub_option for sub_option in sub_options}
+        if kind == OPTION_CHOICE:
+            self.keyboard = ReplyKeyboardMarkup(
+                [[KeyboardButton(sub_option)] for sub_option in self.sub_options]
+                + [[KeyboardButton(BACK_TO_OPTIONS)]],
+                resize_keyboard=True
+            )
+        elif kind == OPTION_FREE_TEXT:
+            self.keyboard = BACK_KEYBOARD
+        else:
+            self.keyboard = None
+
+    @classmethod
+    def compile(cls, raw: Any) -> "SurveyOption":
+        """
+        Разбирает вариант в формате get_questions_with_options
+
+        Все эвристики формата (пустой список подвариантов, подсказки "введите..."
+        среди подвариантов) применяются здесь один раз, а не при каждом ответе.
+        """
+        if not isinstance(raw, dict):
+            return cls(str(raw), OPTION_PLAIN)
+        text = raw.get("text", "")
+        sub_options = raw.get("sub_options")
+        if not isinstance(sub_options, list):
+            return cls(text, OPTION_PLAIN)
+        prompt = raw.get("free_text_prompt", "")
+        if prompt or not sub_options:
+            return cls(text, OPTION_FREE_TEXT, prompt)
+        if isinstance(sub_options[0], str) and is_prompt_text(sub_options[0]):
+            return cls(text, OPTION_FREE_TEXT, sub_options[0])
+        choices = tuple(sub_option for sub_option in sub_options
+                        if isinstance(sub_option, str) and not is_prompt_text(sub_option))
+        if not choices:
+            return cls(text, OPTION_FREE_TEXT, str(sub_options[0]))
+        return cls(text, OPTION_CHOICE, sub_options=choices)
+
+
+class SurveyQuestion:
+    """Вопрос опроса с вариантами ответов"""
+
+    __slots__ = ("index", "text", "display_text", "options", "option_by_text", "keyboard")
+
+    def __init__(self, index: int, text: str, options: Tuple[SurveyOption, ...], display_text: str = None):
+        self.index = index
+        self.text = text
+        self.display_text = display_text or text  # Текст, который показывается пользователю
+        self.options = options
+        # {текст варианта: вариант}; при повторе текста действует первый вариант
+        self.option_by_text: Dict[str, SurveyOption] = {}
+        for option in options:
+            self.option_by_text.setdefault(option.text, option)
+        self.keyboard = ReplyKeyboardMarkup(
+            [[KeyboardButton(option.text)] for option in options],
+            resize_keyboard=True
+        ) if options else None
+
+    def find_option(self, text: Optional[str]) -> Optional[SurveyOption]:
+        """Вариант ответа по тексту кнопки или None"""
+        return self.option_by_text.get(text)
+
+
+class SurveySchema:
+    """
+    Неизменяемая схема опроса, скомпилированная из листа вопросов.
+
+    Строится один раз для набора вопросов: варианты разобраны, для каждого
+    вопроса и варианта с подвариантами есть словарь текст -> вариант и
+    готовая клавиатура. Шаг опроса - это поиск по индексу и по словарю.
+    Номер версии растет с каждым изменением вопросов.
+    """
+
+    __slots__ = ("version", "questions", "texts", "source")
+
+    def __init__(self, version: int, questions: Tuple[SurveyQuestion, ...], source: Dict[str, List[Any]]):
+        self.version = version
+        self.questions = questions
+        self.texts = tuple(question.text for question in questions)
+        self.source = source  # Словарь вопросов, из которого собрана схема (не изменяется)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def question(self, index: int) -> Optional[SurveyQuestion]:
+        """Вопрос по номеру (с нуля) или None"""
+        if 0 <= index < len(self.questions):
+            return self.questions[index]
+        return None
+
+    @staticmethod
+    def resolve_display_texts(texts: List[str]) -> List[str]:
+        """
+        Подбирает полные формулировки для коротких вопросов
+        
+        Вопрос из одного номера ("3") показывается текстом первого вопроса,
+        начинающегося с этого номера ("3. ..." или "3 ..."), который еще не
+        показан среди предыдущих вопросов. Если такого нет, остается как есть.
+        """
+        display_texts = []
+        asked = set()  # Тексты, уже показанные предыдущими вопросами
+        for text in texts:
+            display_text = text
+            if is_short_question(text):
+                number = str(text).strip()
+                for full_text in texts:
+                    if (full_text.startswith(number + ".") or full_text.startswith(number + " ")) \
+                            and full_text not in asked:
+                        display_text = full_text
+                        break
+                else:
+                    logger.warning("Не удалось найти полный текст для вопроса (полный_текст_не_найден)",
+                                   details={"вопрос": text})
+            display_texts.append(display_text)
+            asked.add(display_text)
+        return display_texts
+
+    @classmethod
+    def compile(cls, questions_with_options: Dict[str, List[Any]], version: int = 0) -> "SurveySchema":
+        """
+        Компилирует схему из словаря {вопрос: варианты} (get_questions_with_options)
+
+        Короткий вопрос показывается текстом и вариантами найденного полного
+        вопроса; если у полного вопроса вариантов нет, остаются свои.
+        """
+        display_texts = cls.resolve_display_texts(list(questions_with_options))
+        questions = tuple(
+            SurveyQuestion(index, text,
+                           tuple(SurveyOption.compile(raw)
+                                 for raw in (questions_with_options.get(display_texts[index]) or options or [])),
+                           display_text=display_texts[index])
+            for index, (text, options) in enumerate(questions_with_options.items())
+        )
+        logger.data_processing("вопросы", "Компиляция схемы опроса",
+                               details={"версия": version, "вопросов": len(questions),
+                                        "заменено_коротких": sum(1 for question in questions
+                                                                 if question.display_text != question.text)})
+        return cls(version, questions, questions_with_options)
@@ -0,0 +1,76 @@
+"""
+Модуль с текущей версией схемы опроса, общей для всех обработчиков
+"""
+
+import copy
+import threading
+from typing import Any, Dict, List
+
+from utils.survey_schema import SurveySchema
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+class SurveyStore:
+    """
+    Синглтон-класс с текущей версией схемы опроса.
+
+    Все обработчики читают вопросы отсюда. Новая версия компилируется
+    целиком и подменяет текущую одним присваиванием, поэтому читатели видят
+    либо старую, либо новую схему целиком. Пользователь, начавший опрос,
+    проходит его по той версии, с которой начал (ссылка хранится в user_data).
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SurveyStore, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._current = SurveySchema.compile({}, version=0)
+        self._publications = 0
+
+        self._initialized = True
+        logger.init("SurveyStore", "Инициализировано хранилище схемы опроса")
+
+    @property
+    def current(self) -> SurveySchema:
+        """Текущая версия схемы (чтение без блокировки)"""
+        return self._current
+
+    def publish(self, questions_with_options: Dict[str, List[Any]]) -> SurveySchema:
+        """
+        Публикует вопросы как новую версию схемы, если они изменились
+
+        Args:
+            questions_with_options: Словарь {вопрос: варианты} (get_questions_with_options)
+
+        Returns:
+            SurveySchema: Текущая версия после публикации
+        """
+        with self._lock:
+            current = self._current
+            if current.version and current.source == questions_with_options:
+                return current
+            # Схема владеет своей копией: правки словаря вызывающим не меняют опубликованную версию
+            schema = SurveySchema.compile(copy.deepcopy(questions_with_options), version=current.version + 1)
+            self._current = schema
+            self._publications += 1
+        logger.cache_update("survey_schema", key=str(schema.version), count=len(schema))
+        return schema
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает номер текущей версии и число вопросов"""
+        current = self._current
+        return {"version": current.version, "questions": len(current), "publications": self._publications}
+
+# Создаем глобальный экземпляр хранилища
+survey_store = SurveyStore()
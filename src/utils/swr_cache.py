@@ -0,0 +1,469 @@
+"""
+Модуль с кэшем, отдающим устаревшие значения во время фонового обновления (stale-while-revalidate)
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.logger import get_logger
+from utils.single_flight import SingleFlight, MISS
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Состояние записи кэша по ее возрасту
+STATE_FRESH = "fresh"      # Младше мягкого TTL - отдается без обновления
+STATE_STALE = "stale"      # Между мягким и жестким TTL - отдается, обновляется в фоне
+STATE_EXPIRED = "expired"  # Старше жесткого TTL - загружается заново с ожиданием
+
+# Через сколько секунд незавершенное фоновое обновление можно запланировать повторно
+REFRESH_RETRY_AFTER = 60
+
+
+def ttl_from_env(name: str, soft_default: int, hard_default: int) -> Tuple[int, int]:
+    """
+    Читает мягкий и жесткий TTL кэша из CACHE_<NAME>_SOFT_TTL и CACHE_<NAME>_HARD_TTL
+
+    Returns:
+        Tuple[int, int]: (мягкий TTL, жесткий TTL), жесткий не меньше мягкого
+    """
+    prefix = f"CACHE_{name.upper()}"
+    soft_ttl = int(os.getenv(f"{prefix}_SOFT_TTL", str(soft_default)))
+    hard_ttl = int(os.getenv(f"{prefix}_HARD_TTL", str(hard_default)))
+    return soft_ttl, max(soft_ttl, hard_ttl)
+
+
+def approx_size(value: Any, depth: int = 3) -> int:
+    """Приблизительный объем значения в памяти (байт) с вложенными списками и словарями"""
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        for item_key, item in value.items():
+            size += sys.getsizeof(item_key) + approx_size(item, depth - 1)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += approx_size(item, depth - 1)
+    return size
+
+
+class _Entry:
+    """Значение кэша, время загрузки, собственные TTL и функция, которой его можно обновить"""
+
+    __slots__ = ("value", "stored_at", "fetch", "soft_ttl", "hard_ttl", "size")
+
+    def __init__(self, value: Any, fetch: Optional[Callable[[], Any]], soft_ttl: float, hard_ttl: float):
+        self.value = value
+        self.stored_at = time.time()
+        self.fetch = fetch
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.size = approx_size(value)
+
+
+class SWRCache:
+    """
+    Кэш с мягким и жестким TTL.
+
+    Пока запись младше мягкого TTL, она отдается как есть. После мягкого TTL
+    запись продолжает отдаваться сразу, а ее обновление запускается в фоне
+    (через scheduler - обычно пул Sheets с фоновым приоритетом квоты).
+    Жесткий TTL применяется, только если фоновые обновления не удаются:
+    запись старше жесткого TTL больше не отдается, и вызывающий ждет загрузку.
+    Ошибка загрузки не перезаписывает последнее удачное значение.
+
+    TTL хранится в каждой записи. Количество записей ограничено max_entries:
+    при переполнении вытесняется дольше всех не использованная запись (LRU).
+    Отрицательный результат (например, "пользователь не найден") можно
+    кэшировать на короткий negative_ttl, чтобы повторные проверки не шли в API,
+    но новый пользователь быстро становился виден.
+    Пока serve_expired() возвращает True (источник недоступен), записи старше
+    жесткого TTL тоже отдаются сразу: последнее удачное значение лучше ожидания
+    заведомо неудачной загрузки.
+    """
+
+    def __init__(self, name: str, soft_ttl: int, hard_ttl: int,
+                 scheduler: Callable[[Callable[[], Any]], bool] = None, copy_values: bool = False,
+                 max_entries: int = None, negative_ttl: int = None,
+                 is_negative: Callable[[Any], bool] = None,
+                 serve_expired: Callable[[], bool] = None):
+        """
+        Инициализация кэша
+
+        Args:
+            name (str): Название кэша для логов и метрик
+            soft_ttl (int): Через сколько секунд запись обновляется в фоне
+            hard_ttl (int): Через сколько секунд запись перестает отдаваться
+            scheduler (Callable): Запускает функцию в фоне, возвращает False, если запустить нельзя
+            copy_values (bool): Отдавать копию значения (для списков и словарей)
+            max_entries (int): Максимум записей (None - без ограничения)
+            negative_ttl (int): TTL отрицательных результатов (None - не кэшировать их)
+            is_negative (Callable): Является ли загруженное значение отрицательным результатом
+            serve_expired (Callable): Отдавать ли записи старше жесткого TTL (источник недоступен)
+        """
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(soft_ttl, hard_ttl)
+        self.scheduler = scheduler
+        self.copy_values = copy_values
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self.serve_expired = serve_expired
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._flight = SingleFlight(name)
+        # Поколение растет при сбросе: загрузка, начатая до сброса, не попадет в кэш
+        self._generation = 0
+        self._refreshing: Dict[Hashable, float] = {}  # {ключ: время постановки обновления}
+
+        # Метрики
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._served_age_total = 0.0
+        self._served_age_max = 0.0
+        self._last_served_age: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._evictions = 0
+        self._negative_hits = 0
+        self._expired_hits = 0
+
+    @staticmethod
+    def _state(entry: _Entry, age: float) -> str:
+        """Состояние записи по ее возрасту"""
+        if age < entry.soft_ttl:
+            return STATE_FRESH
+        if age < entry.hard_ttl:
+            return STATE_STALE
+        return STATE_EXPIRED
+
+    def _output(self, value: Any) -> Any:
+        """Значение для вызывающего (копия, если значения изменяемые)"""
+        if self.copy_values and value is not None:
+            return value.copy()
+        return value
+
+    def _serve(self, key: Hashable, entry: _Entry, age: float, stale: bool) -> Any:
+        """Учитывает попадание и возраст отданной записи"""
+        self._hits += 1
+        self._entries.move_to_end(key)
+        if stale:
+            self._stale_hits += 1
+        if self.is_negative is not None and self.is_negative(entry.value):
+            self._negative_hits += 1
+        self._served_age_total += age
+        self._served_age_max = max(self._served_age_max, age)
+        self._last_served_age = age
+        logger.cache_hit(self.name, details={"key": str(key), "возраст": f"{age:.0f}с",
+                                             "устарело": stale})
+        return self._output(entry.value)
+
+    def peek(self, key: Hashable = None) -> Any:
+        """
+        Возвращает значение без ожидания API или MISS
+
+        Устаревшая (но младше жесткого TTL) запись отдается сразу,
+        а ее обновление ставится в фон.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            age = time.time() - entry.stored_at
+            state = self._state(entry, age)
+            if state == STATE_EXPIRED:
+                if not self._can_serve_expired():
+                    return MISS
+                # Источник недоступен: отдаем последнее значение, обновление - в фоне после восстановления
+                self._schedule_refresh(key, entry)
+                self._expired_hits += 1
+                return self._serve(key, entry, age, True)
+            if state == STATE_STALE and not self._schedule_refresh(key, entry):
+                # Фоновое обновление недоступно (нет цикла событий) - загружаем с ожиданием
+                return MISS
+            return self._serve(key, entry, age, state == STATE_STALE)
+
+    def _can_serve_expired(self) -> bool:
+        """Можно ли отдавать записи старше жесткого TTL"""
+        return self.serve_expired is not None and self.serve_expired()
+
+    def peek_any(self, key: Hashable = None) -> Any:
+        """Возвращает последнее загруженное значение независимо от возраста или MISS"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            return self._output(entry.value)
+
+    def items(self) -> Dict[Hashable, Any]:
+        """Все записи независимо от возраста: {ключ: значение}"""
+        with self._lock:
+            return {key: self._output(entry.value) for key, entry in self._entries.items()}
+
+    def age(self, key: Hashable = None) -> Optional[float]:
+        """Возраст записи в секундах или None, если записи нет"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else time.time() - entry.stored_at
+
+    def in_flight(self, key: Hashable = None):
+        """Выполняющаяся загрузка ключа (Future) или None"""
+        return self._flight.in_flight(key)
+
+    def note_coalesced(self):
+        """Учитывает ожидание чужой загрузки из асинхронного кода"""
+        self._flight.note_coalesced()
+
+    def get(self, key: Hashable, fetch: Callable[[], Any], fallback: Callable[[], Any] = None) -> Any:
+        """
+        Возвращает значение из кэша или загружает его
+
+        Args:
+            key: Ключ записи
+            fetch (Callable): Загрузка значения; при ошибке должна выбрасывать исключение
+            fallback (Callable): Значение при ошибке загрузки, если отдать нечего (не кэшируется)
+
+        Returns:
+            Any: Значение записи
+        """
+        cached = self.peek(key)
+        if cached is not MISS:
+            return cached
+
+        def load():
+            # Пока ждали своей очереди, значение мог загрузить другой вызов
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.time() - entry.stored_at < entry.soft_ttl:
+                    return entry.value
+                self._misses += 1
+                generation = self._generation
+            logger.cache_miss(self.name, details={"key": str(key)})
+            value = fetch()
+            self._store(key, value, fetch, generation)
+            return value
+
+        try:
+            return self._output(self._flight.do(key, load))
+        except Exception as e:
+            self._note_failure(key, e)
+            # Пока не истек жесткий TTL, последнее удачное значение лучше значения по умолчанию
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    age = time.time() - entry.stored_at
+                    if age < entry.hard_ttl or self._can_serve_expired():
+                        return self._serve(key, entry, age, True)
+            if fallback is None:
+                raise
+            return fallback()
+
+    def reload(self, key: Hashable, fetch: Callable[[], Any]) -> bool:
+        """
+        Загружает значение заново независимо от возраста записи
+
+        Одновременные чтения ключа присоединяются к этой загрузке.
+        При ошибке прежняя запись остается в кэше.
+
+        Returns:
+            bool: True, если значение загружено
+        """
+        with self._lock:
+            generation = self._generation
+
+        def load():
+            value = fetch()
+            self._store(key, value, fetch, generation)
+            return value
+
+        try:
+            with self._lock:
+                self._refreshes += 1
+            self._flight.do(key, load)
+            return True
+        except Exception as e:
+            self._note_failure(key, e)
+            return False
+
+    def set(self, key: Hashable, value: Any, fetch: Callable[[], Any] = None, ttl: int = None):
+        """
+        Записывает значение в кэш без обращения к API
+
+        Args:
+            key: Ключ записи
+            value: Значение
+            fetch (Callable): Загрузка для фонового обновления (по умолчанию - прежняя)
+            ttl (int): Собственный TTL записи (по умолчанию - TTL кэша)
+        """
+        with self._lock:
+            self._generation += 1
+            self._flight.forget()
+            previous = self._entries.get(key)
+            self._put(key, value, fetch or (previous.fetch if previous else None), ttl)
+        logger.cache_update(self.name, key=str(key), details={"forced": True})
+
+    def update(self, key: Hashable, mutate: Callable[[Any], Any]) -> bool:
+        """
+        Применяет к записи изменение, уже записанное в источник (write-through)
+
+        Возраст записи не меняется: остальные данные в ней не стали свежее.
+        Загрузки, начатые до изменения, не попадут в кэш.
+
+        Args:
+            key: Ключ записи
+            mutate (Callable): Получает текущее значение и возвращает новое, не изменяя переданное
+
+        Returns:
+            bool: True, если запись обновлена; False, если записи нет или mutate
+                  выбросил исключение (тогда запись сбрасывается)
+        """
+        with self._lock:
+            self._generation += 1
+            self._flight.forget()
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            try:
+                value = mutate(entry.value)
+            except Exception as e:
+                self._remove(key)
+                logger.warning("Изменение не применено к кэшу, запись сброшена",
+                               details={"cache": self.name, "key": str(key), "ошибка": str(e)[:200]})
+                return False
+            self._bytes -= entry.size
+            entry.value = value
+            entry.size = approx_size(value)
+            self._bytes += entry.size
+        logger.cache_update(self.name, key=str(key), details={"action": "write-through"})
+        return True
+
+    def _put(self, key: Hashable, value: Any, fetch: Optional[Callable[[], Any]], ttl: int = None):
+        """Добавляет запись и вытесняет самые давно использованные сверх max_entries"""
+        if ttl is not None:
+            soft_ttl = hard_ttl = ttl
+        elif self.negative_ttl is not None and self.is_negative is not None and self.is_negative(value):
+            # Отрицательный результат живет коротко и не обновляется в фоне
+            soft_ttl = hard_ttl = self.negative_ttl
+        else:
+            soft_ttl, hard_ttl = self.soft_ttl, self.hard_ttl
+        self._remove(key)
+        entry = self._entries[key] = _Entry(value, fetch, soft_ttl, hard_ttl)
+        self._bytes += entry.size
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self._evictions += 1
+
+    def _remove(self, key: Hashable):
+        """Удаляет запись и уменьшает учтенный объем"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _store(self, key: Hashable, value: Any, fetch: Callable[[], Any], generation: int):
+        """Сохраняет загруженное значение, если за время загрузки кэш не сбросили"""
+        if (self.negative_ttl is None and self.is_negative is not None
+                and self.is_negative(value)):
+            # Отрицательные результаты не кэшируются
+            return
+        with self._lock:
+            if self._generation != generation:
+                return
+            self._put(key, value, fetch)
+        count = len(value) if self.copy_values and value is not None else None
+        logger.cache_update(self.name, key=str(key), count=count)
+
+    def _note_failure(self, key: Hashable, error: Exception):
+        """Учитывает неудачную загрузку"""
+        with self._lock:
+            self._refresh_failures += 1
+            self._last_error = f"{type(error).__name__}: {str(error)[:200]}"
+        logger.warning("Не удалось обновить кэш, используется последнее значение",
+                       details={"cache": self.name, "key": str(key), "ошибка": str(error)[:200]})
+
+    def _schedule_refresh(self, key: Hashable, entry: _Entry) -> bool:
+        """Ставит фоновое обновление записи (не более одного на ключ)"""
+        if self.scheduler is None or entry.fetch is None or entry.soft_ttl >= entry.hard_ttl:
+            return False
+        now = time.time()
+        queued = self._refreshing.get(key)
+        if queued is not None and now - queued < REFRESH_RETRY_AFTER:
+            return True
+        if self._flight.in_flight(key) is not None:
+            return True
+
+        fetch = entry.fetch
+        generation = self._generation
+
+        def refresh():
+            def load():
+                value = fetch()
+                self._store(key, value, fetch, generation)
+                return value
+
+            try:
+                with self._lock:
+                    self._refreshes += 1
+                self._flight.do(key, load)
+            except Exception as e:
+                self._note_failure(key, e)
+            finally:
+                with self._lock:
+                    if self._refreshing.get(key) == now:
+                        del self._refreshing[key]
+
+        self._refreshing[key] = now
+        try:
+            scheduled = self.scheduler(refresh)
+        except Exception as e:
+            logger.error("планирование_обновления_кэша", e, details={"cache": self.name})
+            scheduled = False
+        if not scheduled:
+            del self._refreshing[key]
+        return scheduled
+
+    def invalidate(self, key: Hashable = MISS):
+        """Сбрасывает запись или весь кэш (без аргумента)"""
+        with self._lock:
+            self._generation += 1
+            self._flight.forget()
+            self._refreshing = {}
+            if key is MISS:
+                self._entries = OrderedDict()
+                self._bytes = 0
+            else:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает попадания, промахи, обновления и возраст отданных значений"""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "coalesced": self._flight.stats()["coalesced"],
+                "refreshes": self._refreshes,
+                "refresh_failures": self._refresh_failures,
+                "last_error": self._last_error,
+                "negative_hits": self._negative_hits,
+                "expired_hits": self._expired_hits,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self._evictions,
+                "bytes": self._bytes,
+                "soft_ttl": self.soft_ttl,
+                "hard_ttl": self.hard_ttl,
+                "served_age_last": round(self._last_served_age, 1) if self._last_served_age is not None else None,
+                "served_age_avg": round(self._served_age_total / self._hits, 1) if self._hits else None,
+                "served_age_max": round(self._served_age_max, 1),
+            }
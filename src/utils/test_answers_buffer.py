@@ -0,0 +1,161 @@
+"""
+Тесты буфера ответов: журнал, повтор после перезапуска и отсутствие дублей
+"""
+
+import asyncio
+import json
+
+import pytest
+from requests.exceptions import Timeout
+
+from utils.answers_buffer import AnswersWriteBuffer
+from utils.sheets_retry import SheetsCircuitOpen
+from utils.sheets_transport import SheetsTransportError
+
+
+class FakeSheet:
+    """Лист ответов: принимает строки пачкой или отвечает заданными ошибками"""
+
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        self.errors = []
+
+    def append(self, rows):
+        self.calls += 1
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Timeout):
+                # Таймаут после того, как таблица уже приняла строки
+                self.rows.extend(rows)
+            raise error
+        for row in rows:
+            if row[0] == "bad":
+                raise SheetsTransportError("invalid row", status=400)
+        self.rows.extend(rows)
+
+    def verify(self, rows):
+        return [row in self.rows for row in rows]
+
+
+@pytest.fixture
+def sheet():
+    return FakeSheet()
+
+
+def make_buffer(tmp_path, sheet):
+    return AnswersWriteBuffer(sheet.append, str(tmp_path / "answers.jsonl"), verify_function=sheet.verify)
+
+
+def journal_rows(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    return [json.loads(line)["row"] for line in path.read_text(encoding="utf-8").splitlines() if line]
+
+
+def test_rows_are_journaled_and_flushed_in_one_call(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    buffer.add(2, ["t2", "2"])
+    assert journal_rows(tmp_path) == [["t1", "1"], ["t2", "2"]]
+    assert buffer.pending_user_ids() == ["1", "2"]
+
+    assert asyncio.run(buffer.flush()) == 2
+    assert sheet.rows == [["t1", "1"], ["t2", "2"]]
+    assert sheet.calls == 1
+    assert journal_rows(tmp_path) == []
+    assert not buffer.has_pending(1)
+
+
+def test_journal_is_replayed_without_duplicates(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    buffer.add(2, ["t2", "2"])
+    # Бот упал после записи первой строки, но до очистки журнала
+    sheet.rows.append(["t1", "1"])
+    with open(tmp_path / "answers.jsonl", "a", encoding="utf-8") as journal:
+        journal.write('{"id": "broken", "user_')
+
+    restored = make_buffer(tmp_path, sheet)
+    assert restored.pending_rows() == [["t1", "1"], ["t2", "2"]]
+    assert asyncio.run(restored.flush()) == 2
+    assert sheet.rows == [["t1", "1"], ["t2", "2"]]
+    assert restored.stats()["verified_rows"] == 1
+
+
+def test_uncertain_flush_is_verified_before_retry(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    sheet.errors = [Timeout()]
+
+    assert asyncio.run(buffer.flush()) == 0
+    assert buffer.has_pending(1)
+    # Повтор находит строку в листе и не отправляет ее второй раз
+    assert asyncio.run(buffer.flush()) == 1
+    assert sheet.rows == [["t1", "1"]]
+    assert sheet.calls == 1
+
+
+def test_unsent_flush_keeps_rows(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    sheet.errors = [SheetsCircuitOpen("open")]
+
+    assert asyncio.run(buffer.flush()) == 0
+    assert journal_rows(tmp_path) == [["t1", "1"]]
+    assert asyncio.run(buffer.flush()) == 1
+    assert sheet.rows == [["t1", "1"]]
+
+
+def test_rejected_row_is_quarantined_and_others_are_written(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    buffer.add(2, ["bad", "2"])
+    buffer.add(3, ["t3", "3"])
+
+    assert asyncio.run(buffer.flush()) == 2
+    assert sheet.rows == [["t1", "1"], ["t3", "3"]]
+    assert buffer.pending_rows() == []
+    quarantined = (tmp_path / "answers.quarantine.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["row"] for line in quarantined] == [["bad", "2"]]
+
+
+def test_discard_drops_only_the_users_rows(tmp_path, sheet, direct_sheets_calls):
+    buffer = make_buffer(tmp_path, sheet)
+    buffer.add(1, ["t1", "1"])
+    buffer.add(2, ["t2", "2"])
+
+    assert buffer.discard(1) == [["t1", "1"]]
+    assert journal_rows(tmp_path) == [["t2", "2"]]
+    assert asyncio.run(buffer.flush()) == 1
+    assert sheet.rows == [["t2", "2"]]
+
+
+def test_background_flush_survives_a_failed_journal_rewrite(tmp_path, sheet, direct_sheets_calls):
+    buffer = AnswersWriteBuffer(sheet.append, str(tmp_path / "answers.jsonl"), max_rows=1,
+                                flush_interval_ms=50, verify_function=sheet.verify)
+    rewrite = buffer._rewrite_journal
+    failures = [OSError("disk full")]
+
+    def failing_rewrite():
+        if failures:
+            raise failures.pop(0)
+        rewrite()
+
+    buffer._rewrite_journal = failing_rewrite
+
+    async def scenario():
+        buffer.start()
+        buffer.add(1, ["t1", "1"])
+        while not sheet.rows or failures:
+            await asyncio.sleep(0.01)
+        # Фоновая задача пережила ошибку и записывает следующие ответы
+        buffer.add(2, ["t2", "2"])
+        while len(sheet.rows) < 2:
+            await asyncio.sleep(0.01)
+        assert not buffer._task.done()
+        await buffer.stop()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert sheet.rows == [["t1", "1"], ["t2", "2"]]
+    assert buffer.stats()["flush_errors"] == 1
+    assert journal_rows(tmp_path) == []
@@ -0,0 +1,82 @@
+"""
+Тесты локального хранилища листов и применения очереди изменений к таблице
+"""
+
+import pytest
+
+from utils.local_store import SQLiteSheetStore, OP_APPEND, OP_UPDATE, OP_DELETE, replay_ops
+
+
+@pytest.fixture
+def store(tmp_path):
+    sheet_store = SQLiteSheetStore(str(tmp_path / "sheets.db"))
+    yield sheet_store
+    sheet_store.close()
+
+
+def op(op_id, kind, **payload):
+    return {"id": op_id, "title": "Posts", "op": kind, "payload": payload}
+
+
+def test_update_follows_a_row_shifted_in_the_sheet():
+    values = [["header"], ["new"], ["p1", "old"]]
+    ops = [op(1, OP_UPDATE, row=2, col=2, values=[["edited"]], input="RAW", before=[["p1", "old"]])]
+    rows, resolved, conflicts = replay_ops(values, ops)
+    assert rows == [["header"], ["new"], ["p1", "edited"]]
+    assert resolved[0]["payload"]["row"] == 3
+    assert conflicts == []
+
+
+def test_update_of_a_row_edited_in_the_sheet_is_a_conflict():
+    values = [["header"], ["p1", "manual"]]
+    ops = [op(1, OP_UPDATE, row=2, col=2, values=[["edited"]], input="RAW", before=[["p1", "old"]])]
+    rows, resolved, conflicts = replay_ops(values, ops)
+    assert rows == [["header"], ["p1", "manual"]]
+    assert resolved == []
+    assert conflicts == ops
+
+
+def test_changes_already_in_the_sheet_are_dropped():
+    values = [["header"], ["p1", "edited"]]
+    ops = [
+        op(1, OP_UPDATE, row=2, col=2, values=[["edited"]], input="RAW", before=[["p1", "old"]]),
+        op(2, OP_DELETE, start=3, end=3, rows=[["p2"]]),
+    ]
+    rows, resolved, conflicts = replay_ops(values, ops)
+    assert rows == [["header"], ["p1", "edited"]]
+    assert resolved == []
+    assert conflicts == []
+
+
+def test_append_goes_after_the_last_filled_row():
+    rows, resolved, _ = replay_ops([["header"], ["p1"], [], []], [op(1, OP_APPEND, rows=[["p2"]])])
+    assert rows == [["header"], ["p1"], ["p2"]]
+    assert resolved[0]["id"] == 1
+
+
+def test_local_changes_are_queued_in_order(store):
+    store.replace("Posts", [["header"], ["p1", "a"], ["p2", "b"]])
+    assert store.append_rows("Posts", [["p3", 5.0]]) == 4
+    store.update("Posts", 2, 2, [["edited"]])
+    store.delete_rows("Posts", 3)
+
+    assert store.get_all_values("Posts") == [["header", ""], ["p1", "edited"], ["p3", "5"]]
+    assert store.find_rows("Posts", 1, "p3") == [(3, ["p3", "5"])]
+    ops = store.pending_ops()
+    assert [queued["op"] for queued in ops] == [OP_APPEND, OP_UPDATE, OP_DELETE]
+    assert ops[1]["payload"]["before"] == [["p1", "a"]]
+    assert ops[2]["payload"]["rows"] == [["p2", "b"]]
+
+    store.ack([queued["id"] for queued in ops])
+    assert store.pending_count() == 0
+
+
+def test_replace_keeps_unsent_changes_and_rebase_applies_them(store):
+    store.replace("Posts", [["header"], ["p1", "a"]])
+    store.update("Posts", 2, 2, [["edited"]])
+
+    # Лист изменили в таблице: строка сдвинулась вниз
+    sheet = [["header"], ["manual"], ["p1", "a"]]
+    assert store.replace("Posts", sheet) is False
+    assert store.rebase("Posts", sheet) is True
+    assert store.get_all_values("Posts") == [["header", ""], ["manual", ""], ["p1", "edited"]]
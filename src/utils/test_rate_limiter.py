@@ -0,0 +1,89 @@
+"""
+Тесты ограничителя частоты запросов (token bucket с приоритетной очередью)
+"""
+
+import asyncio
+
+import pytest
+
+from utils.rate_limiter import (
+    TokenBucket, SheetsRateLimiter,
+    PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BACKGROUND, OPERATION_READ
+)
+
+
+def test_burst_passes_without_waiting():
+    async def scenario():
+        bucket = TokenBucket("test", rate=1, capacity=3)
+        return [await bucket.acquire() for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [0.0, 0.0, 0.0]
+
+
+def test_empty_bucket_waits_for_refill():
+    async def scenario():
+        bucket = TokenBucket("test", rate=50, capacity=1)
+        await bucket.acquire()
+        return await bucket.acquire()
+
+    waited = asyncio.run(scenario())
+    assert 0.01 <= waited < 0.5
+
+
+def test_tokens_do_not_exceed_capacity():
+    bucket = TokenBucket("test", rate=1000, capacity=2)
+    bucket._updated -= 60
+    bucket._refill()
+    assert bucket._tokens == 2
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        bucket = TokenBucket("test", rate=100, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        # Все ставятся в очередь до первого пополнения
+        await asyncio.gather(
+            take("background", PRIORITY_BACKGROUND),
+            take("normal-1", PRIORITY_NORMAL),
+            take("interactive", PRIORITY_INTERACTIVE),
+            take("normal-2", PRIORITY_NORMAL),
+        )
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "normal-1", "normal-2", "background"]
+
+
+def test_cancelled_waiter_does_not_take_a_token():
+    async def scenario():
+        bucket = TokenBucket("test", rate=50, capacity=1)
+        await bucket.acquire()
+        cancelled = asyncio.ensure_future(bucket.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await bucket.acquire(PRIORITY_BACKGROUND)
+        return bucket.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["acquired"] == 2
+    assert stats["queued"] == {}
+
+
+def test_cost_is_capped_by_capacity():
+    async def scenario():
+        bucket = TokenBucket("test", rate=1, capacity=2)
+        return await bucket.acquire(tokens=10)
+
+    assert asyncio.run(scenario()) == 0.0
+
+
+def test_unknown_operation_is_rejected():
+    limiter = SheetsRateLimiter(read_per_minute=60, write_per_minute=60, burst=2)
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.acquire("delete"))
+    assert asyncio.run(limiter.acquire(OPERATION_READ)) == 0.0
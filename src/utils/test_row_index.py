@@ -0,0 +1,38 @@
+"""
+Тесты индекса строк листа
+"""
+
+from utils.row_index import SheetRowIndex
+
+
+def test_load_skips_header_empty_and_repeated_keys():
+    index = SheetRowIndex("posts")
+    assert not index.is_loaded
+    index.load([["ID", "Текст"], ["p1", "a"], [], ["", "x"], ["p2", "b"], ["p1", "c"]])
+    assert index.is_loaded
+    assert index.get("p1") == (2, ["p1", "a"])
+    assert index.get("p2") == (5, ["p2", "b"])
+    assert index.get("p3") is None
+
+
+def test_get_returns_a_copy():
+    index = SheetRowIndex("posts")
+    index.load([["ID"], ["p1", "a"]])
+    index.get("p1")[1][1] = "changed"
+    assert index.get("p1") == (2, ["p1", "a"])
+
+
+def test_writes_keep_row_numbers_in_sync_with_the_sheet():
+    index = SheetRowIndex("posts")
+    index.load([["ID"], ["p1"], ["p2"], ["p3"]])
+    index.append("p4", {"updates": {"updatedRange": "'Posts'!A5:B5"}}, ["p4"])
+    assert index.get("p4") == (5, ["p4"])
+
+    index.remove("p2")
+    assert index.get("p1") == (2, ["p1"])
+    assert index.get("p3") == (3, ["p3"])
+    assert index.get("p4") == (4, ["p4"])
+
+    # Без номера строки из ответа ключ удаляется: строка будет найдена чтением листа
+    index.append("p1", None, ["p1", "new"])
+    assert index.get("p1") is None
@@ -0,0 +1,118 @@
+"""
+Тесты репликации очереди локального хранилища в таблицу
+"""
+
+import asyncio
+
+import pytest
+
+from utils.local_store import SQLiteSheetStore, OP_APPEND, OP_UPDATE, OP_CLEAR, OP_DELETE
+from utils.sheets_replicator import SheetsReplicator
+from utils.sheets_transport import SheetsTransportError
+
+
+class FakeApi:
+    """Запросы к таблице: записывает вызовы, отдает значения листов или заданные ошибки"""
+
+    def __init__(self, sheets=None):
+        self.sheets = sheets or {}
+        self.calls = []
+        self.errors = []
+
+    async def request(self, method, *args, priority=None, operation=None, **kwargs):
+        if method == "values_batch_get":
+            return {"valueRanges": [{"values": self.sheets.get(name.strip("'"), [])} for name in args[0]]}
+        self.calls.append((method, kwargs.get("body") or args[-1]))
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+@pytest.fixture
+def store(tmp_path):
+    sheet_store = SQLiteSheetStore(str(tmp_path / "sheets.db"))
+    yield sheet_store
+    sheet_store.close()
+
+
+def make_replicator(store, api):
+    return SheetsReplicator(store, api.request, sheet_id=lambda title: 7)
+
+
+def op(op_id, kind, title="Posts", **payload):
+    return {"id": op_id, "title": title, "op": kind, "payload": payload}
+
+
+def test_consecutive_ops_of_one_kind_are_grouped():
+    ops = [
+        op(1, OP_APPEND, rows=[]), op(2, OP_APPEND, rows=[]), op(3, OP_APPEND, title="Users", rows=[]),
+        op(4, OP_UPDATE, input="RAW"), op(5, OP_UPDATE, title="Users", input="RAW"),
+        op(6, OP_UPDATE, input="USER_ENTERED"),
+        op(7, OP_CLEAR), op(8, OP_CLEAR, title="Users"),
+        op(9, OP_DELETE), op(10, OP_APPEND, rows=[]),
+    ]
+    groups = SheetsReplicator._groups(ops)
+    assert [[grouped["id"] for grouped in group] for group in groups] == [[1, 2], [3], [4, 5], [6], [7, 8], [9], [10]]
+
+
+def test_flush_sends_groups_in_order_and_acks_them(store, direct_sheets_calls):
+    store.replace("Posts", [["header"], ["p1", "a"]])
+    store.append_rows("Posts", [["p2"]])
+    store.append_rows("Posts", [["p3"]])
+    store.update("Posts", 2, 2, [["edited"]])
+    api = FakeApi({"Posts": [["header"], ["p1", "a"]]})
+
+    assert asyncio.run(make_replicator(store, api).flush()) == 3
+    assert [method for method, _ in api.calls] == ["values_append", "values_batch_update"]
+    assert api.calls[0][1]["values"] == [["p2"], ["p3"]]
+    assert api.calls[1][1]["data"][0]["range"] == "'Posts'!B2"
+    assert store.pending_count() == 0
+
+
+def test_flush_writes_to_the_row_found_by_content(store, direct_sheets_calls):
+    store.replace("Posts", [["header"], ["p1", "a"]])
+    store.update("Posts", 2, 2, [["edited"]])
+    store.delete_rows("Posts", 2)
+    api = FakeApi({"Posts": [["header"], ["manual"], ["p1", "a"]]})
+
+    assert asyncio.run(make_replicator(store, api).flush()) == 2
+    assert api.calls[0][1]["data"][0]["range"] == "'Posts'!B3"
+    delete = api.calls[1][1]["requests"][0]["deleteDimension"]["range"]
+    assert (delete["sheetId"], delete["startIndex"], delete["endIndex"]) == (7, 2, 3)
+
+
+def test_conflicting_update_is_not_sent(store, direct_sheets_calls):
+    store.replace("Posts", [["header"], ["p1", "a"]])
+    store.update("Posts", 2, 2, [["edited"]])
+    api = FakeApi({"Posts": [["header"], ["p1", "manual"]]})
+
+    replicator = make_replicator(store, api)
+    assert asyncio.run(replicator.flush()) == 0
+    assert api.calls == []
+    assert store.pending_count() == 0
+    # Лист будет перезагружен из таблицы фоновой задачей
+    assert replicator._conflicted_titles == {"Posts"}
+
+
+def test_unavailable_sheet_keeps_the_queue(store, direct_sheets_calls):
+    store.append_rows("Posts", [["p1"]])
+    store.append_rows("Users", [["u1"]])
+    api = FakeApi()
+    api.errors = [SheetsTransportError("unavailable", status=503)]
+
+    replicator = make_replicator(store, api)
+    assert asyncio.run(replicator.flush()) == 0
+    assert store.pending_count() == 2
+    assert asyncio.run(replicator.flush()) == 2
+    assert store.pending_count() == 0
+
+
+def test_rejected_group_is_skipped(store, direct_sheets_calls):
+    store.append_rows("Posts", [["p1"]])
+    store.append_rows("Users", [["u1"]])
+    api = FakeApi()
+    api.errors = [SheetsTransportError("bad range", status=400)]
+
+    replicator = make_replicator(store, api)
+    assert asyncio.run(replicator.flush()) == 1
+    assert store.pending_count() == 0
+    assert replicator.stats()["skipped"] == 1
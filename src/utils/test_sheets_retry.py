@@ -0,0 +1,157 @@
+"""
+Тесты политики повторов, бюджета повторов и выключателя
+"""
+
+import asyncio
+
+import pytest
+
+from utils.sheets_retry import (
+    CircuitBreaker, RetryBudget, SheetsCircuitOpen, SheetsRetry,
+    CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+)
+from utils.sheets_transport import SheetsTransportError
+
+
+@pytest.fixture
+def retry(monkeypatch):
+    # Политика - синглтон: перед каждым тестом сбрасываем ее состояние, паузы - без ожидания
+    policy = SheetsRetry()
+    policy._initialized = False
+    policy.__init__()
+    monkeypatch.setattr(policy, "base_delay", 0)
+    return policy
+
+
+def flaky(errors, result="ok"):
+    """Асинхронный запрос, который сначала выбрасывает errors, затем возвращает result"""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return request, calls
+
+
+def test_breaker_opens_after_threshold_and_probes_after_timeout():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+
+    # После паузы пропускается ровно один пробный запрос
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_open_breaker_rejects_requests():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_budget_limits_retries_to_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.stats()["exhausted"] == 1
+
+
+def test_read_is_retried_after_server_error(retry):
+    request, calls = flaky([SheetsTransportError("unavailable", status=503)])
+    assert asyncio.run(retry.run(request)) == "ok"
+    assert len(calls) == 2
+    assert retry.stats()["retries"] == 1
+    assert retry.breaker.state == CIRCUIT_CLOSED
+
+
+def test_write_is_not_retried_after_server_error(retry):
+    request, calls = flaky([SheetsTransportError("unavailable", status=503)])
+    with pytest.raises(SheetsTransportError):
+        asyncio.run(retry.run(request, idempotent=False))
+    assert len(calls) == 1
+    assert retry.stats()["gave_up"] == 1
+
+
+def test_write_is_retried_after_quota_error(retry):
+    request, calls = flaky([SheetsTransportError("quota", status=429)])
+    assert asyncio.run(retry.run(request, idempotent=False)) == "ok"
+    assert len(calls) == 2
+
+
+def test_rejected_request_is_not_retried_and_does_not_trip_breaker(retry):
+    request, calls = flaky([SheetsTransportError("bad request", status=400)])
+    with pytest.raises(SheetsTransportError) as error:
+        asyncio.run(retry.run(request))
+    assert len(calls) == 1
+    assert retry.is_rejected_error(error.value)
+    assert not retry.has_recent_failures
+
+
+def test_retry_that_does_not_fit_the_timeout_is_skipped(retry):
+    retry.base_delay = 10
+    request, calls = flaky([SheetsTransportError("unavailable", status=503, retry_after=5)])
+    with pytest.raises(SheetsTransportError):
+        asyncio.run(retry.run(request, timeout=3))
+    assert len(calls) == 1
+
+
+def test_requests_fail_fast_while_breaker_is_open(retry):
+    retry.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    request, calls = flaky([SheetsTransportError("unavailable", status=None)] * 4)
+    with pytest.raises(SheetsTransportError):
+        asyncio.run(retry.run(request))
+    assert retry.is_degraded
+
+    with pytest.raises(SheetsCircuitOpen) as error:
+        asyncio.run(retry.run(request))
+    assert retry.is_unsent_error(error.value)
+    assert len(calls) == 1
+
+
+def test_pool_call_is_not_replayed_after_a_write_could_apply(retry):
+    attempts = []
+
+    def write_then_fail():
+        attempts.append(1)
+        retry.call(lambda: None, idempotent=False)
+        raise SheetsTransportError("unavailable", status=503)
+
+    async def submit(call, timeout):
+        return call()
+
+    with pytest.raises(SheetsTransportError):
+        asyncio.run(retry.run_in_pool(submit, write_then_fail, timeout=30))
+    assert len(attempts) == 1
+
+
+def test_pool_call_is_replayed_when_only_reads_failed(retry):
+    attempts = []
+
+    def read():
+        attempts.append(1)
+        if len(attempts) == 1:
+            retry.call(lambda: (_ for _ in ()).throw(SheetsTransportError("unavailable", status=503)))
+        return "ok"
+
+    async def submit(call, timeout):
+        return call()
+
+    assert asyncio.run(retry.run_in_pool(submit, read, timeout=30)) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,82 @@
+"""
+Тесты объединения одновременных загрузок одного ключа (single-flight)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, "key", load)
+        started.wait(1)
+        followers = [pool.submit(flight.do, "key", load) for _ in range(4)]
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"fetches": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_error_is_raised_to_every_waiter_and_not_cached():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", failing)
+        started.wait(1)
+        follower = pool.submit(flight.do, "key", failing)
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    # Следующий вызов выполняет новую загрузку
+    assert flight.do("key", lambda: "retry") == "retry"
+
+
+def test_different_keys_load_independently():
+    flight = SingleFlight("test")
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["fetches"] == 2
+
+
+def test_forget_starts_a_new_load_for_later_callers():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(1)
+        return "old"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        old = pool.submit(flight.do, "key", slow)
+        started.wait(1)
+        flight.forget()
+        assert flight.in_flight("key") is None
+        assert flight.do("key", lambda: "new") == "new"
+        release.set()
+        assert old.result() == "old"
+    assert flight.stats()["in_flight"] == 0
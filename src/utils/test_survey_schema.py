@@ -0,0 +1,79 @@
+"""
+Тесты скомпилированной схемы опроса
+"""
+
+from utils.survey_schema import (
+    SurveySchema, SurveyOption, OPTION_PLAIN, OPTION_FREE_TEXT, OPTION_CHOICE,
+    BACK_TO_OPTIONS, BACK_KEYBOARD
+)
+
+
+def keyboard_texts(keyboard):
+    return [[button.text for button in row] for row in keyboard.keyboard]
+
+
+def test_option_kinds_are_resolved_once():
+    assert SurveyOption.compile("Да").kind == OPTION_PLAIN
+    assert SurveyOption.compile({"text": "Да"}).kind == OPTION_PLAIN
+
+    other = SurveyOption.compile({"text": "Другое", "sub_options": []})
+    assert other.kind == OPTION_FREE_TEXT
+    assert other.keyboard is BACK_KEYBOARD
+
+    prompted = SurveyOption.compile({"text": "Другое", "sub_options": ["Введите свой вариант"]})
+    assert prompted.kind == OPTION_FREE_TEXT
+    assert prompted.prompt == "Введите свой вариант"
+
+    choice = SurveyOption.compile({"text": "Город", "sub_options": ["Москва", "Казань"]})
+    assert choice.kind == OPTION_CHOICE
+    assert list(choice.sub_options) == ["Москва", "Казань"]
+    assert keyboard_texts(choice.keyboard) == [["Москва"], ["Казань"], [BACK_TO_OPTIONS]]
+
+
+def test_schema_lookup_and_keyboards():
+    source = {
+        "Вам понравилось?": ["Да", "Нет", "Да"],
+        "Откуда вы?": [{"text": "Город", "sub_options": ["Москва"]}],
+        "Комментарий": [],
+    }
+    schema = SurveySchema.compile(source, version=3)
+
+    assert schema.version == 3
+    assert len(schema) == 3
+    assert schema.texts == tuple(source)
+    assert schema.source is source
+    assert schema.question(3) is None
+    assert schema.question(-1) is None
+
+    first = schema.question(0)
+    assert keyboard_texts(first.keyboard) == [["Да"], ["Нет"], ["Да"]]
+    # При повторе текста действует первый вариант
+    assert first.find_option("Да") is first.options[0]
+    assert first.find_option("Может быть") is None
+    assert first.find_option(None) is None
+
+    assert schema.question(1).find_option("Город").kind == OPTION_CHOICE
+    assert schema.question(2).keyboard is None
+
+
+def test_short_questions_show_their_full_text():
+    texts = ["1", "2", "1. Как вас зовут?", "2 Сколько вам лет?", "1", "7"]
+    # Полный текст, уже заданный или показанный раньше, повторно не подставляется
+    assert SurveySchema.resolve_display_texts(texts) == [
+        "1. Как вас зовут?", "2 Сколько вам лет?", "1. Как вас зовут?", "2 Сколько вам лет?", "1", "7"
+    ]
+
+
+def test_short_question_takes_options_of_the_full_question():
+    schema = SurveySchema.compile({
+        "3": [],
+        "4": ["Скорость"],
+        "3. Оцените сервис": ["Хорошо", "Плохо"],
+        "4. Что улучшить?": [],
+    })
+    short = schema.question(0)
+    assert short.text == "3"
+    assert short.display_text == "3. Оцените сервис"
+    assert [option.text for option in short.options] == ["Хорошо", "Плохо"]
+    # У полного вопроса вариантов нет - остаются собственные варианты короткого
+    assert [option.text for option in schema.question(1).options] == ["Скорость"]
@@ -0,0 +1,164 @@
+"""
+Тесты кэша с мягким и жестким TTL (stale-while-revalidate)
+"""
+
+import pytest
+
+from utils.single_flight import MISS
+from utils.swr_cache import SWRCache
+
+
+def age_entry(cache: SWRCache, key, seconds: float):
+    """Состаривает запись кэша на seconds секунд"""
+    cache._entries[key].stored_at -= seconds
+
+
+def inline_scheduler(scheduled: list):
+    """Планировщик, который копит фоновые обновления для ручного запуска"""
+    def schedule(function):
+        scheduled.append(function)
+        return True
+    return schedule
+
+
+def test_fresh_entry_is_served_without_fetch():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600)
+    fetches = []
+    assert cache.get("key", lambda: fetches.append(1) or "value") == "value"
+    assert cache.get("key", lambda: fetches.append(1) or "other") == "value"
+    assert len(fetches) == 1
+
+
+def test_stale_entry_is_served_and_refreshed_in_background():
+    scheduled = []
+    versions = iter(["old", "new"])
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, scheduler=inline_scheduler(scheduled))
+    # Фоновое обновление повторяет загрузку, которой запись была получена
+    cache.get("key", lambda: next(versions))
+    age_entry(cache, "key", 120)
+
+    assert cache.get("key", lambda: "unused") == "old"
+    assert len(scheduled) == 1
+    # Повторное чтение не ставит второе обновление того же ключа
+    assert cache.get("key", lambda: "unused") == "old"
+    assert len(scheduled) == 1
+
+    scheduled[0]()
+    assert cache.peek("key") == "new"
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_stale_entry_without_scheduler_is_loaded_synchronously():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600)
+    cache.get("key", lambda: "old")
+    age_entry(cache, "key", 120)
+    assert cache.get("key", lambda: "new") == "new"
+
+
+def test_expired_entry_is_not_served():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, scheduler=inline_scheduler([]))
+    cache.get("key", lambda: "old")
+    age_entry(cache, "key", 900)
+    assert cache.peek("key") is MISS
+    assert cache.get("key", lambda: "new") == "new"
+
+
+def test_expired_entry_is_served_while_source_is_unavailable():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, scheduler=inline_scheduler([]),
+                     serve_expired=lambda: True)
+    cache.get("key", lambda: "old")
+    age_entry(cache, "key", 900)
+    assert cache.peek("key") == "old"
+    assert cache.stats()["expired_hits"] == 1
+
+
+def test_failed_load_keeps_last_good_value():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600)
+    cache.get("key", lambda: "old")
+    age_entry(cache, "key", 120)
+
+    def failing():
+        raise RuntimeError("unavailable")
+
+    assert cache.get("key", failing) == "old"
+    assert cache.peek_any("key") == "old"
+    assert cache.stats()["refresh_failures"] == 1
+
+
+def test_failed_load_without_value_uses_fallback():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600)
+
+    def failing():
+        raise RuntimeError("unavailable")
+
+    assert cache.get("key", failing, fallback=lambda: "default") == "default"
+    assert cache.peek_any("key") is MISS
+    with pytest.raises(RuntimeError):
+        cache.get("key", failing)
+
+
+def test_refresh_started_before_invalidate_is_discarded():
+    scheduled = []
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, scheduler=inline_scheduler(scheduled))
+    cache.get("key", lambda: "old")
+    age_entry(cache, "key", 120)
+    cache.get("key", lambda: "refreshed")
+
+    cache.set("key", "written")
+    scheduled[0]()
+    assert cache.peek("key") == "written"
+
+
+def test_update_applies_write_through_without_changing_age():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, copy_values=True)
+    cache.get("key", lambda: [1, 2])
+    age_entry(cache, "key", 30)
+
+    assert cache.update("key", lambda items: items + [3])
+    assert cache.peek("key") == [1, 2, 3]
+    assert cache.age("key") >= 30
+    assert not cache.update("missing", lambda items: items)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    # Чтение делает "a" недавно использованной - вытесняется "b"
+    cache.get("a", lambda: 1)
+    cache.get("c", lambda: 3)
+
+    assert set(cache.items()) == {"a", "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entry_keeps_its_own_ttl():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600)
+    cache.set("short", "value", ttl=10)
+    cache.get("default", lambda: "value")
+    age_entry(cache, "short", 30)
+    age_entry(cache, "default", 30)
+
+    assert cache.peek("short") is MISS
+    assert cache.peek("default") == "value"
+
+
+def test_negative_result_uses_negative_ttl():
+    cache = SWRCache("test", soft_ttl=600, hard_ttl=3600, negative_ttl=5,
+                     is_negative=lambda value: value is False)
+    cache.get("missing", lambda: False)
+    cache.get("present", lambda: True)
+    age_entry(cache, "missing", 10)
+    age_entry(cache, "present", 10)
+
+    assert cache.peek("missing") is MISS
+    assert cache.peek("present") is True
+
+
+def test_size_accounting_follows_removals():
+    cache = SWRCache("test", soft_ttl=60, hard_ttl=600, max_entries=1)
+    cache.get("a", lambda: ["x" * 100])
+    cache.get("b", lambda: ["y"])
+    assert cache.stats()["bytes"] == cache._entries["b"].size
+    cache.invalidate()
+    assert cache.stats()["bytes"] == 0
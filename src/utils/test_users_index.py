@@ -0,0 +1,61 @@
+"""
+Тесты индекса листа пользователей
+"""
+
+import pytest
+
+from utils.users_index import UsersIndex
+
+
+@pytest.fixture
+def index():
+    # Индекс - синглтон: перед каждым тестом сбрасываем его состояние
+    users = UsersIndex()
+    users._initialized = False
+    users.__init__()
+    return users
+
+
+HEADER = ["ID", "Telegram ID", "Имя", "Дата"]
+
+
+def test_load_indexes_rows_and_next_id(index):
+    index.load([HEADER, ["1", "100"], ["5", "500"], ["x", "700"]])
+    assert index.get_row(500) == 3
+    assert index.contains(100) is True
+    assert index.contains(999) is False
+    assert index.reserve(999) == 6
+
+
+def test_reserve_rejects_registered_and_registering_users(index):
+    index.load([HEADER, ["1", "100"]])
+    assert index.reserve(100) is None
+    assert index.reserve(200) == 2
+    assert index.reserve(200) is None
+    index.release(200)
+    # ID, выданный под неудавшуюся запись, повторно не используется
+    assert index.reserve(200) == 3
+
+
+def test_counter_does_not_decrease_after_reload(index):
+    index.load([HEADER, ["1", "100"], ["9", "900"]])
+    index.load([HEADER, ["1", "100"]])
+    assert index.allocate_id() == 10
+
+
+def test_restored_index_defers_id_allocation(index):
+    index.restore({"rows": {"100": 2}, "next_id": 2})
+    assert index.is_restored
+    # Пользователя без ID можно занять, но сам ID выдается после сверки с таблицей
+    assert index.reserve(300, allocate_id=False) == 0
+    assert index.contains(300) is True
+    assert index.contains(400) is None
+
+    index.load([HEADER, ["1", "100"], ["7", "700"]])
+    assert not index.is_restored
+    assert index.allocate_id() == 8
+
+
+def test_parse_updated_row():
+    assert UsersIndex.parse_updated_row({"updates": {"updatedRange": "'Users'!A12:D12"}}) == 12
+    assert UsersIndex.parse_updated_row(None) is None
@@ -0,0 +1,202 @@
+"""
+Тесты очереди отложенных записей: журнал, порядок, отсутствие дублей и карантин
+"""
+
+import asyncio
+import json
+
+import pytest
+from requests.exceptions import Timeout
+
+from utils.sheets_retry import SheetsCircuitOpen
+from utils.sheets_transport import SheetsTransportError
+from utils.write_queue import DeferredWriteQueue
+
+
+class FakeSpreadsheet:
+    """Листы таблицы: values.append с номерами строк в ответе или заданные ошибки"""
+
+    def __init__(self):
+        self.sheets = {}
+        self.calls = []
+        self.errors = []
+
+    def append(self, sheet_title, rows):
+        self.calls.append((sheet_title, len(rows)))
+        sheet = self.sheets.setdefault(sheet_title, [["header"]])
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Timeout):
+                # Таймаут после того, как таблица уже приняла строки
+                sheet.extend(rows)
+            raise error
+        if any(row[0] == "bad" for row in rows):
+            raise SheetsTransportError("invalid row", status=400)
+        first = len(sheet) + 1
+        sheet.extend(rows)
+        return {"updates": {"updatedRange": f"'{sheet_title}'!A{first}:D{len(sheet)}"}}
+
+    def verify(self, sheet_title, rows):
+        return [row in self.sheets.get(sheet_title, []) for row in rows]
+
+
+@pytest.fixture
+def spreadsheet():
+    return FakeSpreadsheet()
+
+
+def make_queue(tmp_path, spreadsheet, applied=None):
+    queue = DeferredWriteQueue(spreadsheet.append, str(tmp_path / "deferred.jsonl"),
+                               verify_function=spreadsheet.verify)
+    if applied is not None:
+        queue.register("users", lambda entry, row: applied.append((entry["key"], row)))
+    return queue
+
+
+def test_consecutive_rows_of_a_sheet_are_sent_together(tmp_path, spreadsheet, direct_sheets_calls):
+    applied = []
+    queue = make_queue(tmp_path, spreadsheet, applied)
+    queue.enqueue("users", "Users", ["1", "100"], key="100")
+    queue.enqueue("users", "Users", ["2", "200"], key="200")
+    queue.enqueue("posts", "Posts", ["p1"], key="p1")
+
+    assert asyncio.run(queue.drain()) == 3
+    assert spreadsheet.calls == [("Users", 2), ("Posts", 1)]
+    assert applied == [("100", 2), ("200", 3)]
+    assert not queue.has_pending()
+    assert (tmp_path / "deferred.jsonl").read_text(encoding="utf-8") == ""
+
+
+def test_journal_is_replayed_without_duplicates(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+    queue.enqueue("users", "Users", ["1", "100"], key="100")
+    queue.enqueue("users", "Users", ["2", "200"], key="200")
+    # Бот упал после записи первой строки, но до очистки журнала
+    spreadsheet.sheets["Users"] = [["header"], ["1", "100"]]
+
+    applied = []
+    restored = make_queue(tmp_path, spreadsheet, applied)
+    assert restored.has_pending("users")
+    assert asyncio.run(restored.drain()) == 2
+    assert spreadsheet.sheets["Users"] == [["header"], ["1", "100"], ["2", "200"]]
+    # Найденная в листе строка передается обработчику без номера строки
+    assert applied == [("100", None), ("200", 3)]
+
+
+def test_uncertain_write_is_verified_before_retry(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+    queue.enqueue("users", "Users", ["1", "100"], key="100")
+    spreadsheet.errors = [Timeout()]
+
+    assert asyncio.run(queue.drain()) == 0
+    assert queue.stats()["uncertain"] == 1
+    assert asyncio.run(queue.drain()) == 1
+    assert spreadsheet.sheets["Users"] == [["header"], ["1", "100"]]
+    assert queue.stats()["verified_rows"] == 1
+
+
+def test_unsent_write_stops_the_drain(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+    queue.enqueue("users", "Users", ["1", "100"], key="100")
+    queue.enqueue("posts", "Posts", ["p1"], key="p1")
+    spreadsheet.errors = [SheetsCircuitOpen("open")]
+
+    assert asyncio.run(queue.drain()) == 0
+    # Порядок сохраняется: посты не обгоняют пользователей
+    assert spreadsheet.calls == [("Users", 1)]
+    assert len(queue.pending_entries()) == 2
+
+
+def test_rejected_row_is_quarantined(tmp_path, spreadsheet, direct_sheets_calls):
+    released = []
+    queue = make_queue(tmp_path, spreadsheet)
+    queue.register("users", lambda entry, row: None, on_quarantined=lambda entry: released.append(entry["key"]))
+    queue.enqueue("users", "Users", ["1", "100"], key="100")
+    queue.enqueue("users", "Users", ["bad", "200"], key="200")
+    queue.enqueue("users", "Users", ["3", "300"], key="300")
+
+    assert asyncio.run(queue.drain()) == 2
+    assert spreadsheet.sheets["Users"] == [["header"], ["1", "100"], ["3", "300"]]
+    assert released == ["200"]
+    quarantined = (tmp_path / "deferred.quarantine.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["key"] for line in quarantined] == ["200"]
+
+
+
+def test_prepare_fills_rows_before_sending_and_journals_them(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+
+    def prepare(entries):
+        for entry in entries:
+            entry["row"][0] = "7"
+        return True
+
+    queue.register("users", lambda entry, row: None, prepare=prepare)
+    queue.enqueue("users", "Users", ["", "100"], key="100")
+    spreadsheet.errors = [Timeout()]
+
+    assert asyncio.run(queue.drain()) == 0
+    # Выданный ID сохранен в журнале: после перезапуска строка проверяется в листе с ним же
+    restored = make_queue(tmp_path, spreadsheet)
+    assert restored.pending_entries("users")[0]["row"] == ["7", "100"]
+    assert asyncio.run(restored.drain()) == 1
+    assert spreadsheet.sheets["Users"] == [["header"], ["7", "100"]]
+
+
+def test_failed_prepare_keeps_rows_queued(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+
+    def prepare(entries):
+        raise RuntimeError("index not reconciled")
+
+    queue.register("users", lambda entry, row: None, prepare=prepare)
+    queue.enqueue("users", "Users", ["", "100"], key="100")
+
+    assert asyncio.run(queue.drain()) == 0
+    assert spreadsheet.calls == []
+    assert queue.has_pending("users")
+
+
+def test_background_drain_survives_a_failed_journal_rewrite(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+    rewrite = queue._rewrite_journal
+    failures = [OSError("disk full")]
+
+    def failing_rewrite():
+        if failures:
+            raise failures.pop(0)
+        rewrite()
+
+    queue._rewrite_journal = failing_rewrite
+
+    async def scenario():
+        queue.start()
+        queue.enqueue("users", "Users", ["1", "100"], key="100")
+        queue.wakeup()
+        while failures:
+            await asyncio.sleep(0.01)
+        # Фоновая задача пережила ошибку и отправляет следующие записи
+        queue.enqueue("posts", "Posts", ["p1"], key="p1")
+        queue.wakeup()
+        while queue.has_pending():
+            await asyncio.sleep(0.01)
+        assert not queue._task.done()
+        await queue.stop()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert spreadsheet.calls == [("Users", 1), ("Posts", 1)]
+    assert queue.stats()["drain_errors"] == 1
+    assert (tmp_path / "deferred.jsonl").read_text(encoding="utf-8") == ""
+
+
+def test_failed_journal_rewrite_after_prepare_keeps_rows_unsent(tmp_path, spreadsheet, direct_sheets_calls):
+    queue = make_queue(tmp_path, spreadsheet)
+    queue.register("users", lambda entry, row: None, prepare=lambda entries: True)
+    queue.enqueue("users", "Users", ["", "100"], key="100")
+
+    def failing_rewrite():
+        raise OSError("disk full")
+
+    queue._rewrite_journal = failing_rewrite
+    assert asyncio.run(queue._prepare(queue.pending_entries())) is False
+    assert spreadsheet.calls == []
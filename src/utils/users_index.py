@@ -0,0 +1,181 @@
+"""
+Модуль с индексом листа пользователей
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+class UsersIndex:
+    """
+    Синглтон-класс с индексом листа пользователей: telegram_id -> номер строки.
+
+    Хранит также следующий свободный ID пользователя. Счетчик только растет:
+    ID, выданный под неудавшуюся запись, повторно не используется, поэтому
+    параллельные регистрации не получат одинаковый ID.
+    """
+
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UsersIndex, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._rows: Dict[str, int] = {}  # {telegram_id: номер строки в листе}
+        self._reserved: Dict[str, int] = {}  # Регистрации в процессе: {telegram_id: user_id}
+        self._committed_since_load: Dict[str, int] = {}  # Регистрации после последней загрузки
+        self._next_id = 1
+        self._loaded = False
+        self._restored = False  # Восстановлен из снимка и еще не сверен с таблицей
+
+        self._initialized = True
+        logger.init("UsersIndex", "Инициализирован индекс пользователей")
+
+    @property
+    def is_loaded(self) -> bool:
+        """Загружен ли индекс из таблицы"""
+        return self._loaded
+
+    @property
+    def is_restored(self) -> bool:
+        """Восстановлен ли индекс из снимка без сверки с таблицей (следующий ID может быть неточным)"""
+        return self._restored
+
+    def export(self) -> Dict[str, object]:
+        """Состояние индекса для снимка на диске"""
+        with self._lock:
+            return {"rows": dict(self._rows), "next_id": self._next_id}
+
+    def restore(self, state: Dict[str, object]):
+        """Восстанавливает индекс из снимка; до сверки с таблицей он отвечает только на проверки"""
+        with self._lock:
+            self._rows = {str(key): int(row) for key, row in state.get("rows", {}).items()}
+            self._next_id = int(state.get("next_id", 1))
+            self._loaded = True
+            self._restored = True
+        logger.cache_update("users_index", count=len(self._rows), details={"source": "snapshot"})
+
+    def load(self, values: List[List[str]]):
+        """
+        Строит индекс по содержимому листа пользователей
+
+        Args:
+            values (List[List[str]]): Все значения листа, включая строку заголовков
+        """
+        rows = {}
+        max_id = 0
+        for row_number, row in enumerate(values[1:], start=2):
+            if len(row) > 1 and row[1].strip():
+                rows[row[1].strip()] = row_number
+            try:
+                if row and row[0].strip():
+                    max_id = max(max_id, int(row[0]))
+            except (ValueError, TypeError):
+                # Пропускаем некорректные значения
+                continue
+
+        with self._lock:
+            # Пользователи, добавленные пока лист читался, в прочитанных данных могут отсутствовать
+            for key, row_number in self._committed_since_load.items():
+                rows.setdefault(key, row_number)
+            self._committed_since_load = {}
+            self._rows = rows
+            # Счетчик не уменьшается, даже если строки удалили вручную
+            self._next_id = max(self._next_id if self._loaded else 1, max_id + 1)
+            self._loaded = True
+            self._restored = False
+        logger.cache_update("users_index", count=len(rows), details={"next_id": self._next_id})
+
+    def contains(self, telegram_id: int) -> Optional[bool]:
+        """
+        Проверяет, зарегистрирован ли пользователь
+
+        Returns:
+            Optional[bool]: Результат проверки или None, если индекс еще не загружен
+                            (или восстановлен из снимка и пользователя в нем нет)
+        """
+        key = str(telegram_id)
+        with self._lock:
+            if not self._loaded:
+                return None
+            if key in self._rows or key in self._reserved:
+                return True
+            # До сверки со снимком отсутствие пользователя в индексе не доказано
+            return None if self._restored else False
+
+    def get_row(self, telegram_id: int) -> Optional[int]:
+        """Возвращает номер строки пользователя в листе или None"""
+        with self._lock:
+            return self._rows.get(str(telegram_id))
+
+    def reserve(self, telegram_id: int, allocate_id: bool = True) -> Optional[int]:
+        """
+        Выделяет ID для нового пользователя
+
+        Args:
+            telegram_id (int): Telegram ID пользователя
+            allocate_id (bool): Выдать ID сразу; False - только занять пользователя, ID будет
+                выдан позже через allocate_id() (счетчик из снимка может быть устаревшим)
+
+        Returns:
+            Optional[int]: Новый ID (0, если ID не выдавался) или None, если пользователь
+                уже есть или регистрируется
+        """
+        key = str(telegram_id)
+        with self._lock:
+            if key in self._rows or key in self._reserved:
+                return None
+            user_id = self.allocate_id() if allocate_id else 0
+            self._reserved[key] = user_id
+            return user_id
+
+    def allocate_id(self) -> int:
+        """Выдает следующий свободный ID пользователя"""
+        with self._lock:
+            user_id = self._next_id
+            self._next_id += 1
+            return user_id
+
+    def commit(self, telegram_id: int, row_number: Optional[int]):
+        """Фиксирует успешную регистрацию пользователя в строке row_number"""
+        key = str(telegram_id)
+        with self._lock:
+            self._reserved.pop(key, None)
+            self._rows[key] = row_number or 0
+            self._committed_since_load[key] = row_number or 0
+        logger.cache_update("users_index", key=key, details={"row": row_number})
+
+    def release(self, telegram_id: int):
+        """Отменяет резервирование после неудачной записи (ID не переиспользуется)"""
+        with self._lock:
+            self._reserved.pop(str(telegram_id), None)
+
+    def count(self) -> int:
+        """Количество зарегистрированных пользователей в индексе"""
+        with self._lock:
+            return len(self._rows)
+
+    @staticmethod
+    def parse_updated_row(append_response: dict) -> Optional[int]:
+        """Извлекает номер строки из ответа values.append (updates.updatedRange)"""
+        try:
+            updated_range = append_response["updates"]["updatedRange"]
+        except (KeyError, TypeError):
+            return None
+        match = re.search(r"![A-Z]+(\d+)", updated_range)
+        return int(match.group(1)) if match else None
+
+# Создаем глобальный экземпляр индекса
+users_index = UsersIndex()
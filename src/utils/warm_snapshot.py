@@ -0,0 +1,145 @@
+"""
+Модуль со снимком данных таблицы на диске для быстрого (теплого) запуска бота
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Версия формата снимка: снимок другой версии не используется
+SNAPSHOT_VERSION = 1
+
+
+class WarmSnapshot:
+    """
+    Снимок вопросов, сообщений, админов, постов и индексов пользователей на диске.
+
+    При запуске бот восстанавливает данные из снимка без обращений к API,
+    сразу начинает принимать обновления и сверяется с таблицей в фоне.
+    Снимок привязан к таблице и названиям листов (fingerprint): снимок
+    другой таблицы, другой версии формата или старше max_age не используется.
+    Файл перезаписывается атомарно, поэтому прерванная запись не портит
+    предыдущий снимок.
+    """
+
+    def __init__(self, path: str = None, max_age: int = None):
+        """
+        Инициализация снимка
+
+        Args:
+            path (str): Путь к файлу снимка
+            max_age (int): Максимальный возраст снимка в секундах (0 - не использовать снимок)
+        """
+        if path is None:
+            path = os.path.join(os.getenv("DATA_DIR", "/app/data"), "warm_snapshot.json")
+        if max_age is None:
+            max_age = int(os.getenv("WARM_SNAPSHOT_MAX_AGE", "604800"))
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        # Метрики
+        self._saves = 0
+        self._last_saved: Optional[float] = None
+        self._restored_age: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Используется ли снимок"""
+        return self.max_age > 0
+
+    def load(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Читает снимок, если он подходит для запуска
+
+        Args:
+            fingerprint (Dict[str, Any]): Таблица и листы, для которых нужен снимок
+
+        Returns:
+            Optional[Dict[str, Any]]: Данные снимка или None (холодный запуск)
+        """
+        if not self.enabled:
+            return None
+        started = time.time()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Снимок данных поврежден, выполняется холодный запуск",
+                           details={"файл": self.path, "ошибка": str(e)[:200]})
+            return None
+
+        reason = None
+        age = started - snapshot.get("saved_at", 0)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            reason = "версия формата"
+        elif snapshot.get("fingerprint") != fingerprint:
+            reason = "другая таблица или листы"
+        elif age > self.max_age:
+            reason = "снимок устарел"
+        if reason:
+            logger.warning("Снимок данных не подходит, выполняется холодный запуск",
+                           details={"причина": reason, "возраст": f"{age:.0f}с"})
+            return None
+
+        self._restored_age = age
+        logger.data_load("снимок", self.path, details={"возраст": f"{age:.0f}с",
+                                                      "время": f"{time.time() - started:.3f}с"})
+        return snapshot.get("data", {})
+
+    def save(self, fingerprint: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        """
+        Атомарно записывает снимок
+
+        Args:
+            fingerprint (Dict[str, Any]): Таблица и листы, к которым относятся данные
+            data (Dict[str, Any]): Данные снимка (JSON-совместимые)
+
+        Returns:
+            bool: True, если снимок записан
+        """
+        if not self.enabled:
+            return False
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "fingerprint": fingerprint,
+            "data": data,
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._saves += 1
+                self._last_saved = snapshot["saved_at"]
+        except OSError as e:
+            logger.error("сохранение_снимка_данных", e, details={"файл": self.path})
+            return False
+        logger.data_save("снимок", self.path)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает состояние снимка"""
+        return {
+            "enabled": self.enabled,
+            "saves": self._saves,
+            "last_saved_age": round(time.time() - self._last_saved, 1) if self._last_saved else None,
+            "restored_age": round(self._restored_age, 1) if self._restored_age is not None else None,
+        }
+
+# Создаем глобальный экземпляр снимка
+warm_snapshot = WarmSnapshot()
@@ -0,0 +1,214 @@
+"""
+Модуль с реестром листов таблицы (кэш объектов Worksheet)
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+import gspread
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from utils.logger import get_logger
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+# Фрагменты ошибок API, означающие, что закэшированный лист переименован или удален
+STALE_HANDLE_ERRORS = (
+    "Unable to parse range",
+    "No grid with id",
+    "does not exist",
+)
+
+
+class WorksheetRegistry:
+    """
+    Синглтон-класс с объектами Worksheet всех листов таблицы.
+
+    spreadsheet.worksheet(title) в gspread каждый раз запрашивает метаданные
+    таблицы, поэтому список листов загружается одним запросом worksheets()
+    и дальше листы выдаются из памяти по логическому имени (ключу SHEET_NAMES)
+    или по названию. Список перезагружается при создании, переименовании и
+    удалении листа через реестр, а также когда API отвечает ошибкой,
+    означающей, что лист изменили в обход бота.
+    """
+
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(WorksheetRegistry, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._spreadsheet: Optional[gspread.Spreadsheet] = None
+        self._sheet_names: Dict[str, str] = {}
+        self._worksheets: Dict[str, gspread.Worksheet] = {}  # {название листа: Worksheet}
+        self._loaded = False
+        self._loaded_time = 0
+
+        self._hits = 0
+        self._loads = 0
+        self._stale_errors = 0
+
+        self._initialized = True
+        logger.init("WorksheetRegistry", "Инициализирован реестр листов")
+
+    def bind(self, spreadsheet: gspread.Spreadsheet, sheet_names: Dict[str, str]):
+        """
+        Подключает реестр к таблице
+
+        Args:
+            spreadsheet (gspread.Spreadsheet): Открытая таблица или SpreadsheetBridge (листы
+                создаются поверх моста, и их запросы идут через асинхронный транспорт)
+            sheet_names (Dict[str, str]): Логические имена листов -> названия (SHEET_NAMES)
+        """
+        with self._lock:
+            self._spreadsheet = spreadsheet
+            self._sheet_names = dict(sheet_names)
+            self._worksheets = {}
+            self._loaded = False
+        self._watch_client(spreadsheet.client)
+        watch_errors = getattr(spreadsheet, "watch_errors", None)
+        if watch_errors is not None:
+            # Ошибки запросов асинхронного транспорта (они не проходят через клиент gspread)
+            watch_errors(self.note_error)
+
+    def _watch_client(self, client):
+        """Перехватывает ошибки API клиента, чтобы сбрасывать устаревшие листы"""
+        if getattr(client, "_worksheet_registry_watch", False):
+            return
+        request = client.request
+
+        def watched_request(*args, **kwargs):
+            try:
+                return request(*args, **kwargs)
+            except APIError as e:
+                self.note_error(e)
+                raise
+
+        client.request = watched_request
+        client._worksheet_registry_watch = True
+
+    def _resolve(self, name: str) -> str:
+        """Название листа по логическому имени (или само название)"""
+        return self._sheet_names.get(name, name)
+
+    def _load(self):
+        """Загружает список листов одним запросом метаданных"""
+        worksheets = self._spreadsheet.worksheets()
+        self._worksheets = {worksheet.title: worksheet for worksheet in worksheets}
+        self._loaded = True
+        self._loaded_time = time.time()
+        self._loads += 1
+        logger.cache_update("worksheets", count=len(self._worksheets),
+                            details={"листы": list(self._worksheets)})
+
+    def get(self, name: str) -> gspread.Worksheet:
+        """
+        Возвращает лист по логическому имени или названию
+
+        Args:
+            name (str): Ключ SHEET_NAMES ('users', 'posts'...) или название листа
+
+        Raises:
+            WorksheetNotFound: Листа нет в таблице
+        """
+        title = self._resolve(name)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            elif title not in self._worksheets:
+                # Лист мог быть создан в таблице вручную
+                self._load()
+
+            worksheet = self._worksheets.get(title)
+            if worksheet is None:
+                raise WorksheetNotFound(title)
+            self._hits += 1
+            return worksheet
+
+    def exists(self, name: str) -> bool:
+        """Есть ли лист в таблице"""
+        try:
+            self.get(name)
+            return True
+        except WorksheetNotFound:
+            return False
+
+    def all(self) -> Dict[str, gspread.Worksheet]:
+        """Все листы таблицы: {название: Worksheet} (без запроса, если список загружен)"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return dict(self._worksheets)
+
+    def register(self, worksheet: gspread.Worksheet):
+        """Добавляет в реестр лист, созданный в обход add (например, в пакетном batch_update)"""
+        with self._lock:
+            self._worksheets[worksheet.title] = worksheet
+        logger.cache_update("worksheets", key=worksheet.title, details={"action": "add"})
+
+    def add(self, title: str, rows: int, cols: int) -> gspread.Worksheet:
+        """Создает лист и добавляет его в реестр"""
+        title = self._resolve(title)
+        with self._lock:
+            worksheet = self._spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+            self._worksheets[worksheet.title] = worksheet
+        logger.cache_update("worksheets", key=title, details={"action": "add"})
+        return worksheet
+
+    def delete(self, name: str):
+        """Удаляет лист из таблицы и из реестра"""
+        with self._lock:
+            worksheet = self.get(name)
+            self._spreadsheet.del_worksheet(worksheet)
+            self._worksheets.pop(worksheet.title, None)
+        logger.cache_update("worksheets", key=worksheet.title, details={"action": "delete"})
+
+    def rename(self, name: str, new_title: str) -> gspread.Worksheet:
+        """Переименовывает лист и обновляет реестр"""
+        with self._lock:
+            worksheet = self.get(name)
+            old_title = worksheet.title
+            worksheet.update_title(new_title)
+            self._worksheets.pop(old_title, None)
+            self._worksheets[new_title] = worksheet
+        logger.cache_update("worksheets", key=new_title, details={"action": "rename", "old_title": old_title})
+        return worksheet
+
+    def invalidate(self):
+        """Сбрасывает список листов; он будет загружен при следующем обращении"""
+        with self._lock:
+            self._loaded = False
+            self._worksheets = {}
+
+    def note_error(self, error: Exception):
+        """Сбрасывает реестр, если ошибка API указывает на переименованный или удаленный лист"""
+        message = str(error)
+        if any(fragment in message for fragment in STALE_HANDLE_ERRORS):
+            self._stale_errors += 1
+            logger.warning("Лист таблицы изменен вне бота, список листов будет перезагружен",
+                           details={"ошибка": message[:200]})
+            self.invalidate()
+
+    def stats(self) -> Dict[str, object]:
+        """Возвращает состояние реестра"""
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "worksheets": len(self._worksheets),
+                "hits": self._hits,
+                "loads": self._loads,
+                "stale_errors": self._stale_errors,
+                "age": round(time.time() - self._loaded_time, 1) if self._loaded else None,
+            }
+
+# Создаем глобальный экземпляр реестра
+worksheet_registry = WorksheetRegistry()
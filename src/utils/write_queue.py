@@ -0,0 +1,429 @@
+"""
+Модуль с очередью отложенных записей в Google Sheets на время недоступности таблицы
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from utils.logger import get_logger
+from utils.rate_limiter import PRIORITY_BACKGROUND, OPERATION_READ, OPERATION_WRITE
+from utils.sheets_cache import sheets_cache
+from utils.sheets_retry import sheets_retry
+from utils.users_index import UsersIndex
+
+# Получаем логгер для модуля
+logger = get_logger()
+
+
+class DeferredWriteQueue:
+    """
+    Очередь строк, которые не удалось (или не стоит пытаться) записать в таблицу сразу.
+
+    Пока Sheets API недоступен, новые пользователи и посты не теряются:
+    строка дописывается в локальный журнал (JSONL, fsync) и ставится в очередь.
+    Фоновая задача раз в drain_interval отправляет очередь по порядку:
+    подряд идущие строки одного листа уходят одним вызовом append_function.
+    При ошибке отправка останавливается, строки остаются в очереди до
+    следующей попытки. Пока выключатель разомкнут, попытка завершается сразу,
+    а после таймаута служит пробным запросом. Журнал читается при запуске.
+
+    Строки, которые могли попасть в лист (таймаут, 5xx, восстановление из
+    журнала), перед повторной отправкой ищутся в листе через verify_function,
+    поэтому пользователи и посты не дублируются. Строку, которую таблица
+    отклоняет, очередь переносит в карантинный файл и идет дальше.
+    Значения, которые выбираются по данным таблицы (ID пользователя после
+    теплого запуска), дописываются в строку обработчиком prepare перед отправкой.
+    """
+
+    def __init__(self, append_function: Callable[[str, List[List[str]]], dict], journal_path: str,
+                 drain_interval: float = 15,
+                 verify_function: Optional[Callable[[str, List[List[str]]], List[bool]]] = None):
+        """
+        Инициализация очереди
+
+        Args:
+            append_function (Callable): Синхронная функция (лист, строки) -> ответ values.append
+            journal_path (str): Путь к файлу журнала
+            drain_interval (float): Интервал между попытками отправки очереди, с
+            verify_function (Optional[Callable]): Синхронная функция (лист, строки) -> есть ли
+                каждая строка уже в листе
+        """
+        self.append_function = append_function
+        self.verify_function = verify_function
+        self.journal_path = journal_path
+        self.quarantine_path = os.path.splitext(journal_path)[0] + ".quarantine.jsonl"
+        self.drain_interval = max(1.0, drain_interval)
+
+        self._pending: List[Dict] = []  # [{"id": ..., "kind": ..., "sheet": ..., "row": [...], "key": ...}]
+        self._uncertain = set()  # ID строк, которые могли уже попасть в лист
+        self._sending = False
+        self._handlers: Dict[str, Callable[[Dict, Optional[int]], None]] = {}
+        self._quarantine_handlers: Dict[str, Callable[[Dict], None]] = {}
+        self._prepare_handlers: Dict[str, Callable[[List[Dict]], bool]] = {}
+        self._journal_lock = threading.Lock()
+        self._drain_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._applied_rows = 0
+        self._drain_errors = 0
+        self._verified_rows = 0
+        self._quarantined = 0
+
+        journal_dir = os.path.dirname(self.journal_path)
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """Загружает незаписанные строки из журнала"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self._pending.append(entry)
+                    # Строка могла быть записана перед падением бота, до очистки журнала
+                    self._uncertain.add(entry["id"])
+                except json.JSONDecodeError:
+                    # Оборванная последняя строка после падения - пропускаем
+                    logger.warning("Поврежденная запись в журнале отложенных записей пропущена",
+                                   details={"файл": self.journal_path})
+
+        if self._pending:
+            logger.data_load("журнал отложенных записей", self.journal_path, count=len(self._pending))
+
+    def _rewrite_journal(self):
+        """Переписывает журнал, оставляя только неотправленные строки"""
+        with self._journal_lock:
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as journal:
+                for entry in list(self._pending):
+                    journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def register(self, kind: str, on_applied: Callable[[Dict, Optional[int]], None],
+                 on_quarantined: Optional[Callable[[Dict], None]] = None,
+                 prepare: Optional[Callable[[List[Dict]], bool]] = None):
+        """
+        Регистрирует обработчик записанных строк вида kind
+
+        Args:
+            kind (str): Вид записи ("users", "posts", ...)
+            on_applied (Callable): Вызывается с записью и номером строки в листе (или None)
+            on_quarantined (Optional[Callable]): Вызывается с записью, перенесенной в карантин
+            prepare (Optional[Callable]): Синхронная функция (записи) -> изменены ли строки;
+                вызывается перед отправкой и может дописать в строки значения, которые
+                нельзя было выбрать без таблицы (например, ID пользователя)
+        """
+        self._handlers[kind] = on_applied
+        if on_quarantined is not None:
+            self._quarantine_handlers[kind] = on_quarantined
+        if prepare is not None:
+            self._prepare_handlers[kind] = prepare
+
+    def enqueue(self, kind: str, sheet_title: str, row: List[str], key: Optional[str] = None):
+        """
+        Ставит строку в очередь; строка считается принятой после записи в журнал
+
+        Args:
+            kind (str): Вид записи
+            sheet_title (str): Название листа
+            row (List[str]): Строка для добавления в конец листа
+            key (Optional[str]): Ключ записи (например, telegram_id) для обработчика
+        """
+        entry = {"id": uuid.uuid4().hex, "kind": kind, "sheet": sheet_title, "row": row, "key": key}
+        with self._journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._pending.append(entry)
+        logger.data_processing("отложенные записи", "Строка поставлена в очередь",
+                               details={"вид": kind, "лист": sheet_title, "в очереди": len(self._pending)})
+
+    def has_pending(self, kind: Optional[str] = None) -> bool:
+        """Есть ли в очереди неотправленные строки (вида kind или любые)"""
+        with self._journal_lock:
+            return any(kind is None or entry["kind"] == kind for entry in self._pending)
+
+    def pending_entries(self, kind: Optional[str] = None) -> List[Dict]:
+        """Возвращает неотправленные записи (вида kind или все)"""
+        with self._journal_lock:
+            return [dict(entry) for entry in self._pending if kind is None or entry["kind"] == kind]
+
+    def _next_batch(self) -> List[Dict]:
+        """Первые подряд идущие записи одного листа"""
+        with self._journal_lock:
+            if not self._pending:
+                return []
+            sheet_title = self._pending[0]["sheet"]
+            batch = []
+            for entry in self._pending:
+                if entry["sheet"] != sheet_title:
+                    break
+                batch.append(entry)
+            return batch
+
+    def _apply(self, batch: List[Dict], response: dict):
+        """Передает записанные строки обработчикам с номерами строк в листе"""
+        first_row = UsersIndex.parse_updated_row(response)
+        for offset, entry in enumerate(batch):
+            handler = self._handlers.get(entry["kind"])
+            if handler is None:
+                continue
+            try:
+                handler(entry, first_row + offset if first_row else None)
+            except Exception as e:
+                logger.error("обработка_отложенной_записи", e, details={"вид": entry["kind"], "ключ": entry["key"]})
+
+    def _remove(self, entries: List[Dict]):
+        """Убирает записи из очереди"""
+        done = {entry["id"] for entry in entries}
+        with self._journal_lock:
+            self._pending = [entry for entry in self._pending if entry["id"] not in done]
+            self._uncertain -= done
+
+    def _send(self, sheet_title: str, rows: List[List[str]]) -> dict:
+        """Выполняется в потоке пула: отправляет строки и отмечает, что отправка идет"""
+        self._sending = True
+        try:
+            return self.append_function(sheet_title, rows)
+        finally:
+            self._sending = False
+
+    def _quarantine(self, entry: Dict, error: Exception):
+        """Переносит запись, которую таблица отклоняет, из очереди в карантинный файл"""
+        with self._journal_lock:
+            with open(self.quarantine_path, "a", encoding="utf-8") as quarantine:
+                quarantine.write(json.dumps(dict(entry, error=str(error)[:500], quarantined_at=int(time.time())),
+                                            ensure_ascii=False) + "\n")
+        self._remove([entry])
+        self._quarantined += 1
+        logger.error("запись_отложенных_строк", error,
+                     details={"вид": entry["kind"], "ключ": entry["key"], "карантин": self.quarantine_path})
+        handler = self._quarantine_handlers.get(entry["kind"])
+        if handler is not None:
+            handler(entry)
+
+    async def _prepare(self, batch: List[Dict]) -> bool:
+        """
+        Дополняет строки пачки перед отправкой (обработчики prepare)
+
+        Returns:
+            bool: False - подготовить строки не удалось, отправку нужно прекратить до следующей попытки
+        """
+        changed = False
+        for kind in sorted({entry["kind"] for entry in batch} & set(self._prepare_handlers)):
+            entries = [entry for entry in batch if entry["kind"] == kind]
+            try:
+                changed = await sheets_cache.execute_with_rate_limit(
+                    self._prepare_handlers[kind], entries,
+                    priority=PRIORITY_BACKGROUND, operation=OPERATION_READ
+                ) or changed
+            except Exception as e:
+                self._drain_errors += 1
+                logger.warning("Не удалось подготовить отложенные записи к отправке, отправка отложена",
+                               details={"вид": kind, "ошибка": str(e)[:200]})
+                return False
+        if changed:
+            # Дополненные строки сохраняем до отправки: после перезапуска они проверяются в листе как есть
+            try:
+                await sheets_cache.run_in_executor(self._rewrite_journal)
+            except Exception as e:
+                self._drain_errors += 1
+                logger.warning("Не удалось сохранить подготовленные записи в журнал, отправка отложена",
+                               details={"ошибка": str(e)[:200]})
+                return False
+        return True
+
+    async def _verify(self, batch: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Ищет в листе записи пачки с неизвестным исходом; найденные считаются записанными
+
+        Returns:
+            Optional[List[Dict]]: Записи, которые еще нужно отправить; None - проверить не удалось
+        """
+        uncertain = [entry for entry in batch if entry["id"] in self._uncertain]
+        if not uncertain or self.verify_function is None:
+            return batch
+        try:
+            present = await sheets_cache.execute_with_rate_limit(
+                self.verify_function, batch[0]["sheet"], [entry["row"] for entry in uncertain],
+                priority=PRIORITY_BACKGROUND, operation=OPERATION_READ
+            )
+        except Exception as e:
+            self._drain_errors += 1
+            logger.warning("Не удалось проверить отложенные записи в таблице, отправка отложена",
+                           details={"лист": batch[0]["sheet"], "ошибка": str(e)[:200]})
+            return None
+
+        found = [entry for entry, written in zip(uncertain, present) if written]
+        with self._journal_lock:
+            self._uncertain.difference_update(entry["id"] for entry in uncertain)
+        if found:
+            self._remove(found)
+            # Номер строки неизвестен - обработчики получают None
+            self._apply(found, {})
+            self._verified_rows += len(found)
+            self._applied_rows += len(found)
+            logger.data_processing("отложенные записи", "Строки уже были записаны в таблицу, повторно не отправляются",
+                                   details={"лист": batch[0]["sheet"], "строк": len(found)})
+        found_ids = {entry["id"] for entry in found}
+        return [entry for entry in batch if entry["id"] not in found_ids]
+
+    async def _write(self, batch: List[Dict]) -> Optional[int]:
+        """
+        Отправляет пачку одного листа
+
+        Returns:
+            Optional[int]: Количество записанных строк; None - отправку нужно прекратить до следующей попытки
+        """
+        try:
+            response = await sheets_cache.execute_with_rate_limit(
+                self._send, batch[0]["sheet"], [entry["row"] for entry in batch],
+                priority=PRIORITY_BACKGROUND, operation=OPERATION_WRITE
+            )
+        except Exception as e:
+            self._drain_errors += 1
+            if sheets_retry.is_unsent_error(e):
+                logger.warning("Таблица недоступна, отложенные записи остаются в очереди",
+                               details={"в очереди": len(self._pending)})
+                return None
+            if sheets_retry.is_unavailable_error(e):
+                # Строки могли записаться: перед повтором их нужно найти в листе
+                with self._journal_lock:
+                    self._uncertain.update(entry["id"] for entry in batch)
+                logger.warning("Исход отложенной записи неизвестен, перед повтором строки будут проверены в таблице",
+                               details={"лист": batch[0]["sheet"], "строк": len(batch), "ошибка": str(e)[:200]})
+                return None
+            if len(batch) > 1:
+                # Отправляем по одной, чтобы в карантин попала только отклоненная строка
+                written = 0
+                for entry in batch:
+                    result = await self._write([entry])
+                    if result is None:
+                        return None
+                    written += result
+                return written
+            self._quarantine(batch[0], e)
+            return 0
+
+        self._remove(batch)
+        self._apply(batch, response)
+        self._applied_rows += len(batch)
+        return len(batch)
+
+    async def drain(self) -> int:
+        """
+        Отправляет очередь в таблицу по порядку
+
+        Returns:
+            int: Количество записанных строк
+        """
+        if self._drain_lock is None:
+            self._drain_lock = asyncio.Lock()
+
+        applied = 0
+        async with self._drain_lock:
+            while not self._sending:
+                # Пока предыдущая отправка еще идет в потоке пула (таймаут ожидания), не отправляем
+                batch = self._next_batch()
+                if not batch:
+                    break
+                if not await self._prepare(batch):
+                    break
+                unsent = await self._verify(batch)
+                if unsent is None:
+                    break
+                applied += len(batch) - len(unsent)
+                if unsent:
+                    written = await self._write(unsent)
+                    if written is None:
+                        break
+                    applied += written
+            await sheets_cache.run_in_executor(self._rewrite_journal)
+
+        if applied:
+            logger.data_processing("отложенные записи", "Очередь отложенных записей отправлена в таблицу",
+                                   details={"строк": applied, "осталось": len(self._pending)})
+        return applied
+
+    async def _run(self):
+        """Фоновая задача периодической отправки очереди"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.drain_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._pending:
+                continue
+            try:
+                await self.drain()
+            except Exception as e:
+                # Ошибка одной попытки (пул перегружен, журнал не переписан) не должна останавливать отправку:
+                # записи остаются в очереди и журнале до следующей попытки
+                self._drain_errors += 1
+                logger.error("фоновая_отправка_отложенных_записей", e, details={"в очереди": len(self._pending)})
+
+    def wakeup(self):
+        """Запускает отправку очереди, не дожидаясь интервала"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """Запускает фоновую отправку очереди (вызывать внутри цикла событий)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._drain_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._pending:
+            # Сразу отправляем строки, восстановленные из журнала
+            self._wakeup.set()
+        logger.init("DeferredWriteQueue", "Очередь отложенных записей запущена",
+                    details={"интервал": f"{self.drain_interval:.0f}с", "из журнала": len(self._pending)})
+
+    async def stop(self):
+        """Останавливает фоновую задачу и делает последнюю попытку отправки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            await self.drain()
+        if self._pending:
+            logger.warning("Не все отложенные записи отправлены в таблицу, они останутся в журнале",
+                           details={"строк": len(self._pending), "файл": self.journal_path})
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает состояние очереди"""
+        with self._journal_lock:
+            by_kind: Dict[str, int] = {}
+            for entry in self._pending:
+                by_kind[entry["kind"]] = by_kind.get(entry["kind"], 0) + 1
+        return {
+            "pending": sum(by_kind.values()),
+            "pending_by_kind": by_kind,
+            "applied_rows": self._applied_rows,
+            "drain_errors": self._drain_errors,
+            "uncertain": len(self._uncertain),
+            "verified_rows": self._verified_rows,
+            "quarantined": self._quarantined,
+        }
@@ -14,8 +14,8 @@ if [ ! -f ".env" ]; then
     exit 1
 fi
 
-# Создаем директорию для логов
-mkdir -p logs
+# Создаем директории для логов и локальных данных
+mkdir -p logs data
 
 # Запускаем бота в Docker
 docker-compose up -d